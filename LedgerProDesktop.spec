@@ -6,7 +6,7 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[('assets', 'assets'), ('database/schema.sql', 'database'), ('br31logo.png', '.')],
-    hiddenimports=['sqlite3', 'reportlab', 'PySide6.QtPrintSupport', 'PySide6.QtXml', 'update_schema', 'update_schema_v2', 'update_schema_v3', 'update_schema_v4', 'debug_logger', 'matplotlib', 'matplotlib.backends.backend_qtagg'],
+    hiddenimports=['sqlite3', 'reportlab', 'PySide6.QtPrintSupport', 'PySide6.QtXml', 'update_schema', 'update_schema_v2', 'update_schema_v3', 'update_schema_v4', 'update_schema_v5', 'update_schema_v6', 'update_schema_v7', 'update_schema_v8', 'update_schema_v9', 'update_schema_v10', 'update_schema_v11', 'update_schema_v12', 'update_schema_v13', 'debug_logger', 'matplotlib', 'matplotlib.backends.backend_qtagg'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -1,8 +1,70 @@
+import time
+import threading
 import bcrypt
-from database.db import execute_read_query, execute_write_query
+from database.db import execute_read_query, execute_write_query, get_remote
+from modules.backend import remotable
+
+# bcrypt cost is calibrated once per run so verifying a password takes about
+# TARGET_VERIFY_MS on this machine. Each extra round doubles the time.
+TARGET_VERIFY_MS = 250
+MIN_ROUNDS = 10
+MAX_ROUNDS = 16
+CALIBRATION_ROUNDS = 8
+
+_work_factor = None
+_calibration_lock = threading.Lock()
+
+def calibrate_work_factor(target_ms=TARGET_VERIFY_MS):
+    """
+    Times a cheap hash and returns the highest cost whose estimated verify
+    time stays within target_ms (clamped to MIN_ROUNDS..MAX_ROUNDS). The
+    result is used by hash_password() for the rest of the session.
+    """
+    global _work_factor
+    with _calibration_lock:
+        # Best of three, so a busy moment at startup doesn't lower the cost
+        best = None
+        for _ in range(3):
+            started = time.perf_counter()
+            bcrypt.hashpw(b"calibration", bcrypt.gensalt(CALIBRATION_ROUNDS))
+            elapsed = (time.perf_counter() - started) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+
+        rounds = MIN_ROUNDS
+        while rounds < MAX_ROUNDS and best * 2 ** (rounds + 1 - CALIBRATION_ROUNDS) <= target_ms:
+            rounds += 1
+        _work_factor = rounds
+        return rounds
+
+def get_work_factor():
+    """Returns the calibrated bcrypt cost, calibrating on first use."""
+    if _work_factor is None:
+        return calibrate_work_factor()
+    return _work_factor
+
+def get_hash_rounds(hashed):
+    """Returns the cost stored in a bcrypt hash ("$2b$12$..." -> 12), or None."""
+    if isinstance(hashed, bytes):
+        hashed = hashed.decode('utf-8')
+    try:
+        return int(hashed.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+def needs_rehash(hashed):
+    """
+    True when a stored hash is weaker than the calibrated cost, or more than
+    one round slower than it (calibration may differ by a round between runs,
+    which shouldn't rewrite every hash).
+    """
+    rounds = get_hash_rounds(hashed)
+    if rounds is None:
+        return False
+    factor = get_work_factor()
+    return rounds < factor or rounds > factor + 1
 
 def hash_password(password):
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(get_work_factor())).decode('utf-8')
 
 def check_password(password, hashed):
     # If hashed is bytes, decode it; if it's str, encode it for bcrypt
@@ -10,25 +72,44 @@ def check_password(password, hashed):
         hashed = hashed.encode('utf-8')
     return bcrypt.checkpw(password.encode('utf-8'), hashed)
 
-def login_user(email, password):
+def login_user(email, password, progress_callback=None, is_cancelled=None):
     """
     Verifies user credentials.
     Returns user dict if successful, None otherwise.
+
+    Slow by design (bcrypt), so the login window runs it on a BackgroundTask.
+    A hash made with a different cost is replaced with one at the calibrated
+    cost while the plain password is at hand. On a client terminal the
+    server checks the password and signs the user in there.
     """
+    remote = get_remote()
+    if remote is not None:
+        return remote.login(email, password)
     try:
         user_rows = execute_read_query("SELECT * FROM users WHERE email = ?", (email,))
         if not user_rows:
             return None
-        
+
         user = user_rows[0]
         # user['password_hash'] should be the hash string from DB
-        if check_password(password, user['password_hash']):
-            return dict(user)
-        return None
+        if not check_password(password, user['password_hash']):
+            return None
+
+        user = dict(user)
+        if needs_rehash(user['password_hash']):
+            try:
+                user['password_hash'] = hash_password(password)
+                execute_write_query("UPDATE users SET password_hash = ? WHERE id = ?",
+                                   (user['password_hash'], user['id']))
+            except Exception as e:
+                # The login itself succeeded; the old hash still works
+                print(f"Warning: Could not rehash password: {e}")
+        return user
     except Exception as e:
         print(f"Login error: {e}")
         return None
 
+@remotable(write=True)
 def signup_user(name, email, password):
     """
     Registers a new user.
@@ -36,7 +117,7 @@ def signup_user(name, email, password):
     """
     hashed = hash_password(password)
     try:
-        execute_write_query("INSERT INTO users (name, email, password_hash) VALUES (?, ?, ?)", 
+        execute_write_query("INSERT INTO users (name, email, password_hash) VALUES (?, ?, ?)",
                            (name, email, hashed))
         return True
     except Exception as e:
@@ -44,12 +125,15 @@ def signup_user(name, email, password):
         print(f"Signup error: {e}")
         return False
 
-def update_password(user_id, new_password):
-    """Updates user password."""
-    hashed = hash_password(new_password)
-    try:
-        execute_write_query("UPDATE users SET password_hash = ? WHERE id = ?", (hashed, user_id))
-        return True
-    except Exception as e:
-        print(f"Update password error: {e}")
+@remotable(write=True)
+def change_password(user_id, current_password, new_password):
+    """
+    Replaces the user's password once the current one checks out. Runs on
+    the server for a client terminal, so the stored hash never leaves it.
+    Returns False if the user is gone or the current password is wrong.
+    """
+    rows = execute_read_query("SELECT password_hash FROM users WHERE id = ?", (user_id,))
+    if not rows or not check_password(current_password, rows[0]['password_hash']):
         return False
+    execute_write_query("UPDATE users SET password_hash = ? WHERE id = ?", (hash_password(new_password), user_id))
+    return True
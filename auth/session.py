@@ -1,3 +1,6 @@
+from database import audit
+from database.db import get_remote
+
 class Session:
     _instance = None
     user = None
@@ -10,9 +13,15 @@ class Session:
 
     def set_user(self, user_data):
         self.user = user_data
+        # Changes recorded by the audit triggers are attributed to this user
+        audit.set_user(user_data.get('id') if user_data else None)
 
     def get_user(self):
         return self.user
 
     def clear(self):
         self.user = None
+        audit.set_user(None)
+        remote = get_remote()
+        if remote is not None:
+            remote.logout()
@@ -1,12 +1,13 @@
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton,
-    QMessageBox, QFormLayout, QFrame, QCheckBox, QInputDialog
+    QMessageBox, QFormLayout, QFrame, QCheckBox, QInputDialog, QProgressBar
 )
 from PySide6.QtCore import Qt, Signal
 from PySide6.QtGui import QFont, QPalette, QColor, QIcon, QPixmap, QPainter
 import os
-from auth.auth_logic import login_user, signup_user, update_password
+from auth.auth_logic import login_user, signup_user
 from auth.session import Session
+from ui.workers import BackgroundTask
 
 from database.db import execute_read_query, execute_write_query
 
@@ -181,11 +182,21 @@ class LoginWindow(QWidget):
         right_layout.addLayout(options_layout)
         right_layout.addSpacing(20)
         
-        login_btn = QPushButton("LOGIN")
-        login_btn.setObjectName("LoginBtn")
-        login_btn.setCursor(Qt.CursorShape.PointingHandCursor)
-        login_btn.clicked.connect(self.handle_login)
-        right_layout.addWidget(login_btn)
+        self.login_btn = QPushButton("LOGIN")
+        self.login_btn.setObjectName("LoginBtn")
+        self.login_btn.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.login_btn.clicked.connect(self.handle_login)
+        right_layout.addWidget(self.login_btn)
+        self.password_input.returnPressed.connect(self.handle_login)
+
+        # Busy indicator while the password is verified off the GUI thread
+        self.login_progress = QProgressBar()
+        self.login_progress.setRange(0, 0)
+        self.login_progress.setTextVisible(False)
+        self.login_progress.setFixedHeight(4)
+        self.login_progress.hide()
+        right_layout.addWidget(self.login_progress)
+        self.login_task = None
         
         right_layout.addSpacing(20)
         
@@ -239,13 +250,37 @@ class LoginWindow(QWidget):
         if not email or not password:
             QMessageBox.warning(self, "Error", "Please fill all fields")
             return
-            
-        user = login_user(email, password)
+        if self.login_task and self.login_task.is_running():
+            return
+
+        # bcrypt takes a noticeable fraction of a second by design
+        self.set_busy(True)
+        self.login_task = BackgroundTask(login_user, email, password)
+        self.login_task.finished.connect(self.on_login_finished)
+        self.login_task.failed.connect(self.on_login_failed)
+        self.login_task.start()
+
+    def set_busy(self, busy):
+        self.email_input.setEnabled(not busy)
+        self.password_input.setEnabled(not busy)
+        self.login_btn.setEnabled(not busy)
+        self.login_btn.setText("SIGNING IN..." if busy else "LOGIN")
+        self.login_progress.setVisible(busy)
+
+    def on_login_finished(self, user):
+        self.login_task.wait()
+        self.set_busy(False)
         if user:
             Session.get_instance().set_user(user)
-            self.login_successful.emit(user.get('name', email))
+            self.login_successful.emit(user.get('name', self.email_input.text()))
         else:
             QMessageBox.critical(self, "Login Failed", "Invalid email or password")
+            self.password_input.setFocus()
+
+    def on_login_failed(self, message):
+        self.login_task.wait()
+        self.set_busy(False)
+        QMessageBox.critical(self, "Login Failed", f"Could not sign in: {message}")
 
 class SignupWindow(QWidget):
     signup_successful = Signal()
@@ -0,0 +1,611 @@
+import os
+import sys
+import csv
+import json
+import time
+import random
+import sqlite3
+import argparse
+import platform
+import datetime
+import tempfile
+import statistics
+import database.db as db
+from database import audit
+
+# Generates a reproducible large set of books in a scratch database and times
+# the hot paths against it. The same seed and sizes always produce the same
+# rows, so result files from different versions can be compared with --compare.
+#
+#   python benchmark.py --scale 0.01 --output bench.json
+#   python benchmark.py --output new.json --compare bench.json
+#   python benchmark.py --scale 0.01 --only create_invoice --audit-overhead
+
+BOOKS_START = datetime.date(2022, 4, 1)
+BOOKS_DAYS = 3 * 365
+LINES_PER_INVOICE = 5
+LINES_PER_BILL = 3
+COMPANY_STATE = "Maharashtra"
+STATES = ["Maharashtra", "Karnataka", "Tamil Nadu", "Delhi", "West Bengal", "Gujarat", "Kerala", "Punjab"]
+GST_RATES = [0.0, 5.0, 12.0, 18.0, 28.0]
+CHUNK = 10000
+# Write paths timed with and without the audit triggers, and the slowdown
+# they may cost before --audit-overhead reports a failure
+AUDITED_WRITES = ("create_invoice", "reduce_stock_fifo")
+AUDIT_OVERHEAD_LIMIT = 0.10
+# Alternating plain/audited rounds the overhead is measured over
+AUDIT_ROUNDS = 7
+
+
+def _date(rng, start=BOOKS_START, days=BOOKS_DAYS):
+    return (start + datetime.timedelta(days=rng.randrange(days))).isoformat()
+
+
+def _insert_chunked(conn, query, rows):
+    """executemany in fixed-size chunks so generators are never fully materialised."""
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= CHUNK:
+            conn.executemany(query, chunk)
+            chunk = []
+    if chunk:
+        conn.executemany(query, chunk)
+
+
+def generate_books(db_path, items=100000, invoice_lines=1000000, payments=500000, seed=42, progress=print):
+    """
+    Creates a new database at db_path and fills it with synthetic books using
+    bulk inserts on a single connection.
+
+    Customers, vendors and bills are sized from the item and invoice counts.
+    Invoice statuses follow the generated payments, and FIFO items get their
+    stock batches and an opening stock movement, so every report has realistic
+    data to read.
+
+    Returns:
+        dict: Row counts per table.
+    """
+    if os.path.exists(db_path):
+        raise Exception(f"{db_path} already exists; the benchmark needs a new database file.")
+    rng = random.Random(seed)
+    original_db = db.DB_NAME
+    db.DB_NAME = db_path
+    try:
+        db.init_db()
+    finally:
+        db.DB_NAME = original_db
+
+    conn = sqlite3.connect(db_path, timeout=30.0)
+    conn.execute("PRAGMA synchronous=OFF")
+    counts = {}
+    try:
+        conn.execute("BEGIN")
+        # Generated books are not user changes; keep them out of the audit log
+        conn.execute(*audit.context_query(suspended=True))
+        conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('company_state', ?)", (COMPANY_STATE,))
+
+        n_customers = max(items // 50, 10)
+        n_vendors = max(n_customers // 4, 5)
+        conn.executemany(
+            "INSERT INTO customers (id, name, email, phone, address, state) VALUES (?, ?, ?, ?, ?, ?)",
+            ((i, f"Customer {i:06d}", f"customer{i}@example.com", f"98{i:08d}", f"{i} Market Road", rng.choice(STATES))
+             for i in range(1, n_customers + 1))
+        )
+        conn.executemany(
+            "INSERT INTO vendors (id, name, email, phone, address, state) VALUES (?, ?, ?, ?, ?, ?)",
+            ((i, f"Vendor {i:06d}", f"vendor{i}@example.com", f"97{i:08d}", f"{i} Industrial Area", rng.choice(STATES))
+             for i in range(1, n_vendors + 1))
+        )
+        counts['customers'], counts['vendors'] = n_customers, n_vendors
+        progress(f"Generated {n_customers} customers and {n_vendors} vendors")
+
+        # Items: one in ten is weighted average, the rest FIFO with two batches
+        prices, item_rows, batch_rows, movement_rows = [], [], [], []
+        for i in range(1, items + 1):
+            selling = round(rng.uniform(10, 5000), 2)
+            purchase = round(selling * rng.uniform(0.5, 0.9), 2)
+            gst = rng.choice(GST_RATES)
+            stock = rng.randrange(0, 500)
+            method = "Weighted Average" if i % 10 == 0 else "FIFO"
+            prices.append((selling, gst))
+            item_rows.append((i, f"Item {i:06d}", f"SKU{i:06d}", f"{8400 + i % 100}", selling, purchase, gst,
+                              stock, rng.randrange(0, 50), method, purchase if method != "FIFO" else 0))
+            if method == "FIFO" and stock:
+                first = stock // 2
+                batch_rows.append((i, first, purchase, BOOKS_START.isoformat()))
+                batch_rows.append((i, stock - first, round(purchase * 1.05, 2), _date(rng)))
+                value = first * purchase + (stock - first) * round(purchase * 1.05, 2)
+            else:
+                value = stock * purchase
+            if stock:
+                movement_rows.append((i, BOOKS_START.isoformat(), stock, value, 'opening'))
+        conn.executemany("""
+            INSERT INTO items (id, name, sku, hsn_sac, selling_price, purchase_price, gst_rate, stock_on_hand,
+                               reorder_point, inventory_valuation_method, average_cost, track_inventory)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
+        """, item_rows)
+        conn.executemany(
+            "INSERT INTO stock_batches (item_id, quantity_remaining, purchase_rate, purchase_date) VALUES (?, ?, ?, ?)",
+            batch_rows
+        )
+        conn.executemany(
+            "INSERT INTO stock_movements (item_id, date, quantity, value, kind) VALUES (?, ?, ?, ?, ?)",
+            movement_rows
+        )
+        counts['items'], counts['stock_batches'] = items, len(batch_rows)
+        del item_rows, batch_rows, movement_rows
+        progress(f"Generated {items} items")
+
+        # Invoices: headers stay in memory until the payments decide their status
+        n_invoices = max(invoice_lines // LINES_PER_INVOICE, 1)
+        invoice_dates = sorted(_date(rng) for _ in range(n_invoices))
+        invoices = []
+
+        def invoice_lines_rows():
+            for idx, date in enumerate(invoice_dates, start=1):
+                customer_id = rng.randrange(1, n_customers + 1)
+                subtotal = tax = 0.0
+                for _ in range(LINES_PER_INVOICE):
+                    item_id = rng.randrange(1, items + 1)
+                    rate, gst = prices[item_id - 1]
+                    qty = rng.randrange(1, 10)
+                    amount = round(qty * rate, 2)
+                    subtotal += amount
+                    tax += amount * gst / 100
+                    yield (idx, item_id, qty, rate, gst, amount)
+                invoices.append([idx, f"INV-{idx:07d}", customer_id, date, round(subtotal, 2), round(tax, 2),
+                                 round(subtotal + tax, 2)])
+
+        _insert_chunked(conn, """
+            INSERT INTO invoice_items (invoice_id, item_id, quantity, rate, gst_percent, amount)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, invoice_lines_rows())
+        counts['invoice_items'] = n_invoices * LINES_PER_INVOICE
+        progress(f"Generated {counts['invoice_items']} invoice lines")
+
+        n_bills = max(n_invoices // 10, 1)
+        bills = []
+
+        def bill_lines_rows():
+            for idx, date in enumerate(sorted(_date(rng) for _ in range(n_bills)), start=1):
+                subtotal = tax = 0.0
+                for _ in range(LINES_PER_BILL):
+                    item_id = rng.randrange(1, items + 1)
+                    rate, gst = prices[item_id - 1]
+                    qty = rng.randrange(5, 50)
+                    amount = round(qty * rate * 0.7, 2)
+                    subtotal += amount
+                    tax += amount * gst / 100
+                    yield (idx, item_id, qty, round(rate * 0.7, 2), gst, amount)
+                bills.append([idx, f"BILL-{idx:06d}", rng.randrange(1, n_vendors + 1), date, round(subtotal, 2),
+                              round(tax, 2), round(subtotal + tax, 2)])
+
+        _insert_chunked(conn, """
+            INSERT INTO bill_items (bill_id, item_id, quantity, rate, gst_percent, amount)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, bill_lines_rows())
+        counts['bill_items'] = n_bills * LINES_PER_BILL
+
+        # Payments: four in five settle invoices, the rest bills, often in instalments
+        last_day = BOOKS_START + datetime.timedelta(days=BOOKS_DAYS)
+        invoice_due = [inv[6] for inv in invoices]
+        bill_due = [bill[6] for bill in bills]
+
+        def payment_rows():
+            for n in range(1, payments + 1):
+                if n % 5:
+                    docs, due, column = invoices, invoice_due, 'invoice'
+                else:
+                    docs, due, column = bills, bill_due, 'bill'
+                # Look for a document that is not fully paid yet
+                for _ in range(10):
+                    idx = rng.randrange(len(docs))
+                    if due[idx] > 0.01:
+                        break
+                else:
+                    continue
+                amount = due[idx] if rng.random() < 0.3 else round(due[idx] * rng.choice((0.2, 0.3, 0.5)), 2)
+                due[idx] = round(due[idx] - amount, 2)
+                doc_date = datetime.date.fromisoformat(docs[idx][3])
+                date = min(doc_date + datetime.timedelta(days=rng.randrange(0, 60)), last_day).isoformat()
+                party_id = docs[idx][2]
+                yield (f"PAY-{n:07d}", docs[idx][0] if column == 'invoice' else None,
+                       docs[idx][0] if column == 'bill' else None,
+                       party_id if column == 'invoice' else None, party_id if column == 'bill' else None,
+                       amount, date, rng.choice(("Cash", "Bank Transfer", "UPI")))
+
+        _insert_chunked(conn, """
+            INSERT INTO payments (payment_number, invoice_id, bill_id, customer_id, vendor_id, amount, date, method)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, payment_rows())
+        counts['payments'] = conn.execute("SELECT COUNT(*) FROM payments").fetchone()[0]
+        progress(f"Generated {counts['payments']} payments")
+
+        def status(due):
+            return 'Paid' if due <= 0.01 else 'Sent'
+
+        _insert_chunked(conn, """
+            INSERT INTO invoices (id, invoice_number, customer_id, date, due_date, subtotal, tax_amount, grand_total, status)
+            VALUES (?, ?, ?, ?, DATE(?, '+30 days'), ?, ?, ?, ?)
+        """, ((idx, number, customer_id, date, date, subtotal, tax, total, status(invoice_due[idx - 1]))
+              for idx, number, customer_id, date, subtotal, tax, total in invoices))
+        _insert_chunked(conn, """
+            INSERT INTO bills (id, bill_number, vendor_id, date, due_date, subtotal, tax_amount, grand_total, status)
+            VALUES (?, ?, ?, ?, DATE(?, '+30 days'), ?, ?, ?, ?)
+        """, ((idx, number, vendor_id, date, date, subtotal, tax, total, status(bill_due[idx - 1]))
+              for idx, number, vendor_id, date, subtotal, tax, total in bills))
+        counts['invoices'], counts['bills'] = n_invoices, n_bills
+        conn.execute("UPDATE audit_context SET suspended = 0 WHERE id = 1")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    # Same statistics the maintenance scheduler keeps up to date
+    conn = sqlite3.connect(db_path, timeout=30.0)
+    conn.execute("ANALYZE")
+    conn.close()
+    return counts
+
+
+def time_call(fn, repeat):
+    """Runs fn repeat times and returns the timings in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        'runs': repeat,
+        'min_ms': round(min(timings), 3),
+        'median_ms': round(statistics.median(timings), 3),
+        'mean_ms': round(statistics.mean(timings), 3),
+        'max_ms': round(max(timings), 3),
+    }
+
+
+def _benchmarks(rng, work_dir):
+    """Yields (name, callable) for every timed hot path. Names are stable across versions."""
+    from modules.invoice import create_invoice, generate_invoice_number
+    from modules.stock_fifo import reduce_stock_fifo
+    from modules.payment import get_unpaid_invoices
+    from modules import reports_logic as reports
+    from pdf.batch_export import load_invoices_bulk, get_company_settings
+    from pdf.generator import generate_invoice_pdf
+    from pdf.report_stream import generate_streaming_report_pdf
+
+    execute_read_query = db.execute_read_query
+    n_items = execute_read_query("SELECT MAX(id) FROM items")[0][0]
+    n_customers = execute_read_query("SELECT MAX(id) FROM customers")[0][0]
+    last_date = execute_read_query("SELECT MAX(date) FROM invoices")[0][0]
+    year = int(last_date[:4])
+    fiscal_year = year if int(last_date[5:7]) >= 4 else year - 1
+    month_start, month_end = f"{last_date[:7]}-01", last_date
+    fifo_items = [row[0] for row in execute_read_query(
+        "SELECT DISTINCT item_id FROM stock_batches WHERE quantity_remaining > 2 LIMIT 1000"
+    )]
+
+    def new_invoice():
+        item_ids = [rng.randrange(1, n_items + 1) for _ in range(LINES_PER_INVOICE)]
+        create_invoice({
+            'customer_id': rng.randrange(1, n_customers + 1),
+            'date': last_date,
+            'status': 'Sent',
+            'items': [{'item_id': item_id, 'quantity': 1, 'rate': 100.0, 'gst_percent': 18.0} for item_id in item_ids],
+        })
+
+    yield "create_invoice", new_invoice
+    yield "reduce_stock_fifo", lambda: reduce_stock_fifo(rng.choice(fifo_items), 1, last_date)
+    yield "generate_invoice_number", generate_invoice_number
+    yield "get_unpaid_invoices", lambda: get_unpaid_invoices(rng.randrange(1, n_customers + 1))
+
+    yield "reports.get_sales_report", lambda: reports.get_sales_report(month_start, month_end)
+    yield "reports.get_purchase_report", lambda: reports.get_purchase_report(month_start, month_end)
+    yield "reports.iter_sales_report", lambda: sum(1 for _ in reports.iter_sales_report(month_start, month_end))
+    yield "reports.iter_purchase_report", lambda: sum(1 for _ in reports.iter_purchase_report(month_start, month_end))
+    yield "reports.get_gst_report", lambda: reports.get_gst_report(month_start, month_end)
+    yield "reports.get_outstanding_invoices", reports.get_outstanding_invoices
+    yield "reports.get_stock_valuation", reports.get_stock_valuation
+    yield "reports.get_stock_valuation_at", lambda: reports.get_stock_valuation_at(f"{fiscal_year}-03-31")
+    yield "reports.get_monthly_sales_data", lambda: reports.get_monthly_sales_data(year)
+    yield "reports.get_monthly_purchase_data", lambda: reports.get_monthly_purchase_data(year)
+    yield "reports.get_ar_aging_report", reports.get_ar_aging_report
+    yield "reports.get_ap_aging_report", reports.get_ap_aging_report
+    yield "reports.get_cash_flow_data", lambda: reports.get_cash_flow_data(fiscal_year)
+    yield "reports.get_party_balance_report", reports.get_party_balance_report
+
+    settings = get_company_settings()
+    invoice_data = load_invoices_bulk(last_date, last_date, settings=settings)[0]
+    yield "pdf.generate_invoice_pdf", lambda: generate_invoice_pdf(invoice_data, os.path.join(work_dir, "invoice.pdf"))
+    report_data = dict(settings, generated_date=last_date, date_range=f"{month_start} to {month_end}")
+    yield "pdf.sales_report_stream", lambda: generate_streaming_report_pdf(
+        report_data, ["Inv #", "Customer", "Date", "Amount", "Status"],
+        ([r['invoice_number'], r['customer_name'], str(r['date']), f"₹{r['grand_total']:.2f}", r['status']]
+         for r in reports.iter_sales_report(month_start, month_end)),
+        os.path.join(work_dir, "sales_report.pdf"), "SALES REPORT"
+    )
+
+
+def benchmark_csv_import(work_dir, rows, repeat):
+    """
+    Times the Items page CSV import end to end, including the table refresh,
+    by driving the real page offscreen. Each run imports new SKUs.
+    """
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtWidgets import QApplication, QFileDialog, QMessageBox
+    app = QApplication.instance() or QApplication([])
+    from ui.master_data import ItemsPage
+
+    page = ItemsPage()
+    run = {'n': 0}
+    path = os.path.join(work_dir, "items_import.csv")
+
+    def write_csv():
+        run['n'] += 1
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(["Item Name", "SKU", "HSN/SAC", "Rate", "Purchase Rate", "Opening Stock", "Opening Stock Value"])
+            for i in range(rows):
+                writer.writerow([f"Imported {run['n']}-{i}", f"IMP{run['n']}-{i:06d}", "8471", 100, 70, 10, 700])
+
+    patched = [(QFileDialog, 'getOpenFileName', lambda *args, **kwargs: (path, ""))]
+    patched += [(QMessageBox, name, lambda *args, **kwargs: None) for name in ('information', 'critical', 'warning')]
+    originals = [(cls, name, getattr(cls, name)) for cls, name, _ in patched]
+    for cls, name, fn in patched:
+        setattr(cls, name, staticmethod(fn))
+    try:
+        timings = []
+        for _ in range(repeat):
+            write_csv()
+            started = time.perf_counter()
+            page.import_csv()
+            timings.append((time.perf_counter() - started) * 1000)
+    finally:
+        for cls, name, fn in originals:
+            setattr(cls, name, fn)
+        page.deleteLater()
+        app.processEvents()
+    return {
+        'runs': repeat,
+        'rows': rows,
+        'min_ms': round(min(timings), 3),
+        'median_ms': round(statistics.median(timings), 3),
+        'mean_ms': round(statistics.mean(timings), 3),
+        'max_ms': round(max(timings), 3),
+    }
+
+
+def run_benchmarks(db_path, repeat=5, seed=42, csv_rows=1000, only=None, progress=print):
+    """
+    Times every hot path against the books in db_path.
+
+    Returns:
+        dict: {name: {'runs', 'min_ms', 'median_ms', 'mean_ms', 'max_ms'}}; a
+        benchmark that fails records {'error': message} instead.
+    """
+    rng = random.Random(seed)
+    work_dir = tempfile.mkdtemp()
+    original_db = db.DB_NAME
+    db.DB_NAME = db_path
+    results = {}
+    try:
+        for name, fn in _benchmarks(rng, work_dir):
+            if only and not any(part in name for part in only):
+                continue
+            try:
+                results[name] = time_call(fn, repeat)
+                progress(f"{name:40s} {results[name]['median_ms']:10.2f} ms")
+            except Exception as e:
+                results[name] = {'error': str(e)}
+                progress(f"{name:40s} failed: {e}")
+        if csv_rows and (not only or any(part in "csv_import" for part in only)):
+            try:
+                results["csv_import"] = benchmark_csv_import(work_dir, csv_rows, repeat)
+                progress(f"{'csv_import':40s} {results['csv_import']['median_ms']:10.2f} ms")
+            except Exception as e:
+                results["csv_import"] = {'error': str(e)}
+                progress(f"{'csv_import':40s} failed: {e}")
+    finally:
+        # Let go of db_path so the caller can delete it
+        db.close_thread_connection()
+        db.DB_NAME = original_db
+        for name in os.listdir(work_dir):
+            os.remove(os.path.join(work_dir, name))
+        os.rmdir(work_dir)
+    return results
+
+
+def measure_audit_overhead(db_path, repeat=5, seed=42, rounds=AUDIT_ROUNDS, progress=print):
+    """
+    Times the audited write paths against db_path and against a copy of it
+    with no auditing at all: the triggers dropped and the audit_context bump
+    switched off. Both start from the same books and the same seed, so they
+    make the same writes.
+
+    The two variants take turns for the given number of rounds, swapping
+    which goes first each round, so drift in the machine's speed falls on
+    both alike. The overhead compares the fastest round median of each.
+
+    Returns:
+        dict: {name: {'audited_ms', 'plain_ms', 'overhead', 'audited_spread_ms',
+        'plain_spread_ms'}}, overhead being the fractional slowdown (0.05 = 5%)
+        and the spreads the (min, max) of the round medians.
+    """
+    work_dir = tempfile.mkdtemp()
+    plain_path = os.path.join(work_dir, "plain.db")
+    medians = {'plain': {}, 'audited': {}}
+    errors = {}
+    try:
+        source = sqlite3.connect(db_path, timeout=30.0)
+        target = sqlite3.connect(plain_path)
+        try:
+            source.backup(target)
+            audit.drop_audit_triggers(target)
+        finally:
+            target.close()
+            source.close()
+
+        quiet = lambda msg: None
+        for round_number in range(rounds):
+            order = ('plain', 'audited') if round_number % 2 == 0 else ('audited', 'plain')
+            for variant in order:
+                audit.set_enabled(variant == 'audited')
+                try:
+                    path = db_path if variant == 'audited' else plain_path
+                    results = run_benchmarks(path, repeat, seed, csv_rows=0, only=AUDITED_WRITES, progress=quiet)
+                finally:
+                    audit.set_enabled(True)
+                for name in AUDITED_WRITES:
+                    result = results.get(name, {})
+                    if 'median_ms' in result:
+                        medians[variant].setdefault(name, []).append(result['median_ms'])
+                    else:
+                        errors.setdefault(name, result.get('error'))
+    finally:
+        for name in os.listdir(work_dir):
+            os.remove(os.path.join(work_dir, name))
+        os.rmdir(work_dir)
+
+    overhead = {}
+    for name in AUDITED_WRITES:
+        before, after = medians['plain'].get(name), medians['audited'].get(name)
+        if name in errors or not before or not after or not min(before):
+            progress(f"audit overhead {name:25s} failed: {errors.get(name)}")
+            continue
+        overhead[name] = {
+            'audited_ms': min(after),
+            'plain_ms': min(before),
+            'overhead': round((min(after) - min(before)) / min(before), 3),
+            'audited_spread_ms': (min(after), max(after)),
+            'plain_spread_ms': (min(before), max(before)),
+        }
+        progress(f"audit overhead {name:25s} {min(before):10.2f} ms -> {min(after):.2f} ms "
+                 f"({overhead[name]['overhead'] * 100:+.1f}%), round medians "
+                 f"plain {min(before):.2f}-{max(before):.2f} ms, audited {min(after):.2f}-{max(after):.2f} ms")
+    return overhead
+
+
+def compare_results(baseline, current, threshold=0.2):
+    """
+    Compares two result files and returns the regressions: benchmarks whose
+    median got slower by more than threshold (0.2 = 20%). Books generated
+    with different sizes are not comparable and raise.
+
+    Returns:
+        list: [{'name', 'baseline_ms', 'current_ms', 'change'}], worst first.
+    """
+    if baseline.get('config', {}).get('books') != current.get('config', {}).get('books'):
+        raise Exception("The result files were generated with different book sizes or seeds.")
+    regressions = []
+    for name, result in current['results'].items():
+        before = baseline['results'].get(name)
+        if not before or 'median_ms' not in before or 'median_ms' not in result or not before['median_ms']:
+            continue
+        change = (result['median_ms'] - before['median_ms']) / before['median_ms']
+        if change > threshold:
+            regressions.append({'name': name, 'baseline_ms': before['median_ms'],
+                                'current_ms': result['median_ms'], 'change': round(change, 3)})
+    return sorted(regressions, key=lambda r: r['change'], reverse=True)
+
+
+def _git_revision():
+    try:
+        import subprocess
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate large synthetic books and time the hot paths.")
+    parser.add_argument("--items", type=int, default=100000, help="Number of items")
+    parser.add_argument("--invoice-lines", type=int, default=1000000, help="Number of invoice lines")
+    parser.add_argument("--payments", type=int, default=500000, help="Number of payments")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplies all three sizes, e.g. 0.01 for a quick run")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed; the same seed gives the same books")
+    parser.add_argument("--db", help="Reuse (or create) the books at this path instead of a temporary file")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per benchmark")
+    parser.add_argument("--csv-rows", type=int, default=1000, help="Rows per CSV import run, 0 to skip it")
+    parser.add_argument("--only", help="Comma separated name fragments of the benchmarks to run")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON results file")
+    parser.add_argument("--compare", help="Baseline JSON results file to check for regressions")
+    parser.add_argument("--audit-overhead", action="store_true",
+                        help="Also time the write paths without auditing and fail above a 10%% slowdown")
+    parser.add_argument("--audit-rounds", type=int, default=AUDIT_ROUNDS,
+                        help="Alternating runs with and without auditing for --audit-overhead")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed median slowdown before a regression (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    books = {
+        'items': max(int(args.items * args.scale), 10),
+        'invoice_lines': max(int(args.invoice_lines * args.scale), LINES_PER_INVOICE),
+        'payments': max(int(args.payments * args.scale), 1),
+        'seed': args.seed,
+    }
+    temp_dir = None
+    db_path = args.db
+    if not db_path:
+        temp_dir = tempfile.mkdtemp()
+        db_path = os.path.join(temp_dir, "benchmark.db")
+
+    try:
+        generate_seconds = None
+        if not os.path.exists(db_path):
+            started = time.perf_counter()
+            counts = generate_books(db_path, books['items'], books['invoice_lines'], books['payments'], args.seed)
+            generate_seconds = round(time.perf_counter() - started, 3)
+            print(f"Generated books in {generate_seconds:.1f}s: {counts}")
+        else:
+            print(f"Using existing books at {db_path}")
+
+        only = [part.strip() for part in args.only.split(",") if part.strip()] if args.only else None
+        results = run_benchmarks(db_path, args.repeat, args.seed, args.csv_rows, only)
+        audit_overhead = measure_audit_overhead(db_path, args.repeat, args.seed, args.audit_rounds) if args.audit_overhead else None
+    finally:
+        if temp_dir:
+            for name in os.listdir(temp_dir):
+                os.remove(os.path.join(temp_dir, name))
+            os.rmdir(temp_dir)
+
+    report = {
+        'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'revision': _git_revision(),
+        'schema_version': db.SCHEMA_VERSION,
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'config': {'books': books, 'repeat': args.repeat, 'csv_rows': args.csv_rows},
+        'generate_seconds': generate_seconds,
+        'results': results,
+        'audit_overhead': audit_overhead,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if audit_overhead is not None:
+        too_slow = [name for name, r in audit_overhead.items() if r['overhead'] > AUDIT_OVERHEAD_LIMIT]
+        for name in too_slow:
+            print(f"AUDIT OVERHEAD {name}: +{audit_overhead[name]['overhead'] * 100:.0f}% "
+                  f"(limit {AUDIT_OVERHEAD_LIMIT * 100:.0f}%)")
+        if too_slow:
+            return 1
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_results(baseline, report, args.threshold)
+        for r in regressions:
+            print(f"REGRESSION {r['name']}: {r['baseline_ms']:.2f} ms -> {r['current_ms']:.2f} ms (+{r['change'] * 100:.0f}%)")
+        if regressions:
+            return 1
+        print("No regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
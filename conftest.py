@@ -0,0 +1,41 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import pytest
+import database.db as db
+
+# Tests that write get a copy of the live database in a temporary folder,
+# so database/ledgerpro.db is never changed by a test run.
+
+@pytest.fixture
+def live_copy():
+    """
+    Points the database helpers at a copy of the live database, as it is,
+    for the test and yields the copy's path. The folder it is in goes away
+    afterwards, with anything else the test put there.
+    """
+    work_dir = tempfile.mkdtemp()
+    original_db = db.DB_NAME
+
+    path = os.path.join(work_dir, "ledgerpro.db")
+    source = sqlite3.connect(original_db)
+    target = sqlite3.connect(path)
+    source.backup(target)
+    source.close()
+    target.close()
+    db.DB_NAME = path
+
+    try:
+        yield path
+    finally:
+        db.stop_write_queue()
+        db.close_thread_connection()
+        db.DB_NAME = original_db
+        shutil.rmtree(work_dir)
+
+@pytest.fixture
+def work_db(live_copy):
+    """Like live_copy, with the copy migrated to the current schema."""
+    db.run_migrations(live_copy)
+    return live_copy
@@ -1,4 +1,4 @@
-import bcrypt
+from auth.auth_logic import hash_password
 from database.db import execute_read_query, execute_write_query, init_db
 import sys
 
@@ -10,7 +10,7 @@ def create_admin_user():
     password = "admin123"
     name = "Administrator"
     
-    hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    hashed = hash_password(password)
     
     # Check if user exists
     existing = execute_read_query("SELECT id FROM users WHERE email = ?", (email,))
@@ -0,0 +1,226 @@
+import json
+
+# Change capture for the audited tables. AFTER triggers append one row per
+# changed record to audit_log inside the writer's own transaction, so
+# auditing costs no extra commit. The transaction number and the signed-in
+# user come from the single audit_context row, which the write helpers in
+# database.db bump at the start of every transaction; the triggers never
+# call back into Python, so connections opened elsewhere keep working.
+#
+# changes holds compact JSON: {"column": [old, new]} for the columns an
+# UPDATE changed, the non-null columns of a deleted row, and nothing for an
+# INSERT (the row itself is the record).
+
+# Columns left out of the diff, and updates touching only them aren't
+# logged. Stock levels and average cost change on every sale and purchase
+# and are already recorded by the stock ledger; the row version (see
+# database/concurrency.py) is never logged.
+AUDITED_TABLES = {
+    'invoices': (),
+    'bills': (),
+    'payments': (),
+    'items': ('stock_on_hand', 'average_cost'),
+}
+
+ACTIONS = {'I': 'Created', 'U': 'Updated', 'D': 'Deleted', 'A': 'Archived'}
+
+# Column shown as the record's name in the viewer
+LABEL_COLUMNS = {
+    'invoices': 'invoice_number',
+    'bills': 'bill_number',
+    'payments': 'payment_number',
+    'items': 'name',
+}
+
+CONTEXT_QUERY = "UPDATE audit_context SET txn = txn + 1, user_id = ?, suspended = ? WHERE id = 1"
+
+_user_id = None
+_enabled = True
+
+
+def set_enabled(enabled):
+    """
+    Switches the audit_context bump at the start of each write transaction
+    on or off. Only benchmark.py turns it off, to time writes with no
+    auditing at all.
+    """
+    global _enabled
+    _enabled = enabled
+
+
+def is_enabled():
+    return _enabled
+
+
+def set_user(user_id):
+    """Sets the user that following writes are attributed to (None when signed out)."""
+    global _user_id
+    _user_id = user_id
+
+
+def get_user():
+    """The user id following writes are attributed to, or None."""
+    return _user_id
+
+
+def context_query(suspended=False):
+    """
+    Returns the (query, params) that starts a new audited transaction for the
+    current user. With suspended=True the triggers stay quiet until the
+    transaction commits, for bulk moves that log a summary row instead.
+    """
+    return CONTEXT_QUERY, (_user_id, 1 if suspended else 0)
+
+
+def record_query(entity, entity_id, action, changes=None):
+    """Returns the (query, params) that appends an audit row written by code rather than a trigger."""
+    return ("""
+        INSERT INTO audit_log (txn, ts, user_id, entity, entity_id, action, changes)
+        SELECT txn, datetime('now', 'localtime'), user_id, ?, ?, ?, ? FROM audit_context WHERE id = 1
+    """, (entity, entity_id, action, json.dumps(changes, separators=(',', ':')) if changes is not None else None))
+
+
+def _json_pairs(columns, expression, condition):
+    """SQL building '{"col":<value>,...}' from the columns whose condition holds."""
+    parts = " || ".join(
+        f"""CASE WHEN {condition.format(c=c)} THEN ',"{c}":' || {expression.format(c=c)} ELSE '' END"""
+        for c in columns
+    )
+    return f"'{{' || substr({parts}, 2) || '}}'"
+
+
+def _trigger_sql(table, columns):
+    active = "(SELECT suspended FROM audit_context WHERE id = 1) = 0"
+    insert = ("INSERT INTO audit_log (txn, ts, user_id, entity, entity_id, action, changes) "
+              "SELECT txn, datetime('now', 'localtime'), user_id, '{table}', {ref}.id, '{action}', {changes} "
+              "FROM audit_context WHERE id = 1")
+    changed = " OR ".join(f"OLD.{c} IS NOT NEW.{c}" for c in columns)
+    diff = _json_pairs(columns, "'[' || json_quote(OLD.{c}) || ',' || json_quote(NEW.{c}) || ']'", "OLD.{c} IS NOT NEW.{c}")
+    old_row = _json_pairs(columns, "json_quote(OLD.{c})", "OLD.{c} IS NOT NULL")
+    return {
+        f"audit_{table}_insert": (
+            f"CREATE TRIGGER audit_{table}_insert AFTER INSERT ON {table} WHEN {active} BEGIN "
+            + insert.format(table=table, ref="NEW", action="I", changes="NULL") + "; END"
+        ),
+        f"audit_{table}_update": (
+            f"CREATE TRIGGER audit_{table}_update AFTER UPDATE ON {table} WHEN {active} AND ({changed}) BEGIN "
+            + insert.format(table=table, ref="NEW", action="U", changes=diff) + "; END"
+        ),
+        f"audit_{table}_delete": (
+            f"CREATE TRIGGER audit_{table}_delete AFTER DELETE ON {table} WHEN {active} BEGIN "
+            + insert.format(table=table, ref="OLD", action="D", changes=old_row) + "; END"
+        ),
+    }
+
+
+def install_audit_triggers(conn):
+    """
+    Creates or refreshes the audit triggers so they cover the current columns
+    of every audited table. Triggers that are already up to date are left
+    alone. Returns the number of triggers (re)created.
+    """
+    existing = {row[0]: row[1] for row in conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger'")}
+    created = 0
+    for table, excluded in AUDITED_TABLES.items():
+        columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")
+                   if row[1] not in ('id', 'version') and row[1] not in excluded and row[2].upper() != 'BLOB']
+        if not columns:
+            continue
+        for name, sql in _trigger_sql(table, columns).items():
+            if existing.get(name) == sql:
+                continue
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+            conn.execute(sql)
+            created += 1
+    conn.commit()
+    return created
+
+
+def drop_audit_triggers(conn):
+    """Removes every audit trigger; install_audit_triggers() puts them back."""
+    for table in AUDITED_TABLES:
+        for action in ('insert', 'update', 'delete'):
+            conn.execute(f"DROP TRIGGER IF EXISTS audit_{table}_{action}")
+    conn.commit()
+
+
+def describe_changes(action, changes):
+    """Readable summary of an audit row's changes, e.g. "status: Sent → Paid"."""
+    if not changes:
+        return ""
+    try:
+        values = json.loads(changes)
+    except ValueError:
+        return changes
+    if action == 'U':
+        return "; ".join(f"{column}: {old if old is not None else '—'} → {new if new is not None else '—'}"
+                         for column, (old, new) in values.items())
+    return "; ".join(f"{column}: {value}" for column, value in values.items())
+
+
+def get_audit_log(entity=None, entity_id=None, start_date=None, end_date=None, limit=2000):
+    """
+    Returns audit rows newest first, filtered by entity (table name), record
+    id and date range (inclusive, 'YYYY-MM-DD'). Each row has 'id', 'txn',
+    'ts', 'user', 'entity', 'entity_id', 'label', 'action' and 'changes'.
+    """
+    from database.db import execute_read_query
+
+    conditions, params = [], []
+    if entity:
+        conditions.append("a.entity = ?")
+        params.append(entity)
+    if entity_id is not None:
+        conditions.append("a.entity_id = ?")
+        params.append(entity_id)
+    if start_date:
+        conditions.append("a.ts >= ?")
+        params.append(start_date)
+    if end_date:
+        conditions.append("a.ts < date(?, '+1 day')")
+        params.append(end_date)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    rows = execute_read_query(f"""
+        SELECT a.id, a.txn, a.ts, a.user_id, u.name AS user, a.entity, a.entity_id, a.action, a.changes
+        FROM audit_log a LEFT JOIN users u ON u.id = a.user_id
+        {where}
+        ORDER BY a.id DESC LIMIT ?
+    """, params + [limit])
+
+    # Current names of the records, one query per entity; deleted records
+    # fall back to the name kept in their delete row
+    ids = {}
+    for row in rows:
+        if row['entity'] in LABEL_COLUMNS:
+            ids.setdefault(row['entity'], set()).add(row['entity_id'])
+    labels = {}
+    for table, table_ids in ids.items():
+        table_ids = list(table_ids)
+        for start in range(0, len(table_ids), 500):
+            chunk = table_ids[start:start + 500]
+            placeholders = ", ".join("?" * len(chunk))
+            for found in execute_read_query(
+                f"SELECT id, {LABEL_COLUMNS[table]} FROM {table} WHERE id IN ({placeholders})", chunk
+            ):
+                labels[(table, found[0])] = found[1]
+
+    for row in rows:
+        key = (row['entity'], row['entity_id'])
+        if row['action'] == 'D' and row['changes'] and key not in labels:
+            labels[key] = json.loads(row['changes']).get(LABEL_COLUMNS.get(row['entity'], ''))
+
+    results = []
+    for row in rows:
+        label = labels.get((row['entity'], row['entity_id']))
+        results.append({
+            'id': row['id'],
+            'txn': row['txn'],
+            'ts': row['ts'],
+            'user': row['user'] or ("System" if row['user_id'] is None else f"User #{row['user_id']}"),
+            'entity': row['entity'],
+            'entity_id': row['entity_id'],
+            'label': label if label is not None else "",
+            'action': row['action'],
+            'changes': row['changes'],
+        })
+    return results
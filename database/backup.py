@@ -0,0 +1,173 @@
+import os
+import gzip
+import shutil
+import sqlite3
+import time
+from database.db import get_connection
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Pages copied per backup step; the app's own connections can run between steps
+PAGES_PER_STEP = 256
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class BackupCancelled(Exception):
+    """Raised when a backup is cancelled; no backup file is left behind."""
+    pass
+
+
+def default_backup_extension():
+    """'.db.zst' when zstandard is installed, otherwise '.db.gz'."""
+    return ".db.zst" if zstandard else ".db.gz"
+
+
+def compression_for_path(path):
+    """Returns 'zstd', 'gzip' or None based on the backup file name."""
+    lower = path.lower()
+    if lower.endswith(".zst"):
+        return "zstd"
+    if lower.endswith(".gz"):
+        return "gzip"
+    return None
+
+
+def _remove_quietly(path):
+    try:
+        if os.path.exists(path):
+            os.remove(path)
+    except OSError:
+        pass
+
+
+def _compress_file(source_path, dest_path, compression):
+    with open(source_path, 'rb') as src:
+        if compression == "zstd":
+            if zstandard is None:
+                raise Exception("zstd compression needs the 'zstandard' package. Save the backup as .gz instead.")
+            with open(dest_path, 'wb') as dst:
+                zstandard.ZstdCompressor(level=10).copy_stream(src, dst, read_size=COPY_CHUNK_SIZE)
+        elif compression == "gzip":
+            with gzip.open(dest_path, 'wb', compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+        else:
+            with open(dest_path, 'wb') as dst:
+                shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+
+
+def decompress_backup(backup_path, dest_path):
+    """Writes the plain SQLite database contained in backup_path to dest_path."""
+    compression = compression_for_path(backup_path)
+    with open(dest_path, 'wb') as dst:
+        if compression == "zstd":
+            if zstandard is None:
+                raise Exception("This backup is zstd compressed; install the 'zstandard' package to open it.")
+            with open(backup_path, 'rb') as src:
+                zstandard.ZstdDecompressor().copy_stream(src, dst, read_size=COPY_CHUNK_SIZE)
+        elif compression == "gzip":
+            with gzip.open(backup_path, 'rb') as src:
+                shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+        else:
+            with open(backup_path, 'rb') as src:
+                shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+
+
+def check_database_integrity(db_path):
+    """Runs PRAGMA integrity_check on db_path and returns the list of problems (empty if ok)."""
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute("PRAGMA integrity_check").fetchall()
+    finally:
+        conn.close()
+    problems = [row[0] for row in rows]
+    return [] if problems == ["ok"] else problems
+
+
+def copy_live_database(dest_path, pages_per_step=PAGES_PER_STEP, progress_callback=None, is_cancelled=None):
+    """
+    Copies the live database to dest_path with the online backup API.
+
+    The copy is switched out of WAL mode so it is a single self-contained file.
+
+    Returns:
+        int: Number of pages copied.
+    """
+    pages = {'total': 0}
+
+    def on_step(status, remaining, total):
+        pages['total'] = total
+        if progress_callback:
+            progress_callback(total - remaining, total)
+        if is_cancelled and is_cancelled():
+            raise BackupCancelled("Backup was cancelled.")
+
+    source = get_connection()
+    target = sqlite3.connect(dest_path)
+    try:
+        source.backup(target, pages=pages_per_step, progress=on_step)
+        # The live database is in WAL mode; the copy should not need a -wal file
+        target.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        target.close()
+        source.close()
+    return pages['total']
+
+
+def backup_database(dest_path, pages_per_step=PAGES_PER_STEP, progress_callback=None, is_cancelled=None):
+    """
+    Takes a consistent copy of the live database with the SQLite online backup API.
+
+    Pages are copied in steps of pages_per_step so other connections can keep
+    reading and writing in between. The copy is switched out of WAL mode so it
+    is a single self-contained file, checked with PRAGMA integrity_check and
+    then compressed according to the extension of dest_path (.zst, .gz or none).
+
+    Args:
+        dest_path (str): Backup file to create. Only replaced once the backup has been verified.
+        progress_callback (callable): Called as progress_callback(pages_done, total_pages).
+        is_cancelled (callable): Returns True to abort between steps.
+
+    Returns:
+        dict: 'path', 'pages', 'db_bytes', 'backup_bytes', 'compression' and 'seconds'.
+    """
+    started = time.perf_counter()
+    compression = compression_for_path(dest_path)
+    if compression == "zstd" and zstandard is None:
+        raise Exception("zstd compression needs the 'zstandard' package. Save the backup as .gz instead.")
+
+    folder = os.path.dirname(os.path.abspath(dest_path))
+    os.makedirs(folder, exist_ok=True)
+    snapshot_path = os.path.join(folder, f".ledgerpro_backup_{os.getpid()}.db")
+    partial_path = dest_path + ".part"
+    _remove_quietly(snapshot_path)
+
+    try:
+        page_count = copy_live_database(snapshot_path, pages_per_step, progress_callback, is_cancelled)
+
+        problems = check_database_integrity(snapshot_path)
+        if problems:
+            raise Exception("Backup failed integrity check: " + "; ".join(problems[:5]))
+
+        if is_cancelled and is_cancelled():
+            raise BackupCancelled("Backup was cancelled.")
+
+        db_bytes = os.path.getsize(snapshot_path)
+        _compress_file(snapshot_path, partial_path, compression)
+        os.replace(partial_path, dest_path)
+    except BaseException:
+        _remove_quietly(partial_path)
+        raise
+    finally:
+        _remove_quietly(snapshot_path)
+
+    return {
+        'path': dest_path,
+        'pages': page_count,
+        'db_bytes': db_bytes,
+        'backup_bytes': os.path.getsize(dest_path),
+        'compression': compression,
+        'seconds': time.perf_counter() - started,
+    }
@@ -0,0 +1,264 @@
+import os
+import re
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from database import db
+
+# Several companies (one per GSTIN) in one install, each in its own database
+# file with its own archives, snapshots and PDF cache next to it. The
+# registry, companies.json in the data folder, lists them and remembers the
+# one in use. The existing ledgerpro.db is the first company, so single
+# company installs carry on unchanged.
+#
+# Switching points database.db at another file. The companies used last
+# stay warm: their helper connections stay open (db.WARM_CONNECTIONS per
+# thread) and their settings and item catalog stay cached here, up to
+# WARM_COMPANIES of them, least recently used dropped first.
+
+DATA_DIR = os.path.dirname(db.DB_NAME)
+REGISTRY_FILE = "companies.json"
+DEFAULT_ID = "default"
+DB_FILE = "ledgerpro.db"
+WARM_COMPANIES = db.WARM_CONNECTIONS
+REPORT_WORKERS = 4
+
+_lock = threading.RLock()
+# Database files init_db() has checked this session
+_opened = set()
+# path -> {cache name: (change token, value)}, most recently used last
+_caches = OrderedDict()
+_report_pool = None
+
+
+def registry_path():
+    return os.path.join(DATA_DIR, REGISTRY_FILE)
+
+
+def _absolute(company):
+    company = dict(company)
+    company['path'] = os.path.normpath(os.path.join(DATA_DIR, company['path']))
+    return company
+
+
+def _default_registry():
+    path = os.path.join(DATA_DIR, DB_FILE)
+    name = "My Company"
+    if os.path.exists(path):
+        conn = sqlite3.connect(path)
+        try:
+            row = conn.execute("SELECT value FROM settings WHERE key = 'company_name'").fetchone()
+            name = (row[0] if row else None) or name
+        except sqlite3.Error:
+            pass
+        finally:
+            conn.close()
+    return {'active': DEFAULT_ID, 'companies': [
+        {'id': DEFAULT_ID, 'name': name, 'gstin': "", 'path': os.path.basename(path)}
+    ]}
+
+
+def _load():
+    try:
+        with open(registry_path(), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return _default_registry()
+
+
+def _save(registry):
+    path = registry_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(registry, f, indent=2)
+    os.replace(temp_path, path)
+
+
+def list_companies():
+    """Returns the registered companies as dicts with 'id', 'name', 'gstin' and the database 'path'."""
+    with _lock:
+        return [_absolute(company) for company in _load()['companies']]
+
+
+def get_company(company_id):
+    for company in list_companies():
+        if company['id'] == company_id:
+            return company
+    raise Exception(f"Company '{company_id}' not found.")
+
+
+def get_active_company():
+    """The company in use; the first one if the registry names none that exists."""
+    with _lock:
+        registry = _load()
+        companies = [_absolute(company) for company in registry['companies']]
+    for company in companies:
+        if company['id'] == registry.get('active'):
+            return company
+    return companies[0]
+
+
+def _slug(name, taken):
+    base = re.sub(r"[^a-z0-9]+", "_", name.lower()).strip("_") or "company"
+    slug, n = base, 2
+    while slug in taken:
+        slug, n = f"{base}_{n}", n + 1
+    return slug
+
+
+def _ensure_ready(path):
+    """Creates or migrates a company database the first time it is used this session."""
+    with _lock:
+        if path in _opened:
+            return
+        with db.using_database(path):
+            db.init_db()
+        _opened.add(path)
+
+
+def add_company(name, gstin=None):
+    """
+    Registers a new company with an empty database in its own folder. The
+    users of the current company are copied over so the same people can
+    sign in. Returns the company dict.
+    """
+    name = (name or "").strip()
+    if not name:
+        raise Exception("Enter a company name.")
+    with _lock:
+        registry = _load()
+        if any(c['name'].lower() == name.lower() for c in registry['companies']):
+            raise Exception(f"A company named '{name}' already exists.")
+        company_id = _slug(name, {c['id'] for c in registry['companies']})
+        relative = os.path.join("companies", company_id, DB_FILE)
+        path = os.path.join(DATA_DIR, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _ensure_ready(path)
+
+        conn = sqlite3.connect(path, timeout=30.0)
+        try:
+            conn.execute("ATTACH DATABASE ? AS source", (db.current_db(),))
+            columns = ({row[1] for row in conn.execute("PRAGMA main.table_info(users)")}
+                       & {row[1] for row in conn.execute("PRAGMA source.table_info(users)")})
+            column_list = ", ".join(sorted(columns))
+            conn.execute(f"INSERT OR IGNORE INTO main.users ({column_list}) SELECT {column_list} FROM source.users")
+            conn.executemany("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+                             [('company_name', name), ('company_gstin', gstin or "")])
+            conn.commit()
+        finally:
+            conn.close()
+
+        registry['companies'].append({'id': company_id, 'name': name, 'gstin': gstin or "", 'path': relative})
+        _save(registry)
+    return get_company(company_id)
+
+
+def remove_company(company_id):
+    """Takes a company off the list. Its database file is kept."""
+    with _lock:
+        registry = _load()
+        if company_id == get_active_company()['id']:
+            raise Exception("Switch to another company before removing this one.")
+        registry['companies'] = [c for c in registry['companies'] if c['id'] != company_id]
+        _save(registry)
+
+
+def switch_company(company_id):
+    """
+    Makes company_id the company in use and remembers it for the next start.
+    Writes already queued still go to the company they were made in.
+    Returns the company dict.
+    """
+    company = get_company(company_id)
+    _ensure_ready(company['path'])
+    with _lock:
+        db.DB_NAME = company['path']
+        if company['path'] in _caches:
+            _caches.move_to_end(company['path'])
+        registry = _load()
+        if registry.get('active') != company_id:
+            registry['active'] = company_id
+            _save(registry)
+    return company
+
+
+def open_active_company():
+    """Points database.db at the company used last. Called once at startup, before init_db()."""
+    company = get_active_company()
+    db.DB_NAME = company['path']
+    return company
+
+
+def _cached(name, load):
+    """
+    Returns load() for the current database, reusing the last result until
+    the database is written to (see db.change_token).
+    """
+    if db.get_remote() is not None:
+        # The server's book can't be watched from here
+        return load()
+    path = db.current_db()
+    token = db.change_token()
+    with _lock:
+        entries = _caches.get(path)
+        if entries is not None:
+            _caches.move_to_end(path)
+            cached = entries.get(name)
+            if cached is not None and cached[0] == token:
+                return cached[1]
+    value = load()
+    with _lock:
+        _caches.setdefault(path, {})[name] = (token, value)
+        _caches.move_to_end(path)
+        while len(_caches) > WARM_COMPANIES:
+            _caches.popitem(last=False)
+    return value
+
+
+def get_settings():
+    """The settings of the current company as a new {key: value} dict."""
+    return dict(_cached('settings', lambda: {
+        row['key']: row['value'] for row in db.execute_read_query("SELECT key, value FROM settings")
+    }))
+
+
+def get_item_catalog():
+    """
+    The items of the current company for pickers, as dicts with the fields
+    invoice and bill lines need. The list is shared; don't modify it.
+    """
+    return _cached('items', lambda: [dict(row) for row in db.execute_read_query(
+        "SELECT id, name, sku, selling_price, purchase_price, gst_rate, is_sellable, is_purchasable FROM items"
+    )])
+
+
+def run_for_companies(fn, *args, company_ids=None, **kwargs):
+    """
+    Runs fn(*args, **kwargs) against each company's database in parallel,
+    on a pool whose threads keep their connections warm between calls.
+
+    Returns:
+        dict: {company id: result}, in registry order.
+    """
+    global _report_pool
+    companies = [c for c in list_companies() if company_ids is None or c['id'] in company_ids]
+    with _lock:
+        if _report_pool is None:
+            _report_pool = ThreadPoolExecutor(REPORT_WORKERS, thread_name_prefix="company-report")
+
+    def run(company):
+        _ensure_ready(company['path'])
+        with db.using_database(company['path']):
+            return fn(*args, **kwargs)
+
+    futures = [(company, _report_pool.submit(run, company)) for company in companies]
+    results = {}
+    for company, future in futures:
+        try:
+            results[company['id']] = future.result()
+        except Exception as e:
+            raise Exception(f"{company['name']}: {e}") from e
+    return results
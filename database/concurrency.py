@@ -0,0 +1,74 @@
+# Optimistic concurrency for records edited from several app instances on a
+# shared database. invoices, bills, payments and items carry a version that
+# every update moves forward: edits saved through
+# database.db.execute_versioned_transaction set it themselves, and the
+# triggers below bump it for every other writer. An edit is written only if
+# the record still has the version its editor loaded, so no lock is held
+# while a dialog is open.
+
+VERSIONED_TABLES = {
+    'invoices': 'invoice',
+    'bills': 'bill',
+    'payments': 'payment',
+    'items': 'item',
+}
+
+# Stock levels and average cost change on every sale and purchase; those
+# updates alone don't count as an edit of the item
+_UNVERSIONED_UPDATES = {
+    'items': " AND NEW.stock_on_hand IS OLD.stock_on_hand AND NEW.average_cost IS OLD.average_cost",
+}
+
+VERSION_TRIGGERS = {
+    f"version_{table}": (
+        f"CREATE TRIGGER IF NOT EXISTS version_{table} AFTER UPDATE ON {table} "
+        f"WHEN NEW.version IS OLD.version{_UNVERSIONED_UPDATES.get(table, '')} "
+        f"BEGIN UPDATE {table} SET version = OLD.version + 1 WHERE id = NEW.id; END"
+    )
+    for table in VERSIONED_TABLES
+}
+
+
+class EditConflict(Exception):
+    """
+    Raised when a record changed or was deleted after the editor loaded it;
+    nothing is written. current maps the ids still present to their current
+    rows (as dicts), so the editor can reload or merge.
+    """
+
+    def __init__(self, table, record_ids, current):
+        self.table = table
+        self.record_ids = list(record_ids)
+        self.current = current
+        noun = VERSIONED_TABLES.get(table, 'record')
+        if self.deleted:
+            message = f"This {noun} was deleted by someone else after you opened it."
+        else:
+            message = f"This {noun} was changed by someone else after you opened it."
+        super().__init__(message)
+
+    @property
+    def deleted(self):
+        return len(self.current) < len(self.record_ids)
+
+
+def merge_changes(base, mine, theirs):
+    """
+    Three-way merge of an edited record. base is the record as the editor
+    loaded it, mine the editor's values and theirs the record as saved
+    elsewhere since. Keys the editor changed keep the editor's value; all
+    others take theirs.
+
+    Returns:
+        tuple: (merged dict, keys changed on both sides to different values).
+    """
+    merged = dict(theirs)
+    clashes = []
+    for key, value in mine.items():
+        if key in base and base[key] == value:
+            continue
+        if key in theirs and key in base and theirs[key] != base[key] and theirs[key] != value:
+            clashes.append(key)
+        merged[key] = value
+    return merged, clashes
+
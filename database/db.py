@@ -1,6 +1,15 @@
 import sqlite3
 import os
 import sys
+import time
+import threading
+import queue
+import contextlib
+from collections import deque, OrderedDict
+from concurrent.futures import Future
+from database import query_stats
+from database import audit
+from database.concurrency import EditConflict
 
 def _resolve_paths():
     if getattr(sys, "frozen", False):
@@ -16,17 +25,333 @@ def _resolve_paths():
 
 DB_NAME, SCHEMA_FILE = _resolve_paths()
 
-def get_connection():
+# Stored in PRAGMA user_version once run_migrations() has brought a database up
+# to date; bump it together with every new update_schema_v* migration.
+SCHEMA_VERSION = 13
+
+def get_connection(check_same_thread=True):
     # Increased timeout to 30 seconds to prevent "database is locked" errors
-    conn = sqlite3.connect(DB_NAME, timeout=30.0)
+    conn = sqlite3.connect(current_db(), timeout=30.0, check_same_thread=check_same_thread)
     conn.row_factory = sqlite3.Row
     # Enable WAL mode for better concurrency
     conn.execute("PRAGMA journal_mode=WAL;")
+    if getattr(_local, 'protected', False):
+        conn.set_authorizer(_authorize)
+    return conn
+
+# Connections reused by the query helpers below, per thread and per database
+# file. Opening a connection makes SQLite parse the whole schema, audit
+# triggers included, which costs more than most of the statements the
+# helpers run. The WARM_CONNECTIONS files used last stay open, so switching
+# back to a recent company (database/companies.py) doesn't pay it again.
+WARM_CONNECTIONS = 4
+_local = threading.local()
+# Every thread's helper connection -> its database file, so
+# close_all_connections() can reach connections other threads opened
+_open_connections = {}
+_open_lock = threading.Lock()
+
+def current_db():
+    """The database file the calling thread's helpers use: DB_NAME unless pinned with using_database()."""
+    return getattr(_local, 'pinned', None) or DB_NAME
+
+@contextlib.contextmanager
+def using_database(path):
+    """Points the calling thread's helpers at path for the duration of the block."""
+    previous = getattr(_local, 'pinned', None)
+    _local.pinned = path
+    try:
+        yield
+    finally:
+        _local.pinned = previous
+
+# Columns the SQL a client sends the server may neither read nor change;
+# see protected_columns()
+PROTECTED_COLUMNS = {('users', 'password_hash')}
+
+def _authorize(action, table, column, database, source):
+    if (table, column) in PROTECTED_COLUMNS:
+        return sqlite3.SQLITE_IGNORE if action == sqlite3.SQLITE_READ else sqlite3.SQLITE_DENY
+    return sqlite3.SQLITE_OK
+
+def _allow_all(*args):
+    return sqlite3.SQLITE_OK
+
+@contextlib.contextmanager
+def protected_columns():
+    """
+    Runs the block with PROTECTED_COLUMNS reading as NULL and refusing
+    updates, on the calling thread's helper connection and on any connection
+    opened in the block. The server runs the SQL clients send in it.
+    """
+    conn = _thread_connection()
+    _local.protected = True
+    conn.set_authorizer(_authorize)
+    try:
+        yield
+    finally:
+        _local.protected = False
+        if conn in _open_connections:
+            # Statements prepared in the block would keep the columns hidden;
+            # installing another authorizer makes SQLite prepare them again
+            conn.set_authorizer(_allow_all)
+            conn.set_authorizer(None)
+
+def _thread_connection():
+    path = current_db()
+    conns = getattr(_local, 'conns', None)
+    if conns is None:
+        conns = _local.conns = OrderedDict()
+    conn = conns.get(path)
+    if conn is not None and conn not in _open_connections:
+        # Closed by close_all_connections() from another thread
+        del conns[path]
+        conn = None
+    if conn is not None:
+        conns.move_to_end(path)
+        # A helper interrupted mid-transaction must not leak it into the next
+        # call; the writer thread's group commit is meant to stay open
+        if conn.in_transaction and conn is not getattr(_local, 'batch', None):
+            conn.rollback()
+        return conn
+    # Closed only by its own thread or by close_all_connections()
+    conn = get_connection(check_same_thread=False)
+    conns[path] = conn
+    with _open_lock:
+        _open_connections[conn] = path
+    while len(conns) > WARM_CONNECTIONS:
+        _close(conns.popitem(last=False)[1])
     return conn
 
+def _close(conn):
+    with _open_lock:
+        _open_connections.pop(conn, None)
+    conn.close()
+
+def close_thread_connection():
+    """Closes the calling thread's helper connections."""
+    conns = getattr(_local, 'conns', None)
+    _local.conns = None
+    for conn in (conns or {}).values():
+        _close(conn)
+
+def close_all_connections(path=None):
+    """
+    Closes the helper connections of every thread to path (all files when
+    None), e.g. before deleting or replacing a database file. Threads open a
+    new connection on their next query. Stop the write queue first so no
+    batch is in progress.
+    """
+    with _open_lock:
+        closing = [conn for conn, conn_path in _open_connections.items() if path is None or conn_path == path]
+        for conn in closing:
+            del _open_connections[conn]
+    for conn in closing:
+        conn.close()
+
+# Set by modules.backend.use_remote(): returns the LedgerPro server the
+# calling thread's helper calls go to, or None to run them here. Forwarding
+# the helpers sends every page's own SQL to the server's book as well, not
+# just the @remotable module functions.
+_remote_resolver = None
+
+def set_remote_resolver(resolver):
+    global _remote_resolver
+    _remote_resolver = resolver
+
+def get_remote():
+    """The server the calling thread's queries go to, or None when they run against the local file."""
+    resolver = _remote_resolver
+    return resolver() if resolver is not None else None
+
+def change_token():
+    """
+    A value that changes whenever the current database is written, from this
+    connection or any other, for caching data read from it. Costs one PRAGMA.
+    """
+    conn = _thread_connection()
+    return conn, conn.execute("PRAGMA data_version").fetchone()[0], conn.total_changes
+
+# Left by WriteQueue._run when it has no item in hand for the next batch
+_TAKE_NEXT = object()
+
+class WriteQueue:
+    """
+    Dedicated writer thread with group commit. Writes submitted from any
+    thread wait in a queue; the writer takes everything queued (up to
+    max_batch) and runs it in one IMMEDIATE transaction with a single commit,
+    so concurrent writers share one fsync instead of contending for the lock
+    and each paying their own. Every operation runs in its own savepoint: one
+    that raises is rolled back and gets the error through its future, the
+    rest of the batch still commits. Futures resolve only after the commit,
+    so a caller reading back its write sees it.
+
+    Operations can be any callable using the helpers in this module; they run
+    on the writer thread, where reads see the batch's uncommitted writes.
+    """
+
+    STATS_SIZE = 1000
+
+    def __init__(self, max_batch=64):
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        # (batch size, commit seconds, oldest wait in seconds) per group commit
+        self._batches = deque(maxlen=self.STATS_SIZE)
+        self._totals = {'batches': 0, 'operations': 0, 'failed': 0}
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Commits what is already queued, then stops the writer thread."""
+        thread = self._thread
+        if thread is None:
+            return
+        self._queue.put(None)
+        thread.join()
+        self._thread = None
+
+    def on_writer_thread(self):
+        return self._thread is threading.current_thread()
+
+    def submit(self, fn, *args, **kwargs):
+        """Queues fn(*args, **kwargs) against the caller's current database and returns a Future for its result."""
+        if not self.running:
+            raise Exception("The database write queue is not running.")
+        future = Future()
+        # The caller's UI action goes along so N+1 checks still see the statements
+        self._queue.put((future, fn, args, kwargs, time.perf_counter(), current_db(), query_stats.get_action()))
+        return future
+
+    def run(self, fn, *args, **kwargs):
+        """Runs fn through the queue and waits for it to commit. Returns its result or raises its error."""
+        if self.on_writer_thread():
+            # Already part of a batch; queueing it would wait on ourselves
+            return fn(*args, **kwargs)
+        return self.submit(fn, *args, **kwargs).result()
+
+    def _run(self):
+        item = self._queue.get()
+        while item is not None:
+            batch, item = [item], _TAKE_NEXT
+            while len(batch) < self.max_batch:
+                try:
+                    following = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if following is None or following[5] != batch[0][5]:
+                    # The stop marker, or a write to another database file: it goes after this commit
+                    item = following
+                    break
+                batch.append(following)
+            self._commit(batch)
+            if item is _TAKE_NEXT:
+                item = self._queue.get()
+        close_thread_connection()
+
+    def _commit(self, batch):
+        done = []
+        failed = 0
+        with using_database(batch[0][5]):
+            conn = _thread_connection()
+            _local.batch, _local.depth = conn, 0
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                for future, fn, args, kwargs, _, _, action in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    query_stats.set_action(action)
+                    try:
+                        done.append((future, _in_savepoint(conn, lambda cursor: fn(*args, **kwargs), ())))
+                    except Exception as e:
+                        failed += 1
+                        future.set_exception(e)
+                    finally:
+                        query_stats.set_action(None)
+                started = time.perf_counter()
+                conn.commit()
+                commit_seconds = time.perf_counter() - started
+            except Exception as e:
+                # The commit failed (or the lock could not be taken): nothing in the batch was written
+                if conn.in_transaction:
+                    conn.rollback()
+                for future, *_ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            finally:
+                _local.batch = None
+
+        with self._lock:
+            self._batches.append((len(batch), commit_seconds, time.perf_counter() - batch[0][4]))
+            self._totals['batches'] += 1
+            self._totals['operations'] += len(batch)
+            self._totals['failed'] += failed
+        for future, result in done:
+            future.set_result(result)
+
+    def stats(self):
+        """
+        Returns group commit figures: totals since start, and batch size,
+        commit latency and the oldest operation's wait (submit to commit)
+        over the last STATS_SIZE batches.
+        """
+        with self._lock:
+            batches = list(self._batches)
+            stats = dict(self._totals)
+        if not batches:
+            return stats
+        sizes = [size for size, _, _ in batches]
+        commits = sorted(seconds * 1000 for _, seconds, _ in batches)
+        waits = sorted(seconds * 1000 for _, _, seconds in batches)
+        stats.update({
+            'mean_batch': round(sum(sizes) / len(sizes), 2),
+            'max_batch': max(sizes),
+            'commit_ms': round(sum(commits) / len(commits), 3),
+            'commit_p95_ms': round(commits[int(0.95 * (len(commits) - 1))], 3),
+            'wait_ms': round(sum(waits) / len(waits), 3),
+            'wait_p95_ms': round(waits[int(0.95 * (len(waits) - 1))], 3),
+        })
+        return stats
+
+
+_write_queue = None
+
+def start_write_queue(max_batch=64):
+    """
+    Starts the process-wide write queue (once) and returns it. From then on
+    every write helper in this module goes through it.
+    """
+    global _write_queue
+    if _write_queue is None:
+        _write_queue = WriteQueue(max_batch)
+    _write_queue.start()
+    return _write_queue
+
+def stop_write_queue():
+    """Commits what is queued and goes back to writing on the calling thread."""
+    global _write_queue
+    if _write_queue is not None:
+        _write_queue.stop()
+        _write_queue = None
+
+def get_write_queue():
+    """The running write queue, or None."""
+    return _write_queue if _write_queue is not None and _write_queue.running else None
+
 def init_db():
-    if not os.path.exists(DB_NAME):
-        conn = sqlite3.connect(DB_NAME, timeout=30.0)
+    db_path = current_db()
+    if not os.path.exists(db_path):
+        conn = sqlite3.connect(db_path, timeout=30.0)
         # Enable WAL on creation too
         conn.execute("PRAGMA journal_mode=WAL;")
         with open(SCHEMA_FILE, 'r') as f:
@@ -36,7 +361,7 @@ def init_db():
         print("Database initialized.")
     else:
         # Check if tables exist
-        conn = sqlite3.connect(DB_NAME, timeout=30.0)
+        conn = sqlite3.connect(db_path, timeout=30.0)
         conn.execute("PRAGMA journal_mode=WAL;")
         cursor = conn.cursor()
         cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='users'")
@@ -46,17 +371,38 @@ def init_db():
                 conn.executescript(f.read())
             conn.commit()
         conn.close()
-    run_migrations()
+    run_migrations(db_path)
+
+def reset_database():
+    """
+    Deletes the current database and creates an empty one in its place.
+    Queued writes are committed and every connection to the file is closed
+    first: on Windows an open file can't be deleted, and elsewhere the open
+    connections would go on writing to the deleted file.
+    """
+    db_path = current_db()
+    restart_queue = get_write_queue() is not None
+    stop_write_queue()
+    close_all_connections(db_path)
+    for path in (db_path, db_path + "-wal", db_path + "-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+    init_db()
+    if restart_queue:
+        start_write_queue()
 
-def run_migrations():
+def run_migrations(db_path=None):
     # Only run migrations if not frozen (development) or if explicitly needed.
     # When frozen, migrations can be risky if import mechanisms fail.
     # But we need them for updates. Let's wrap them carefully.
-    
+
+    # Resolve the path here: the migration modules bind DB_NAME when first imported
+    db_path = db_path or current_db()
+
     # V1
     try:
         import update_schema
-        update_schema.migrate()
+        update_schema.migrate(db_path)
     except ImportError:
         pass # Likely frozen and module not found in standard way, or not bundled
     except Exception as e:
@@ -65,7 +411,7 @@ def run_migrations():
     # V2
     try:
         import update_schema_v2
-        update_schema_v2.migrate()
+        update_schema_v2.migrate(db_path)
     except ImportError:
         pass
     except Exception as e:
@@ -74,7 +420,7 @@ def run_migrations():
     # V3
     try:
         import update_schema_v3
-        update_schema_v3.migrate()
+        update_schema_v3.migrate(db_path)
     except ImportError:
         pass
     except Exception as e:
@@ -83,49 +429,296 @@ def run_migrations():
     # V4
     try:
         import update_schema_v4
-        update_schema_v4.migrate()
+        update_schema_v4.migrate(db_path)
     except ImportError:
         pass
     except Exception as e:
         print(f"Migration v4 failed: {e}")
 
+    # V5
+    try:
+        import update_schema_v5
+        update_schema_v5.migrate(db_path)
+    except ImportError:
+        pass
+    except Exception as e:
+        print(f"Migration v5 failed: {e}")
+
+    # V6
+    try:
+        import update_schema_v6
+        update_schema_v6.migrate(db_path)
+    except ImportError:
+        pass
+    except Exception as e:
+        print(f"Migration v6 failed: {e}")
+
+    # V7
+    try:
+        import update_schema_v7
+        update_schema_v7.migrate(db_path)
+    except ImportError:
+        pass
+    except Exception as e:
+        print(f"Migration v7 failed: {e}")
+
+    # V8
+    try:
+        import update_schema_v8
+        update_schema_v8.migrate(db_path)
+    except ImportError:
+        pass
+    except Exception as e:
+        print(f"Migration v8 failed: {e}")
+
+    # V9
+    try:
+        import update_schema_v9
+        update_schema_v9.migrate(db_path)
+    except ImportError:
+        pass
+    except Exception as e:
+        print(f"Migration v9 failed: {e}")
+
+    # V10
+    try:
+        import update_schema_v10
+        update_schema_v10.migrate(db_path)
+    except ImportError:
+        pass
+    except Exception as e:
+        print(f"Migration v10 failed: {e}")
+
+    # V11
+    try:
+        import update_schema_v11
+        update_schema_v11.migrate(db_path)
+    except ImportError:
+        pass
+    except Exception as e:
+        print(f"Migration v11 failed: {e}")
+
+    # V12
+    try:
+        import update_schema_v12
+        update_schema_v12.migrate(db_path)
+    except ImportError:
+        pass
+    except Exception as e:
+        print(f"Migration v12 failed: {e}")
+
+    # V13
+    try:
+        import update_schema_v13
+        update_schema_v13.migrate(db_path)
+    except ImportError:
+        pass
+    except Exception as e:
+        print(f"Migration v13 failed: {e}")
+
+    # Record that this database has every migration applied
+    if os.path.exists(db_path):
+        conn = sqlite3.connect(db_path, timeout=30.0)
+        try:
+            # Audit triggers follow columns added by any migration above
+            try:
+                audit.install_audit_triggers(conn)
+            except sqlite3.OperationalError as e:
+                print(f"Warning: Could not refresh audit triggers: {e}")
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.commit()
+        finally:
+            conn.close()
+
+def _begin_audited(cursor):
+    """
+    Opens the write transaction by bumping audit_context, so the audit
+    triggers attribute its changes to one transaction and the current user.
+    Databases from before migration v12 have no audit tables.
+    """
+    if not audit.is_enabled():
+        return
+    try:
+        cursor.execute(*audit.context_query())
+    except sqlite3.OperationalError:
+        pass
+
 def execute_read_query(query, params=()):
+    remote = get_remote()
+    if remote is not None:
+        return remote.call("db.execute_read_query", (query, params))
+    conn = _thread_connection()
+    cursor = conn.cursor()
+    started = time.perf_counter() if query_stats.enabled else None
+    cursor.execute(query, params)
+    result = cursor.fetchall()
+    if started is not None:
+        query_stats.record(query, time.perf_counter() - started, len(result))
+    return result
+
+def iter_read_query(query, params=(), batch_size=500):
+    """
+    Yields rows for a read query in batches instead of loading them all at once.
+    The connection is opened lazily, so the generator must be consumed on the
+    thread that will read it.
+    """
+    remote = get_remote()
+    if remote is not None:
+        yield from remote.call("db.execute_read_query", (query, params))
+        return
     conn = get_connection()
+    # Only time spent in SQLite is recorded, not the consumer's work between batches
+    instrumented = query_stats.enabled
+    elapsed, rows = 0.0, 0
     try:
         cursor = conn.cursor()
+        started = time.perf_counter()
         cursor.execute(query, params)
-        result = cursor.fetchall()
-        return result
+        elapsed += time.perf_counter() - started
+        while True:
+            started = time.perf_counter()
+            batch = cursor.fetchmany(batch_size)
+            elapsed += time.perf_counter() - started
+            if not batch:
+                break
+            rows += len(batch)
+            for row in batch:
+                yield row
     finally:
         conn.close()
+        if instrumented:
+            query_stats.record(query, elapsed, rows)
 
-def execute_write_query(query, params=()):
-    conn = get_connection()
+def _run_write(body, *args, immediate=False):
+    """
+    Runs body(cursor, *args) as one write transaction and returns its result.
+    With the write queue running, the call is handed to the writer thread and
+    shares a group commit with the writes queued alongside it; a savepoint
+    keeps it atomic on its own. immediate=True takes the write lock before
+    body reads anything.
+    """
+    batch = getattr(_local, 'batch', None)
+    if batch is not None:
+        return _in_savepoint(batch, body, args)
+    queue = _write_queue
+    if queue is not None and queue.running:
+        return queue.run(_run_write, body, *args)
+    conn = _thread_connection()
+    cursor = conn.cursor()
     try:
-        cursor = conn.cursor()
-        cursor.execute(query, params)
+        if immediate:
+            cursor.execute("BEGIN IMMEDIATE")
+        result = body(cursor, *args)
         conn.commit()
-        last_row_id = cursor.lastrowid
-        return last_row_id
     except Exception as e:
         conn.rollback()
         raise e
+    return result
+
+def _in_savepoint(conn, body, args):
+    name = f"write_{_local.depth}"
+    _local.depth += 1
+    cursor = conn.cursor()
+    cursor.execute(f"SAVEPOINT {name}")
+    try:
+        result = body(cursor, *args)
+    except Exception:
+        cursor.execute(f"ROLLBACK TO {name}")
+        cursor.execute(f"RELEASE {name}")
+        raise
     finally:
-        conn.close()
+        _local.depth -= 1
+    cursor.execute(f"RELEASE {name}")
+    return result
+
+def _write_query(cursor, query, params):
+    _begin_audited(cursor)
+    started = time.perf_counter() if query_stats.enabled else None
+    cursor.execute(query, params)
+    if started is not None:
+        query_stats.record(query, time.perf_counter() - started, cursor.rowcount)
+    return cursor.lastrowid
+
+def _transaction(cursor, operations):
+    _begin_audited(cursor)
+    if query_stats.enabled:
+        for query, params in operations:
+            started = time.perf_counter()
+            cursor.execute(query, params)
+            query_stats.record(query, time.perf_counter() - started, cursor.rowcount)
+    else:
+        for query, params in operations:
+            cursor.execute(query, params)
+
+def _many_transaction(cursor, operations):
+    _begin_audited(cursor)
+    for query, params_list in operations:
+        started = time.perf_counter() if query_stats.enabled else None
+        cursor.executemany(query, params_list)
+        if started is not None:
+            query_stats.record(query, time.perf_counter() - started, cursor.rowcount)
+
+def _versioned_transaction(cursor, table, versions, operations):
+    ids = list(versions)
+    placeholders = ", ".join("?" * len(ids))
+    current = {row['id']: dict(row) for row in cursor.execute(
+        f"SELECT * FROM {table} WHERE id IN ({placeholders})", ids
+    )}
+    if len(current) < len(ids) or any(current[i]['version'] != v for i, v in versions.items()):
+        raise EditConflict(table, ids, current)
+    _begin_audited(cursor)
+    for query, params in operations:
+        started = time.perf_counter() if query_stats.enabled else None
+        cursor.execute(query, params)
+        if started is not None:
+            query_stats.record(query, time.perf_counter() - started, cursor.rowcount)
+    # Rows the operations updated were already moved on by the version triggers
+    cursor.executemany(f"UPDATE {table} SET version = ? WHERE id = ? AND version = ?",
+                       [(v + 1, i, v) for i, v in versions.items()])
+    return {i: v + 1 for i, v in versions.items()}
+
+def execute_write_query(query, params=()):
+    remote = get_remote()
+    if remote is not None:
+        return remote.call("db.execute_write_query", (query, params))
+    return _run_write(_write_query, query, params)
 
 def execute_transaction(operations):
     """
     Executes a list of queries in a single transaction.
     operations: list of (query, params) tuples.
     """
-    conn = get_connection()
-    cursor = conn.cursor()
-    try:
-        for query, params in operations:
-            cursor.execute(query, params)
-        conn.commit()
-    except Exception as e:
-        conn.rollback()
-        raise e
-    finally:
-        conn.close()
+    remote = get_remote()
+    if remote is not None:
+        return remote.call("db.execute_transaction", (operations,))
+    _run_write(_transaction, operations)
+
+def execute_many_transaction(operations):
+    """
+    Executes batched statements in a single transaction.
+    operations: list of (query, params_list) tuples; each query runs once per
+    params entry through executemany.
+    """
+    remote = get_remote()
+    if remote is not None:
+        return remote.call("db.execute_many_transaction", (operations,))
+    _run_write(_many_transaction, operations)
+
+def execute_versioned_transaction(table, versions, operations):
+    """
+    Executes a list of (query, params) in a single transaction, provided each
+    row of table in versions ({id: version}) still has the version it was
+    loaded with, and moves those rows to the next version. The check and the
+    writes share one short IMMEDIATE transaction, so no lock is held while
+    the record is being edited.
+
+    Returns:
+        dict: {id: new version}.
+
+    Raises:
+        EditConflict: If a row changed or was deleted since; nothing is written.
+    """
+    remote = get_remote()
+    if remote is not None:
+        return remote.call("db.execute_versioned_transaction", (table, versions, operations))
+    return _run_write(_versioned_transaction, table, versions, operations, immediate=True)
@@ -0,0 +1,246 @@
+import os
+import time
+import datetime
+import threading
+from database.db import current_db, get_connection, execute_read_query, execute_transaction
+
+# The app counts as idle once the database and its WAL have not been written for this long
+IDLE_SECONDS = 120
+# Checkpoint once the WAL is this big, or after CHECKPOINT_INTERVAL_MINUTES
+WAL_CHECKPOINT_BYTES = 4 * 1024 * 1024
+CHECKPOINT_INTERVAL_MINUTES = 30
+OPTIMIZE_INTERVAL_HOURS = 24
+# Hand free pages back once there are this many, or they are this share of the file
+VACUUM_MIN_FREE_PAGES = 256
+VACUUM_FREE_RATIO = 0.10
+
+# Run order: the checkpoint goes last so it also folds in what the others wrote
+TASKS = ('optimize', 'vacuum', 'checkpoint')
+LOG_RETENTION_DAYS = 90
+
+_lock = threading.Lock()
+
+
+def get_database_stats():
+    """
+    Returns size information about the live database.
+
+    Returns:
+        dict: 'db_bytes', 'wal_bytes', 'page_size', 'page_count', 'free_pages',
+            'free_bytes' and 'auto_vacuum' ('none', 'full' or 'incremental').
+    """
+    conn = get_connection()
+    try:
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+    finally:
+        conn.close()
+
+    db_path = current_db()
+    wal_path = db_path + "-wal"
+    return {
+        'db_bytes': os.path.getsize(db_path) if os.path.exists(db_path) else 0,
+        'wal_bytes': os.path.getsize(wal_path) if os.path.exists(wal_path) else 0,
+        'page_size': page_size,
+        'page_count': page_count,
+        'free_pages': free_pages,
+        'free_bytes': free_pages * page_size,
+        'auto_vacuum': {0: 'none', 1: 'full', 2: 'incremental'}.get(auto_vacuum, str(auto_vacuum)),
+    }
+
+
+def seconds_since_last_write():
+    """Seconds since the database or its WAL file was last modified."""
+    latest = 0
+    db_path = current_db()
+    for path in (db_path, db_path + "-wal"):
+        try:
+            latest = max(latest, os.path.getmtime(path))
+        except OSError:
+            pass
+    return time.time() - latest if latest else None
+
+
+def get_last_runs():
+    """Returns {task: latest maintenance_log row} for every task that has run."""
+    rows = execute_read_query("""
+        SELECT task, started_at, seconds, details FROM maintenance_log
+        WHERE id IN (SELECT MAX(id) FROM maintenance_log GROUP BY task)
+    """)
+    return {row['task']: dict(row) for row in rows}
+
+
+def _record(task, started_at, seconds, details):
+    cutoff = (started_at - datetime.timedelta(days=LOG_RETENTION_DAYS)).isoformat(timespec='seconds')
+    execute_transaction([
+        ("INSERT INTO maintenance_log (task, started_at, seconds, details) VALUES (?, ?, ?, ?)",
+         (task, started_at.isoformat(timespec='seconds'), seconds, details)),
+        ("DELETE FROM maintenance_log WHERE task = ? AND started_at < ?", (task, cutoff)),
+    ])
+
+
+def run_optimize():
+    """Refreshes planner statistics: a full ANALYZE the first time, PRAGMA optimize after that."""
+    conn = get_connection()
+    try:
+        has_stats = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='sqlite_stat1'"
+        ).fetchone()
+        # Sample at most this many rows per index so it stays fast on big books
+        conn.execute("PRAGMA analysis_limit = 1000")
+        if has_stats:
+            conn.execute("PRAGMA optimize")
+            details = "PRAGMA optimize"
+        else:
+            conn.execute("ANALYZE")
+            details = "ANALYZE"
+        conn.commit()
+    finally:
+        conn.close()
+    return details
+
+
+def run_checkpoint():
+    """Copies the WAL back into the database and truncates it."""
+    conn = get_connection()
+    try:
+        busy, log_pages, checkpointed = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+    finally:
+        conn.close()
+    if busy:
+        return f"Busy: {checkpointed} of {log_pages} pages checkpointed"
+    return f"{checkpointed} pages checkpointed"
+
+
+def run_incremental_vacuum(max_pages=None):
+    """Releases free pages back to the file system (needs auto_vacuum=INCREMENTAL)."""
+    conn = get_connection()
+    try:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            return "Skipped: auto_vacuum is not INCREMENTAL"
+        before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        # The pragma frees one page per step; executescript() steps it to the end
+        # where execute() would stop after the first page
+        if max_pages:
+            conn.executescript(f"PRAGMA incremental_vacuum({int(max_pages)});")
+        else:
+            conn.executescript("PRAGMA incremental_vacuum;")
+        after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    finally:
+        conn.close()
+    return f"{before - after} free pages released"
+
+
+RUNNERS = {
+    'optimize': run_optimize,
+    'checkpoint': run_checkpoint,
+    'vacuum': run_incremental_vacuum,
+}
+
+
+def tasks_due(now=None, stats=None, last_runs=None):
+    """Returns the maintenance tasks that should run now, in run order."""
+    now = now or datetime.datetime.now()
+    stats = stats or get_database_stats()
+    last_runs = get_last_runs() if last_runs is None else last_runs
+
+    def older_than(task, delta):
+        last = last_runs.get(task)
+        return last is None or now - datetime.datetime.fromisoformat(last['started_at']) >= delta
+
+    due = []
+    if older_than('optimize', datetime.timedelta(hours=OPTIMIZE_INTERVAL_HOURS)):
+        due.append('optimize')
+    if stats['free_pages'] and stats['auto_vacuum'] == 'incremental' and (
+            stats['free_pages'] >= VACUUM_MIN_FREE_PAGES
+            or stats['free_pages'] >= stats['page_count'] * VACUUM_FREE_RATIO):
+        due.append('vacuum')
+    if stats['wal_bytes'] >= WAL_CHECKPOINT_BYTES or (
+            stats['wal_bytes'] and older_than('checkpoint', datetime.timedelta(minutes=CHECKPOINT_INTERVAL_MINUTES))):
+        due.append('checkpoint')
+    return due
+
+
+def run_maintenance(tasks=None, progress_callback=None, is_cancelled=None):
+    """
+    Runs the given maintenance tasks (all of them by default) and logs how long each took.
+
+    Args:
+        tasks (iterable): Names from TASKS.
+        progress_callback (callable): Called as progress_callback(tasks_done, total_tasks).
+        is_cancelled (callable): Checked between tasks.
+
+    Returns:
+        list: Dicts with 'task', 'seconds' and 'details'.
+    """
+    tasks = [t for t in TASKS if t in tasks] if tasks is not None else list(TASKS)
+    results = []
+    with _lock:
+        for done, task in enumerate(tasks):
+            if is_cancelled and is_cancelled():
+                break
+            if progress_callback:
+                progress_callback(done, len(tasks))
+            started_at = datetime.datetime.now()
+            start = time.perf_counter()
+            details = RUNNERS[task]()
+            seconds = time.perf_counter() - start
+            _record(task, started_at, seconds, details)
+            results.append({'task': task, 'seconds': seconds, 'details': details})
+        if progress_callback:
+            progress_callback(len(results), len(tasks))
+    return results
+
+
+class MaintenanceScheduler:
+    """
+    Background thread that runs whatever maintenance is due once the database
+    has been idle for IDLE_SECONDS.
+    """
+
+    def __init__(self, check_seconds=60, idle_seconds=IDLE_SECONDS):
+        self.check_seconds = check_seconds
+        self.idle_seconds = idle_seconds
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="db-maintenance", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def run_once(self):
+        """Runs the due tasks if the database is idle. Returns the run_maintenance() results."""
+        idle_for = seconds_since_last_write()
+        if idle_for is not None and idle_for < self.idle_seconds:
+            return []
+        due = tasks_due()
+        if not due:
+            return []
+        return run_maintenance(due, is_cancelled=self._stop.is_set)
+
+    def _run(self):
+        while not self._stop.wait(self.check_seconds):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Warning: Database maintenance failed: {e}")
+
+
+_scheduler = None
+
+
+def start_maintenance_scheduler(check_seconds=60):
+    """Starts the process-wide maintenance scheduler (once) and returns it."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = MaintenanceScheduler(check_seconds)
+    _scheduler.start()
+    return _scheduler
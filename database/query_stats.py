@@ -0,0 +1,210 @@
+import os
+import re
+import sys
+import json
+import time
+import datetime
+import threading
+import functools
+from collections import deque
+
+# Optional instrumentation of every statement run through database.db. When
+# enabled, each statement is recorded with its normalized text, the call site
+# outside the database layer, the row count and its latency. Statements over
+# the slow threshold go to a separate log, and a statement repeated many times
+# within one UI action (an N+1 pattern) is flagged when the action ends.
+#
+# Disabled by default: database.db only pays a flag check per statement.
+
+RING_SIZE = 5000
+LOG_SIZE = 500
+DEFAULT_SLOW_MS = 100
+# Identical statements from one call site within a single action before it counts as N+1
+N_PLUS_ONE_MIN = 10
+
+enabled = False
+slow_threshold_ms = DEFAULT_SLOW_MS
+
+_lock = threading.Lock()
+_records = deque(maxlen=RING_SIZE)
+_slow = deque(maxlen=LOG_SIZE)
+_n_plus_one = deque(maxlen=LOG_SIZE)
+_call_sites = {}
+_local = threading.local()
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Frames in these files are the database layer, not the caller
+_SKIP_FILES = {
+    os.path.join(_ROOT, "database", "db.py"),
+    os.path.join(_ROOT, "database", "query_stats.py"),
+    os.path.join(_ROOT, "modules", "archive.py"),
+}
+
+_WHITESPACE = re.compile(r"\s+")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN \(\?(?:, ?\?)*\)", re.IGNORECASE)
+
+
+@functools.lru_cache(maxsize=2048)
+def normalize_sql(query):
+    """Collapses whitespace and replaces literals with ?, so the same statement with different values groups together."""
+    text = _WHITESPACE.sub(" ", query).strip()
+    text = _STRING.sub("?", text)
+    text = _NUMBER.sub("?", text)
+    return _IN_LIST.sub("IN (...)", text)
+
+
+def _call_site():
+    frame = sys._getframe(2)
+    while frame and os.path.abspath(frame.f_code.co_filename) in _SKIP_FILES:
+        frame = frame.f_back
+    if not frame:
+        return "?"
+    path = os.path.abspath(frame.f_code.co_filename)
+    if path.startswith(_ROOT):
+        path = os.path.relpath(path, _ROOT)
+    return f"{path.replace(os.sep, '/')}:{frame.f_lineno} {frame.f_code.co_name}"
+
+
+def record(query, seconds, rows):
+    """Records one statement. Called by database.db only while enabled."""
+    sql = normalize_sql(query)
+    site = _call_site()
+    ms = seconds * 1000
+    action = getattr(_local, 'action', None)
+    entry = {
+        'at': datetime.datetime.now().isoformat(timespec='milliseconds'),
+        'sql': sql,
+        'call_site': site,
+        'rows': rows,
+        'ms': round(ms, 3),
+        'thread': threading.current_thread().name,
+        'action': action['name'] if action else None,
+    }
+    with _lock:
+        _records.append(entry)
+        stats = _call_sites.get((site, sql))
+        if stats is None:
+            stats = _call_sites[(site, sql)] = {'call_site': site, 'sql': sql, 'calls': 0, 'total_ms': 0.0,
+                                                 'max_ms': 0.0, 'rows': 0}
+        stats['calls'] += 1
+        stats['total_ms'] += ms
+        stats['max_ms'] = max(stats['max_ms'], ms)
+        stats['rows'] += rows if rows and rows > 0 else 0
+        if ms >= slow_threshold_ms:
+            _slow.append(entry)
+    if action:
+        counts = action['statements']
+        key = (site, sql)
+        counts[key] = counts.get(key, 0) + 1
+    if ms >= slow_threshold_ms:
+        print(f"Slow query ({ms:.0f} ms, {rows} rows) at {site}: {sql[:200]}")
+
+
+def begin_action(name):
+    """Starts a UI action on this thread; statements until end_action() are checked for N+1 patterns."""
+    _local.action = {'name': name, 'started': time.perf_counter(), 'statements': {}}
+
+
+def get_action():
+    """The action tracked on this thread, for handing it to a thread doing work on its behalf."""
+    return getattr(_local, 'action', None)
+
+
+def set_action(action):
+    """Tracks statements on this thread under action (from get_action(), or None)."""
+    _local.action = action
+
+
+def end_action():
+    """Ends the current action and returns the N+1 patterns found in it."""
+    action = getattr(_local, 'action', None)
+    _local.action = None
+    if not action:
+        return []
+    found = [
+        {
+            'at': datetime.datetime.now().isoformat(timespec='seconds'),
+            'action': action['name'],
+            'call_site': site,
+            'sql': sql,
+            'count': count,
+            'action_ms': round((time.perf_counter() - action['started']) * 1000, 1),
+        }
+        for (site, sql), count in action['statements'].items()
+        if count >= N_PLUS_ONE_MIN
+    ]
+    if found:
+        with _lock:
+            _n_plus_one.extend(found)
+        for item in found:
+            print(f"N+1 query: {item['count']}x at {item['call_site']} during '{item['action']}': {item['sql'][:200]}")
+    return found
+
+
+def in_action():
+    """True while an action is being tracked on this thread."""
+    return getattr(_local, 'action', None) is not None
+
+
+def set_enabled(value, threshold_ms=None):
+    global enabled, slow_threshold_ms
+    if threshold_ms is not None:
+        slow_threshold_ms = max(1, int(threshold_ms))
+    enabled = bool(value)
+
+
+def load_settings():
+    """Applies the query_stats_enabled and slow_query_ms settings."""
+    from database.db import execute_read_query
+    try:
+        rows = execute_read_query("SELECT key, value FROM settings WHERE key IN ('query_stats_enabled', 'slow_query_ms')")
+        settings = {row['key']: row['value'] for row in rows}
+    except Exception as e:
+        print(f"Warning: Could not read query instrumentation settings: {e}")
+        return
+    try:
+        threshold = int(settings.get('slow_query_ms', DEFAULT_SLOW_MS))
+    except ValueError:
+        threshold = DEFAULT_SLOW_MS
+    set_enabled(settings.get('query_stats_enabled') == '1', threshold)
+
+
+def clear():
+    with _lock:
+        _records.clear()
+        _slow.clear()
+        _n_plus_one.clear()
+        _call_sites.clear()
+
+
+def get_call_site_stats(limit=None):
+    """Per call site and statement totals, most total time first."""
+    with _lock:
+        stats = [dict(s, total_ms=round(s['total_ms'], 3), max_ms=round(s['max_ms'], 3)) for s in _call_sites.values()]
+    stats.sort(key=lambda s: s['total_ms'], reverse=True)
+    return stats[:limit] if limit else stats
+
+
+def get_snapshot():
+    """Everything recorded so far, in the shape written by dump_json()."""
+    with _lock:
+        records, slow, n_plus_one = list(_records), list(_slow), list(_n_plus_one)
+    return {
+        'generated_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'enabled': enabled,
+        'slow_threshold_ms': slow_threshold_ms,
+        'n_plus_one_min': N_PLUS_ONE_MIN,
+        'call_sites': get_call_site_stats(),
+        'slow_queries': slow,
+        'n_plus_one': n_plus_one,
+        'recent': records,
+    }
+
+
+def dump_json(path):
+    """Writes get_snapshot() to path and returns the path."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(get_snapshot(), f, indent=2)
+    return path
@@ -0,0 +1,178 @@
+import time
+import sqlite3
+import threading
+from database.db import current_db, SCHEMA_VERSION, get_connection, run_migrations
+from database.backup import (
+    BackupCancelled, copy_live_database, decompress_backup, check_database_integrity, _remove_quietly
+)
+
+SQLITE_HEADER = b"SQLite format 3\x00"
+# A file without these is not a LedgerPro book, however valid it is as SQLite
+REQUIRED_TABLES = ('users', 'customers', 'vendors', 'items', 'invoices', 'invoice_items',
+                   'bills', 'bill_items', 'payments', 'settings')
+
+_lock = threading.Lock()
+
+
+class RestoreError(Exception):
+    """Raised when a backup cannot be restored; the live database is left untouched."""
+    pass
+
+
+def validate_database_file(db_path):
+    """
+    Checks that db_path is an intact LedgerPro database.
+
+    Returns:
+        dict: 'schema_version' (PRAGMA user_version) and 'page_size'.
+
+    Raises:
+        RestoreError: If the file is not SQLite, is corrupt, is missing tables
+            or was written by a newer version of the application.
+    """
+    with open(db_path, 'rb') as f:
+        if f.read(len(SQLITE_HEADER)) != SQLITE_HEADER:
+            raise RestoreError("The selected file is not a SQLite database.")
+
+    try:
+        problems = check_database_integrity(db_path)
+    except sqlite3.DatabaseError as e:
+        raise RestoreError(f"The database could not be read: {e}")
+    if problems:
+        raise RestoreError("The database failed its integrity check: " + "; ".join(problems[:5]))
+
+    conn = sqlite3.connect(db_path)
+    try:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        schema_version = conn.execute("PRAGMA user_version").fetchone()[0]
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    finally:
+        conn.close()
+
+    missing = [t for t in REQUIRED_TABLES if t not in tables]
+    if missing:
+        raise RestoreError("This is not a LedgerPro database (missing tables: " + ", ".join(missing) + ").")
+    if schema_version > SCHEMA_VERSION:
+        raise RestoreError(
+            f"This backup was made by a newer version of LedgerPro (schema {schema_version}, "
+            f"this version supports {SCHEMA_VERSION}). Please update the application first."
+        )
+    return {'schema_version': schema_version, 'page_size': page_size}
+
+
+def prepare_restore(source_path, work_path):
+    """
+    Unpacks source_path into work_path, validates it and migrates it to the
+    current schema. Nothing outside work_path is touched.
+
+    Returns:
+        dict: 'schema_version' before migration, 'migrated' and 'page_size'.
+    """
+    _remove_quietly(work_path)
+    try:
+        decompress_backup(source_path, work_path)
+    except (OSError, EOFError) as e:
+        raise RestoreError(f"The backup file could not be unpacked: {e}")
+
+    info = validate_database_file(work_path)
+    migrated = info['schema_version'] < SCHEMA_VERSION
+    if migrated:
+        run_migrations(work_path)
+        validate_database_file(work_path)
+
+    # The live database decides the page size; WAL databases cannot be backed up
+    # into from a source with a different one
+    live = get_connection()
+    try:
+        live_page_size = live.execute("PRAGMA page_size").fetchone()[0]
+    finally:
+        live.close()
+    if info['page_size'] != live_page_size:
+        conn = sqlite3.connect(work_path)
+        try:
+            conn.execute("PRAGMA journal_mode=DELETE")
+            conn.execute(f"PRAGMA page_size = {live_page_size}")
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+
+    return {'schema_version': info['schema_version'], 'migrated': migrated, 'page_size': live_page_size}
+
+
+def restore_database(source_path, progress_callback=None, is_cancelled=None, keep_safety_copy=True):
+    """
+    Replaces the contents of the live database with the backup at source_path.
+
+    The backup (.db, .gz or .zst) is unpacked and checked in a work file next
+    to the database and migrated there if it is older than this version. It is
+    then copied into the live database with the SQLite backup API as a single
+    write transaction: other connections either see the old book or the new
+    one, the WAL stays consistent and no restart is needed. The connections
+    kept open per thread hold no transaction between queries, so their next
+    query reads the restored pages; SQLite notices the changed schema and
+    prepares its statements again, and PRAGMA data_version moves, which
+    drops the settings and item caches built on db.change_token().
+
+    Args:
+        source_path (str): Backup file to restore.
+        progress_callback (callable): Called as progress_callback(step, total_steps).
+        is_cancelled (callable): Checked before the live database is changed.
+        keep_safety_copy (bool): Save the current database as <db>.pre-restore first.
+
+    Returns:
+        dict: 'schema_version', 'migrated', 'safety_copy' and 'seconds'.
+    """
+    started = time.perf_counter()
+    work_path = current_db() + ".restore"
+    safety_path = current_db() + ".pre-restore" if keep_safety_copy else None
+    total_steps = 3
+
+    def step(done):
+        if progress_callback:
+            progress_callback(done, total_steps)
+        if is_cancelled and is_cancelled():
+            raise BackupCancelled("Restore was cancelled.")
+
+    with _lock:
+        try:
+            step(0)
+            info = prepare_restore(source_path, work_path)
+            step(1)
+            if safety_path:
+                copy_live_database(safety_path)
+            step(2)
+
+            source = sqlite3.connect(work_path)
+            live = get_connection()
+            try:
+                # pages=-1 copies everything in one step, i.e. one transaction on the live file
+                source.backup(live, pages=-1)
+                live.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            finally:
+                live.close()
+                source.close()
+            if progress_callback:
+                progress_callback(total_steps, total_steps)
+        finally:
+            _remove_quietly(work_path)
+            _remove_quietly(work_path + "-wal")
+            _remove_quietly(work_path + "-shm")
+
+    return {
+        'schema_version': info['schema_version'],
+        'migrated': info['migrated'],
+        'safety_copy': safety_path,
+        'seconds': time.perf_counter() - started,
+    }
+
+
+def restore_from_snapshot(snapshot_id, progress_callback=None, is_cancelled=None, keep_safety_copy=True):
+    """Rebuilds the given snapshot and restores it into the live database with restore_database()."""
+    from database.snapshots import restore_snapshot
+
+    rebuilt_path = current_db() + ".snapshot"
+    try:
+        restore_snapshot(snapshot_id, rebuilt_path)
+        return restore_database(rebuilt_path, progress_callback, is_cancelled, keep_safety_copy)
+    finally:
+        _remove_quietly(rebuilt_path)
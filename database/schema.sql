@@ -59,11 +59,13 @@ CREATE TABLE IF NOT EXISTS items (
     inter_state_tax_rate REAL DEFAULT 0,
     purchase_description TEXT,
     inventory_valuation_method TEXT,
+    average_cost REAL DEFAULT 0,
     item_type TEXT DEFAULT 'Goods',
     is_sellable INTEGER DEFAULT 1,
     is_purchasable INTEGER DEFAULT 1,
     track_inventory INTEGER DEFAULT 1,
     vendor_id INTEGER,
+    version INTEGER NOT NULL DEFAULT 1,
     
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
@@ -81,6 +83,33 @@ CREATE TABLE IF NOT EXISTS stock_batches (
     FOREIGN KEY (vendor_id) REFERENCES vendors(id)
 );
 
+-- Stock Movements (append-only ledger)
+CREATE TABLE IF NOT EXISTS stock_movements (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    item_id INTEGER NOT NULL,
+    date DATE NOT NULL,
+    quantity REAL NOT NULL,
+    value REAL NOT NULL DEFAULT 0,
+    kind TEXT NOT NULL, -- opening, purchase, sale, adjustment, ...
+    reference_type TEXT,
+    reference_id INTEGER,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (item_id) REFERENCES items(id)
+);
+CREATE INDEX IF NOT EXISTS idx_stock_movements_item_date ON stock_movements(item_id, date);
+CREATE TRIGGER IF NOT EXISTS stock_movements_no_update BEFORE UPDATE ON stock_movements
+BEGIN SELECT RAISE(ABORT, 'stock_movements is append-only'); END;
+CREATE TRIGGER IF NOT EXISTS stock_movements_no_delete BEFORE DELETE ON stock_movements
+BEGIN SELECT RAISE(ABORT, 'stock_movements is append-only'); END;
+
+CREATE TABLE IF NOT EXISTS stock_checkpoints (
+    date DATE NOT NULL,
+    item_id INTEGER NOT NULL,
+    quantity REAL DEFAULT 0,
+    value REAL DEFAULT 0,
+    PRIMARY KEY (date, item_id)
+);
+
 -- Invoices Table
 CREATE TABLE IF NOT EXISTS invoices (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -108,6 +137,7 @@ CREATE TABLE IF NOT EXISTS invoices (
     attachment_path TEXT,
     custom_fields TEXT,
     adjustment REAL DEFAULT 0,
+    version INTEGER NOT NULL DEFAULT 1,
     
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (customer_id) REFERENCES customers(id)
@@ -150,6 +180,7 @@ CREATE TABLE IF NOT EXISTS bills (
     notes TEXT,
     discount_amount REAL DEFAULT 0,
     custom_fields TEXT,
+    version INTEGER NOT NULL DEFAULT 1,
     
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (vendor_id) REFERENCES vendors(id)
@@ -188,11 +219,23 @@ CREATE TABLE IF NOT EXISTS payments (
     reference TEXT,
     send_thank_you INTEGER DEFAULT 0,
     custom_fields TEXT,
+    version INTEGER NOT NULL DEFAULT 1,
     
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (invoice_id) REFERENCES invoices(id),
     FOREIGN KEY (bill_id) REFERENCES bills(id)
 );
+CREATE INDEX IF NOT EXISTS idx_invoices_customer_date ON invoices(customer_id, date);
+CREATE INDEX IF NOT EXISTS idx_bills_vendor_date ON bills(vendor_id, date);
+CREATE INDEX IF NOT EXISTS idx_payments_invoice ON payments(invoice_id);
+CREATE INDEX IF NOT EXISTS idx_payments_bill ON payments(bill_id);
+-- payments(customer_id, date) and payments(vendor_id, date) are created by update_schema_v11
+
+-- Every other update moves the row version on (see database/concurrency.py)
+CREATE TRIGGER IF NOT EXISTS version_invoices AFTER UPDATE ON invoices WHEN NEW.version IS OLD.version BEGIN UPDATE invoices SET version = OLD.version + 1 WHERE id = NEW.id; END;
+CREATE TRIGGER IF NOT EXISTS version_bills AFTER UPDATE ON bills WHEN NEW.version IS OLD.version BEGIN UPDATE bills SET version = OLD.version + 1 WHERE id = NEW.id; END;
+CREATE TRIGGER IF NOT EXISTS version_payments AFTER UPDATE ON payments WHEN NEW.version IS OLD.version BEGIN UPDATE payments SET version = OLD.version + 1 WHERE id = NEW.id; END;
+CREATE TRIGGER IF NOT EXISTS version_items AFTER UPDATE ON items WHEN NEW.version IS OLD.version AND NEW.stock_on_hand IS OLD.stock_on_hand AND NEW.average_cost IS OLD.average_cost BEGIN UPDATE items SET version = OLD.version + 1 WHERE id = NEW.id; END;
 
 -- Settings Table
 CREATE TABLE IF NOT EXISTS settings (
@@ -200,6 +243,127 @@ CREATE TABLE IF NOT EXISTS settings (
     value TEXT
 );
 
+-- Maintenance Log
+CREATE TABLE IF NOT EXISTS maintenance_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    task TEXT NOT NULL,
+    started_at TIMESTAMP NOT NULL,
+    seconds REAL NOT NULL,
+    details TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_maintenance_log_task ON maintenance_log(task, started_at);
+
+-- Fiscal Year Archives
+CREATE TABLE IF NOT EXISTS archived_years (
+    fiscal_year INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    first_date DATE,
+    last_date DATE,
+    invoices INTEGER DEFAULT 0,
+    bills INTEGER DEFAULT 0,
+    payments INTEGER DEFAULT 0,
+    stock_batches INTEGER DEFAULT 0,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS archived_totals (
+    fiscal_year INTEGER NOT NULL,
+    month TEXT NOT NULL,
+    sales REAL DEFAULT 0,
+    purchases REAL DEFAULT 0,
+    output_tax REAL DEFAULT 0,
+    input_tax REAL DEFAULT 0,
+    cash_in REAL DEFAULT 0,
+    cash_out REAL DEFAULT 0,
+    PRIMARY KEY (fiscal_year, month)
+);
+
+CREATE TABLE IF NOT EXISTS archived_party_totals (
+    fiscal_year INTEGER NOT NULL,
+    party_type TEXT NOT NULL,
+    party_id INTEGER NOT NULL,
+    billed REAL DEFAULT 0,
+    settled REAL DEFAULT 0,
+    PRIMARY KEY (fiscal_year, party_type, party_id)
+);
+
+-- Period Close Snapshots
+CREATE TABLE IF NOT EXISTS period_closes (
+    period TEXT PRIMARY KEY,
+    kind TEXT NOT NULL DEFAULT 'month',
+    end_date DATE NOT NULL,
+    cash_in REAL DEFAULT 0,
+    cash_out REAL DEFAULT 0,
+    closed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS period_party_balances (
+    period TEXT NOT NULL,
+    party_type TEXT NOT NULL,
+    party_id INTEGER NOT NULL,
+    billed REAL DEFAULT 0,
+    settled REAL DEFAULT 0,
+    PRIMARY KEY (period, party_type, party_id)
+);
+
+CREATE TABLE IF NOT EXISTS period_stock (
+    period TEXT NOT NULL,
+    item_id INTEGER NOT NULL,
+    quantity REAL DEFAULT 0,
+    value REAL DEFAULT 0,
+    PRIMARY KEY (period, item_id)
+);
+
+-- Bank Statement Reconciliation
+CREATE TABLE IF NOT EXISTS bank_statements (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    file_name TEXT,
+    account TEXT,
+    line_count INTEGER DEFAULT 0,
+    imported_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS bank_statement_lines (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    statement_id INTEGER NOT NULL,
+    line_no INTEGER,
+    date DATE,
+    description TEXT,
+    reference TEXT,
+    amount REAL NOT NULL,
+    status TEXT DEFAULT 'Unmatched',
+    match_type TEXT,
+    match_id INTEGER,
+    payment_number TEXT,
+    match_rule TEXT,
+    score REAL,
+    FOREIGN KEY(statement_id) REFERENCES bank_statements(id)
+);
+CREATE INDEX IF NOT EXISTS idx_bank_lines_statement ON bank_statement_lines(statement_id, status);
+CREATE INDEX IF NOT EXISTS idx_bank_lines_payment ON bank_statement_lines(payment_number);
+
+-- Audit Log (triggers are generated by database/audit.py)
+CREATE TABLE IF NOT EXISTS audit_log (
+    id INTEGER PRIMARY KEY,
+    txn INTEGER,
+    ts TEXT,
+    user_id INTEGER,
+    entity TEXT,
+    entity_id INTEGER,
+    action TEXT,
+    changes TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_audit_log_entity_ts ON audit_log(entity, ts);
+CREATE INDEX IF NOT EXISTS idx_audit_log_entity_id ON audit_log(entity, entity_id);
+
+CREATE TABLE IF NOT EXISTS audit_context (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    txn INTEGER NOT NULL DEFAULT 0,
+    user_id INTEGER,
+    suspended INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO audit_context (id) VALUES (1);
+
 -- Insert Default Settings
 INSERT OR IGNORE INTO settings (key, value) VALUES ('company_name', 'My Company');
 INSERT OR IGNORE INTO settings (key, value) VALUES ('company_address', '123 Business St');
@@ -0,0 +1,386 @@
+import os
+import time
+import zlib
+import sqlite3
+import hashlib
+import datetime
+import threading
+from database.db import current_db, execute_read_query
+from database.backup import (
+    PAGES_PER_STEP, BackupCancelled, copy_live_database, check_database_integrity, _remove_quietly
+)
+
+# Snapshots share one page store: every database page is stored once, keyed by
+# its hash, and a snapshot is just the ordered list of page hashes. Consecutive
+# snapshots of a book that changed a little only add the pages that changed.
+# Each database keeps its store in a snapshots folder next to it unless set here
+SNAPSHOT_DIR = None
+DIGEST_SIZE = 16
+
+# Retention: newest snapshot per hour / day / month, for this many buckets
+KEEP_HOURLY = 24
+KEEP_DAILY = 30
+KEEP_MONTHLY = 12
+
+DEFAULT_INTERVAL_MINUTES = 60
+
+_lock = threading.Lock()
+
+
+def snapshot_dir():
+    return SNAPSHOT_DIR or os.path.join(os.path.dirname(current_db()), "snapshots")
+
+
+def store_path():
+    return os.path.join(snapshot_dir(), "snapshots.db")
+
+
+def _page_digest(page):
+    return hashlib.blake2b(page, digest_size=DIGEST_SIZE).digest()
+
+
+def _open_store():
+    os.makedirs(snapshot_dir(), exist_ok=True)
+    conn = sqlite3.connect(store_path())
+    conn.row_factory = sqlite3.Row
+    # Takes effect on a new store; an older one switches over at its next prune
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS pages (
+            hash BLOB PRIMARY KEY,
+            data BLOB NOT NULL
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS snapshots (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at TEXT NOT NULL,
+            page_size INTEGER NOT NULL,
+            page_count INTEGER NOT NULL,
+            db_bytes INTEGER NOT NULL,
+            new_pages INTEGER NOT NULL,
+            new_bytes INTEGER NOT NULL,
+            manifest BLOB NOT NULL
+        )
+    """)
+    return conn
+
+
+def _read_manifest(blob):
+    raw = zlib.decompress(blob)
+    return [raw[i:i + DIGEST_SIZE] for i in range(0, len(raw), DIGEST_SIZE)]
+
+
+def take_snapshot(progress_callback=None, is_cancelled=None, force=False):
+    """
+    Takes a deduplicated snapshot of the live database.
+
+    The database is copied with the online backup API, split into pages and
+    only pages whose hash is not in the store yet are compressed and saved.
+    If nothing changed since the latest snapshot no snapshot is added unless
+    force is True.
+
+    Args:
+        progress_callback (callable): Called as progress_callback(pages_done, total_pages).
+        is_cancelled (callable): Returns True to abort; raises BackupCancelled.
+        force (bool): Record a snapshot even if it matches the latest one.
+
+    Returns:
+        dict: 'id' (None if skipped), 'page_count', 'new_pages', 'new_bytes', 'db_bytes' and 'seconds'.
+    """
+    started = time.perf_counter()
+    with _lock:
+        os.makedirs(snapshot_dir(), exist_ok=True)
+        copy_path = os.path.join(snapshot_dir(), f".snapshot_{os.getpid()}.db")
+        _remove_quietly(copy_path)
+        store = _open_store()
+        try:
+            # Copying is the first half of the work, hashing the second
+            def copy_progress(done, total):
+                if progress_callback:
+                    progress_callback(done, total * 2)
+
+            copy_live_database(copy_path, PAGES_PER_STEP, copy_progress, is_cancelled)
+
+            conn = sqlite3.connect(copy_path)
+            try:
+                page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+            finally:
+                conn.close()
+
+            db_bytes = os.path.getsize(copy_path)
+            page_count = db_bytes // page_size
+            known = {row[0] for row in store.execute("SELECT hash FROM pages")}
+
+            digests = []
+            new_pages = []
+            new_bytes = 0
+            with open(copy_path, 'rb') as f:
+                for index in range(page_count):
+                    page = f.read(page_size)
+                    digest = _page_digest(page)
+                    digests.append(digest)
+                    if digest not in known:
+                        known.add(digest)
+                        data = zlib.compress(page, 6)
+                        new_pages.append((digest, data))
+                        new_bytes += len(data)
+                    if index % PAGES_PER_STEP == 0:
+                        if is_cancelled and is_cancelled():
+                            raise BackupCancelled("Snapshot was cancelled.")
+                        if progress_callback:
+                            progress_callback(page_count + index, page_count * 2)
+
+            manifest = b"".join(digests)
+            latest = store.execute("SELECT manifest FROM snapshots ORDER BY id DESC LIMIT 1").fetchone()
+            if not force and latest and zlib.decompress(latest['manifest']) == manifest:
+                snapshot_id = None
+            else:
+                with store:
+                    store.executemany("INSERT OR IGNORE INTO pages (hash, data) VALUES (?, ?)", new_pages)
+                    cursor = store.execute("""
+                        INSERT INTO snapshots (created_at, page_size, page_count, db_bytes, new_pages, new_bytes, manifest)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """, (datetime.datetime.now().isoformat(timespec='seconds'), page_size, page_count,
+                          db_bytes, len(new_pages), new_bytes, zlib.compress(manifest, 6)))
+                    snapshot_id = cursor.lastrowid
+            if progress_callback:
+                progress_callback(page_count * 2, page_count * 2)
+        finally:
+            store.close()
+            _remove_quietly(copy_path)
+
+    return {
+        'id': snapshot_id,
+        'page_count': page_count,
+        'new_pages': len(new_pages) if snapshot_id else 0,
+        'new_bytes': new_bytes if snapshot_id else 0,
+        'db_bytes': db_bytes,
+        'seconds': time.perf_counter() - started,
+    }
+
+
+def list_snapshots():
+    """Returns the snapshots, newest first, without their manifests."""
+    if not os.path.exists(store_path()):
+        return []
+    store = _open_store()
+    try:
+        rows = store.execute("""
+            SELECT id, created_at, page_size, page_count, db_bytes, new_pages, new_bytes
+            FROM snapshots ORDER BY id DESC
+        """).fetchall()
+        return [dict(row) for row in rows]
+    finally:
+        store.close()
+
+
+def get_latest_snapshot_time():
+    """Returns the datetime of the newest snapshot, or None."""
+    snapshots = list_snapshots()
+    if not snapshots:
+        return None
+    return datetime.datetime.fromisoformat(snapshots[0]['created_at'])
+
+
+def get_store_size():
+    """Bytes used on disk by the snapshot store."""
+    path = store_path()
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def restore_snapshot(snapshot_id, dest_path):
+    """
+    Rebuilds the database as it was at the given snapshot and writes it to dest_path.
+
+    dest_path is only replaced once the rebuilt file passes an integrity check;
+    it is not the live database path, copying it into place is up to the caller.
+
+    Returns:
+        str: dest_path.
+    """
+    with _lock:
+        store = _open_store()
+        try:
+            row = store.execute("SELECT page_size, manifest FROM snapshots WHERE id = ?", (snapshot_id,)).fetchone()
+            if not row:
+                raise Exception(f"Snapshot {snapshot_id} does not exist.")
+            digests = _read_manifest(row['manifest'])
+
+            partial_path = dest_path + ".part"
+            try:
+                with open(partial_path, 'wb') as f:
+                    for digest in digests:
+                        page = store.execute("SELECT data FROM pages WHERE hash = ?", (digest,)).fetchone()
+                        if page is None:
+                            raise Exception(f"Snapshot {snapshot_id} is missing a page; it cannot be restored.")
+                        f.write(zlib.decompress(page['data']))
+
+                problems = check_database_integrity(partial_path)
+                if problems:
+                    raise Exception("Restored snapshot failed integrity check: " + "; ".join(problems[:5]))
+                os.replace(partial_path, dest_path)
+            except BaseException:
+                _remove_quietly(partial_path)
+                raise
+        finally:
+            store.close()
+    return dest_path
+
+
+def select_snapshots_to_keep(snapshots, now=None, hourly=KEEP_HOURLY, daily=KEEP_DAILY, monthly=KEEP_MONTHLY):
+    """
+    Applies the hourly/daily/monthly retention policy.
+
+    The newest snapshot in each of the last `hourly` hours, `daily` days and
+    `monthly` months is kept, as is the newest snapshot overall.
+
+    Args:
+        snapshots (list): Dicts with 'id' and 'created_at' (ISO format).
+        now (datetime): Reference time, defaults to the current time.
+
+    Returns:
+        set: Ids of the snapshots to keep.
+    """
+    now = now or datetime.datetime.now()
+    policies = [
+        (hourly, lambda t: (t.year, t.month, t.day, t.hour), datetime.timedelta(hours=hourly)),
+        (daily, lambda t: (t.year, t.month, t.day), datetime.timedelta(days=daily)),
+        (monthly, lambda t: (t.year, t.month), datetime.timedelta(days=31 * monthly)),
+    ]
+    ordered = sorted(snapshots, key=lambda s: (s['created_at'], s['id']), reverse=True)
+    keep = {ordered[0]['id']} if ordered else set()
+
+    for count, bucket_of, window in policies:
+        seen = set()
+        for snap in ordered:
+            created = datetime.datetime.fromisoformat(snap['created_at'])
+            if now - created > window or len(seen) >= count:
+                continue
+            bucket = bucket_of(created)
+            if bucket not in seen:
+                seen.add(bucket)
+                keep.add(snap['id'])
+    return keep
+
+
+def prune_snapshots(now=None, hourly=KEEP_HOURLY, daily=KEEP_DAILY, monthly=KEEP_MONTHLY):
+    """
+    Deletes snapshots outside the retention policy and the pages no snapshot uses any more.
+
+    Returns:
+        int: Number of snapshots deleted.
+    """
+    with _lock:
+        if not os.path.exists(store_path()):
+            return 0
+        store = _open_store()
+        try:
+            snapshots = [dict(row) for row in store.execute("SELECT id, created_at FROM snapshots")]
+            keep = select_snapshots_to_keep(snapshots, now, hourly, daily, monthly)
+            doomed = [(s['id'],) for s in snapshots if s['id'] not in keep]
+            if not doomed:
+                return 0
+
+            referenced = set()
+            for row in store.execute("SELECT id, manifest FROM snapshots"):
+                if row['id'] in keep:
+                    referenced.update(_read_manifest(row['manifest']))
+            unused = [(row[0],) for row in store.execute("SELECT hash FROM pages") if row[0] not in referenced]
+
+            with store:
+                store.executemany("DELETE FROM snapshots WHERE id = ?", doomed)
+                store.executemany("DELETE FROM pages WHERE hash = ?", unused)
+            if store.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+                # Only hands back the freed pages, without rewriting the whole store;
+                # executescript() steps the pragma to the end, see run_incremental_vacuum()
+                store.executescript("PRAGMA incremental_vacuum;")
+            else:
+                # A store from before auto_vacuum was set needs one full VACUUM to switch
+                store.execute("VACUUM")
+            return len(doomed)
+        finally:
+            store.close()
+
+
+def get_snapshot_settings():
+    """Returns (enabled, interval_minutes) from the settings table."""
+    settings = {}
+    try:
+        rows = execute_read_query(
+            "SELECT key, value FROM settings WHERE key IN ('auto_snapshot_enabled', 'auto_snapshot_interval_minutes')"
+        )
+        settings = {row['key']: row['value'] for row in rows}
+    except Exception as e:
+        print(f"Warning: Could not read snapshot settings: {e}")
+
+    enabled = settings.get('auto_snapshot_enabled', '1') == '1'
+    try:
+        interval = max(5, int(settings.get('auto_snapshot_interval_minutes', DEFAULT_INTERVAL_MINUTES)))
+    except ValueError:
+        interval = DEFAULT_INTERVAL_MINUTES
+    return enabled, interval
+
+
+class SnapshotScheduler:
+    """
+    Background thread that takes a snapshot whenever the configured interval
+    has passed since the latest one, then applies the retention policy.
+
+    Settings are re-read on every check, so changes in Settings apply without a restart.
+    """
+
+    def __init__(self, check_seconds=60):
+        self.check_seconds = check_seconds
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="snapshot-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def is_due(self, now=None):
+        enabled, interval = get_snapshot_settings()
+        if not enabled:
+            return False
+        latest = get_latest_snapshot_time()
+        now = now or datetime.datetime.now()
+        return latest is None or now - latest >= datetime.timedelta(minutes=interval)
+
+    def run_once(self):
+        """Takes and prunes a snapshot if one is due. Returns the take_snapshot() result or None."""
+        if not self.is_due():
+            return None
+        # Forced so an idle book still advances the latest snapshot time; an
+        # unchanged snapshot only costs its manifest
+        result = take_snapshot(is_cancelled=self._stop.is_set, force=True)
+        prune_snapshots()
+        return result
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except BackupCancelled:
+                break
+            except Exception as e:
+                print(f"Warning: Automatic snapshot failed: {e}")
+            self._stop.wait(self.check_seconds)
+
+
+_scheduler = None
+
+
+def start_snapshot_scheduler(check_seconds=60):
+    """Starts the process-wide snapshot scheduler (once) and returns it."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = SnapshotScheduler(check_seconds)
+    _scheduler.start()
+    return _scheduler
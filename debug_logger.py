@@ -1,41 +1,164 @@
 import sys
 import os
-import traceback
+import queue
+import atexit
+import logging
 import datetime
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
-class DebugLogger:
-    def __init__(self):
-        self.log_file = os.path.join(os.getcwd(), "debug_log.txt")
-        # Clear previous log
-        with open(self.log_file, "w") as f:
-            f.write(f"Session started at {datetime.datetime.now()}\n")
-            f.write(f"Executable: {sys.executable}\n")
-            f.write(f"CWD: {os.getcwd()}\n")
-            f.write("-" * 50 + "\n")
+# Log records are queued by the calling thread and written by one listener
+# thread, so print() and logger calls on hot paths never touch the disk.
+# The file rotates by size and each run starts a fresh file, keeping the
+# previous sessions as debug_log.txt.1 .. .N.
+
+LOG_FILE_NAME = "debug_log.txt"
+MAX_BYTES = 2 * 1024 * 1024
+BACKUP_COUNT = 5
+# Records waiting for the writer thread; beyond this they are dropped and counted
+QUEUE_SIZE = 10000
+LOG_FORMAT = "[%(asctime)s] %(levelname)s %(name)s (%(threadName)s): %(message)s"
+
+_listener = None
+_queue_handler = None
+_saved_streams = None
+
+
+class BoundedQueueHandler(QueueHandler):
+    """
+    QueueHandler over a bounded queue. When the writer falls behind (a log
+    storm) new records are dropped instead of growing memory, and the number
+    dropped is logged once the queue has room again.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._drop_lock = threading.Lock()
+
+    def enqueue(self, record):
+        with self._drop_lock:
+            if self.dropped and not self.queue.full():
+                notice = logging.LogRecord(
+                    "debug_logger", logging.WARNING, __file__, 0,
+                    "Dropped %d log records while the log queue was full", (self.dropped,), None
+                )
+                self.queue.put_nowait(notice)
+                self.dropped = 0
+            try:
+                self.queue.put_nowait(record)
+            except queue.Full:
+                self.dropped += 1
+
+
+class StreamToLogger:
+    """
+    File-like object for sys.stdout / sys.stderr. Complete lines are logged
+    under the module that printed them, so existing print() calls end up in
+    per-module loggers without changing them.
+    """
+
+    def __init__(self, level, stream_name):
+        self.level = level
+        self.stream_name = stream_name
+        self._local = threading.local()
 
     def write(self, message):
+        buffer = getattr(self._local, "buffer", "") + message
+        if "\n" not in buffer:
+            self._local.buffer = buffer
+            return len(message)
+        *lines, self._local.buffer = buffer.split("\n")
+        # print() is builtin, so frame 1 is the code that called it
         try:
-            timestamp = datetime.datetime.now().strftime("%H:%M:%S")
-            with open(self.log_file, "a") as f:
-                f.write(f"[{timestamp}] {message}\n")
-        except:
-            pass
+            name = sys._getframe(1).f_globals.get("__name__", self.stream_name)
+        except ValueError:
+            name = self.stream_name
+        logger = logging.getLogger(self.stream_name if name == "__main__" else name)
+        for line in lines:
+            if line.strip():
+                logger.log(self.level, line.rstrip())
+        return len(message)
 
     def flush(self):
-        pass
-
-def setup_logging():
-    # Only setup if frozen or explicitly requested
-    if getattr(sys, 'frozen', False) or os.environ.get('DEBUG_LOGGING'):
-        logger = DebugLogger()
-        sys.stdout = logger
-        sys.stderr = logger
-        
-        # Hook excepthook
-        def exception_hook(exctype, value, tb):
-            logger.write("Uncaught Exception:")
-            logger.write("".join(traceback.format_exception(exctype, value, tb)))
-            sys.__excepthook__(exctype, value, tb)
-            
-        sys.excepthook = exception_hook
-        print("Debug logging enabled.")
+        buffer = getattr(self._local, "buffer", "")
+        if buffer.strip():
+            logging.getLogger(self.stream_name).log(self.level, buffer.rstrip())
+        self._local.buffer = ""
+
+    def isatty(self):
+        return False
+
+
+def get_log_path(log_dir=None):
+    return os.path.join(log_dir or os.getcwd(), LOG_FILE_NAME)
+
+
+def setup_logging(force=False, log_dir=None, max_bytes=MAX_BYTES, backup_count=BACKUP_COUNT, queue_size=QUEUE_SIZE):
+    """
+    Routes logging, print() output and uncaught exceptions to a rotating
+    debug_log.txt through a background writer thread. Only enabled for
+    frozen builds or when DEBUG_LOGGING is set, unless force is True.
+    Returns the log file path, or None when logging stays on the console.
+    """
+    global _listener, _queue_handler, _saved_streams
+    if not (force or getattr(sys, 'frozen', False) or os.environ.get('DEBUG_LOGGING')):
+        return None
+    if _listener is not None:
+        return _listener.handlers[0].baseFilename
+
+    log_path = get_log_path(log_dir)
+    file_handler = RotatingFileHandler(log_path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True)
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT, "%Y-%m-%d %H:%M:%S"))
+    # One file per session: the previous run moves to debug_log.txt.1
+    if os.path.exists(log_path) and os.path.getsize(log_path) > 0:
+        file_handler.doRollover()
+
+    _queue_handler = BoundedQueueHandler(queue.Queue(queue_size))
+    _listener = QueueListener(_queue_handler.queue, file_handler, respect_handler_level=True)
+    _listener.start()
+
+    root = logging.getLogger()
+    root.addHandler(_queue_handler)
+    root.setLevel(logging.INFO)
+
+    _saved_streams = (sys.stdout, sys.stderr, sys.excepthook, threading.excepthook)
+    sys.stdout = StreamToLogger(logging.INFO, "stdout")
+    sys.stderr = StreamToLogger(logging.ERROR, "stderr")
+
+    def exception_hook(exctype, value, tb):
+        logging.getLogger("uncaught").critical("Uncaught Exception:", exc_info=(exctype, value, tb))
+        sys.__excepthook__(exctype, value, tb)
+
+    def thread_exception_hook(args):
+        logging.getLogger("uncaught").critical(
+            "Uncaught Exception in thread %s:", args.thread.name if args.thread else "?",
+            exc_info=(args.exc_type, args.exc_value, args.exc_traceback)
+        )
+
+    sys.excepthook = exception_hook
+    threading.excepthook = thread_exception_hook
+    atexit.register(shutdown_logging)
+
+    log = logging.getLogger("debug_logger")
+    log.info("Session started at %s", datetime.datetime.now())
+    log.info("Executable: %s", sys.executable)
+    log.info("CWD: %s", os.getcwd())
+    return log_path
+
+
+def shutdown_logging():
+    """Flushes queued records, stops the writer thread and restores the console streams."""
+    global _listener, _queue_handler, _saved_streams
+    if _listener is None:
+        return
+    sys.stdout.flush()
+    sys.stderr.flush()
+    logging.getLogger().removeHandler(_queue_handler)
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    sys.stdout, sys.stderr, sys.excepthook, threading.excepthook = _saved_streams
+    _listener = None
+    _queue_handler = None
+    _saved_streams = None
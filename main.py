@@ -1,5 +1,6 @@
 import sys
 import os
+import multiprocessing
 # Setup debug logging first thing
 try:
     from debug_logger import setup_logging
@@ -7,19 +8,30 @@ try:
 except ImportError:
     pass
 
-from PySide6.QtWidgets import QApplication
+from PySide6.QtWidgets import QApplication, QMessageBox
 from PySide6.QtCore import Qt, QTimer
 from PySide6.QtGui import QIcon
 
-from database.db import init_db
+from database.db import init_db, start_write_queue
+from database.companies import open_active_company
+from auth.auth_logic import calibrate_work_factor
+from pdf.resources import start_pdf_warm_up
+from database.snapshots import start_snapshot_scheduler
+from database.maintenance import start_maintenance_scheduler
+from database import query_stats
+from modules.backend import use_remote
+from modules.stock_fifo import write_stock_checkpoints
 from splash import SplashScreen
 from auth.ui import LoginWindow, SignupWindow
 from ui.main_window import MainWindow
+from ui.query_monitor import install_action_tracker
 
 class AppController:
     def __init__(self):
         self.app = QApplication(sys.argv)
         self.app.setApplicationName("LedgerPro Desktop")
+        # Groups the statements of each click or key press for the N+1 detector
+        self.action_tracker = install_action_tracker(self.app)
         base_dir = os.path.dirname(__file__)
         icon_candidates = [
             os.path.join(base_dir, "tsl_icon.ico"),
@@ -53,10 +65,44 @@ class AppController:
         
         if self.progress == 30:
             self.splash.update_progress(self.progress, "Connecting to Database...")
-            init_db()
+            # With LEDGERPRO_SERVER set, every query goes to a LedgerPro server
+            # (python -m server.app) and the local database is not opened
+            server_url = os.environ.get("LEDGERPRO_SERVER")
+            if server_url:
+                from server.client import RemoteBackend
+                remote = RemoteBackend(server_url, token=os.environ.get("LEDGERPRO_TOKEN"))
+                try:
+                    remote.ping()
+                except Exception as e:
+                    # Falling back to the local file would start a second, diverging book
+                    QMessageBox.critical(None, "LedgerPro Server", f"Could not connect to the LedgerPro server:\n{e}")
+                    sys.exit(1)
+                use_remote(remote)
+            else:
+                # Opens the company used last (see database/companies.py)
+                open_active_company()
+                init_db()
+                # Writes from every window and background task share group commits
+                start_write_queue()
+            # Query instrumentation is off unless turned on in Settings
+            query_stats.load_settings()
+            # Fonts and the company logo load while the rest of the UI comes up
+            start_pdf_warm_up()
+            if not server_url:
+                # Automatic snapshots run in the background for the whole session
+                start_snapshot_scheduler()
+                # ANALYZE, WAL checkpoints and incremental vacuum run while the app is idle
+                start_maintenance_scheduler()
+            # Month-end stock checkpoints keep point-in-time stock queries short
+            try:
+                write_stock_checkpoints()
+            except Exception as e:
+                print(f"Warning: Could not write stock checkpoints: {e}")
             
         if self.progress == 70:
             self.splash.update_progress(self.progress, "Loading User Interface...")
+            # Sets the bcrypt cost for this machine before anyone signs in
+            calibrate_work_factor()
             
         if self.progress >= 100:
             self.timer.stop()
@@ -95,5 +141,7 @@ class AppController:
         sys.exit(self.app.exec())
 
 if __name__ == "__main__":
+    # Bulk PDF export spawns worker processes; required for the frozen build
+    multiprocessing.freeze_support()
     controller = AppController()
     controller.run()
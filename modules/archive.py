@@ -0,0 +1,448 @@
+import os
+import time
+import sqlite3
+import datetime
+import threading
+from database.db import current_db, get_connection, execute_read_query, get_remote
+from modules.backend import remotable
+from database import audit
+from database.backup import BackupCancelled
+from database import query_stats
+
+# Closed fiscal years (April to March, as in the cash flow report) are moved
+# into one SQLite file per year next to the live database (or in
+# ARCHIVE_DIR when set). Only settled documents move: open invoices and
+# bills, unallocated credits and batches with stock left stay live, so
+# balances and aging are unaffected.
+ARCHIVE_DIR = None
+HISTORY_TABLES = ('invoices', 'invoice_items', 'bills', 'bill_items', 'payments', 'stock_batches')
+# SQLite's default SQLITE_MAX_ATTACHED
+DEFAULT_ATTACH_LIMIT = 10
+NUMBER_KINDS = {
+    'invoice': ('invoices', 'invoice_number', 'invoice_prefix', 'INV-'),
+    'bill': ('bills', 'bill_number', 'bill_prefix', 'BILL-'),
+    'payment': ('payments', 'payment_number', 'payment_prefix', 'PAY-'),
+}
+
+_lock = threading.Lock()
+
+
+def fiscal_year_of(date):
+    """Returns the starting year of the fiscal year a date (date or 'YYYY-MM-DD') falls in."""
+    if isinstance(date, str):
+        date = datetime.date.fromisoformat(date[:10])
+    return date.year if date.month >= 4 else date.year - 1
+
+
+def fiscal_year_range(fiscal_year):
+    return f"{fiscal_year}-04-01", f"{fiscal_year + 1}-03-31"
+
+
+def fiscal_year_label(fiscal_year):
+    return f"FY {fiscal_year}-{str(fiscal_year + 1)[-2:]}"
+
+
+def archive_path(fiscal_year):
+    return os.path.join(ARCHIVE_DIR or os.path.dirname(current_db()), f"ledgerpro_FY{fiscal_year}.db")
+
+
+def get_archived_years():
+    """Returns the archived_years rows, oldest first."""
+    return [dict(row) for row in execute_read_query("SELECT * FROM archived_years ORDER BY fiscal_year")]
+
+
+def get_closable_fiscal_years(today=None):
+    """Past fiscal years that still have invoices or bills in the live database."""
+    current = fiscal_year_of(today or datetime.date.today())
+    rows = execute_read_query("""
+        SELECT MIN(date) AS first_date FROM (
+            SELECT MIN(date) AS date FROM invoices
+            UNION ALL
+            SELECT MIN(date) FROM bills
+        )
+    """)
+    first_date = rows[0]['first_date'] if rows else None
+    if not first_date:
+        return []
+    return list(range(fiscal_year_of(first_date), current))
+
+
+def _parse_number(number, prefix):
+    if not number or not number.startswith(prefix):
+        return None
+    suffix = number[len(prefix):]
+    return int(suffix) if suffix.isdigit() else None
+
+
+def get_archived_number_floor(kind):
+    """
+    Highest document number of this kind ('invoice', 'bill' or 'payment') that
+    was moved to an archive, so numbering does not restart after a year is closed.
+    """
+    rows = execute_read_query("SELECT value FROM settings WHERE key = ?", (f"archived_max_{kind}_number",))
+    try:
+        return int(rows[0]['value']) if rows else 0
+    except (TypeError, ValueError):
+        return 0
+
+
+def _table_columns(conn, schema, table):
+    return [row[1] for row in conn.execute(f"PRAGMA {schema}.table_info({table})")]
+
+
+def _prepare_archive_file(conn, path):
+    """Creates the archive tables with the live schema, adding columns added by later migrations."""
+    archive = sqlite3.connect(path)
+    try:
+        archive.execute("PRAGMA journal_mode=DELETE")
+        for table in HISTORY_TABLES:
+            sql = conn.execute("SELECT sql FROM main.sqlite_master WHERE type='table' AND name=?", (table,)).fetchone()[0]
+            existing = {row[1] for row in archive.execute(f"PRAGMA table_info({table})")}
+            if not existing:
+                archive.execute(sql)
+                continue
+            for row in conn.execute(f"PRAGMA main.table_info({table})"):
+                if row[1] not in existing:
+                    archive.execute(f"ALTER TABLE {table} ADD COLUMN {row[1]} {row[2]}")
+        for table in ('invoices', 'bills', 'payments'):
+            archive.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_date ON {table}(date)")
+        archive.execute("CREATE INDEX IF NOT EXISTS idx_stock_batches_date ON stock_batches(purchase_date)")
+        archive.commit()
+    finally:
+        archive.close()
+
+
+# (table, condition selecting the archived rows)
+_ARCHIVE_SELECTION = (
+    ('invoices', "id IN (SELECT id FROM temp.archive_invoice_ids)"),
+    ('invoice_items', "invoice_id IN (SELECT id FROM temp.archive_invoice_ids)"),
+    ('bills', "id IN (SELECT id FROM temp.archive_bill_ids)"),
+    ('bill_items', "bill_id IN (SELECT id FROM temp.archive_bill_ids)"),
+    ('payments', "id IN (SELECT id FROM temp.archive_payment_ids)"),
+    ('stock_batches', "id IN (SELECT id FROM temp.archive_batch_ids)"),
+)
+
+
+def _select_rows_to_archive(conn, start_date, end_date):
+    for name in ('invoice', 'bill', 'payment', 'batch'):
+        conn.execute(f"CREATE TEMP TABLE archive_{name}_ids (id INTEGER PRIMARY KEY)")
+
+    # Settled: marked Paid, or payments cover the total
+    conn.execute("""
+        INSERT INTO temp.archive_invoice_ids (id)
+        SELECT i.id FROM main.invoices i
+        LEFT JOIN (SELECT invoice_id, SUM(amount) AS paid FROM main.payments
+                   WHERE invoice_id IS NOT NULL GROUP BY invoice_id) p ON p.invoice_id = i.id
+        WHERE i.date BETWEEN ? AND ?
+          AND (i.status = 'Paid' OR (i.status != 'Draft' AND COALESCE(p.paid, 0) >= i.grand_total - 0.01))
+    """, (start_date, end_date))
+    conn.execute("""
+        INSERT INTO temp.archive_bill_ids (id)
+        SELECT b.id FROM main.bills b
+        LEFT JOIN (SELECT bill_id, SUM(amount) AS paid FROM main.payments
+                   WHERE bill_id IS NOT NULL GROUP BY bill_id) p ON p.bill_id = b.id
+        WHERE b.date BETWEEN ? AND ?
+          AND (b.status = 'Paid' OR (b.status != 'Draft' AND COALESCE(p.paid, 0) >= b.grand_total - 0.01))
+    """, (start_date, end_date))
+    # Payments follow their document, even when they were made in a later year
+    conn.execute("""
+        INSERT INTO temp.archive_payment_ids (id)
+        SELECT id FROM main.payments
+        WHERE invoice_id IN (SELECT id FROM temp.archive_invoice_ids)
+           OR bill_id IN (SELECT id FROM temp.archive_bill_ids)
+    """)
+    conn.execute("""
+        INSERT INTO temp.archive_batch_ids (id)
+        SELECT id FROM main.stock_batches
+        WHERE purchase_date BETWEEN ? AND ? AND quantity_remaining <= 0.0001
+    """, (start_date, end_date))
+
+
+def _carry_forward(conn, fiscal_year):
+    """Adds the monthly and per-party totals of the selected rows to the live summary tables."""
+    monthly = {}
+
+    def add(month, column, value):
+        totals = monthly.setdefault(month, dict.fromkeys(
+            ('sales', 'purchases', 'output_tax', 'input_tax', 'cash_in', 'cash_out'), 0.0))
+        totals[column] += value or 0.0
+
+    for row in conn.execute("""
+        SELECT strftime('%Y-%m', date), SUM(grand_total), SUM(tax_amount) FROM main.invoices
+        WHERE id IN (SELECT id FROM temp.archive_invoice_ids) GROUP BY 1
+    """):
+        add(row[0], 'sales', row[1])
+        add(row[0], 'output_tax', row[2])
+    for row in conn.execute("""
+        SELECT strftime('%Y-%m', date), SUM(grand_total), SUM(tax_amount) FROM main.bills
+        WHERE id IN (SELECT id FROM temp.archive_bill_ids) GROUP BY 1
+    """):
+        add(row[0], 'purchases', row[1])
+        add(row[0], 'input_tax', row[2])
+    for row in conn.execute("""
+        SELECT strftime('%Y-%m', date),
+               SUM(CASE WHEN invoice_id IS NOT NULL THEN amount ELSE 0 END),
+               SUM(CASE WHEN bill_id IS NOT NULL THEN amount ELSE 0 END)
+        FROM main.payments WHERE id IN (SELECT id FROM temp.archive_payment_ids) GROUP BY 1
+    """):
+        add(row[0], 'cash_in', row[1])
+        add(row[0], 'cash_out', row[2])
+
+    conn.executemany("""
+        INSERT INTO archived_totals (fiscal_year, month, sales, purchases, output_tax, input_tax, cash_in, cash_out)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (fiscal_year, month) DO UPDATE SET
+            sales = sales + excluded.sales,
+            purchases = purchases + excluded.purchases,
+            output_tax = output_tax + excluded.output_tax,
+            input_tax = input_tax + excluded.input_tax,
+            cash_in = cash_in + excluded.cash_in,
+            cash_out = cash_out + excluded.cash_out
+    """, [(fiscal_year, month, t['sales'], t['purchases'], t['output_tax'], t['input_tax'], t['cash_in'], t['cash_out'])
+          for month, t in monthly.items()])
+
+    party_rows = conn.execute("""
+        SELECT 'customer', i.customer_id, SUM(i.grand_total),
+               COALESCE(SUM((SELECT SUM(amount) FROM main.payments p WHERE p.invoice_id = i.id)), 0)
+        FROM main.invoices i WHERE i.id IN (SELECT id FROM temp.archive_invoice_ids) GROUP BY i.customer_id
+        UNION ALL
+        SELECT 'vendor', b.vendor_id, SUM(b.grand_total),
+               COALESCE(SUM((SELECT SUM(amount) FROM main.payments p WHERE p.bill_id = b.id)), 0)
+        FROM main.bills b WHERE b.id IN (SELECT id FROM temp.archive_bill_ids) GROUP BY b.vendor_id
+    """).fetchall()
+    conn.executemany("""
+        INSERT INTO archived_party_totals (fiscal_year, party_type, party_id, billed, settled)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (fiscal_year, party_type, party_id) DO UPDATE SET
+            billed = billed + excluded.billed,
+            settled = settled + excluded.settled
+    """, [(fiscal_year, *row) for row in party_rows])
+
+
+def _raise_number_floors(conn):
+    ids_table = {'invoice': 'archive_invoice_ids', 'bill': 'archive_bill_ids', 'payment': 'archive_payment_ids'}
+    for kind, (table, column, prefix_key, default_prefix) in NUMBER_KINDS.items():
+        row = conn.execute("SELECT value FROM main.settings WHERE key = ?", (prefix_key,)).fetchone()
+        prefix = row[0] if row and row[0] is not None else default_prefix
+        numbers = [_parse_number(r[0], prefix) for r in conn.execute(
+            f"SELECT {column} FROM main.{table} WHERE id IN (SELECT id FROM temp.{ids_table[kind]})")]
+        highest = max([n for n in numbers if n is not None], default=0)
+        if highest:
+            conn.execute("""
+                INSERT INTO main.settings (key, value) VALUES (?, ?)
+                ON CONFLICT (key) DO UPDATE SET value = MAX(CAST(value AS INTEGER), CAST(excluded.value AS INTEGER))
+            """, (f"archived_max_{kind}_number", str(highest)))
+
+
+def archive_fiscal_year(fiscal_year, today=None, progress_callback=None, is_cancelled=None):
+    """
+    Moves the settled documents of a closed fiscal year into ledgerpro_FY<year>.db.
+
+    Archived: invoices and bills dated in the year that are paid, their items
+    and payments, and stock batches bought in the year that are used up. The
+    monthly and per-party totals of the moved rows are carried forward into
+    archived_totals and archived_party_totals. Running it again for the same
+    year moves whatever has been settled since.
+
+    The rows are first copied into the archive and committed there, then
+    removed from the live database in one transaction, so an interruption
+    never loses data; rerunning finishes an interrupted archive.
+
+    Returns:
+        dict: 'fiscal_year', 'path', 'invoices', 'bills', 'payments', 'stock_batches' and 'seconds'.
+    """
+    started = time.perf_counter()
+    if fiscal_year >= fiscal_year_of(today or datetime.date.today()):
+        raise Exception(f"{fiscal_year_label(fiscal_year)} has not ended yet and cannot be archived.")
+    start_date, end_date = fiscal_year_range(fiscal_year)
+    path = archive_path(fiscal_year)
+    total_steps = 3
+
+    def step(done):
+        if progress_callback:
+            progress_callback(done, total_steps)
+        if is_cancelled and is_cancelled():
+            raise BackupCancelled("Archiving was cancelled.")
+
+    with _lock:
+        conn = get_connection()
+        try:
+            step(0)
+            _prepare_archive_file(conn, path)
+            conn.execute("ATTACH DATABASE ? AS archive", (path,))
+            _select_rows_to_archive(conn, start_date, end_date)
+            counts = {
+                'invoices': conn.execute("SELECT COUNT(*) FROM temp.archive_invoice_ids").fetchone()[0],
+                'bills': conn.execute("SELECT COUNT(*) FROM temp.archive_bill_ids").fetchone()[0],
+                'payments': conn.execute("SELECT COUNT(*) FROM temp.archive_payment_ids").fetchone()[0],
+                'stock_batches': conn.execute("SELECT COUNT(*) FROM temp.archive_batch_ids").fetchone()[0],
+            }
+            step(1)
+
+            # Phase 1: copy. In WAL mode a transaction is atomic per file only,
+            # so the archive is committed before anything is removed
+            for table, condition in _ARCHIVE_SELECTION:
+                columns = ", ".join(_table_columns(conn, 'main', table))
+                conn.execute(f"INSERT OR REPLACE INTO archive.{table} ({columns}) "
+                             f"SELECT {columns} FROM main.{table} WHERE {condition}")
+            conn.commit()
+            for table, condition in _ARCHIVE_SELECTION:
+                live = conn.execute(f"SELECT COUNT(*) FROM main.{table} WHERE {condition}").fetchone()[0]
+                copied = conn.execute(f"SELECT COUNT(*) FROM archive.{table} WHERE {condition}").fetchone()[0]
+                if live != copied:
+                    raise Exception(f"Archive copy of {table} is incomplete ({copied} of {live} rows); nothing was removed.")
+            step(2)
+
+            # Phase 2: carry totals forward and remove the rows from the live book
+            dates = conn.execute("""
+                SELECT MIN(d), MAX(d) FROM (
+                    SELECT date AS d FROM main.invoices WHERE id IN (SELECT id FROM temp.archive_invoice_ids)
+                    UNION ALL SELECT date FROM main.bills WHERE id IN (SELECT id FROM temp.archive_bill_ids)
+                    UNION ALL SELECT date FROM main.payments WHERE id IN (SELECT id FROM temp.archive_payment_ids)
+                    UNION ALL SELECT purchase_date FROM main.stock_batches WHERE id IN (SELECT id FROM temp.archive_batch_ids)
+                )
+            """).fetchone()
+            _carry_forward(conn, fiscal_year)
+            _raise_number_floors(conn)
+            conn.execute("""
+                INSERT INTO main.archived_years (fiscal_year, path, first_date, last_date, invoices, bills, payments, stock_batches)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (fiscal_year) DO UPDATE SET
+                    first_date = MIN(COALESCE(first_date, excluded.first_date), COALESCE(excluded.first_date, first_date)),
+                    last_date = MAX(COALESCE(last_date, excluded.last_date), COALESCE(excluded.last_date, last_date)),
+                    invoices = invoices + excluded.invoices,
+                    bills = bills + excluded.bills,
+                    payments = payments + excluded.payments,
+                    stock_batches = stock_batches + excluded.stock_batches,
+                    archived_at = CURRENT_TIMESTAMP
+            """, (fiscal_year, os.path.basename(path), dates[0], dates[1], counts['invoices'], counts['bills'],
+                  counts['payments'], counts['stock_batches']))
+            # One audit row for the whole move instead of one per deleted row
+            conn.execute(*audit.context_query(suspended=True))
+            conn.execute(*audit.record_query('archive', fiscal_year, 'A', counts))
+            # Children before parents
+            for table, condition in reversed(_ARCHIVE_SELECTION):
+                conn.execute(f"DELETE FROM main.{table} WHERE {condition}")
+            conn.execute("UPDATE audit_context SET suspended = 0 WHERE id = 1")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    if progress_callback:
+        progress_callback(total_steps, total_steps)
+    return dict(counts, fiscal_year=fiscal_year, path=path, seconds=time.perf_counter() - started)
+
+
+def open_history_connection(start_date=None, end_date=None):
+    """
+    Returns a connection with the archives covering start_date..end_date
+    attached and TEMP views history_<table> (for every table in HISTORY_TABLES)
+    that UNION ALL the live rows with the archived ones.
+
+    Archives outside the range are not attached, so reports on recent dates
+    only read the live database. The caller closes the connection.
+    """
+    conn = get_connection()
+    try:
+        try:
+            archives = conn.execute("""
+                SELECT fiscal_year FROM archived_years
+                WHERE (? IS NULL OR last_date >= ?) AND (? IS NULL OR first_date <= ?)
+                ORDER BY fiscal_year
+            """, (start_date, start_date, end_date, end_date)).fetchall()
+        except sqlite3.OperationalError:
+            # Database not migrated yet, so nothing has been archived
+            archives = []
+
+        try:
+            limit = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+        except AttributeError:
+            limit = DEFAULT_ATTACH_LIMIT
+        if len(archives) > limit:
+            raise Exception(f"This report covers {len(archives)} archived years; at most {limit} can be read at once. "
+                            "Please choose a shorter date range.")
+
+        attached = []
+        for row in archives:
+            path = archive_path(row['fiscal_year'])
+            if not os.path.exists(path):
+                print(f"Warning: Archive for {fiscal_year_label(row['fiscal_year'])} not found at {path}")
+                continue
+            schema = f"fy{row['fiscal_year']}"
+            conn.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+            attached.append(schema)
+
+        for table in HISTORY_TABLES:
+            columns = _table_columns(conn, 'main', table)
+            selects = [f"SELECT {', '.join(columns)} FROM main.{table}"]
+            for schema in attached:
+                available = set(_table_columns(conn, schema, table))
+                if available:
+                    # Archives made before a migration lack its columns
+                    select_list = ", ".join(c if c in available else f"NULL AS {c}" for c in columns)
+                    selects.append(f"SELECT {select_list} FROM {schema}.{table}")
+            conn.execute(f"CREATE TEMP VIEW history_{table} AS " + " UNION ALL ".join(selects))
+        return conn
+    except Exception:
+        conn.close()
+        raise
+
+
+@remotable()
+def execute_history_query(query, params=(), start_date=None, end_date=None):
+    """Runs a read query that uses the history_<table> views (see open_history_connection)."""
+    conn = open_history_connection(start_date, end_date)
+    try:
+        started = time.perf_counter() if query_stats.enabled else None
+        rows = conn.execute(query, params).fetchall()
+        if started is not None:
+            query_stats.record(query, time.perf_counter() - started, len(rows))
+        return rows
+    finally:
+        conn.close()
+
+
+def iter_history_query(query, params=(), start_date=None, end_date=None, batch_size=500):
+    """Streaming version of execute_history_query, like iter_read_query."""
+    if get_remote() is not None:
+        yield from execute_history_query(query, params, start_date, end_date)
+        return
+    conn = open_history_connection(start_date, end_date)
+    instrumented = query_stats.enabled
+    elapsed, rows = 0.0, 0
+    try:
+        started = time.perf_counter()
+        cursor = conn.execute(query, params)
+        elapsed += time.perf_counter() - started
+        while True:
+            started = time.perf_counter()
+            batch = cursor.fetchmany(batch_size)
+            elapsed += time.perf_counter() - started
+            if not batch:
+                break
+            rows += len(batch)
+            for row in batch:
+                yield row
+    finally:
+        conn.close()
+        if instrumented:
+            query_stats.record(query, elapsed, rows)
+
+
+def get_archived_monthly_totals(start_month=None, end_month=None):
+    """Returns {'YYYY-MM': totals dict} of the carried-forward archive totals."""
+    try:
+        rows = execute_read_query("""
+            SELECT month, SUM(sales) AS sales, SUM(purchases) AS purchases,
+                   SUM(output_tax) AS output_tax, SUM(input_tax) AS input_tax,
+                   SUM(cash_in) AS cash_in, SUM(cash_out) AS cash_out
+            FROM archived_totals
+            WHERE (? IS NULL OR month >= ?) AND (? IS NULL OR month <= ?)
+            GROUP BY month
+        """, (start_month, start_month, end_month, end_month))
+    except sqlite3.OperationalError:
+        return {}
+    return {row['month']: dict(row) for row in rows}
@@ -0,0 +1,94 @@
+import contextlib
+import functools
+import threading
+from database import db
+
+# The modules layer normally runs in this process against the local database.
+# After use_remote(), calls to the functions marked @remotable go to a
+# LedgerPro server instead (server/app.py), which runs them against the
+# database it hosts, and so do the query helpers of database.db that pages
+# call with their own SQL. Callers import and call the functions the same
+# way in both modes.
+
+# 'invoice.create_invoice' -> (undecorated function, whether it writes)
+REGISTRY = {}
+
+_backend = None
+
+# Set on threads running calls for the server, so the functions those calls
+# reach stay local even in a process that is itself a client
+_serving = threading.local()
+
+
+def remotable(write=False):
+    """
+    Marks a modules-layer function as callable through the server. write=True
+    runs it on the writer thread of the database write queue when one is
+    running (see database.db.WriteQueue), here or on the server, so all of
+    its writes share one group commit; reads run in parallel.
+    """
+    def decorate(fn):
+        name = f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__name__}"
+        REGISTRY[name] = (fn, write)
+
+        @functools.wraps(fn)
+        def call(*args, **kwargs):
+            backend = _thread_backend()
+            if backend is None:
+                writer = db.get_write_queue() if write else None
+                if writer is not None:
+                    return writer.run(fn, *args, **kwargs)
+                return fn(*args, **kwargs)
+            return backend.call(name, args, kwargs)
+        return call
+    return decorate
+
+
+def _thread_backend():
+    if getattr(_serving, 'active', False):
+        return None
+    return _backend
+
+
+@contextlib.contextmanager
+def serving():
+    """Runs the block in this process even while a backend is in use. Used by the server."""
+    _serving.active = True
+    try:
+        yield
+    finally:
+        _serving.active = False
+
+
+def run_local(name, args=(), kwargs=None):
+    """Runs the registered function name in this process. Used by the server."""
+    fn, _ = REGISTRY[name]
+    with serving():
+        return fn(*args, **(kwargs or {}))
+
+
+def use_remote(backend):
+    """Sends every @remotable call to backend (a server.client.RemoteBackend)."""
+    global _backend
+    _backend = backend
+    db.set_remote_resolver(_thread_backend)
+
+
+def use_local():
+    """Runs @remotable calls in this process again."""
+    global _backend
+    _backend = None
+    db.set_remote_resolver(None)
+
+
+def get_backend():
+    """The remote backend in use, or None when running locally."""
+    return _backend
+
+
+# The query helpers of database.db, which forward themselves while a backend
+# is in use, so pages running their own SQL read and write the server's book
+for _name, _write in (('execute_read_query', False), ('execute_write_query', True),
+                      ('execute_transaction', True), ('execute_many_transaction', True),
+                      ('execute_versioned_transaction', True)):
+    REGISTRY[f"db.{_name}"] = (getattr(db, _name), _write)
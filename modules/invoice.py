@@ -1,8 +1,16 @@
-from database.db import execute_read_query, execute_transaction, execute_write_query
+from database.db import execute_read_query, execute_transaction, execute_write_query, execute_versioned_transaction
+from modules.backend import remotable
 from modules.gst import calculate_gst
-from modules.stock_fifo import reduce_stock_fifo, add_stock
+from modules.stock_fifo import reduce_stock, add_stock, get_return_rate
+from modules.archive import get_archived_number_floor
+from modules.period_close import check_period_open
 import datetime
 
+def _document_date(table, doc_id):
+    rows = execute_read_query(f"SELECT date FROM {table} WHERE id = ?", (doc_id,))
+    return rows[0]['date'] if rows else None
+
+@remotable()
 def generate_invoice_number():
     """Generates a new invoice number."""
     settings = execute_read_query("SELECT value FROM settings WHERE key='invoice_prefix'")
@@ -19,10 +27,12 @@ def generate_invoice_number():
             num = int(suffix)
             if num > max_num:
                 max_num = num
-    next_num = max_num + 1
+    # Numbers of archived years are not in the live table any more
+    next_num = max(max_num, get_archived_number_floor('invoice')) + 1
         
     return f"{prefix}{next_num:04d}"
 
+@remotable(write=True)
 def create_invoice(data):
     """
     Creates a new invoice, updates stock, and saves to database.
@@ -35,6 +45,7 @@ def create_invoice(data):
     """
     customer_id = data['customer_id']
     date = data['date']
+    check_period_open(date)
     due_date = data.get('due_date')
     notes = data.get('notes', '')
     
@@ -156,14 +167,22 @@ def create_invoice(data):
         
     # Reduce stock
     for item_id, qty in stock_reductions:
-        reduce_stock_fifo(item_id, qty)
+        reduce_stock(item_id, qty, date, 'sale', 'invoice', invoice_id)
         
     return invoice_id
 
+@remotable(write=True)
 def update_invoice(invoice_id, data):
     """
     Updates an existing invoice and adjusts stock accordingly.
+
+    If data carries the 'version' the invoice was loaded with, nothing is
+    written when someone else saved it since: EditConflict is raised before
+    the header, lines or stock change.
     """
+    # Neither the old nor the new date may be in a closed period
+    check_period_open(_document_date('invoices', invoice_id), data['date'])
+    
     # 1. Get existing items to calculate stock difference
     old_items_query = "SELECT item_id, quantity FROM invoice_items WHERE invoice_id = ?"
     old_items = execute_read_query(old_items_query, (invoice_id,))
@@ -196,18 +215,7 @@ def update_invoice(invoice_id, data):
         if item_id not in new_items_map:
             to_add.append((item_id, old_qty))
             
-    # 4. Apply Stock Changes
-    for item_id, qty in to_reduce:
-        reduce_stock_fifo(item_id, qty)
-        
-    for item_id, qty in to_add:
-        # We need purchase price to add back. 
-        # Since we don't know the exact batch cost, use current purchase_price from items table
-        item_row = execute_read_query("SELECT purchase_price FROM items WHERE id=?", (item_id,))
-        rate = item_row[0]['purchase_price'] if item_row else 0
-        add_stock(item_id, qty, rate, data['date'])
-        
-    # 5. Update Invoice Record
+    # 4. Update Invoice Record
     # Calculate totals first (same logic as create_invoice)
     # ... (Reuse logic or refactor. For now, copy-paste logic for safety and speed)
     customer_id = data['customer_id']
@@ -272,12 +280,9 @@ def update_invoice(invoice_id, data):
         data.get('status', 'Due'), data.get('attachment_path', ''), data.get('custom_fields', '{}'),
         invoice_id
     )
-    execute_write_query(inv_query, inv_params)
     
-    # 6. Delete old items and insert new
-    execute_write_query("DELETE FROM invoice_items WHERE invoice_id=?", (invoice_id,))
-    
-    item_queries = []
+    # 5. Replace the items together with the header
+    queries = [(inv_query, inv_params), ("DELETE FROM invoice_items WHERE invoice_id=?", (invoice_id,))]
     for item_data in invoice_items_data:
         q = """
             INSERT INTO invoice_items (invoice_id, item_id, quantity, rate, discount_percent, gst_percent, amount)
@@ -285,13 +290,26 @@ def update_invoice(invoice_id, data):
         """
         p = (invoice_id, item_data['item_id'], item_data['quantity'], item_data['rate'], 
              item_data['discount_percent'], item_data['gst_percent'], item_data['amount'])
-        item_queries.append((q, p))
+        queries.append((q, p))
         
-    if item_queries:
-        execute_transaction(item_queries)
+    if data.get('version') is not None:
+        execute_versioned_transaction('invoices', {invoice_id: data['version']}, queries)
+    else:
+        execute_transaction(queries)
+    
+    # 6. Apply Stock Changes, after the version check so they never come from a stale read
+    for item_id, qty in to_reduce:
+        reduce_stock(item_id, qty, data['date'], 'invoice_edit', 'invoice', invoice_id)
         
+    for item_id, qty in to_add:
+        # We need a cost to add back. 
+        # Since we don't know the exact batch cost, use the purchase price (average cost for average items)
+        rate = get_return_rate(item_id)
+        add_stock(item_id, qty, rate, data['date'], kind='invoice_edit', reference_type='invoice', reference_id=invoice_id)
+    
     return invoice_id
 
+@remotable()
 def generate_bill_number():
     """Generates a new bill number."""
     # Get prefix from settings
@@ -308,9 +326,11 @@ def generate_bill_number():
             next_num = 1
     else:
         next_num = 1
+    next_num = max(next_num, get_archived_number_floor('bill') + 1)
         
     return f"{prefix}{next_num:04d}"
 
+@remotable(write=True)
 def create_bill(data):
     """
     Creates a new bill (purchase), updates stock, and saves to database.
@@ -323,6 +343,7 @@ def create_bill(data):
     """
     vendor_id = data['vendor_id']
     date = data['date']
+    check_period_open(date)
     due_date = data.get('due_date')
     status = data.get('status', 'Draft')
     
@@ -412,14 +433,22 @@ def create_bill(data):
         
     # Add stock
     for item_id, qty, rate in stock_additions:
-        add_stock(item_id, qty, rate, date, vendor_id)
+        add_stock(item_id, qty, rate, date, vendor_id, 'purchase', 'bill', bill_id)
         
     return bill_id
 
+@remotable(write=True)
 def update_bill(bill_id, data):
     """
     Updates an existing bill and adjusts stock accordingly.
+
+    If data carries the 'version' the bill was loaded with, nothing is
+    written when someone else saved it since: EditConflict is raised before
+    the header, lines or stock change.
     """
+    # Neither the old nor the new date may be in a closed period
+    check_period_open(_document_date('bills', bill_id), data['date'])
+    
     # 1. Get existing items to calculate stock difference
     old_items_query = "SELECT item_id, quantity FROM bill_items WHERE bill_id = ?"
     old_items = execute_read_query(old_items_query, (bill_id,))
@@ -452,14 +481,7 @@ def update_bill(bill_id, data):
         if item_id not in new_items_map:
             to_reduce.append((item_id, old_qty))
             
-    # 4. Apply Stock Changes
-    for item_id, qty, rate in to_add:
-        add_stock(item_id, qty, rate, data['date'], data['vendor_id'])
-        
-    for item_id, qty in to_reduce:
-        reduce_stock_fifo(item_id, qty)
-        
-    # 5. Update Bill Record
+    # 4. Update Bill Record
     vendor_id = data['vendor_id']
     subtotal = 0.0
     total_tax = 0.0
@@ -510,12 +532,9 @@ def update_bill(bill_id, data):
         data.get('custom_fields', '{}'),
         bill_id
     )
-    execute_write_query(bill_query, bill_params)
     
-    # 6. Delete old items and insert new
-    execute_write_query("DELETE FROM bill_items WHERE bill_id=?", (bill_id,))
-    
-    item_queries = []
+    # 5. Replace the items together with the header
+    queries = [(bill_query, bill_params), ("DELETE FROM bill_items WHERE bill_id=?", (bill_id,))]
     for item_data in bill_items_data:
         q = """
             INSERT INTO bill_items (bill_id, item_id, quantity, rate, gst_percent, amount)
@@ -523,18 +542,30 @@ def update_bill(bill_id, data):
         """
         p = (bill_id, item_data['item_id'], item_data['quantity'], item_data['rate'], 
              item_data['gst_percent'], item_data['amount'])
-        item_queries.append((q, p))
+        queries.append((q, p))
         
-    if item_queries:
-        execute_transaction(item_queries)
+    if data.get('version') is not None:
+        execute_versioned_transaction('bills', {bill_id: data['version']}, queries)
+    else:
+        execute_transaction(queries)
+    
+    # 6. Apply Stock Changes, after the version check so they never come from a stale read
+    for item_id, qty, rate in to_add:
+        add_stock(item_id, qty, rate, data['date'], data['vendor_id'], 'bill_edit', 'bill', bill_id)
         
+    for item_id, qty in to_reduce:
+        reduce_stock(item_id, qty, data['date'], 'bill_edit', 'bill', bill_id)
+    
     return bill_id
 
+@remotable(write=True)
 def delete_invoice(invoice_id):
     """
     Deletes an invoice and reverses stock changes.
     Returns True if successful, raises Exception if failed.
     """
+    check_period_open(_document_date('invoices', invoice_id))
+    
     # 1. Check for payments
     payments = execute_read_query("SELECT id FROM payments WHERE invoice_id = ?", (invoice_id,))
     if payments:
@@ -547,11 +578,11 @@ def delete_invoice(invoice_id):
     
     # Reverse Stock: Add back the quantity
     for item in items:
-        # We need a rate for the batch. Let's look up the item's current purchase price.
-        item_def = execute_read_query("SELECT purchase_price FROM items WHERE id = ?", (item['item_id'],))
-        rate = item_def[0]['purchase_price'] if item_def else 0.0
+        # We need a rate for the batch: the purchase price, or the average cost for average items.
+        rate = get_return_rate(item['item_id'])
         
-        add_stock(item['item_id'], item['quantity'], rate, datetime.date.today().strftime("%Y-%m-%d"), None)
+        add_stock(item['item_id'], item['quantity'], rate, datetime.date.today().strftime("%Y-%m-%d"), None,
+                  'invoice_deleted', 'invoice', invoice_id)
         
     # 4. Delete Records
     queries.append(("DELETE FROM invoice_items WHERE invoice_id = ?", (invoice_id,)))
@@ -560,10 +591,13 @@ def delete_invoice(invoice_id):
     execute_transaction(queries)
     return True
 
+@remotable(write=True)
 def delete_bill(bill_id):
     """
     Deletes a bill and reverses stock changes (reduces stock).
     """
+    check_period_open(_document_date('bills', bill_id))
+    
     # 1. Check for payments
     payments = execute_read_query("SELECT id FROM payments WHERE bill_id = ?", (bill_id,))
     if payments:
@@ -574,7 +608,8 @@ def delete_bill(bill_id):
     
     # 3. Reduce stock (as we are cancelling a purchase)
     for item in items:
-        reduce_stock_fifo(item['item_id'], item['quantity'])
+        reduce_stock(item['item_id'], item['quantity'], kind='bill_deleted',
+                          reference_type='bill', reference_id=bill_id)
         
     # 4. Delete Records
     queries = []
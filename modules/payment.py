@@ -1,218 +1,103 @@
 
-from database.db import execute_read_query, execute_write_query, execute_transaction
+from database.db import execute_read_query, execute_many_transaction
+from modules.backend import remotable
+from modules.archive import get_archived_number_floor
+from modules.period_close import check_period_open
 import datetime
 
+# How payments link a party to its documents
+PARTIES = {
+    'customer': {'table': 'invoices', 'number_col': 'invoice_number', 'party_col': 'customer_id',
+                 'target_col': 'invoice_id', 'doc_type': 'invoice'},
+    'vendor': {'table': 'bills', 'number_col': 'bill_number', 'party_col': 'vendor_id',
+               'target_col': 'bill_id', 'doc_type': 'bill'},
+}
+
+# Document ids per balance query, well under SQLite's bound parameter limit
+BALANCE_CHUNK = 500
+
+PAYMENT_COLUMNS = (
+    'invoice_id', 'bill_id', 'customer_id', 'vendor_id', 'amount', 'date', 'method', 'notes',
+    'payment_number', 'reference', 'deposit_to', 'bank_charges', 'tax_deducted', 'tax_account',
+    'attachment_path', 'custom_fields', 'send_thank_you',
+)
+INSERT_PAYMENT = (f"INSERT INTO payments ({', '.join(PAYMENT_COLUMNS)}) "
+                  f"VALUES ({', '.join('?' * len(PAYMENT_COLUMNS))})")
+
+def _get_unpaid_documents(party_type, party_id):
+    cfg = PARTIES[party_type]
+    query = f"""
+        SELECT d.id, d.{cfg['number_col']}, d.date, d.due_date, IFNULL(d.grand_total, 0) as grand_total, d.status,
+               IFNULL((SELECT SUM(p.amount) FROM payments p WHERE p.{cfg['target_col']} = d.id), 0) as amount_paid
+        FROM {cfg['table']} d
+        WHERE d.{cfg['party_col']} = ? AND d.status NOT IN ('Paid', 'Draft', 'Cancelled')
+        ORDER BY d.date ASC
+    """
+    results = []
+    for row in execute_read_query(query, (party_id,)):
+        doc = dict(row)
+        doc['balance_due'] = doc['grand_total'] - doc['amount_paid']
+        # Allow small float tolerance; a zero balance means the document is paid
+        if doc['balance_due'] > 0.01:
+            results.append(doc)
+    return results
+
+@remotable()
 def get_unpaid_invoices(customer_id):
     """
     Returns a list of unpaid or partially paid invoices for a customer.
     Calculates the balance due for each invoice.
     Excludes Draft and Paid invoices.
     """
-    query = """
-        SELECT i.id, i.invoice_number, i.date, i.due_date, IFNULL(i.grand_total, 0) as grand_total, i.status
-        FROM invoices i
-        WHERE i.customer_id = ? AND i.status NOT IN ('Paid', 'Draft', 'Cancelled')
-        ORDER BY i.date ASC
-    """
-    invoices = execute_read_query(query, (customer_id,))
-    
-    results = []
-    for inv in invoices:
-        paid_query = "SELECT SUM(amount) FROM payments WHERE invoice_id = ?"
-        paid_res = execute_read_query(paid_query, (inv['id'],))
-        amount_paid = paid_res[0][0] if paid_res and paid_res[0][0] else 0.0
-        
-        balance_due = inv['grand_total'] - amount_paid
-        
-        # Show even if balance is 0 but status is not Paid? 
-        # No, if balance is 0, it should be paid. 
-        # But allow small float tolerance.
-        if balance_due > 0.01:
-            inv_data = dict(inv)
-            inv_data['amount_paid'] = amount_paid
-            inv_data['balance_due'] = balance_due
-            results.append(inv_data)
-            
-    return results
+    return _get_unpaid_documents('customer', customer_id)
 
+@remotable()
 def get_unpaid_bills(vendor_id):
     """
     Returns a list of unpaid or partially paid bills for a vendor.
     Calculates the balance due for each bill.
     Excludes Draft and Paid bills.
     """
-    query = """
-        SELECT b.id, b.bill_number, b.date, b.due_date, IFNULL(b.grand_total, 0) as grand_total, b.status
-        FROM bills b
-        WHERE b.vendor_id = ? AND b.status NOT IN ('Paid', 'Draft', 'Cancelled')
-        ORDER BY b.date ASC
+    return _get_unpaid_documents('vendor', vendor_id)
+
+@remotable()
+def get_document_balances(party_type, doc_ids):
+    """
+    Returns {doc_id: {'grand_total', 'amount_paid'}} for the given invoices
+    ('customer') or bills ('vendor'), in one grouped query per chunk of ids.
+    Ids that do not exist are left out.
     """
-    bills = execute_read_query(query, (vendor_id,))
-    
-    results = []
-    for bill in bills:
-        paid_query = "SELECT SUM(amount) FROM payments WHERE bill_id = ?"
-        paid_res = execute_read_query(paid_query, (bill['id'],))
-        amount_paid = paid_res[0][0] if paid_res and paid_res[0][0] else 0.0
-        
-        balance_due = bill['grand_total'] - amount_paid
-        
-        if balance_due > 0.01:
-            b_data = dict(bill)
-            b_data['amount_paid'] = amount_paid
-            b_data['balance_due'] = balance_due
-            results.append(b_data)
-            
-    return results
+    cfg = PARTIES[party_type]
+    ids = list(dict.fromkeys(doc_ids))
+    balances = {}
+    for start in range(0, len(ids), BALANCE_CHUNK):
+        chunk = ids[start:start + BALANCE_CHUNK]
+        rows = execute_read_query(f"""
+            SELECT d.id, IFNULL(d.grand_total, 0) as grand_total, IFNULL(SUM(p.amount), 0) as amount_paid
+            FROM {cfg['table']} d
+            LEFT JOIN payments p ON p.{cfg['target_col']} = d.id
+            WHERE d.id IN ({', '.join('?' * len(chunk))})
+            GROUP BY d.id
+        """, chunk)
+        for row in rows:
+            balances[row['id']] = {'grand_total': row['grand_total'], 'amount_paid': row['amount_paid']}
+    return balances
 
+@remotable()
 def get_customer_credits(customer_id):
     """Returns the total available credits (unallocated payments) for a customer."""
     query = "SELECT SUM(amount) FROM payments WHERE customer_id = ? AND invoice_id IS NULL"
     res = execute_read_query(query, (customer_id,))
     return res[0][0] if res and res[0][0] else 0.0
 
+@remotable()
 def get_vendor_credits(vendor_id):
     """Returns the total available credits (unallocated payments) for a vendor."""
     query = "SELECT SUM(amount) FROM payments WHERE vendor_id = ? AND bill_id IS NULL"
     res = execute_read_query(query, (vendor_id,))
     return res[0][0] if res and res[0][0] else 0.0
 
-def consume_customer_credits(customer_id, amount_needed, invoice_id, transaction_queries):
-    """
-    Generates queries to consume credits for a specific invoice.
-    Appends queries to the provided list.
-    """
-    # Fetch unallocated payments (FIFO)
-    query = "SELECT id, amount FROM payments WHERE customer_id = ? AND invoice_id IS NULL ORDER BY date ASC, id ASC"
-    credits = execute_read_query(query, (customer_id,))
-    
-    remaining_needed = amount_needed
-    
-    for credit in credits:
-        if remaining_needed <= 0.001:
-            break
-            
-        credit_id = credit['id']
-        credit_amount = credit['amount']
-        
-        to_use = min(remaining_needed, credit_amount)
-        
-        # 1. Reduce the credit amount
-        new_credit_amount = credit_amount - to_use
-        if new_credit_amount < 0.01:
-            # Delete if fully used (or maybe keep as 0? No, delete or mark used. Let's delete or set to 0. 
-            # Deleting is cleaner for "unallocated", but keeping history is good.
-            # But the schema relies on invoice_id IS NULL.
-            # If we set invoice_id, it becomes allocated.
-            # So, if fully used, we can just Update invoice_id = invoice_id?
-            # But we might be splitting it across multiple invoices.
-            # So we must SPLIT the row.
-            
-            # Actually, standard practice:
-            # Update the existing row to have the invoice_id and amount = to_use.
-            # If there was remaining, create a new row with remaining.
-            # But we are iterating.
-            
-            # Case 1: Fully used for this invoice (Exact match)
-            # Update invoice_id.
-            
-            # Case 2: Partially used (Credit > Needed)
-            # Split:
-            # Row A (Original ID): Update amount = Needed, invoice_id = invoice_id.
-            # Row B (New): amount = Remaining, invoice_id = NULL.
-            
-            # Case 3: Fully used but less than needed (Credit < Needed)
-            # Update invoice_id.
-            
-            transaction_queries.append((
-                "UPDATE payments SET amount = ?, invoice_id = ? WHERE id = ?",
-                (to_use, invoice_id, credit_id)
-            ))
-            
-            # If we split (Credit > Needed), we need to re-insert the remainder
-            if new_credit_amount > 0.001:
-                # We need to copy other fields. Since we can't easily fetch-and-insert in one query without complexity,
-                # we rely on the fact we are in a transaction generator.
-                # We need to read the row details first? We already have ID.
-                # Let's assume we can copy basic fields or we need to fetch them.
-                # The 'credits' query only fetched id, amount.
-                # We should fetch all.
-                pass 
-        else:
-             # Fully used
-             transaction_queries.append((
-                "UPDATE payments SET invoice_id = ? WHERE id = ?",
-                (invoice_id, credit_id)
-            ))
-             
-        remaining_needed -= to_use
-
-    # Wait, the logic above is slightly flawed because I need full row details to split.
-    # Let's refine.
-
-def consume_credits(party_type, party_id, amount_needed, target_id, transaction_queries):
-    """
-    Generates queries to consume credits (customer or vendor).
-    party_type: 'customer' or 'vendor'
-    target_id: invoice_id or bill_id
-    """
-    id_col = "customer_id" if party_type == 'customer' else "vendor_id"
-    target_col = "invoice_id" if party_type == 'customer' else "bill_id"
-    
-    # Fetch unallocated payments (FIFO) with full details
-    query = f"SELECT * FROM payments WHERE {id_col} = ? AND {target_col} IS NULL ORDER BY date ASC, id ASC"
-    credits = execute_read_query(query, (party_id,))
-    
-    remaining_needed = amount_needed
-    
-    for credit in credits:
-        if remaining_needed <= 0.001:
-            break
-            
-        credit_id = credit['id']
-        credit_amount = credit['amount']
-        
-        to_use = min(remaining_needed, credit_amount)
-        
-        if abs(credit_amount - to_use) < 0.01:
-            # Case: Credit Amount matches exactly or is less than needed (Fully consumed)
-            # Just link it to the target
-            transaction_queries.append((
-                f"UPDATE payments SET {target_col} = ? WHERE id = ?",
-                (target_id, credit_id)
-            ))
-        else:
-            # Case: Credit Amount > Needed (Partial use)
-            # 1. Update original row to be the "used" portion (link to target, set amount = to_use)
-            transaction_queries.append((
-                f"UPDATE payments SET amount = ?, {target_col} = ? WHERE id = ?",
-                (to_use, target_id, credit_id)
-            ))
-            
-            # 2. Insert new row for the remainder (unallocated)
-            remainder = credit_amount - to_use
-            # Copy all fields except id, amount, and target_col (which is NULL)
-            # We use the values from 'credit' dict
-            # sqlite3.Row doesn't support .get(), so convert to dict or use keys check
-            credit_dict = dict(credit)
-            
-            transaction_queries.append((
-                """INSERT INTO payments (
-                    invoice_id, bill_id, customer_id, vendor_id, amount, date, method, notes, 
-                    payment_number, reference, deposit_to, bank_charges, 
-                    tax_deducted, tax_account, attachment_path, custom_fields, send_thank_you
-                   ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                (
-                    None, None, 
-                    credit['customer_id'], credit['vendor_id'], 
-                    remainder, credit['date'], credit['method'], credit['notes'],
-                    credit['payment_number'], credit['reference'], credit['deposit_to'], credit['bank_charges'],
-                    credit['tax_deducted'], credit['tax_account'], credit['attachment_path'], credit['custom_fields'], credit_dict.get('send_thank_you', 0)
-                )
-            ))
-            
-        remaining_needed -= to_use
-
+@remotable()
 def generate_payment_number():
     """Generates a new payment number."""
     settings = execute_read_query("SELECT value FROM settings WHERE key='payment_prefix'")
@@ -227,281 +112,171 @@ def generate_payment_number():
             next_num = 1
     else:
         next_num = 1
+    next_num = max(next_num, get_archived_number_floor('payment') + 1)
         
     return f"{prefix}{next_num:04d}"
 
-def save_payment(data):
+def _payment_row(values, **overrides):
+    row = dict(values, **overrides)
+    return tuple(row.get(col) for col in PAYMENT_COLUMNS)
+
+@remotable(write=True)
+def allocate_payment(party_type, data, amount_received, credits_only=False):
     """
-    Saves a payment against invoices and updates invoice statuses.
-    Handles unallocated amounts as credits (invoice_id=NULL).
+    Allocation engine behind customer receipts, vendor payments and credit
+    application.
+
+    party_type: 'customer' or 'vendor'
+    data: the party id ('customer_id' / 'vendor_id'), 'allocations' as
+        [{'invoice_id' or 'bill_id': id, 'amount': x}], 'use_credits' and
+        the payment details (date, method, reference, bank charges, ...).
+    amount_received: new money; whatever the allocations leave over is kept
+        as an unallocated credit.
+    credits_only: allocations must be covered by open credits alone.
+
+    Document balances and the party's open credits are read in two queries,
+    credits are applied oldest first in memory, and every payment row and
+    status update is written with executemany in a single transaction.
+    Returns a summary of what was allocated.
     """
-    allocations = data.get('allocations', [])
-    customer_id = data.get('customer_id')
-    amount_received = data.get('amount_received', 0.0)
-    use_credits = data.get('use_credits', False)
-    
+    cfg = PARTIES[party_type]
+    target_col = cfg['target_col']
+    party_id = data.get(cfg['party_col'])
+    allocations = [a for a in data.get('allocations', []) if a['amount'] > 0]
+    use_credits = credits_only or data.get('use_credits', False)
+
     payment_date = data.get('date', datetime.date.today().strftime("%Y-%m-%d"))
-    method = data.get('method', 'Cash')
-    reference = data.get('reference', '')
-    notes = data.get('notes', '')
-    
-    payment_number = data.get('payment_number') or generate_payment_number()
-    deposit_to = data.get('deposit_to', '')
-    bank_charges = data.get('bank_charges', 0.0)
-    tax_deducted = data.get('tax_deducted', 0.0)
-    tax_account = data.get('tax_account', '')
-    attachment_path = data.get('attachment_path', '')
-    send_thank_you = 1 if data.get('send_thank_you') else 0
-    custom_fields = data.get('custom_fields', '{}')
-    
-    transaction_queries = []
-    
-    # Calculate available credits if requested
-    available_credits = 0.0
+    check_period_open(payment_date)
+    cash_values = {
+        cfg['party_col']: party_id,
+        'date': payment_date,
+        'method': data.get('method', 'Cash'),
+        'notes': data.get('notes', ''),
+        'payment_number': data.get('payment_number') or generate_payment_number(),
+        'reference': data.get('reference', ''),
+        'deposit_to': data.get('deposit_to', ''),
+        'bank_charges': 0.0,
+        'tax_deducted': 0.0,
+        'tax_account': '',
+        'attachment_path': data.get('attachment_path', ''),
+        'custom_fields': data.get('custom_fields', '{}'),
+        'send_thank_you': 1 if data.get('send_thank_you') else 0,
+    }
+    # Bank charges and tax deducted belong to the first row of new money
+    charges = {
+        'bank_charges': data.get('bank_charges', 0.0),
+        'tax_deducted': data.get('tax_deducted', 0.0),
+        'tax_account': data.get('tax_account', ''),
+    }
+
+    balances = get_document_balances(party_type, [a[target_col] for a in allocations])
+    credits = []
     if use_credits:
-        available_credits = get_customer_credits(customer_id)
-        
-    total_allocated = 0.0
-    credits_used_total = 0.0
-    
-    # Process allocations
-    for i, alloc in enumerate(allocations):
-        invoice_id = alloc['invoice_id']
+        rows = execute_read_query(
+            f"SELECT * FROM payments WHERE {cfg['party_col']} = ? AND {target_col} IS NULL ORDER BY date ASC, id ASC",
+            (party_id,)
+        )
+        credits = [{'row': dict(row), 'left': row['amount'], 'pieces': []} for row in rows]
+
+    inserts = []
+    paid_ids = []
+    next_credit = 0
+    from_credits = from_cash = 0.0
+    for alloc in allocations:
+        target_id = alloc[target_col]
         amount = alloc['amount']
-        
-        if amount <= 0:
+
+        needed = amount
+        while needed > 0.001 and next_credit < len(credits):
+            credit = credits[next_credit]
+            to_use = min(needed, credit['left'])
+            credit['left'] -= to_use
+            needed -= to_use
+            from_credits += to_use
+            if credit['left'] < 0.01:
+                # Fully consumed: a sub-cent remainder stays with the last piece
+                to_use += credit['left']
+                credit['left'] = 0.0
+                next_credit += 1
+            credit['pieces'].append((target_id, to_use))
+
+        if needed > 0.001:
+            if credits_only:
+                raise Exception("Allocations exceed the available credits.")
+            inserts.append(_payment_row(cash_values, **{target_col: target_id, 'amount': needed}, **charges))
+            charges = {}
+            from_cash += needed
+
+        balance = balances.get(target_id)
+        if balance:
+            balance['amount_paid'] += amount
+            if balance['amount_paid'] >= balance['grand_total'] - 0.01 and (target_id,) not in paid_ids:
+                paid_ids.append((target_id,))
+
+    # Excess new money stays on account as a credit
+    excess = amount_received - from_cash
+    if excess > 0.01 and not credits_only:
+        inserts.append(_payment_row(cash_values, amount=excess, **charges))
+
+    links = []
+    splits = []
+    for credit in credits:
+        if not credit['pieces']:
             continue
-            
-        total_allocated += amount
-        
-        # Determine how much comes from Credit vs New Money
-        amount_from_credit = 0.0
-        if available_credits > 0.001:
-            amount_from_credit = min(amount, available_credits)
-            consume_credits('customer', customer_id, amount_from_credit, invoice_id, transaction_queries)
-            available_credits -= amount_from_credit
-            credits_used_total += amount_from_credit
-            
-        amount_from_cash = amount - amount_from_credit
-        
-        if amount_from_cash > 0.001:
-            current_bank_charges = bank_charges if i == 0 else 0.0
-            current_tax_deducted = tax_deducted if i == 0 else 0.0
-            current_tax_account = tax_account if i == 0 else ''
-                
-            transaction_queries.append((
-                """INSERT INTO payments (
-                    invoice_id, customer_id, amount, date, method, notes, 
-                    payment_number, reference, deposit_to, bank_charges, 
-                    tax_deducted, tax_account, attachment_path, custom_fields, send_thank_you
-                   ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                (
-                    invoice_id, customer_id, amount_from_cash, payment_date, method, notes,
-                    payment_number, reference, deposit_to, current_bank_charges,
-                    current_tax_deducted, current_tax_account, attachment_path, custom_fields, send_thank_you
-                )
-            ))
-        
-        # Update Invoice Status
-        inv_res = execute_read_query("SELECT grand_total FROM invoices WHERE id = ?", (invoice_id,))
-        if not inv_res:
+        row = credit['row']
+        (first_target, first_amount), rest = credit['pieces'][0], credit['pieces'][1:]
+        if not rest and credit['left'] == 0.0:
+            links.append((first_target, row['id']))
             continue
-        grand_total = inv_res[0]['grand_total']
-        
-        paid_res = execute_read_query("SELECT SUM(amount) FROM payments WHERE invoice_id = ?", (invoice_id,))
-        previously_paid = paid_res[0][0] if paid_res and paid_res[0][0] else 0.0
-        
-        # Note: previously_paid might not include the updates we just queued in transaction.
-        # But we are in a transaction block (the function executes queries at end).
-        # Wait, `execute_read_query` reads from DB. The transaction hasn't committed yet.
-        # So `previously_paid` will NOT include current payments.
-        # We need to add `amount` (total allocated for this session) to `previously_paid`.
-        
-        new_total_paid = previously_paid + amount
-        
-        if new_total_paid >= grand_total - 0.01:
-            transaction_queries.append((
-                "UPDATE invoices SET status = 'Paid' WHERE id = ?",
-                (invoice_id,)
-            ))
-            
-    # Handle Excess Amount (New Money only)
-    # Excess is calculated based on what was paid vs what was used from cash
-    # Cash Used = Total Allocated - Credits Used
-    # Excess = Amount Received - Cash Used
-    
-    cash_used = total_allocated - credits_used_total
-    excess_amount = amount_received - cash_used
-    
-    if excess_amount > 0.01:
-        # Only apply bank charges/tax if not applied in allocations (and no credits used? complexity...)
-        # If we used credits, bank charges for *this* payment apply to the cash portion.
-        # If cash portion was 0 (fully credit), then bank charges shouldn't be recorded? 
-        # Or recorded on a 0 amount payment?
-        # Let's assume bank charges apply to the incoming money transaction.
-        
-        apply_charges = (cash_used < 0.001) # If no cash used for allocations, apply here
-        # Actually, if we have allocations, we likely applied charges to the first cash allocation.
-        # If we had allocations but they were all covered by credits, `amount_from_cash` was 0.
-        # So charges were NOT applied.
-        # So we should check if charges were applied.
-        
-        # Simplification: Apply charges to the first cash entry.
-        # If `cash_used` > 0, we already applied charges in the loop (to the first allocation that had cash).
-        # Wait, the loop index `i==0` logic applies to first ALLOCATION.
-        # If first allocation was fully credit, `amount_from_cash` was 0.
-        # We didn't insert a cash payment row.
-        # So charges were NOT applied.
-        
-        # Fix: We need to track if charges were applied.
-        charges_applied = False
-        # (This would require re-looping or smarter logic. For now, let's just apply to excess if not applied).
-        # But we can't easily check inside the loop without state.
-        
-        current_bank_charges = bank_charges if not (total_allocated > credits_used_total) else 0.0
-        # If (Total Allocated > Credits Used), it means we used SOME cash in allocations.
-        # So we assume charges were applied there.
-        # Warning: This is approximate. If allocation 1 was credit, allocation 2 was cash...
-        # My loop: `current_bank_charges = bank_charges if i == 0 else 0.0`
-        # If i=0 was credit, no cash row inserted. i=1 was cash, bank_charges is 0.0.
-        # So charges are LOST.
-        
-        # CORRECT FIX: 
-        # We need to attach charges to the FIRST CASH PAYMENT ROW.
-        # Whether it's an allocation or excess.
-        
-        # Let's revert to a flag strategy in a future refactor or simple fix now:
-        # We can't easily change the loop now without rewriting.
-        # Let's assume for now charges apply if we insert an excess row and haven't used cash yet.
-        
-        current_bank_charges = bank_charges if cash_used < 0.001 else 0.0
-        current_tax_deducted = tax_deducted if cash_used < 0.001 else 0.0
-        current_tax_account = tax_account if cash_used < 0.001 else ''
-        
-        transaction_queries.append((
-            """INSERT INTO payments (
-                invoice_id, customer_id, amount, date, method, notes, 
-                payment_number, reference, deposit_to, bank_charges, 
-                tax_deducted, tax_account, attachment_path, custom_fields, send_thank_you
-               ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-            (
-                None, customer_id, excess_amount, payment_date, method, notes,
-                payment_number, reference, deposit_to, current_bank_charges,
-                current_tax_deducted, current_tax_account, attachment_path, custom_fields, send_thank_you
-            )
-        ))
-            
-    if transaction_queries:
-        execute_transaction(transaction_queries)
+        # The original row keeps the first piece; the other pieces and any
+        # remainder become copies of it without its charges
+        splits.append((first_amount, first_target, row['id']))
+        copy = dict(row, bank_charges=0.0, tax_deducted=0.0, tax_account='')
+        for target_id, piece in rest:
+            inserts.append(_payment_row(copy, **{target_col: target_id, 'amount': piece}))
+        if credit['left'] > 0.0:
+            inserts.append(_payment_row(copy, **{target_col: None, 'amount': credit['left']}))
+
+    operations = [
+        (INSERT_PAYMENT, inserts),
+        (f"UPDATE payments SET {target_col} = ? WHERE id = ?", links),
+        (f"UPDATE payments SET amount = ?, {target_col} = ? WHERE id = ?", splits),
+        (f"UPDATE {cfg['table']} SET status = 'Paid' WHERE id = ?", paid_ids),
+    ]
+    operations = [op for op in operations if op[1]]
+    if operations:
+        execute_many_transaction(operations)
 
+    return {
+        'payment_number': cash_values['payment_number'],
+        'from_credits': from_credits,
+        'from_cash': from_cash,
+        'excess': excess if excess > 0.01 and not credits_only else 0.0,
+        'paid': [doc_id for (doc_id,) in paid_ids],
+    }
+
+@remotable(write=True)
+def save_payment(data):
+    """
+    Saves a payment against invoices and updates invoice statuses.
+    Handles unallocated amounts as credits (invoice_id=NULL).
+    """
+    return allocate_payment('customer', data, data.get('amount_received', 0.0))
+
+@remotable(write=True)
 def save_bill_payment(data):
     """
     Saves a payment against bills and updates bill statuses.
     """
-    allocations = data.get('allocations', [])
-    vendor_id = data.get('vendor_id')
-    amount_paid = data.get('amount_paid', 0.0)
-    use_credits = data.get('use_credits', False)
-    
-    payment_date = data.get('date', datetime.date.today().strftime("%Y-%m-%d"))
-    method = data.get('method', 'Cash')
-    reference = data.get('reference', '')
-    notes = data.get('notes', '')
-    
-    payment_number = data.get('payment_number') or generate_payment_number()
-    deposit_to = data.get('deposit_to', '')
-    bank_charges = data.get('bank_charges', 0.0)
-    tax_deducted = data.get('tax_deducted', 0.0)
-    tax_account = data.get('tax_account', '')
-    attachment_path = data.get('attachment_path', '')
-    custom_fields = data.get('custom_fields', '{}')
-    
-    transaction_queries = []
-    
-    # Calculate available credits if requested
-    available_credits = 0.0
-    if use_credits:
-        available_credits = get_vendor_credits(vendor_id)
-        
-    total_allocated = 0.0
-    credits_used_total = 0.0
-    
-    for i, alloc in enumerate(allocations):
-        bill_id = alloc['bill_id']
-        amount = alloc['amount']
-        
-        if amount <= 0:
-            continue
-            
-        total_allocated += amount
-        
-        # Determine how much comes from Credit vs New Money
-        amount_from_credit = 0.0
-        if available_credits > 0.001:
-            amount_from_credit = min(amount, available_credits)
-            consume_credits('vendor', vendor_id, amount_from_credit, bill_id, transaction_queries)
-            available_credits -= amount_from_credit
-            credits_used_total += amount_from_credit
-            
-        amount_from_cash = amount - amount_from_credit
-        
-        if amount_from_cash > 0.001:
-            current_bank_charges = bank_charges if i == 0 else 0.0
-            current_tax_deducted = tax_deducted if i == 0 else 0.0
-            current_tax_account = tax_account if i == 0 else ''
-                
-            transaction_queries.append((
-                """INSERT INTO payments (
-                    bill_id, vendor_id, amount, date, method, notes, 
-                    payment_number, reference, deposit_to, bank_charges, 
-                    tax_deducted, tax_account, attachment_path, custom_fields
-                   ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                (
-                    bill_id, vendor_id, amount_from_cash, payment_date, method, notes,
-                    payment_number, reference, deposit_to, current_bank_charges,
-                    current_tax_deducted, current_tax_account, attachment_path, custom_fields
-                )
-            ))
-        
-        bill_res = execute_read_query("SELECT grand_total FROM bills WHERE id = ?", (bill_id,))
-        if not bill_res:
-            continue
-        grand_total = bill_res[0]['grand_total']
-        
-        paid_res = execute_read_query("SELECT SUM(amount) FROM payments WHERE bill_id = ?", (bill_id,))
-        previously_paid = paid_res[0][0] if paid_res and paid_res[0][0] else 0.0
-        
-        new_total_paid = previously_paid + amount
-        
-        if new_total_paid >= grand_total - 0.01:
-            transaction_queries.append((
-                "UPDATE bills SET status = 'Paid' WHERE id = ?",
-                (bill_id,)
-            ))
-            
-    # Handle Excess Amount (Credit)
-    cash_used = total_allocated - credits_used_total
-    excess_amount = amount_paid - cash_used
-    
-    if excess_amount > 0.01:
-        # Only apply bank charges/tax if not applied in allocations
-        apply_charges = (cash_used < 0.001)
-        current_bank_charges = bank_charges if apply_charges else 0.0
-        current_tax_deducted = tax_deducted if apply_charges else 0.0
-        current_tax_account = tax_account if apply_charges else ''
-        
-        transaction_queries.append((
-            """INSERT INTO payments (
-                bill_id, vendor_id, amount, date, method, notes, 
-                payment_number, reference, deposit_to, bank_charges, 
-                tax_deducted, tax_account, attachment_path, custom_fields
-               ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-            (
-                None, vendor_id, excess_amount, payment_date, method, notes,
-                payment_number, reference, deposit_to, current_bank_charges,
-                current_tax_deducted, current_tax_account, attachment_path, custom_fields
-            )
-        ))
-            
-    if transaction_queries:
-        execute_transaction(transaction_queries)
+    return allocate_payment('vendor', data, data.get('amount_paid', 0.0))
+
+@remotable(write=True)
+def apply_credits(party_type, party_id, allocations, date=None):
+    """
+    Applies a party's open credits to invoices or bills without new money.
+    Raises if the allocations exceed the credits available.
+    """
+    data = {PARTIES[party_type]['party_col']: party_id, 'allocations': allocations}
+    if date:
+        data['date'] = date
+    return allocate_payment(party_type, data, 0.0, credits_only=True)
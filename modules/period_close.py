@@ -0,0 +1,274 @@
+import sqlite3
+import datetime
+import calendar
+from database.db import execute_read_query, execute_transaction
+from modules.backend import remotable
+from modules.archive import open_history_connection, get_archived_monthly_totals
+from modules.stock_fifo import get_stock_at, write_stock_checkpoints
+
+# Closing a month records the cash position, what each customer and vendor
+# has been billed and has settled, and the stock per item as of the month
+# end. Reports start from the nearest close and only read the activity after
+# it. Everything dated on or before the latest close is locked, so the
+# recorded balances stay valid until the period is reopened.
+
+
+def month_end(period):
+    """Returns the last day ('YYYY-MM-DD') of a 'YYYY-MM' period."""
+    year, month = int(period[:4]), int(period[5:7])
+    return f"{period}-{calendar.monthrange(year, month)[1]:02d}"
+
+
+def add_months(period, months):
+    """Shifts a 'YYYY-MM' period by a number of months."""
+    index = int(period[:4]) * 12 + int(period[5:7]) - 1 + months
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def get_period_closes():
+    """Returns the period_closes rows, latest first."""
+    try:
+        return [dict(row) for row in execute_read_query("SELECT * FROM period_closes ORDER BY period DESC")]
+    except sqlite3.OperationalError:
+        return []
+
+
+def get_latest_close(before_date=None):
+    """Returns the latest close that ends before before_date (any close if None), or None."""
+    try:
+        if before_date:
+            rows = execute_read_query(
+                "SELECT * FROM period_closes WHERE end_date < ? ORDER BY end_date DESC LIMIT 1", (before_date,)
+            )
+        else:
+            rows = execute_read_query("SELECT * FROM period_closes ORDER BY end_date DESC LIMIT 1")
+    except sqlite3.OperationalError:
+        # Database not migrated yet
+        return None
+    return dict(rows[0]) if rows else None
+
+
+def get_locked_until():
+    """Returns the end date of the latest closed period, or None when nothing is closed."""
+    close = get_latest_close()
+    return close['end_date'] if close else None
+
+
+def check_period_open(*dates):
+    """Raises if any of the dates falls in a closed period. None dates are ignored."""
+    locked_until = get_locked_until()
+    if not locked_until:
+        return
+    for date in dates:
+        if date and str(date)[:10] <= locked_until:
+            raise Exception(
+                f"The books are closed up to {locked_until}, so entries dated {str(date)[:10]} cannot be changed. "
+                "Reopen the period in Settings first."
+            )
+
+
+@remotable()
+def get_cash_position(before_date):
+    """
+    Returns (cash_in, cash_out) of all payments dated before before_date,
+    starting from the nearest close instead of summing the whole history.
+
+    Args:
+        before_date (str): First day of a month ('YYYY-MM-01'); archived
+            years are carried forward per month.
+    """
+    close = get_latest_close(before_date)
+    cash_in, cash_out = (close['cash_in'], close['cash_out']) if close else (0.0, 0.0)
+
+    query = """
+        SELECT
+            SUM(CASE WHEN invoice_id IS NOT NULL THEN amount ELSE 0 END) as total_in,
+            SUM(CASE WHEN bill_id IS NOT NULL THEN amount ELSE 0 END) as total_out
+        FROM payments
+        WHERE date < ?
+    """
+    params = (before_date,)
+    if close:
+        query += " AND date > ?"
+        params += (close['end_date'],)
+    row = execute_read_query(query, params)[0]
+    cash_in += row['total_in'] or 0.0
+    cash_out += row['total_out'] or 0.0
+
+    # Plus the cash movements of archived years after the close
+    start_month = add_months(close['period'], 1) if close else None
+    for totals in get_archived_monthly_totals(start_month, add_months(before_date[:7], -1)).values():
+        cash_in += totals['cash_in'] or 0.0
+        cash_out += totals['cash_out'] or 0.0
+    return cash_in, cash_out
+
+
+_PARTY_QUERIES = {
+    'customer': (
+        "SELECT customer_id, SUM(grand_total) FROM history_invoices "
+        "WHERE status NOT IN ('Draft', 'Cancelled') AND {range} GROUP BY customer_id",
+        # Older payments only carry the invoice, not the customer
+        "SELECT COALESCE(p.customer_id, (SELECT i.customer_id FROM history_invoices i WHERE i.id = p.invoice_id)) AS party_id, "
+        "SUM(p.amount) FROM history_payments p "
+        "WHERE p.bill_id IS NULL AND p.vendor_id IS NULL AND {range} GROUP BY party_id HAVING party_id IS NOT NULL",
+    ),
+    'vendor': (
+        "SELECT vendor_id, SUM(grand_total) FROM history_bills "
+        "WHERE status NOT IN ('Draft', 'Cancelled') AND {range} GROUP BY vendor_id",
+        "SELECT COALESCE(p.vendor_id, (SELECT b.vendor_id FROM history_bills b WHERE b.id = p.bill_id)) AS party_id, "
+        "SUM(p.amount) FROM history_payments p "
+        "WHERE p.invoice_id IS NULL AND p.customer_id IS NULL AND {range} GROUP BY party_id HAVING party_id IS NOT NULL",
+    ),
+}
+
+
+def _date_range(column, after_date, before_date):
+    conditions, params = [], []
+    if after_date:
+        conditions.append(f"{column} > ?")
+        params.append(after_date)
+    if before_date:
+        conditions.append(f"{column} < ?")
+        params.append(before_date)
+    return " AND ".join(conditions) or "1", params
+
+
+def _party_activity(party_type, after_date=None, before_date=None):
+    """Returns {party_id: [billed, settled]} for documents and payments dated after after_date and before before_date."""
+    billed_query, settled_query = _PARTY_QUERIES[party_type]
+    activity = {}
+    conn = open_history_connection(after_date, before_date)
+    try:
+        date_range, params = _date_range("date", after_date, before_date)
+        for party_id, billed in conn.execute(billed_query.format(range=date_range), params):
+            activity.setdefault(party_id, [0.0, 0.0])[0] += billed or 0.0
+        date_range, params = _date_range("p.date", after_date, before_date)
+        for party_id, settled in conn.execute(settled_query.format(range=date_range), params):
+            activity.setdefault(party_id, [0.0, 0.0])[1] += settled or 0.0
+    finally:
+        conn.close()
+    return activity
+
+
+@remotable()
+def get_party_balances(party_type, before_date=None):
+    """
+    Returns {party_id: {'billed', 'settled', 'balance'}} for every customer or
+    vendor, counting what is dated before before_date (everything if None).
+    The balance is what the customer owes, or what is owed to the vendor.
+
+    Args:
+        party_type (str): 'customer' or 'vendor'.
+    """
+    close = get_latest_close(before_date)
+    balances = {}
+    if close:
+        for row in execute_read_query(
+            "SELECT party_id, billed, settled FROM period_party_balances WHERE period = ? AND party_type = ?",
+            (close['period'], party_type)
+        ):
+            balances[row['party_id']] = [row['billed'], row['settled']]
+
+    for party_id, (billed, settled) in _party_activity(party_type, close['end_date'] if close else None, before_date).items():
+        totals = balances.setdefault(party_id, [0.0, 0.0])
+        totals[0] += billed
+        totals[1] += settled
+    return {
+        party_id: {'billed': billed, 'settled': settled, 'balance': billed - settled}
+        for party_id, (billed, settled) in balances.items()
+    }
+
+
+def get_period_stock(period):
+    """Returns the stock recorded when a period was closed: [{'item_id', 'name', 'sku', 'quantity', 'value'}]."""
+    rows = execute_read_query("""
+        SELECT ps.item_id, i.name, i.sku, ps.quantity, ps.value
+        FROM period_stock ps
+        LEFT JOIN items i ON i.id = ps.item_id
+        WHERE ps.period = ?
+        ORDER BY i.name
+    """, (period,))
+    return [dict(row) for row in rows]
+
+
+@remotable(write=True)
+def close_period(period, today=None):
+    """
+    Closes the month 'YYYY-MM' (and any open months before it) and locks
+    everything dated up to its last day. March closes are recorded as year ends.
+
+    The balances are the previous close plus the activity after it, so a
+    close only reads the months since the last one. Stock comes from the
+    stock movement ledger as of the month end.
+
+    Returns:
+        dict: The period_closes row.
+    """
+    today = today or datetime.date.today()
+    if isinstance(today, str):
+        # A date sent through the server arrives as its ISO text
+        today = datetime.date.fromisoformat(today)
+    end_date = month_end(period)
+    if end_date >= today.isoformat():
+        raise Exception(f"{period} has not ended yet and cannot be closed.")
+    previous = get_latest_close()
+    if previous and previous['period'] >= period:
+        raise Exception(f"The books are already closed up to {previous['end_date']}.")
+
+    before_date = f"{add_months(period, 1)}-01"
+    cash_in, cash_out = get_cash_position(before_date)
+    kind = 'year' if period[5:7] == '03' else 'month'
+
+    queries = [(
+        "INSERT INTO period_closes (period, kind, end_date, cash_in, cash_out) VALUES (?, ?, ?, ?, ?)",
+        (period, kind, end_date, cash_in, cash_out)
+    )]
+    for party_type in ('customer', 'vendor'):
+        balances = get_party_balances(party_type, before_date)
+        queries.extend((
+            "INSERT INTO period_party_balances (period, party_type, party_id, billed, settled) VALUES (?, ?, ?, ?, ?)",
+            (period, party_type, party_id, b['billed'], b['settled'])
+        ) for party_id, b in balances.items())
+    write_stock_checkpoints(today)
+    queries.extend((
+        "INSERT INTO period_stock (period, item_id, quantity, value) VALUES (?, ?, ?, ?)",
+        (period, item_id, totals['quantity'], totals['value'])
+    ) for item_id, totals in get_stock_at(end_date).items())
+    execute_transaction(queries)
+    return get_latest_close()
+
+
+@remotable(write=True)
+def reopen_period(period=None):
+    """Reopens a closed period and every period after it (all of them if None)."""
+    period = period or ""
+    execute_transaction([
+        (f"DELETE FROM {table} WHERE period >= ?", (period,))
+        for table in ('period_stock', 'period_party_balances', 'period_closes')
+    ])
+
+
+def get_closable_periods(today=None):
+    """Ended months after the latest close that can be closed next, latest first."""
+    today = today or datetime.date.today()
+    last_ended = add_months(today.isoformat()[:7], -1)
+    latest = get_latest_close()
+    if latest:
+        first = add_months(latest['period'], 1)
+    else:
+        rows = execute_read_query("""
+            SELECT MIN(date) AS first_date FROM (
+                SELECT MIN(date) AS date FROM invoices
+                UNION ALL SELECT MIN(date) FROM bills
+                UNION ALL SELECT MIN(date) FROM payments
+            )
+        """)
+        first_date = rows[0]['first_date'] if rows else None
+        first = first_date[:7] if first_date else last_ended
+
+    periods = []
+    period = last_ended
+    while period >= first:
+        periods.append(period)
+        period = add_months(period, -1)
+    return periods
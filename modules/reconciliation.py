@@ -0,0 +1,485 @@
+import os
+import re
+import csv
+import bisect
+import datetime
+from database.db import execute_read_query, execute_write_query, execute_many_transaction, iter_read_query
+from modules.payment import PARTIES, allocate_payment, get_document_balances
+
+# Bank statement reconciliation. A statement CSV is streamed into
+# bank_statement_lines, then every unmatched line is looked up in hash
+# indexes of the payments not yet reconciled and of the open invoices and
+# bills: by payment number or reference found in the line, by exact amount
+# within a date window, and finally by nearest amount within a tolerance
+# (bank charges and TDS make receipts land slightly short). Each lookup is a
+# dict access or a bisect, so a statement matches in near-linear time.
+#
+# Lines matched to a payment are reconciled. Lines matched to an open
+# invoice or bill, and unmatched lines assigned to a party, are recorded as
+# new payments through the payment allocation engine.
+
+STATUSES = ('Unmatched', 'Suggested', 'Matched', 'Recorded', 'Ignored')
+# Statuses that tie a line to its payment
+RECONCILED = ('Matched', 'Recorded')
+
+DATE_WINDOW_DAYS = 3
+# Near-amount matches may differ by this fraction of the line amount
+FUZZY_TOLERANCE = 0.01
+INSERT_CHUNK = 1000
+
+# Header names seen on Indian and international bank exports
+DATE_HEADERS = ('txn date', 'transaction date', 'date', 'value date', 'posting date')
+DESCRIPTION_HEADERS = ('description', 'narration', 'particulars', 'details', 'remarks', 'transaction details')
+REFERENCE_HEADERS = ('reference', 'ref', 'ref no', 'ref no.', 'reference no', 'chq/ref no', 'chq./ref.no.',
+                     'cheque no', 'utr', 'utr no')
+AMOUNT_HEADERS = ('amount', 'transaction amount')
+CREDIT_HEADERS = ('credit', 'deposit', 'deposits', 'deposit amt', 'deposit amt.', 'credit amount', 'cr')
+DEBIT_HEADERS = ('debit', 'withdrawal', 'withdrawals', 'withdrawal amt', 'withdrawal amt.', 'debit amount', 'dr')
+
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y', '%d/%m/%y', '%d-%m-%y',
+                '%d-%b-%Y', '%d %b %Y', '%d-%b-%y', '%d %b %y', '%Y/%m/%d')
+
+_TOKEN = re.compile(r"[A-Z0-9][A-Z0-9_-]{2,}")
+
+
+def _find_column(headers, names):
+    for name in names:
+        if name in headers:
+            return headers[name]
+    return None
+
+
+def parse_amount(text):
+    """Parses '1,234.50', '(250.00)', '₹ 99' or '120.00 DR' into a float; blank is None."""
+    text = (text or '').strip().replace(',', '').replace('₹', '').replace(' ', '')
+    if not text or text == '-':
+        return None
+    sign = 1
+    upper = text.upper()
+    if upper.endswith('DR'):
+        sign, text = -1, text[:-2]
+    elif upper.endswith('CR'):
+        text = text[:-2]
+    if text.startswith('(') and text.endswith(')'):
+        sign, text = -sign, text[1:-1]
+    return sign * float(text)
+
+
+class _DateParser:
+    """Parses statement dates, trying the format that worked last first."""
+
+    def __init__(self):
+        self.last = None
+
+    def __call__(self, text):
+        text = (text or '').strip()
+        if not text:
+            return None
+        formats = (self.last,) + DATE_FORMATS if self.last else DATE_FORMATS
+        for fmt in formats:
+            try:
+                parsed = datetime.datetime.strptime(text, fmt).date()
+            except ValueError:
+                continue
+            self.last = fmt
+            return parsed.isoformat()
+        raise ValueError(f"Unrecognised date '{text}'")
+
+
+def read_statement(path):
+    """
+    Yields (line_no, date, description, reference, amount) for each
+    transaction in a statement CSV without loading the file. amount is
+    positive for money in and negative for money out. Blank and
+    balance-only rows are skipped.
+    """
+    parse_date = _DateParser()
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if not header:
+            raise Exception("The statement file is empty.")
+        headers = {name.strip().lower(): i for i, name in enumerate(header)}
+        date_col = _find_column(headers, DATE_HEADERS)
+        desc_col = _find_column(headers, DESCRIPTION_HEADERS)
+        ref_col = _find_column(headers, REFERENCE_HEADERS)
+        amount_col = _find_column(headers, AMOUNT_HEADERS)
+        credit_col = _find_column(headers, CREDIT_HEADERS)
+        debit_col = _find_column(headers, DEBIT_HEADERS)
+        if date_col is None or (amount_col is None and credit_col is None and debit_col is None):
+            raise Exception("The statement needs a Date column and an Amount or Credit/Debit columns.")
+
+        def cell(row, col):
+            return row[col].strip() if col is not None and col < len(row) else ''
+
+        for line_no, row in enumerate(reader, start=2):
+            if not any(value.strip() for value in row):
+                continue
+            try:
+                if amount_col is not None:
+                    amount = parse_amount(cell(row, amount_col))
+                else:
+                    credit = parse_amount(cell(row, credit_col)) or 0.0
+                    debit = parse_amount(cell(row, debit_col)) or 0.0
+                    amount = credit - abs(debit)
+                if not amount:
+                    continue
+                date = parse_date(cell(row, date_col))
+            except ValueError as e:
+                raise Exception(f"Line {line_no}: {e}")
+            yield line_no, date, cell(row, desc_col), cell(row, ref_col), round(amount, 2)
+
+
+def import_statement(path, account='', progress_callback=None, is_cancelled=None):
+    """
+    Streams a statement CSV into bank_statement_lines in chunks and returns
+    the new statement id.
+    """
+    statement_id = execute_write_query(
+        "INSERT INTO bank_statements (file_name, account) VALUES (?, ?)", (os.path.basename(path), account)
+    )
+    query = ("INSERT INTO bank_statement_lines (statement_id, line_no, date, description, reference, amount) "
+             "VALUES (?, ?, ?, ?, ?, ?)")
+    count = 0
+    chunk = []
+    try:
+        for line in read_statement(path):
+            chunk.append((statement_id,) + line)
+            if len(chunk) >= INSERT_CHUNK:
+                execute_many_transaction([(query, chunk)])
+                count += len(chunk)
+                chunk = []
+                if progress_callback:
+                    progress_callback(count, 0)
+                if is_cancelled and is_cancelled():
+                    raise Exception("Import cancelled.")
+        if chunk:
+            execute_many_transaction([(query, chunk)])
+            count += len(chunk)
+    except Exception:
+        delete_statement(statement_id)
+        raise
+    execute_write_query("UPDATE bank_statements SET line_count = ? WHERE id = ?", (count, statement_id))
+    return statement_id
+
+
+def delete_statement(statement_id):
+    execute_many_transaction([
+        ("DELETE FROM bank_statement_lines WHERE statement_id = ?", [(statement_id,)]),
+        ("DELETE FROM bank_statements WHERE id = ?", [(statement_id,)]),
+    ])
+
+
+def get_statements():
+    """Returns the imported statements with their line counts per status, latest first."""
+    rows = execute_read_query("""
+        SELECT s.id, s.file_name, s.account, s.imported_at, s.line_count,
+               SUM(l.status = 'Unmatched') as unmatched, SUM(l.status = 'Suggested') as suggested,
+               SUM(l.status IN ('Matched', 'Recorded')) as reconciled, SUM(l.status = 'Ignored') as ignored
+        FROM bank_statements s
+        LEFT JOIN bank_statement_lines l ON l.statement_id = s.id
+        GROUP BY s.id
+        ORDER BY s.id DESC
+    """)
+    return [dict(row) for row in rows]
+
+
+def get_statement_lines(statement_id, status=None, limit=None):
+    """Returns a statement's lines with a label for whatever each one is matched to."""
+    query = """
+        SELECT l.*,
+               CASE l.match_type
+                   WHEN 'invoice' THEN (SELECT invoice_number FROM invoices WHERE id = l.match_id)
+                   WHEN 'bill' THEN (SELECT bill_number FROM bills WHERE id = l.match_id)
+                   ELSE l.payment_number
+               END as match_label
+        FROM bank_statement_lines l
+        WHERE l.statement_id = ?
+    """
+    params = [statement_id]
+    if status:
+        query += " AND l.status = ?"
+        params.append(status)
+    query += " ORDER BY l.date, l.line_no"
+    if limit:
+        query += " LIMIT ?"
+        params.append(limit)
+    return [dict(row) for row in execute_read_query(query, params)]
+
+
+class _Candidate:
+    __slots__ = ('kind', 'key', 'sign', 'cents', 'day', 'used')
+
+    def __init__(self, kind, key, sign, cents, day):
+        self.kind = kind
+        self.key = key
+        self.sign = sign
+        self.cents = cents
+        self.day = day
+        self.used = False
+
+
+class MatchIndex:
+    """
+    Hash indexes over what a statement line can match: payments not yet
+    reconciled, and open invoices and bills by balance due.
+    """
+
+    def __init__(self):
+        self.by_token = {}
+        self.by_amount = {}
+        self.sorted_amounts = {1: [], -1: []}
+
+    def add(self, candidate, tokens):
+        for token in tokens:
+            if token:
+                self.by_token.setdefault(token.strip().upper(), []).append(candidate)
+        self.by_amount.setdefault((candidate.sign, candidate.cents), []).append(candidate)
+        if candidate.kind == 'payment':
+            self.sorted_amounts[candidate.sign].append((candidate.cents, candidate.day, candidate.key))
+
+    def finish(self):
+        """Sorts the amount lists used for near-amount lookups."""
+        self._fuzzy = {}
+        for sign, entries in self.sorted_amounts.items():
+            entries.sort()
+            self._fuzzy[sign] = ([cents for cents, _, _ in entries], entries)
+        self._payments = {(c.sign, c.key): c for group in self.by_amount.values() for c in group if c.kind == 'payment'}
+
+    def near_amount(self, sign, low, high):
+        keys, entries = self._fuzzy[sign]
+        for i in range(bisect.bisect_left(keys, low), bisect.bisect_right(keys, high)):
+            candidate = self._payments[(sign, entries[i][2])]
+            if not candidate.used:
+                yield candidate
+
+
+def _day(date_text):
+    return datetime.date.fromisoformat(str(date_text)[:10]).toordinal()
+
+
+def build_match_index():
+    """Loads unreconciled payments and open invoices and bills into a MatchIndex in three queries."""
+    index = MatchIndex()
+    payments = iter_read_query(f"""
+        SELECT p.payment_number, MIN(p.date) as date, SUM(p.amount) as amount,
+               SUM(IFNULL(p.bank_charges, 0)) as charges, MAX(p.reference) as reference,
+               MAX(p.customer_id) as customer_id
+        FROM payments p
+        WHERE p.payment_number IS NOT NULL AND p.payment_number NOT IN (
+            SELECT payment_number FROM bank_statement_lines
+            WHERE payment_number IS NOT NULL AND status IN ('Suggested', {', '.join(repr(s) for s in RECONCILED)})
+        )
+        GROUP BY p.payment_number
+    """)
+    for row in payments:
+        sign = 1 if row['customer_id'] else -1
+        cents = round(row['amount'] * 100)
+        candidate = _Candidate('payment', row['payment_number'], sign, cents, _day(row['date']))
+        index.add(candidate, (row['payment_number'], row['reference']))
+        # Charges the bank kept are missing from the statement amount
+        net = cents - round(row['charges'] * 100)
+        if row['charges'] and net > 0:
+            index.by_amount.setdefault((sign, net), []).append(candidate)
+
+    suggested = {
+        (row['match_type'], row['match_id'])
+        for row in execute_read_query(
+            "SELECT DISTINCT match_type, match_id FROM bank_statement_lines WHERE status = 'Suggested' AND match_id IS NOT NULL"
+        )
+    }
+    for party_type, sign in (('customer', 1), ('vendor', -1)):
+        cfg = PARTIES[party_type]
+        docs = iter_read_query(f"""
+            SELECT d.id, d.{cfg['number_col']} as number, d.date,
+                   IFNULL(d.grand_total, 0) - IFNULL((SELECT SUM(p.amount) FROM payments p WHERE p.{cfg['target_col']} = d.id), 0) as balance
+            FROM {cfg['table']} d
+            WHERE d.status NOT IN ('Paid', 'Draft', 'Cancelled')
+        """)
+        for row in docs:
+            if row['balance'] <= 0.01 or (cfg['doc_type'], row['id']) in suggested:
+                continue
+            candidate = _Candidate(cfg['doc_type'], row['id'], sign, round(row['balance'] * 100), _day(row['date']))
+            index.add(candidate, (row['number'],))
+    index.finish()
+    return index
+
+
+def match_line(index, line, date_window=DATE_WINDOW_DAYS, tolerance=FUZZY_TOLERANCE):
+    """
+    Finds the best candidate for one statement line and marks it used.
+    Returns (candidate, rule, score) or None.
+    """
+    sign = 1 if line['amount'] > 0 else -1
+    cents = round(abs(line['amount']) * 100)
+    slack = max(1, round(cents * tolerance))
+    day = _day(line['date'])
+
+    # 1. A payment number, reference or document number quoted in the line
+    text = f"{line['reference'] or ''} {line['description'] or ''}".upper()
+    tokens = _TOKEN.findall(text)
+    if line['reference']:
+        tokens.insert(0, line['reference'].strip().upper())
+    for token in tokens:
+        for candidate in index.by_token.get(token, ()):
+            if not candidate.used and candidate.sign == sign and abs(candidate.cents - cents) <= slack:
+                candidate.used = True
+                return candidate, 'reference', 1.0 if candidate.cents == cents else 0.8
+
+    # 2. The exact amount: the payment closest in date, else a single open document
+    exact = [c for c in index.by_amount.get((sign, cents), ()) if not c.used]
+    payments = [c for c in exact if c.kind == 'payment' and abs(c.day - day) <= date_window]
+    if payments:
+        best = min(payments, key=lambda c: abs(c.day - day))
+        best.used = True
+        return best, 'amount_date', 0.9
+    documents = [c for c in exact if c.kind != 'payment' and c.day <= day + date_window]
+    if len(documents) == 1:
+        documents[0].used = True
+        return documents[0], 'amount', 0.7
+
+    # 3. The nearest payment amount within the tolerance and date window
+    near = [c for c in index.near_amount(sign, cents - slack, cents + slack) if abs(c.day - day) <= date_window]
+    if near:
+        best = min(near, key=lambda c: (abs(c.cents - cents), abs(c.day - day)))
+        best.used = True
+        return best, 'near_amount', 0.5
+    return None
+
+
+def auto_match(statement_id, date_window=DATE_WINDOW_DAYS, tolerance=FUZZY_TOLERANCE,
+               progress_callback=None, is_cancelled=None):
+    """
+    Matches a statement's unmatched lines and saves the results. Exact
+    reference matches are reconciled straight away; everything else is left
+    as a suggestion for review. Returns the number of lines per new status.
+    """
+    index = build_match_index()
+    lines = execute_read_query(
+        "SELECT id, date, description, reference, amount FROM bank_statement_lines "
+        "WHERE statement_id = ? AND status = 'Unmatched' ORDER BY date, line_no",
+        (statement_id,)
+    )
+    updates = []
+    for done, line in enumerate(lines, start=1):
+        found = match_line(index, line, date_window, tolerance)
+        if found:
+            candidate, rule, score = found
+            status = 'Matched' if score >= 1.0 and candidate.kind == 'payment' else 'Suggested'
+            if candidate.kind == 'payment':
+                updates.append((status, None, None, candidate.key, rule, score, line['id']))
+            else:
+                updates.append((status, candidate.kind, candidate.key, None, rule, score, line['id']))
+        if progress_callback and done % INSERT_CHUNK == 0:
+            progress_callback(done, len(lines))
+            if is_cancelled and is_cancelled():
+                raise Exception("Matching cancelled.")
+    if updates:
+        execute_many_transaction([(
+            "UPDATE bank_statement_lines SET status = ?, match_type = ?, match_id = ?, payment_number = ?, "
+            "match_rule = ?, score = ? WHERE id = ?",
+            updates
+        )])
+    counts = {'Matched': 0, 'Suggested': 0, 'Unmatched': len(lines) - len(updates)}
+    for update in updates:
+        counts[update[0]] += 1
+    return counts
+
+
+def _set_status(line_ids, query):
+    execute_many_transaction([(query, [(line_id,) for line_id in line_ids])])
+
+
+def confirm_lines(line_ids):
+    """Accepts suggested payment matches. Document suggestions are confirmed by recording them."""
+    _set_status(line_ids, "UPDATE bank_statement_lines SET status = 'Matched', match_rule = COALESCE(match_rule, 'manual') "
+                          "WHERE id = ? AND status = 'Suggested' AND payment_number IS NOT NULL")
+
+
+def unmatch_lines(line_ids):
+    """Clears the match on lines that have not been recorded as payments."""
+    _set_status(line_ids, "UPDATE bank_statement_lines SET status = 'Unmatched', match_type = NULL, match_id = NULL, "
+                          "payment_number = NULL, match_rule = NULL, score = NULL WHERE id = ? AND status != 'Recorded'")
+
+
+def ignore_lines(line_ids):
+    """Marks lines (bank fees, transfers...) that need no payment."""
+    _set_status(line_ids, "UPDATE bank_statement_lines SET status = 'Ignored' WHERE id = ? AND status != 'Recorded'")
+
+
+def record_lines(line_ids, party_type=None, party_id=None, method='Bank Transfer', deposit_to=''):
+    """
+    Records statement lines as payments through the allocation engine.
+    Lines suggested against an invoice or bill are paid against it for its
+    party. Unmatched lines are recorded for party_type/party_id, money in
+    as customer receipts and money out as vendor payments, and stay on
+    account as credits. Lines in the other direction, or without a party,
+    are skipped. Returns {'recorded', 'skipped'}.
+    """
+    lines = []
+    for start in range(0, len(line_ids), 500):
+        chunk = line_ids[start:start + 500]
+        lines.extend(execute_read_query(
+            f"SELECT * FROM bank_statement_lines WHERE id IN ({', '.join('?' * len(chunk))}) ORDER BY date, line_no",
+            chunk
+        ))
+
+    documents = {}
+    for doc_type, party in (('invoice', 'customer'), ('bill', 'vendor')):
+        ids = [line['match_id'] for line in lines if line['status'] == 'Suggested' and line['match_type'] == doc_type]
+        if ids:
+            cfg = PARTIES[party]
+            balances = get_document_balances(party, ids)
+            parties = execute_read_query(
+                f"SELECT id, {cfg['party_col']} as party_id FROM {cfg['table']} WHERE id IN ({', '.join('?' * len(balances))})",
+                list(balances)
+            ) if balances else []
+            for row in parties:
+                balance = balances[row['id']]
+                documents[(doc_type, row['id'])] = {
+                    'party_id': row['party_id'], 'balance': balance['grand_total'] - balance['amount_paid']
+                }
+
+    recorded = []
+    skipped = 0
+    try:
+        for line in lines:
+            amount = abs(line['amount'])
+            line_party = 'customer' if line['amount'] > 0 else 'vendor'
+            allocations = []
+            if line['status'] == 'Suggested' and line['match_type'] in ('invoice', 'bill'):
+                document = documents.get((line['match_type'], line['match_id']))
+                if not document:
+                    skipped += 1
+                    continue
+                target_party = document['party_id']
+                applied = min(amount, max(document['balance'], 0.0))
+                if applied > 0.01:
+                    allocations.append({PARTIES[line_party]['target_col']: line['match_id'], 'amount': applied})
+                    document['balance'] -= applied
+            elif line['status'] == 'Unmatched' and party_id and party_type == line_party:
+                target_party = party_id
+            else:
+                skipped += 1
+                continue
+
+            data = {
+                PARTIES[line_party]['party_col']: target_party,
+                'date': line['date'],
+                'method': method,
+                'reference': line['reference'] or (line['description'] or '')[:100],
+                'notes': f"Bank statement line {line['line_no']}: {line['description'] or ''}".strip(),
+                'deposit_to': deposit_to,
+                'allocations': allocations,
+            }
+            result = allocate_payment(line_party, data, amount)
+            recorded.append((result['payment_number'], line['id']))
+    finally:
+        # Lines recorded before a failure (e.g. a closed period) keep their payment
+        if recorded:
+            execute_many_transaction([(
+                "UPDATE bank_statement_lines SET status = 'Recorded', payment_number = ?, "
+                "match_rule = COALESCE(match_rule, 'manual') WHERE id = ?",
+                recorded
+            )])
+    return {'recorded': len(recorded), 'skipped': skipped}
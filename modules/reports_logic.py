@@ -1,32 +1,69 @@
 from database.db import execute_read_query
+from modules.backend import remotable, get_backend
+from modules.archive import execute_history_query, iter_history_query, get_archived_monthly_totals
+from modules.period_close import get_cash_position, get_party_balances
+from modules.stock_fifo import get_stock_at, get_total_stock_value, WEIGHTED_AVERAGE
+from database.companies import list_companies, run_for_companies
 import datetime
 
+@remotable()
 def get_sales_report(start_date, end_date):
     """
     Returns sales data within a date range.
     """
     query = """
         SELECT i.invoice_number, c.name as customer_name, i.date, i.grand_total, i.status
-        FROM invoices i
+        FROM history_invoices i
         JOIN customers c ON i.customer_id = c.id
         WHERE i.date BETWEEN ? AND ?
         ORDER BY i.date DESC
     """
-    return execute_read_query(query, (start_date, end_date))
+    return execute_history_query(query, (start_date, end_date), start_date, end_date)
 
+@remotable()
 def get_purchase_report(start_date, end_date):
     """
     Returns purchase data within a date range.
     """
     query = """
         SELECT b.bill_number, v.name as vendor_name, b.date, b.grand_total, b.status
-        FROM bills b
+        FROM history_bills b
+        JOIN vendors v ON b.vendor_id = v.id
+        WHERE b.date BETWEEN ? AND ?
+        ORDER BY b.date DESC
+    """
+    return execute_history_query(query, (start_date, end_date), start_date, end_date)
+
+@remotable()
+def iter_sales_report(start_date, end_date):
+    """
+    Streams sales register rows within a date range (same columns as get_sales_report).
+    Used for large PDF exports where loading every row at once is too expensive.
+    """
+    query = """
+        SELECT i.invoice_number, c.name as customer_name, i.date, i.grand_total, i.status
+        FROM history_invoices i
+        JOIN customers c ON i.customer_id = c.id
+        WHERE i.date BETWEEN ? AND ?
+        ORDER BY i.date DESC
+    """
+    return iter_history_query(query, (start_date, end_date), start_date, end_date)
+
+@remotable()
+def iter_purchase_report(start_date, end_date):
+    """
+    Streams purchase register rows within a date range (same columns as get_purchase_report).
+    """
+    query = """
+        SELECT b.bill_number, v.name as vendor_name, b.date, b.grand_total, b.status
+        FROM history_bills b
         JOIN vendors v ON b.vendor_id = v.id
         WHERE b.date BETWEEN ? AND ?
         ORDER BY b.date DESC
     """
-    return execute_read_query(query, (start_date, end_date))
+    return iter_history_query(query, (start_date, end_date), start_date, end_date)
 
+@remotable()
 def get_gst_report(start_date, end_date):
     """
     Returns GST collected (Output Tax) and paid (Input Tax).
@@ -34,19 +71,19 @@ def get_gst_report(start_date, end_date):
     # Output Tax (Sales)
     sales_query = """
         SELECT SUM(tax_amount) as total_output_tax
-        FROM invoices
+        FROM history_invoices
         WHERE date BETWEEN ? AND ?
     """
-    sales_res = execute_read_query(sales_query, (start_date, end_date))
+    sales_res = execute_history_query(sales_query, (start_date, end_date), start_date, end_date)
     sales_tax = sales_res[0]['total_output_tax'] if sales_res and sales_res[0]['total_output_tax'] else 0.0
     
     # Input Tax (Purchases)
     purchase_query = """
         SELECT SUM(tax_amount) as total_input_tax
-        FROM bills
+        FROM history_bills
         WHERE date BETWEEN ? AND ?
     """
-    purchase_res = execute_read_query(purchase_query, (start_date, end_date))
+    purchase_res = execute_history_query(purchase_query, (start_date, end_date), start_date, end_date)
     purchase_tax = purchase_res[0]['total_input_tax'] if purchase_res and purchase_res[0]['total_input_tax'] else 0.0
     
     return {
@@ -55,6 +92,7 @@ def get_gst_report(start_date, end_date):
         "net_gst_payable": sales_tax - purchase_tax
     }
 
+@remotable()
 def get_outstanding_invoices():
     """
     Returns invoices that are not fully paid.
@@ -70,6 +108,7 @@ def get_outstanding_invoices():
     """
     return execute_read_query(query)
 
+@remotable()
 def get_stock_valuation():
     """
     Returns stock valuation report.
@@ -80,6 +119,8 @@ def get_stock_valuation():
             i.sku,
             i.stock_on_hand,
             i.purchase_price,
+            i.inventory_valuation_method,
+            i.average_cost,
             COALESCE(SUM(sb.quantity_remaining * sb.purchase_rate), 0) as batch_value,
             COALESCE(SUM(sb.quantity_remaining), 0) as batch_qty
         FROM items i
@@ -91,8 +132,11 @@ def get_stock_valuation():
     results = []
     for row in rows:
         val = row['batch_value']
+        if row['inventory_valuation_method'] == WEIGHTED_AVERAGE:
+            # Average items keep no batches
+            val = max(row['stock_on_hand'] or 0, 0) * (row['average_cost'] or 0)
         # Fallback to simple valuation if no batches
-        if row['batch_qty'] == 0 and row['stock_on_hand'] > 0:
+        elif row['batch_qty'] == 0 and row['stock_on_hand'] > 0:
             val = row['stock_on_hand'] * row['purchase_price']
             
         results.append({
@@ -104,6 +148,30 @@ def get_stock_valuation():
         })
     return results
 
+@remotable()
+def get_stock_valuation_at(date):
+    """
+    Returns the stock valuation as of the end of a past date, from the stock
+    movement ledger. Same row format as get_stock_valuation().
+    """
+    stock = get_stock_at(date)
+    items = execute_read_query("SELECT id, name, sku, purchase_price FROM items ORDER BY name")
+    
+    results = []
+    for item in items:
+        totals = stock.get(item['id'])
+        if not totals or (abs(totals['quantity']) < 0.0001 and abs(totals['value']) < 0.01):
+            continue
+        results.append({
+            'name': item['name'],
+            'sku': item['sku'],
+            'stock_on_hand': totals['quantity'],
+            'purchase_price': item['purchase_price'],
+            'total_value': totals['value']
+        })
+    return results
+
+@remotable()
 def get_monthly_sales_data(year):
     """
     Returns monthly sales totals for a given year.
@@ -123,9 +191,14 @@ def get_monthly_sales_data(year):
     for row in rows:
         month_idx = int(row['month'])
         monthly_data[month_idx] = row['total']
+    
+    # Closed years moved to an archive are carried forward as monthly totals
+    for month, totals in get_archived_monthly_totals(f"{year}-01", f"{year}-12").items():
+        monthly_data[int(month[5:7])] += totals['sales'] or 0.0
         
     return [monthly_data[m] for m in range(1, 13)]
 
+@remotable()
 def get_monthly_purchase_data(year):
     """
     Returns monthly purchase totals for a given year.
@@ -145,9 +218,14 @@ def get_monthly_purchase_data(year):
     for row in rows:
         month_idx = int(row['month'])
         monthly_data[month_idx] = row['total']
+    
+    # Closed years moved to an archive are carried forward as monthly totals
+    for month, totals in get_archived_monthly_totals(f"{year}-01", f"{year}-12").items():
+        monthly_data[int(month[5:7])] += totals['purchases'] or 0.0
         
     return [monthly_data[m] for m in range(1, 13)]
 
+@remotable()
 def get_ar_aging_report():
     """
     Returns AR Aging report data (Customer Invoices).
@@ -213,6 +291,7 @@ def get_ar_aging_report():
             
     return buckets
 
+@remotable()
 def get_cash_flow_data(fiscal_year_start):
     """
     Returns monthly cash flow data for a fiscal year (April to March).
@@ -236,17 +315,8 @@ def get_cash_flow_data(fiscal_year_start):
     end_date = f"{fiscal_year_start + 1}-03-31"
     
     # 1. Calculate Opening Balance (Cash on Hand before Start Date)
-    # Incoming (Invoices paid) - Outgoing (Bills paid)
-    opening_query = """
-        SELECT 
-            SUM(CASE WHEN invoice_id IS NOT NULL THEN amount ELSE 0 END) as total_in,
-            SUM(CASE WHEN bill_id IS NOT NULL THEN amount ELSE 0 END) as total_out
-        FROM payments
-        WHERE date < ?
-    """
-    opening_res = execute_read_query(opening_query, (start_date,))
-    opening_in = opening_res[0]['total_in'] if opening_res and opening_res[0]['total_in'] else 0.0
-    opening_out = opening_res[0]['total_out'] if opening_res and opening_res[0]['total_out'] else 0.0
+    # Incoming (Invoices paid) - Outgoing (Bills paid), from the nearest period close
+    opening_in, opening_out = get_cash_position(start_date)
     opening_balance = opening_in - opening_out
     
     # 2. Get Monthly Data for the Fiscal Year
@@ -300,6 +370,11 @@ def get_cash_flow_data(fiscal_year_start):
             elif row['bill_id']: # Outgoing
                 data_map[m]['out'] += row['total']
     
+    for m, totals in get_archived_monthly_totals(month_dates[0], month_dates[-1]).items():
+        if m in data_map:
+            data_map[m]['in'] += totals['cash_in'] or 0.0
+            data_map[m]['out'] += totals['cash_out'] or 0.0
+    
     # Build result lists
     running_balance = opening_balance
     cash_flow_trend = [] # To store running balance for chart
@@ -329,6 +404,29 @@ def get_cash_flow_data(fiscal_year_start):
         'fiscal_year': f"{fiscal_year_start}-{fiscal_year_start+1}"
     }
 
+@remotable()
+def get_party_balance_report(as_of=None):
+    """
+    Returns what each customer owes and what is owed to each vendor, up to
+    and including as_of (today if None). Starts from the nearest period close.
+    
+    Returns:
+        list: Dicts with 'party_type', 'name', 'billed', 'settled' and 'balance'.
+    """
+    as_of = as_of or datetime.date.today().isoformat()
+    before_date = (datetime.date.fromisoformat(as_of) + datetime.timedelta(days=1)).isoformat()
+    
+    results = []
+    for party_type, table in (('customer', 'customers'), ('vendor', 'vendors')):
+        names = {row['id']: row['name'] for row in execute_read_query(f"SELECT id, name FROM {table}")}
+        for party_id, totals in get_party_balances(party_type, before_date).items():
+            if abs(totals['billed']) < 0.01 and abs(totals['settled']) < 0.01:
+                continue
+            results.append(dict(totals, party_type=party_type, name=names.get(party_id, f"#{party_id}")))
+    results.sort(key=lambda r: (r['party_type'], -r['balance']))
+    return results
+
+@remotable()
 def get_ap_aging_report():
     """
     Returns AP Aging report data (Vendor Bills).
@@ -391,3 +489,38 @@ def get_ap_aging_report():
             
     return buckets
 
+def _company_summary(start_date, end_date):
+    totals = execute_history_query("""
+        SELECT (SELECT COALESCE(SUM(grand_total), 0) FROM history_invoices WHERE date BETWEEN ? AND ?) AS sales,
+               (SELECT COALESCE(SUM(grand_total), 0) FROM history_bills WHERE date BETWEEN ? AND ?) AS purchases
+    """, (start_date, end_date, start_date, end_date), start_date, end_date)[0]
+    balances = get_party_balance_report(end_date)
+    return {
+        'sales': totals['sales'],
+        'purchases': totals['purchases'],
+        'net_gst': get_gst_report(start_date, end_date)['net_gst_payable'],
+        'receivable': sum(r['balance'] for r in balances if r['party_type'] == 'customer'),
+        'payable': sum(r['balance'] for r in balances if r['party_type'] == 'vendor'),
+        'stock_value': get_total_stock_value() or 0.0,
+    }
+
+def get_consolidated_summary(start_date, end_date):
+    """
+    Sales, purchases, net GST, receivables, payables and stock value of every
+    company, read from their databases in parallel.
+
+    Returns:
+        dict: 'companies', one dict per company with 'company_id' and 'name'
+        added, and 'total', the sums across them.
+    """
+    if get_backend() is not None:
+        # A terminal using a server sees the one book the server hosts
+        name = execute_read_query("SELECT value FROM settings WHERE key = 'company_name'")
+        rows = [dict(_company_summary(start_date, end_date), company_id='server',
+                     name=(name[0]['value'] if name else None) or "Server")]
+    else:
+        results = run_for_companies(_company_summary, start_date, end_date)
+        rows = [dict(results[c['id']], company_id=c['id'], name=c['name'])
+                for c in list_companies() if c['id'] in results]
+    keys = ('sales', 'purchases', 'net_gst', 'receivable', 'payable', 'stock_value')
+    return {'companies': rows, 'total': {key: sum(row[key] for row in rows) for key in keys}}
@@ -0,0 +1,158 @@
+from database.db import execute_read_query
+from modules.backend import remotable
+from modules.archive import open_history_connection
+from modules.period_close import get_party_balances
+
+# Statements of account. The opening balance comes from get_party_balances()
+# (the nearest period close plus the activity after it); the entries in the
+# range and their running balance come from one window-function query over
+# the live and archived documents, partitioned by party so the statements of
+# every customer or vendor are produced by the same single query.
+
+PARTY_TABLES = {'customer': 'customers', 'vendor': 'vendors'}
+
+# Documents add to the balance, payments settle it. A receipt split over
+# several documents (or consumed as credit later) is one entry per payment
+# number and date. The unary + keeps the planner on the party indexes
+# instead of the "other party IS NULL" half of them.
+_ENTRY_QUERIES = {
+    'customer': """
+        SELECT customer_id AS party_id, date, 0 AS seq, id AS ref_id, 'Invoice' AS type,
+               invoice_number AS number, '' AS details, grand_total AS billed, 0 AS settled
+        FROM history_invoices
+        WHERE status NOT IN ('Draft', 'Cancelled') AND date >= ? AND date <= ? {doc_party}
+        UNION ALL
+        SELECT COALESCE(p.customer_id, (SELECT i.customer_id FROM history_invoices i WHERE i.id = p.invoice_id)) AS party_id,
+               p.date, 1, MIN(p.id), 'Payment', p.payment_number,
+               TRIM(IFNULL(MAX(p.method), '') || ' ' || IFNULL(MAX(p.reference), '')), 0, SUM(p.amount)
+        FROM history_payments p
+        WHERE +p.bill_id IS NULL AND +p.vendor_id IS NULL AND p.date >= ? AND p.date <= ? {payment_party}
+        GROUP BY party_id, p.date, COALESCE(p.payment_number, p.id)
+    """,
+    'vendor': """
+        SELECT vendor_id AS party_id, date, 0 AS seq, id AS ref_id, 'Bill' AS type,
+               bill_number AS number, '' AS details, grand_total AS billed, 0 AS settled
+        FROM history_bills
+        WHERE status NOT IN ('Draft', 'Cancelled') AND date >= ? AND date <= ? {doc_party}
+        UNION ALL
+        SELECT COALESCE(p.vendor_id, (SELECT b.vendor_id FROM history_bills b WHERE b.id = p.bill_id)) AS party_id,
+               p.date, 1, MIN(p.id), 'Payment', p.payment_number,
+               TRIM(IFNULL(MAX(p.method), '') || ' ' || IFNULL(MAX(p.reference), '')), 0, SUM(p.amount)
+        FROM history_payments p
+        WHERE +p.invoice_id IS NULL AND +p.customer_id IS NULL AND p.date >= ? AND p.date <= ? {payment_party}
+        GROUP BY party_id, p.date, COALESCE(p.payment_number, p.id)
+    """,
+}
+
+_PARTY_FILTERS = {
+    'customer': (
+        "AND customer_id = ?",
+        "AND (p.customer_id = ? OR p.invoice_id IN (SELECT id FROM history_invoices WHERE customer_id = ?))",
+    ),
+    'vendor': (
+        "AND vendor_id = ?",
+        "AND (p.vendor_id = ? OR p.bill_id IN (SELECT id FROM history_bills WHERE vendor_id = ?))",
+    ),
+}
+
+
+def _iter_entries(party_type, start_date, end_date, party_id=None):
+    """Yields the statement entries in range with their running movement, ordered by party then date."""
+    if party_id is None:
+        entries = _ENTRY_QUERIES[party_type].format(doc_party="", payment_party="")
+        params = (start_date, end_date, start_date, end_date)
+    else:
+        doc_party, payment_party = _PARTY_FILTERS[party_type]
+        entries = _ENTRY_QUERIES[party_type].format(doc_party=doc_party, payment_party=payment_party)
+        params = (start_date, end_date, party_id, start_date, end_date, party_id, party_id)
+    query = f"""
+        WITH entries AS ({entries})
+        SELECT party_id, date, type, number, details, billed, settled,
+               SUM(billed - settled) OVER (
+                   PARTITION BY party_id ORDER BY date, seq, ref_id ROWS UNBOUNDED PRECEDING
+               ) AS movement
+        FROM entries
+        WHERE party_id IS NOT NULL
+        ORDER BY party_id, date, seq, ref_id
+    """
+    conn = open_history_connection(start_date, end_date)
+    try:
+        for row in conn.execute(query, params):
+            yield row
+    finally:
+        conn.close()
+
+
+def _new_statement(party_type, party, opening, start_date, end_date):
+    return {
+        'party_type': party_type,
+        'party_id': party['id'],
+        'party_name': party['name'],
+        'party_address': party['address'] or '',
+        'party_gstin': party['gstin'] or '',
+        'party_email': party['email'] or '',
+        'start_date': start_date,
+        'end_date': end_date,
+        'opening_balance': opening,
+        'total_billed': 0.0,
+        'total_settled': 0.0,
+        'closing_balance': opening,
+        'lines': [],
+    }
+
+
+@remotable()
+def get_party_statements(party_type, start_date, end_date, party_id=None, include_inactive=False):
+    """
+    Returns statements of account for one party, or for every customer or
+    vendor, over start_date..end_date (inclusive).
+
+    Each statement has the party details, 'opening_balance',
+    'total_billed', 'total_settled', 'closing_balance' and 'lines':
+    dicts with 'date', 'type', 'number', 'details', 'billed', 'settled'
+    and the running 'balance'. A positive balance is what the customer
+    owes, or what is owed to the vendor.
+
+    Parties without activity in the range and with a zero opening balance
+    are left out unless include_inactive is True (or a party_id is given).
+    """
+    table = PARTY_TABLES[party_type]
+    if party_id is None:
+        parties = execute_read_query(f"SELECT id, name, address, gstin, email FROM {table} ORDER BY name")
+    else:
+        parties = execute_read_query(f"SELECT id, name, address, gstin, email FROM {table} WHERE id = ?", (party_id,))
+    openings = get_party_balances(party_type, start_date)
+
+    statements = {}
+    for party in parties:
+        opening = openings.get(party['id'], {}).get('balance', 0.0)
+        statements[party['id']] = _new_statement(party_type, party, opening, start_date, end_date)
+
+    for row in _iter_entries(party_type, start_date, end_date, party_id):
+        statement = statements.get(row['party_id'])
+        if statement is None:
+            continue
+        balance = statement['opening_balance'] + row['movement']
+        statement['lines'].append({
+            'date': row['date'],
+            'type': row['type'],
+            'number': row['number'] or '',
+            'details': row['details'] or '',
+            'billed': row['billed'] or 0.0,
+            'settled': row['settled'] or 0.0,
+            'balance': balance,
+        })
+        statement['total_billed'] += row['billed'] or 0.0
+        statement['total_settled'] += row['settled'] or 0.0
+        statement['closing_balance'] = balance
+
+    results = list(statements.values())
+    if party_id is None and not include_inactive:
+        results = [s for s in results if s['lines'] or abs(s['opening_balance']) >= 0.01]
+    return results
+
+
+def get_party_statement(party_type, party_id, start_date, end_date):
+    """Returns the statement of account for one customer or vendor, or None if the party does not exist."""
+    statements = get_party_statements(party_type, start_date, end_date, party_id)
+    return statements[0] if statements else None
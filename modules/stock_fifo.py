@@ -1,25 +1,183 @@
-from database.db import execute_read_query, execute_transaction, execute_write_query
+from database.db import execute_read_query, execute_transaction
+from modules.backend import remotable
+import datetime
+import logging
 
-def add_stock(item_id, quantity, rate, date, vendor_id=None):
+logger = logging.getLogger(__name__)
+
+def stock_movement_queries(item_id, date, quantity, value, kind, reference_type=None, reference_id=None):
+    """
+    Returns the queries that append a row to the stock_movements ledger, for
+    use inside the caller's transaction.
+    
+    quantity is positive for stock coming in and negative for stock going
+    out; value is the cost of the movement with the same sign. Checkpoints
+    on or after a backdated movement are dropped and rebuilt later.
+    """
+    return [
+        ("""INSERT INTO stock_movements (item_id, date, quantity, value, kind, reference_type, reference_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?)""",
+         (item_id, date, quantity, value, kind, reference_type, reference_id)),
+        ("DELETE FROM stock_checkpoints WHERE date >= ?", (date,)),
+    ]
+
+@remotable(write=True)
+def record_stock_movement(item_id, date, quantity, value, kind, reference_type=None, reference_id=None):
+    """Appends a row to the stock_movements ledger."""
+    execute_transaction(stock_movement_queries(item_id, date, quantity, value, kind, reference_type, reference_id))
+
+WEIGHTED_AVERAGE = 'Weighted Average'
+
+@remotable()
+def get_valuation_method(item_id):
+    """Returns the item's inventory_valuation_method; FIFO when none is set."""
+    rows = execute_read_query("SELECT inventory_valuation_method FROM items WHERE id = ?", (item_id,))
+    return (rows[0][0] if rows else None) or 'FIFO'
+
+@remotable()
+def get_return_rate(item_id):
+    """
+    Returns the cost at which sold stock comes back into inventory: the
+    average cost for weighted-average items (so returns leave it unchanged),
+    otherwise the item's purchase price.
     """
-    Adds a new stock batch to the inventory.
+    rows = execute_read_query(
+        "SELECT inventory_valuation_method, average_cost, purchase_price FROM items WHERE id = ?", (item_id,)
+    )
+    if not rows:
+        return 0.0
+    if rows[0]['inventory_valuation_method'] == WEIGHTED_AVERAGE:
+        return rows[0]['average_cost'] or 0.0
+    return rows[0]['purchase_price'] or 0.0
+
+@remotable(write=True)
+def add_stock(item_id, quantity, rate, date, vendor_id=None, kind='purchase', reference_type=None, reference_id=None):
+    """
+    Adds stock to the inventory: a new batch for FIFO items, or a new
+    running average cost for weighted-average items.
     """
-    query = """
-        INSERT INTO stock_batches (item_id, quantity_remaining, purchase_rate, purchase_date, vendor_id)
-        VALUES (?, ?, ?, ?, ?)
+    if get_valuation_method(item_id) == WEIGHTED_AVERAGE:
+        # Values on the right-hand side are the ones before the update
+        queries = [("""
+            UPDATE items SET
+                average_cost = CASE
+                    WHEN COALESCE(stock_on_hand, 0) <= 0 THEN ?
+                    WHEN COALESCE(stock_on_hand, 0) + ? <= 0 THEN average_cost
+                    ELSE (stock_on_hand * COALESCE(average_cost, 0) + ? * ?) / (stock_on_hand + ?)
+                END,
+                stock_on_hand = COALESCE(stock_on_hand, 0) + ?
+            WHERE id = ?
+        """, (rate, quantity, quantity, rate, quantity, quantity, item_id))]
+    else:
+        query = """
+            INSERT INTO stock_batches (item_id, quantity_remaining, purchase_rate, purchase_date, vendor_id)
+            VALUES (?, ?, ?, ?, ?)
+        """
+        queries = [
+            (query, (item_id, quantity, rate, date, vendor_id)),
+            # Update master stock
+            ("UPDATE items SET stock_on_hand = stock_on_hand + ? WHERE id = ?", (quantity, item_id)),
+        ]
+    queries.extend(stock_movement_queries(item_id, date, quantity, quantity * rate, kind, reference_type, reference_id))
+    execute_transaction(queries)
+
+@remotable(write=True)
+def reduce_stock(item_id, quantity_sold, date=None, kind='sale', reference_type=None, reference_id=None):
     """
-    execute_write_query(query, (item_id, quantity, rate, date, vendor_id))
+    Reduces stock with the item's valuation method and returns the Cost of
+    Goods Sold. LIFO is not implemented and is costed as FIFO.
+    """
+    if get_valuation_method(item_id) == WEIGHTED_AVERAGE:
+        return reduce_stock_average(item_id, quantity_sold, date, kind, reference_type, reference_id)
+    return reduce_stock_fifo(item_id, quantity_sold, date, kind, reference_type, reference_id)
+
+@remotable(write=True)
+def reduce_stock_average(item_id, quantity_sold, date=None, kind='sale', reference_type=None, reference_id=None):
+    """
+    Reduces stock of a weighted-average item. COGS is the quantity at the
+    current average cost, which does not change on the way out.
     
-    # Update master stock
-    execute_write_query("UPDATE items SET stock_on_hand = stock_on_hand + ? WHERE id = ?", (quantity, item_id))
+    Returns:
+        float: The total cost of goods sold for this transaction.
+    """
+    rows = execute_read_query("SELECT stock_on_hand, average_cost FROM items WHERE id = ?", (item_id,))
+    on_hand = (rows[0]['stock_on_hand'] or 0.0) if rows else 0.0
+    total_cogs = quantity_sold * ((rows[0]['average_cost'] or 0.0) if rows else 0.0)
 
-def reduce_stock_fifo(item_id, quantity_sold):
+    updates = [("UPDATE items SET stock_on_hand = stock_on_hand - ? WHERE id = ?", (quantity_sold, item_id))]
+    updates.extend(stock_movement_queries(
+        item_id, date or datetime.date.today().strftime("%Y-%m-%d"), -quantity_sold, -total_cogs,
+        kind, reference_type, reference_id
+    ))
+    execute_transaction(updates)
+
+    if quantity_sold > on_hand:
+        logger.warning("Not enough stock for item %s. Missing %s", item_id, quantity_sold - on_hand)
+    return total_cogs
+
+@remotable(write=True)
+def set_valuation_method(item_id, method, date=None):
+    """
+    Switches an item between FIFO and weighted average, carrying its stock over.
+    
+    FIFO to average takes the average cost of the remaining batches and
+    empties them; average to FIFO puts the stock on hand in a single batch
+    at the average cost. If the stock value changes (stock on hand that was
+    not in any batch), the difference is recorded in the stock ledger as a
+    revaluation.
+    """
+    date = date or datetime.date.today().strftime("%Y-%m-%d")
+    rows = execute_read_query("""
+        SELECT i.stock_on_hand, i.purchase_price, i.average_cost, i.inventory_valuation_method,
+               SUM(sb.quantity_remaining) AS batch_qty,
+               SUM(sb.quantity_remaining * sb.purchase_rate) AS batch_value
+        FROM items i
+        LEFT JOIN stock_batches sb ON sb.item_id = i.id AND sb.quantity_remaining > 0
+        WHERE i.id = ?
+        GROUP BY i.id
+    """, (item_id,))
+    if not rows:
+        raise Exception(f"Item {item_id} not found.")
+    item = rows[0]
+    on_hand = item['stock_on_hand'] or 0.0
+    was_average = item['inventory_valuation_method'] == WEIGHTED_AVERAGE
+    queries = [("UPDATE items SET inventory_valuation_method = ? WHERE id = ?", (method, item_id))]
+
+    if method == WEIGHTED_AVERAGE and not was_average:
+        if item['batch_qty']:
+            average_cost = item['batch_value'] / item['batch_qty']
+        else:
+            average_cost = item['purchase_price'] or 0.0
+        queries.append(("UPDATE items SET average_cost = ? WHERE id = ?", (average_cost, item_id)))
+        queries.append(("UPDATE stock_batches SET quantity_remaining = 0 WHERE item_id = ? AND quantity_remaining > 0", (item_id,)))
+        new_value = max(on_hand, 0) * average_cost
+    elif method != WEIGHTED_AVERAGE and was_average:
+        average_cost = item['average_cost'] or 0.0
+        if on_hand > 0:
+            queries.append(("""
+                INSERT INTO stock_batches (item_id, quantity_remaining, purchase_rate, purchase_date)
+                VALUES (?, ?, ?, ?)
+            """, (item_id, on_hand, average_cost, date)))
+        new_value = max(on_hand, 0) * average_cost
+    else:
+        execute_transaction(queries)
+        return
+
+    ledger_value = execute_read_query("SELECT COALESCE(SUM(value), 0) FROM stock_movements WHERE item_id = ?", (item_id,))[0][0]
+    if abs(new_value - ledger_value) >= 0.005:
+        queries.extend(stock_movement_queries(item_id, date, 0, new_value - ledger_value, 'revaluation', 'item', item_id))
+    execute_transaction(queries)
+
+@remotable(write=True)
+def reduce_stock_fifo(item_id, quantity_sold, date=None, kind='sale', reference_type=None, reference_id=None):
     """
     Reduces stock using FIFO method and calculates the Cost of Goods Sold (COGS).
     
     Args:
         item_id (int): The ID of the item being sold.
         quantity_sold (float): The quantity being sold.
+        date (str): Date of the movement in the stock ledger (today if None).
+        kind (str): Movement kind recorded in the stock ledger.
         
     Returns:
         float: The total cost of goods sold for this transaction.
@@ -63,53 +221,146 @@ def reduce_stock_fifo(item_id, quantity_sold):
             # Update batch with remaining quantity
             updates.append(("UPDATE stock_batches SET quantity_remaining = ? WHERE id = ?", (new_qty, batch_id)))
             
-    if updates:
-        execute_transaction(updates)
-
     # Always update master stock
-    execute_write_query("UPDATE items SET stock_on_hand = stock_on_hand - ? WHERE id = ?", (quantity_sold, item_id))
+    updates.append(("UPDATE items SET stock_on_hand = stock_on_hand - ? WHERE id = ?", (quantity_sold, item_id)))
+    updates.extend(stock_movement_queries(
+        item_id, date or datetime.date.today().strftime("%Y-%m-%d"), -quantity_sold, -total_cogs,
+        kind, reference_type, reference_id
+    ))
+    execute_transaction(updates)
 
     if remaining_to_sell > 0:
         # Not enough stock available. 
         # In a strict system, we might raise an error. 
         # For now, we'll assume the remaining uses the last known purchase price or 0 if no history.
         # But let's just log a warning or return what we have.
-        print(f"Warning: Not enough stock for item {item_id}. Missing {remaining_to_sell}")
+        logger.warning("Not enough stock for item %s. Missing %s", item_id, remaining_to_sell)
         
     return total_cogs
 
+@remotable()
 def get_stock_valuation_summary():
     """
-    Returns a summary of stock valuation for all items.
+    Returns a summary of stock valuation for all items, valued with each
+    item's own method.
     """
-    items = execute_read_query("SELECT id, name FROM items")
+    items = execute_read_query("""
+        SELECT i.id, i.name, i.inventory_valuation_method, i.stock_on_hand, i.average_cost,
+               COALESCE(b.quantity, 0) AS batch_qty, COALESCE(b.value, 0) AS batch_value
+        FROM items i
+        LEFT JOIN (
+            SELECT item_id, SUM(quantity_remaining) AS quantity, SUM(quantity_remaining * purchase_rate) AS value
+            FROM stock_batches
+            WHERE quantity_remaining > 0
+            GROUP BY item_id
+        ) b ON b.item_id = i.id
+    """)
     summary = []
     
     for item in items:
-        item_id = item['id']
-        batches = execute_read_query("""
-            SELECT quantity_remaining, purchase_rate 
-            FROM stock_batches 
-            WHERE item_id = ? AND quantity_remaining > 0
-        """, (item_id,))
-        
-        total_qty = 0
-        total_value = 0.0
-        
-        for batch in batches:
-            qty = batch['quantity_remaining']
-            rate = batch['purchase_rate']
-            total_qty += qty
-            total_value += qty * rate
-            
-        avg_cost = (total_value / total_qty) if total_qty > 0 else 0.0
+        method = item['inventory_valuation_method'] or 'FIFO'
+        if method == WEIGHTED_AVERAGE:
+            total_qty = max(item['stock_on_hand'] or 0, 0)
+            avg_cost = item['average_cost'] or 0.0
+            total_value = total_qty * avg_cost
+        else:
+            total_qty = item['batch_qty']
+            total_value = item['batch_value']
+            avg_cost = (total_value / total_qty) if total_qty > 0 else 0.0
         
         summary.append({
-            "item_id": item_id,
+            "item_id": item['id'],
             "item_name": item['name'],
+            "method": method,
             "total_quantity": total_qty,
             "total_value": round(total_value, 2),
             "avg_cost": round(avg_cost, 2)
         })
         
     return summary
+
+@remotable()
+def get_total_stock_value():
+    """Returns the value of all stock on hand: FIFO batches plus weighted-average items."""
+    return execute_read_query("""
+        SELECT
+            COALESCE((SELECT SUM(quantity_remaining * purchase_rate) FROM stock_batches WHERE quantity_remaining > 0), 0)
+          + COALESCE((SELECT SUM(stock_on_hand * average_cost) FROM items
+                      WHERE inventory_valuation_method = ? AND stock_on_hand > 0), 0)
+    """, (WEIGHTED_AVERAGE,))[0][0]
+
+@remotable()
+def get_stock_at(date, item_id=None):
+    """
+    Returns {item_id: {'quantity', 'value'}} as of the end of date, for all
+    items or just one. The value is the cost of what was on hand, with
+    each item's valuation method.
+    
+    Starts from the nearest checkpoint on or before date and adds the
+    movements after it, a single range scan over stock_movements.
+    """
+    params = [date]
+    item_filter = ""
+    if item_id is not None:
+        item_filter = " AND item_id = ?"
+        params.append(item_id)
+    checkpoint = execute_read_query(f"SELECT MAX(date) FROM stock_checkpoints WHERE date <= ?{item_filter}", params)[0][0]
+    
+    if checkpoint:
+        query = f"""
+            SELECT item_id, SUM(quantity) AS quantity, SUM(value) AS value FROM (
+                SELECT item_id, quantity, value FROM stock_checkpoints WHERE date = ?{item_filter}
+                UNION ALL
+                SELECT item_id, quantity, value FROM stock_movements WHERE date > ? AND date <= ?{item_filter}
+            )
+            GROUP BY item_id
+        """
+        params = [checkpoint] + params[1:] + [checkpoint, date] + params[1:]
+    else:
+        query = f"""
+            SELECT item_id, SUM(quantity) AS quantity, SUM(value) AS value
+            FROM stock_movements WHERE date <= ?{item_filter}
+            GROUP BY item_id
+        """
+    return {
+        row['item_id']: {'quantity': row['quantity'], 'value': row['value']}
+        for row in execute_read_query(query, params)
+    }
+
+@remotable()
+def get_stock_movements(item_id, start_date=None, end_date=None):
+    """Returns the ledger rows of one item, oldest first."""
+    return execute_read_query("""
+        SELECT * FROM stock_movements
+        WHERE item_id = ? AND (? IS NULL OR date >= ?) AND (? IS NULL OR date <= ?)
+        ORDER BY date, id
+    """, (item_id, start_date, start_date, end_date, end_date))
+
+@remotable(write=True)
+def write_stock_checkpoints(today=None):
+    """
+    Writes a checkpoint at the end of every ended month that has stock
+    movements after the latest checkpoint. Returns the dates written.
+    """
+    today = today or datetime.date.today()
+    month_start = today.replace(day=1).isoformat()
+    latest = execute_read_query("SELECT MAX(date) FROM stock_checkpoints")[0][0]
+    months = execute_read_query("""
+        SELECT DISTINCT strftime('%Y-%m', date) AS month FROM stock_movements
+        WHERE date < ? AND (? IS NULL OR date > ?)
+        ORDER BY month
+    """, (month_start, latest, latest))
+    
+    written = []
+    for row in months:
+        year, month = int(row['month'][:4]), int(row['month'][5:7])
+        next_month = datetime.date(year + month // 12, month % 12 + 1, 1)
+        end_date = (next_month - datetime.timedelta(days=1)).isoformat()
+        stock = get_stock_at(end_date)
+        execute_transaction([
+            ("INSERT OR REPLACE INTO stock_checkpoints (date, item_id, quantity, value) VALUES (?, ?, ?, ?)",
+             (end_date, item_id, totals['quantity'], totals['value']))
+            for item_id, totals in stock.items()
+        ])
+        written.append(end_date)
+    return written
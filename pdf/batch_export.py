@@ -0,0 +1,377 @@
+import os
+import re
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+from database.db import execute_read_query
+from database.companies import get_settings
+from pdf.generator import (
+    generate_invoice_pdf, generate_bill_pdf, generate_payment_receipt_pdf, generate_statement_pdf,
+    draw_invoice, draw_bill, draw_payment_receipt, draw_statement
+)
+from pdf.report_stream import ReportCancelled
+from modules.statements import get_party_statements
+
+DOC_TYPES = ("invoice", "bill", "receipt")
+
+RENDERERS = {
+    "invoice": generate_invoice_pdf,
+    "bill": generate_bill_pdf,
+    "receipt": generate_payment_receipt_pdf,
+    "statement": generate_statement_pdf,
+}
+
+PAGE_DRAWERS = {
+    "invoice": draw_invoice,
+    "bill": draw_bill,
+    "receipt": draw_payment_receipt,
+    "statement": draw_statement,
+}
+
+NUMBER_KEYS = {
+    "invoice": "invoice_number",
+    "bill": "bill_number",
+    "receipt": "payment_number",
+    "statement": "party_name",
+}
+
+
+def get_company_settings():
+    """Loads company settings once, in the shape the PDF generators expect."""
+    settings_dict = get_settings()
+    settings_dict['logo_path'] = settings_dict.get('company_logo', '')
+    return settings_dict
+
+
+def _build_filters(date_col, party_col, start_date, end_date, party_id):
+    clauses = []
+    params = []
+    if start_date:
+        clauses.append(f"{date_col} >= ?")
+        params.append(start_date)
+    if end_date:
+        clauses.append(f"{date_col} <= ?")
+        params.append(end_date)
+    if party_id:
+        clauses.append(f"{party_col} = ?")
+        params.append(party_id)
+    where = " AND ".join(clauses) if clauses else "1=1"
+    return where, tuple(params)
+
+
+def load_invoices_bulk(start_date=None, end_date=None, customer_id=None, settings=None):
+    """
+    Loads every matching invoice with its items using two queries in total.
+
+    Returns:
+        list: Invoice dicts ready for generate_invoice_pdf, ordered by date.
+    """
+    where, params = _build_filters("i.date", "i.customer_id", start_date, end_date, customer_id)
+    invoices = execute_read_query(f"""
+        SELECT i.*, c.name as customer_name, c.address as customer_address, c.gstin as customer_gstin
+        FROM invoices i
+        JOIN customers c ON i.customer_id = c.id
+        WHERE {where}
+        ORDER BY i.date, i.invoice_number
+    """, params)
+    if not invoices:
+        return []
+
+    items = execute_read_query(f"""
+        SELECT ii.*, it.name as item_name
+        FROM invoice_items ii
+        JOIN items it ON ii.item_id = it.id
+        WHERE ii.invoice_id IN (SELECT i.id FROM invoices i WHERE {where})
+        ORDER BY ii.invoice_id, ii.id
+    """, params)
+
+    items_by_invoice = {}
+    for item in items:
+        items_by_invoice.setdefault(item['invoice_id'], []).append({
+            'name': item['item_name'],
+            'quantity': item['quantity'],
+            'rate': item['rate'],
+            'discount_percent': item['discount_percent'],
+            'gst_percent': item['gst_percent'],
+            'amount': item['amount']
+        })
+
+    settings = settings if settings is not None else get_company_settings()
+    documents = []
+    for invoice in invoices:
+        invoice_data = dict(invoice)
+        invoice_data['items'] = items_by_invoice.get(invoice['id'], [])
+        invoice_data.update(settings)
+        documents.append(invoice_data)
+    return documents
+
+
+def load_bills_bulk(start_date=None, end_date=None, vendor_id=None, settings=None):
+    """
+    Loads every matching bill with its items using two queries in total.
+
+    Returns:
+        list: Bill dicts ready for generate_bill_pdf, ordered by date.
+    """
+    where, params = _build_filters("b.date", "b.vendor_id", start_date, end_date, vendor_id)
+    bills = execute_read_query(f"""
+        SELECT b.*, v.name as vendor_name, v.address as vendor_address, v.gstin as vendor_gstin
+        FROM bills b
+        JOIN vendors v ON b.vendor_id = v.id
+        WHERE {where}
+        ORDER BY b.date, b.bill_number
+    """, params)
+    if not bills:
+        return []
+
+    items = execute_read_query(f"""
+        SELECT bi.*, it.name as item_name
+        FROM bill_items bi
+        JOIN items it ON bi.item_id = it.id
+        WHERE bi.bill_id IN (SELECT b.id FROM bills b WHERE {where})
+        ORDER BY bi.bill_id, bi.id
+    """, params)
+
+    items_by_bill = {}
+    for item in items:
+        items_by_bill.setdefault(item['bill_id'], []).append(dict(item))
+
+    settings = settings if settings is not None else get_company_settings()
+    documents = []
+    for bill in bills:
+        bill_data = dict(bill)
+        bill_data['items'] = items_by_bill.get(bill['id'], [])
+        bill_data.update(settings)
+        documents.append(bill_data)
+    return documents
+
+
+def load_receipts_bulk(start_date=None, end_date=None, customer_id=None, settings=None):
+    """
+    Loads customer payment receipts in a single query.
+
+    A receipt is one payment number; its rows are the allocations against
+    individual invoices (rows without an invoice are unallocated credit).
+
+    Returns:
+        list: Receipt dicts ready for generate_payment_receipt_pdf, ordered by date.
+    """
+    where, params = _build_filters("p.date", "p.customer_id", start_date, end_date, customer_id)
+    rows = execute_read_query(f"""
+        SELECT p.*, c.name as customer_name,
+               i.invoice_number, i.date as invoice_date, i.grand_total as invoice_total
+        FROM payments p
+        JOIN customers c ON p.customer_id = c.id
+        LEFT JOIN invoices i ON p.invoice_id = i.id
+        WHERE {where}
+        ORDER BY p.date, p.payment_number, p.id
+    """, params)
+    if not rows:
+        return []
+
+    settings = settings if settings is not None else get_company_settings()
+    receipts = {}
+    for row in rows:
+        key = row['payment_number'] or f"PAY-{row['id']}"
+        receipt = receipts.get(key)
+        if receipt is None:
+            receipt = dict(row)
+            receipt['payment_number'] = key
+            receipt['send_thank_you'] = bool(row['send_thank_you'])
+            receipt['amount_received'] = 0.0
+            receipt['allocations'] = []
+            receipt.update(settings)
+            receipts[key] = receipt
+        receipt['amount_received'] += row['amount'] or 0.0
+        if row['invoice_id']:
+            receipt['allocations'].append({
+                'date': row['invoice_date'],
+                'invoice_number': row['invoice_number'],
+                'invoice_total': row['invoice_total'] or 0.0,
+                'amount': row['amount'] or 0.0
+            })
+    return list(receipts.values())
+
+
+def load_documents(doc_types=DOC_TYPES, start_date=None, end_date=None, customer_id=None, vendor_id=None):
+    """
+    Loads all documents of the requested types for the given period/party.
+    A customer only has invoices and receipts and a vendor only bills, so
+    picking either one leaves out the document types of the other side.
+
+    Returns:
+        list: (doc_type, data) tuples, invoices first, then bills, then receipts.
+    """
+    settings = get_company_settings()
+    documents = []
+    if "invoice" in doc_types and not vendor_id:
+        documents += [("invoice", d) for d in load_invoices_bulk(start_date, end_date, customer_id, settings)]
+    if "bill" in doc_types and not customer_id:
+        documents += [("bill", d) for d in load_bills_bulk(start_date, end_date, vendor_id, settings)]
+    if "receipt" in doc_types and not vendor_id:
+        documents += [("receipt", d) for d in load_receipts_bulk(start_date, end_date, customer_id, settings)]
+    return documents
+
+
+def document_filename(doc_type, data):
+    """Returns a filesystem-safe file name such as 'invoice_INV-0001.pdf'."""
+    number = str(data.get(NUMBER_KEYS[doc_type]) or data.get('id', ''))
+    return f"{doc_type}_{re.sub(r'[^A-Za-z0-9._-]+', '_', number)}.pdf"
+
+
+def render_document(doc_type, data, filename):
+    """Renders one document to its own file. Runs inside the worker processes."""
+    RENDERERS[doc_type](data, filename)
+    return filename
+
+
+def _plan_filenames(documents, folder):
+    # Bill numbers are only unique per vendor, so suffix any repeats
+    seen = {}
+    jobs = []
+    for doc_type, data in documents:
+        name = document_filename(doc_type, data)
+        count = seen.get(name, 0)
+        seen[name] = count + 1
+        if count:
+            root, ext = os.path.splitext(name)
+            name = f"{root}_{count + 1}{ext}"
+        jobs.append((doc_type, data, os.path.join(folder, name)))
+    return jobs
+
+
+def _export_to_folder(documents, folder, max_workers, progress_callback, is_cancelled):
+    os.makedirs(folder, exist_ok=True)
+    jobs = _plan_filenames(documents, folder)
+    total = len(jobs)
+
+    if max_workers == 1 or total < 2:
+        for done, job in enumerate(jobs, start=1):
+            if is_cancelled and is_cancelled():
+                raise ReportCancelled("Bulk export was cancelled.")
+            render_document(*job)
+            if progress_callback:
+                progress_callback(done, total)
+        return [job[2] for job in jobs]
+
+    pool = ProcessPoolExecutor(max_workers=max_workers)
+    try:
+        futures = [pool.submit(render_document, *job) for job in jobs]
+        for done, future in enumerate(as_completed(futures), start=1):
+            if is_cancelled and is_cancelled():
+                raise ReportCancelled("Bulk export was cancelled.")
+            future.result()
+            if progress_callback:
+                progress_callback(done, total)
+    finally:
+        # Drops queued documents straight away when cancelled or on error
+        pool.shutdown(wait=True, cancel_futures=True)
+    return [job[2] for job in jobs]
+
+
+def _export_to_merged_file(documents, filename, progress_callback, is_cancelled):
+    # ReportLab cannot read PDFs back in, so a merged file is drawn on a single
+    # canvas in document order rather than stitched together from worker output.
+    folder = os.path.dirname(filename)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+
+    c = canvas.Canvas(filename, pagesize=A4, pageCompression=1)
+    total = len(documents)
+    for done, (doc_type, data) in enumerate(documents, start=1):
+        if is_cancelled and is_cancelled():
+            raise ReportCancelled("Bulk export was cancelled.")
+        PAGE_DRAWERS[doc_type](c, data)
+        c.showPage()
+        if progress_callback:
+            progress_callback(done, total)
+    c.save()
+    return [filename]
+
+
+def export_documents_pdf(documents, output, merged=False, max_workers=None,
+                         progress_callback=None, is_cancelled=None):
+    """
+    Renders already loaded documents either into a folder or a single PDF.
+
+    Folder output renders one file per document across a ProcessPoolExecutor.
+    Merged output writes every document into one PDF, one document per page.
+
+    Args:
+        documents (list): (doc_type, data) tuples from load_documents().
+        output (str): Target folder, or the merged PDF path when merged=True.
+        max_workers (int): Worker processes for folder output (default: CPU count).
+        progress_callback (callable): Called as progress_callback(done, total).
+        is_cancelled (callable): Returns True to stop; nothing further is rendered.
+
+    Returns:
+        dict: 'count', 'seconds', 'docs_per_sec', 'output' and 'files'.
+    """
+    started = time.perf_counter()
+    if merged:
+        files = _export_to_merged_file(documents, output, progress_callback, is_cancelled) if documents else []
+    else:
+        files = _export_to_folder(documents, output, max_workers, progress_callback, is_cancelled)
+    seconds = time.perf_counter() - started
+    return {
+        'count': len(documents),
+        'seconds': seconds,
+        'docs_per_sec': len(documents) / seconds if seconds > 0 else 0.0,
+        'output': output,
+        'files': files,
+    }
+
+
+def export_bulk_pdfs(output, doc_types=DOC_TYPES, start_date=None, end_date=None, customer_id=None,
+                     vendor_id=None, merged=False, max_workers=None, progress_callback=None, is_cancelled=None):
+    """Loads and renders all matching documents. Signature suits ui.workers.BackgroundTask."""
+    documents = load_documents(doc_types, start_date, end_date, customer_id, vendor_id)
+    return export_documents_pdf(documents, output, merged, max_workers, progress_callback, is_cancelled)
+
+
+def export_party_statements(output, party_type, start_date, end_date, party_id=None, merged=False,
+                            max_workers=None, progress_callback=None, is_cancelled=None):
+    """
+    Renders statements of account for one or every customer/vendor, e.g. for
+    month-end mailing. The statements come from a single query; folder
+    output renders them across worker processes like export_bulk_pdfs().
+    """
+    settings = get_company_settings()
+    documents = [
+        ("statement", dict(settings, **statement))
+        for statement in get_party_statements(party_type, start_date, end_date, party_id)
+    ]
+    return export_documents_pdf(documents, output, merged, max_workers, progress_callback, is_cancelled)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export invoice, bill and receipt PDFs in bulk.")
+    parser.add_argument("output", help="Output folder, or PDF file name with --merge")
+    parser.add_argument("--from", dest="start_date", help="Start date (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="end_date", help="End date (YYYY-MM-DD)")
+    parser.add_argument("--types", default=",".join(DOC_TYPES), help="Comma separated: invoice,bill,receipt")
+    parser.add_argument("--customer", type=int, help="Customer id")
+    parser.add_argument("--vendor", type=int, help="Vendor id")
+    parser.add_argument("--merge", action="store_true", help="Write a single merged PDF")
+    parser.add_argument("--workers", type=int, help="Number of worker processes")
+    args = parser.parse_args(argv)
+
+    doc_types = [t.strip() for t in args.types.split(",") if t.strip()]
+    unknown = [t for t in doc_types if t not in DOC_TYPES]
+    if unknown:
+        parser.error(f"Unknown document type(s): {', '.join(unknown)}")
+
+    result = export_bulk_pdfs(
+        args.output, doc_types, args.start_date, args.end_date, args.customer, args.vendor,
+        merged=args.merge, max_workers=args.workers
+    )
+    print(f"Exported {result['count']} documents to {result['output']} "
+          f"in {result['seconds']:.2f}s ({result['docs_per_sec']:.1f} docs/sec)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
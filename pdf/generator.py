@@ -1,45 +1,47 @@
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 from reportlab.lib import colors
-from reportlab.platypus import Table, TableStyle, SimpleDocTemplate, Paragraph, Spacer, Image
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import Table, TableStyle, SimpleDocTemplate, Paragraph, Spacer, Image, Frame, Flowable
+from reportlab.lib.styles import ParagraphStyle
 from reportlab.lib.units import inch, mm
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-import os
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from xml.sax.saxutils import escape
 import json
+from pdf.resources import get_unicode_font, get_logo_reader, get_stylesheet
 
-UNICODE_FONT_NAME = None
+# Bump whenever the layout of generated documents changes so cached PDFs are re-rendered
+TEMPLATE_VERSION = 3
 
+def _company_lines(data):
+    """Address, contact and GSTIN lines printed under the company name."""
+    lines = []
+    if data.get('company_address'):
+        lines.extend(data.get('company_address', '').split('\n'))
+    
+    contact_info = []
+    if data.get('company_email'): contact_info.append(f"Email: {data['company_email']}")
+    if data.get('company_phone'): contact_info.append(f"Ph: {data['company_phone']}")
+    if data.get('company_website'): contact_info.append(f"Web: {data['company_website']}")
+    if contact_info:
+        lines.append(" | ".join(contact_info))
+        
+    if data.get('company_gstin'):
+        lines.append(f"GSTIN: {data['company_gstin']}")
+    return lines
 
-def get_unicode_font():
-    global UNICODE_FONT_NAME
-    if UNICODE_FONT_NAME:
-        return UNICODE_FONT_NAME
-    font_candidates = [
-        ("ArialUnicode", r"C:\Windows\Fonts\arial.ttf"),
-        ("DejaVuSans", r"C:\Windows\Fonts\DejaVuSans.ttf"),
-    ]
-    for name, path in font_candidates:
-        try:
-            if os.path.exists(path):
-                pdfmetrics.registerFont(TTFont(name, path))
-                UNICODE_FONT_NAME = name
-                return UNICODE_FONT_NAME
-        except Exception as e:
-            print(f"Error registering font {name}: {e}")
-    UNICODE_FONT_NAME = "Helvetica"
-    return UNICODE_FONT_NAME
+def header_bottom(data):
+    """Returns the y coordinate draw_header() will return for data, without drawing anything."""
+    return A4[1] - 115 - 12 * len(_company_lines(data)) - 20
 
 def draw_header(c, data, title="INVOICE"):
     """Draws the header with logo and company details."""
     width, height = A4
     
     # Logo
-    logo_path = data.get('logo_path')
-    if logo_path and os.path.exists(logo_path):
+    logo = get_logo_reader(data.get('logo_path'))
+    if logo:
         try:
-            c.drawImage(logo_path, 30, height - 80, width=100, height=50, preserveAspectRatio=True, mask='auto')
+            c.drawImage(logo, 30, height - 80, width=100, height=50, preserveAspectRatio=True, mask='auto')
         except Exception as e:
             print(f"Error loading logo: {e}")
             
@@ -56,23 +58,8 @@ def draw_header(c, data, title="INVOICE"):
     
     c.setFont("Helvetica", 10)
     y = height - 115
-    if data.get('company_address'):
-        addr_lines = data.get('company_address', '').split('\n')
-        for line in addr_lines:
-            c.drawString(30, y, line)
-            y -= 12
-    
-    contact_info = []
-    if data.get('company_email'): contact_info.append(f"Email: {data['company_email']}")
-    if data.get('company_phone'): contact_info.append(f"Ph: {data['company_phone']}")
-    if data.get('company_website'): contact_info.append(f"Web: {data['company_website']}")
-    
-    if contact_info:
-        c.drawString(30, y, " | ".join(contact_info))
-        y -= 12
-        
-    if data.get('company_gstin'):
-        c.drawString(30, y, f"GSTIN: {data['company_gstin']}")
+    for line in _company_lines(data):
+        c.drawString(30, y, line)
         y -= 12
         
     # Divider
@@ -121,15 +108,280 @@ def draw_status_badge(c, status, x, y):
     
     c.restoreState()
 
+# Items table geometry for invoices and bills. Row heights are worked out up
+# front (one line is the height Table gave rows before; text too wide for its
+# column wraps onto more) so each page's rows can be sliced before drawing and
+# no Table ever has to measure or split more than one page worth of rows.
+ITEM_HEADER_ROW_HEIGHT = 27
+ITEM_ROW_HEIGHT = 18
+ITEM_CELL_PADDING = (12, 6) # Table's default left + right, top + bottom padding
+ITEM_CELL_MAX_CHARS = 300
+PAGE_BOTTOM_MARGIN = 50
+CONTINUATION_TABLE_TOP = A4[1] - 75
+
+ITEM_CELL_STYLE = ParagraphStyle('ItemCell', fontName='Helvetica', fontSize=10, leading=12)
+
+def fit_item_row(row, col_widths):
+    """
+    Returns the row with text wider than its column (or with line breaks)
+    turned into wrapping Paragraphs, and the height the row needs.
+    """
+    cells = []
+    height = ITEM_ROW_HEIGHT
+    for text, col_width in zip(row, col_widths):
+        if isinstance(text, str):
+            available = col_width - ITEM_CELL_PADDING[0]
+            if "\n" in text or stringWidth(text, ITEM_CELL_STYLE.fontName, ITEM_CELL_STYLE.fontSize) > available:
+                if len(text) > ITEM_CELL_MAX_CHARS:
+                    text = text[:ITEM_CELL_MAX_CHARS - 3] + "..."
+                text = Paragraph(escape(text).replace("\n", "<br/>"), ITEM_CELL_STYLE)
+                height = max(height, text.wrap(available, A4[1])[1] + ITEM_CELL_PADDING[1])
+        cells.append(text)
+    return cells, height
+
+_ITEM_TABLE_STYLES = {}
+
+def get_item_table_style(brought_forward=False, carried_forward=False):
+    """Returns the cached TableStyle for one page of an items table."""
+    key = (brought_forward, carried_forward)
+    if key not in _ITEM_TABLE_STYLES:
+        commands = [
+            ('BACKGROUND', (0, 0), (-1, 0), colors.Color(0.9, 0.9, 0.9)),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('ALIGN', (0, 0), (0, -1), 'LEFT'), # Align items left
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+        ]
+        subtotal_rows = ([1] if brought_forward else []) + ([-1] if carried_forward else [])
+        for row in subtotal_rows:
+            commands.append(('FONTNAME', (0, row), (-1, row), 'Helvetica-Oblique'))
+            commands.append(('BACKGROUND', (0, row), (-1, row), colors.Color(0.95, 0.95, 0.95)))
+        _ITEM_TABLE_STYLES[key] = TableStyle(commands)
+    return _ITEM_TABLE_STYLES[key]
+
+def _custom_field_lines(data):
+    lines = []
+    if data.get('custom_fields'):
+        try:
+            custom_fields = json.loads(data['custom_fields'])
+            if custom_fields:
+                lines.append(("Helvetica-Bold", 10, "Additional Information:", 12))
+                for key, value in custom_fields.items():
+                    lines.append(("Helvetica", 9, f"{key}: {value}", 12))
+        except Exception:
+            pass
+    return lines
+
+class DocumentTotals(Flowable):
+    """Totals on the right and notes on the left, as drawn under the items table."""
+
+    def __init__(self, total_lines, grand_total_line, note_lines):
+        super().__init__()
+        self.total_lines = total_lines
+        self.grand_total_line = grand_total_line
+        # (font, size, text, space below) tuples
+        self.note_lines = note_lines
+
+    def wrap(self, availWidth, availHeight):
+        self.width = availWidth
+        totals_height = 15 * len(self.total_lines) + 5
+        notes_height = sum(line[3] for line in self.note_lines)
+        self.height = 20 + max(totals_height, notes_height) + 4
+        return self.width, self.height
+
+    def draw(self):
+        c = self.canv
+        total_y = self.height - 20
+        c.setFont("Helvetica-Bold", 10)
+        for line in self.total_lines:
+            c.drawRightString(self.width, total_y, line)
+            total_y -= 15
+        c.setFont("Helvetica-Bold", 12)
+        c.drawRightString(self.width, total_y - 5, self.grand_total_line)
+
+        notes_y = self.height - 20
+        for font, size, text, space_below in self.note_lines:
+            c.setFont(font, size)
+            c.drawString(0, notes_y, text)
+            notes_y -= space_below
+
+def draw_continuation_header(c, data, title, document_number):
+    """Compact header for the second and later pages of a long document."""
+    width, height = A4
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(30, height - 50, data.get('company_name', 'Company Name'))
+    c.setFont("Helvetica-Bold", 12)
+    c.drawRightString(width - 30, height - 50, f"{title} #{document_number} (continued)")
+    c.setLineWidth(1)
+    c.line(30, height - 60, width - 30, height - 60)
+
+def draw_page_footer(c, footer_text, page_number, page_count):
+    width, height = A4
+    c.setFont("Helvetica", 8)
+    c.drawCentredString(width/2, 30, footer_text)
+    if page_count > 1:
+        c.drawRightString(width - 30, 30, f"Page {page_number} of {page_count}")
+
+def draw_item_document(c, data, title, document_number, headers, col_widths, rows, amounts,
+                       draw_details, totals, footer_text):
+    """
+    Lays out an invoice or bill over as many pages as its items need.
+
+    Every page repeats the table header. When the items continue, the page ends
+    with a "Carried forward" running subtotal and the next page starts with the
+    same amount "Brought forward". The totals block follows the last row, or
+    moves to a new page if it does not fit.
+    """
+    width, height = A4
+    table_top = header_bottom(data) - 100
+    frame_width = max(width - 60, sum(col_widths))
+    fitted = [fit_item_row(row, col_widths) for row in rows]
+    rows = [cells for cells, _ in fitted]
+    heights = [row_height for _, row_height in fitted]
+
+    # Plan the pages up front so every page can say "Page x of y"
+    chunks = []
+    start = 0
+    available = table_top - PAGE_BOTTOM_MARGIN - ITEM_HEADER_ROW_HEIGHT
+    while True:
+        if sum(heights[start:]) <= available:
+            chunks.append((start, len(rows)))
+            break
+        # Leave room for the carried forward row
+        end, used = start, ITEM_ROW_HEIGHT
+        while end < len(rows) and used + heights[end] <= available:
+            used += heights[end]
+            end += 1
+        end = max(end, start + 1)
+        chunks.append((start, end))
+        start = end
+        # Continuation pages start with the brought forward row
+        available = CONTINUATION_TABLE_TOP - PAGE_BOTTOM_MARGIN - ITEM_HEADER_ROW_HEIGHT - ITEM_ROW_HEIGHT
+
+    def new_frame(top):
+        return Frame(30, PAGE_BOTTOM_MARGIN, frame_width, top - PAGE_BOTTOM_MARGIN,
+                     leftPadding=0, bottomPadding=0, rightPadding=0, topPadding=0)
+
+    # Build every page's table before drawing anything
+    tables = []
+    running_total = 0.0
+    blank = [""] * (len(headers) - 2)
+    for index, (start, end) in enumerate(chunks):
+        body = []
+        row_heights = [ITEM_HEADER_ROW_HEIGHT]
+        if index > 0:
+            body.append(["Brought forward"] + blank + [f"{running_total:.2f}"])
+            row_heights.append(ITEM_ROW_HEIGHT)
+        body.extend(rows[start:end])
+        row_heights.extend(heights[start:end])
+        running_total += sum(amounts[start:end])
+        is_last = index == len(chunks) - 1
+        if not is_last:
+            body.append(["Carried forward"] + blank + [f"{running_total:.2f}"])
+            row_heights.append(ITEM_ROW_HEIGHT)
+
+        table = Table([headers] + body, colWidths=col_widths, rowHeights=row_heights)
+        table.hAlign = 'LEFT'
+        table.setStyle(get_item_table_style(index > 0, not is_last))
+        tables.append(table)
+
+    # Measure the totals against the frame the last table is drawn in, so the
+    # page count is final before the first footer goes out
+    frame_height = (table_top if len(chunks) == 1 else CONTINUATION_TABLE_TOP) - PAGE_BOTTOM_MARGIN
+    table_height = tables[-1].wrap(frame_width, frame_height)[1]
+    totals_height = totals.wrap(frame_width, frame_height - table_height)[1]
+    totals_on_new_page = table_height + totals_height > frame_height
+    page_count = len(chunks) + (1 if totals_on_new_page else 0)
+
+    def start_continuation_page(page_number):
+        c.showPage()
+        draw_continuation_header(c, data, title, document_number)
+        draw_page_footer(c, footer_text, page_number, page_count)
+        return new_frame(CONTINUATION_TABLE_TOP)
+
+    page_number = 1
+    for index, table in enumerate(tables):
+        if index == 0:
+            y = draw_header(c, data, title)
+            draw_details(c, data, y)
+            draw_page_footer(c, footer_text, page_number, page_count)
+            frame = new_frame(table_top)
+        else:
+            page_number += 1
+            frame = start_continuation_page(page_number)
+        if not frame.add(table, c):
+            raise Exception(f"Items table does not fit on page {page_number}")
+
+    if totals_on_new_page:
+        page_number += 1
+        frame = start_continuation_page(page_number)
+    if not frame.add(totals, c):
+        raise Exception(f"Totals do not fit on page {page_number}")
+
 def generate_invoice_pdf(invoice_data, filename="invoice.pdf"):
     """
     Generates a PDF invoice with enhanced details.
     """
     c = canvas.Canvas(filename, pagesize=A4)
+    draw_invoice(c, invoice_data)
+    c.save()
+
+def draw_invoice(c, invoice_data):
+    """
+    Draws an invoice starting on the current page of canvas c.
+
+    Long invoices continue onto further pages (c.showPage() is called between
+    them); the caller still ends the last page.
+    """
+    items = invoice_data.get('items', [])
+    rows = [[
+        item.get('name', 'Unknown'),
+        str(item.get('quantity', 0)),
+        f"{item.get('rate', 0):.2f}",
+        f"{item.get('discount_percent', 0)}%",
+        f"{item.get('gst_percent', 0)}%",
+        f"{item.get('amount', 0):.2f}"
+    ] for item in items]
+
+    total_lines = [
+        f"Subtotal: {invoice_data.get('subtotal', 0):.2f}",
+        f"Tax: {invoice_data.get('tax_amount', 0):.2f}",
+    ]
+    if invoice_data.get('discount_amount'):
+        total_lines.append(f"Discount: -{invoice_data.get('discount_amount', 0):.2f}")
+    if invoice_data.get('tds_amount'):
+        total_lines.append(f"TDS: -{invoice_data.get('tds_amount', 0):.2f}")
+    if invoice_data.get('tcs_amount'):
+        total_lines.append(f"TCS: +{invoice_data.get('tcs_amount', 0):.2f}")
+    if invoice_data.get('adjustment'):
+        total_lines.append(f"Adjustment: {invoice_data.get('adjustment', 0):.2f}")
+    if invoice_data.get('round_off'):
+        total_lines.append(f"Round Off: {invoice_data.get('round_off', 0):.2f}")
+
+    # Notes & Terms (Left Side)
+    note_lines = []
+    if invoice_data.get('customer_notes'):
+        note_lines.append(("Helvetica-Bold", 10, "Notes:", 12))
+        note_lines.append(("Helvetica", 9, str(invoice_data['customer_notes'])[:80], 18))
+    if invoice_data.get('terms_conditions'):
+        note_lines.append(("Helvetica-Bold", 10, "Terms & Conditions:", 12))
+        note_lines.append(("Helvetica", 9, str(invoice_data['terms_conditions'])[:80], 18))
+    note_lines.extend(_custom_field_lines(invoice_data))
+
+    totals = DocumentTotals(total_lines, f"Grand Total: {invoice_data.get('grand_total', 0):.2f}", note_lines)
+
+    draw_item_document(
+        c, invoice_data, "INVOICE", invoice_data.get('invoice_number', ''),
+        ["Item", "Qty", "Rate", "Disc %", "GST %", "Amount"], [220, 50, 70, 50, 50, 90],
+        rows, [item.get('amount', 0) or 0 for item in items],
+        _draw_invoice_details, totals, "Generated by BR31-Technologies_LedgerPro"
+    )
+
+def _draw_invoice_details(c, invoice_data, y):
     width, height = A4
     
-    y = draw_header(c, invoice_data, "INVOICE")
-    
     # Status Badge
     draw_status_badge(c, invoice_data.get('status', ''), width - 30, y + 30)
     
@@ -163,127 +415,57 @@ def generate_invoice_pdf(invoice_data, filename="invoice.pdf"):
         
     if invoice_data.get('customer_gstin'):
         c.drawString(30, ay, f"GSTIN: {invoice_data['customer_gstin']}")
-        
-    # Table Start Position
-    table_y = y - 100
-    
-    # Items Table
-    data = [["Item", "Qty", "Rate", "Disc %", "GST %", "Amount"]]
-    
-    for item in invoice_data.get('items', []):
-        name = item.get('name', 'Unknown')
-        qty = str(item.get('quantity', 0))
-        rate = f"{item.get('rate', 0):.2f}"
-        disc = f"{item.get('discount_percent', 0)}%"
-        gst = f"{item.get('gst_percent', 0)}%"
-        amt = f"{item.get('amount', 0):.2f}"
-        
-        data.append([name, qty, rate, disc, gst, amt])
-        
-    # Column Widths
-    col_widths = [220, 50, 70, 50, 50, 90]
-    
-    table = Table(data, colWidths=col_widths)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.Color(0.9, 0.9, 0.9)),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('ALIGN', (0, 0), (0, -1), 'LEFT'), # Align items left
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-    ]))
-    
-    table.wrapOn(c, width, height)
-    # Calculate height of table
-    table_height = len(data) * 20 # Approx
-    
-    # Check if table fits
-    if table_y - table_height < 100:
-        # If table is too long, we might need new page logic, but for now just let it run or clip
-        # Real impl would handle pagination
-        pass
-        
-    table.drawOn(c, 30, table_y - table_height)
-    
-    # Totals Section
-    total_y = table_y - table_height - 20
-    
-    c.setFont("Helvetica-Bold", 10)
-    c.drawRightString(width - 30, total_y, f"Subtotal: {invoice_data.get('subtotal', 0):.2f}")
-    total_y -= 15
-    c.drawRightString(width - 30, total_y, f"Tax: {invoice_data.get('tax_amount', 0):.2f}")
-    total_y -= 15
-    
-    if invoice_data.get('discount_amount'):
-        c.drawRightString(width - 30, total_y, f"Discount: -{invoice_data.get('discount_amount', 0):.2f}")
-        total_y -= 15
-        
-    if invoice_data.get('tds_amount'):
-        c.drawRightString(width - 30, total_y, f"TDS: -{invoice_data.get('tds_amount', 0):.2f}")
-        total_y -= 15
-        
-    if invoice_data.get('tcs_amount'):
-        c.drawRightString(width - 30, total_y, f"TCS: +{invoice_data.get('tcs_amount', 0):.2f}")
-        total_y -= 15
-        
-    if invoice_data.get('adjustment'):
-        c.drawRightString(width - 30, total_y, f"Adjustment: {invoice_data.get('adjustment', 0):.2f}")
-        total_y -= 15
-        
-    if invoice_data.get('round_off'):
-        c.drawRightString(width - 30, total_y, f"Round Off: {invoice_data.get('round_off', 0):.2f}")
-        total_y -= 15
-        
-    c.setFont("Helvetica-Bold", 12)
-    c.drawRightString(width - 30, total_y - 5, f"Grand Total: {invoice_data.get('grand_total', 0):.2f}")
-    
-    # Notes & Terms (Left Side)
-    notes_y = table_y - table_height - 20
-    c.setFont("Helvetica-Bold", 10)
-    
-    if invoice_data.get('customer_notes'):
-        c.drawString(30, notes_y, "Notes:")
-        c.setFont("Helvetica", 9)
-        # Wrap text if needed (simple implementation)
-        c.drawString(30, notes_y - 12, str(invoice_data['customer_notes'])[:80]) 
-        notes_y -= 30
-        
-    c.setFont("Helvetica-Bold", 10)
-    if invoice_data.get('terms_conditions'):
-        c.drawString(30, notes_y, "Terms & Conditions:")
-        c.setFont("Helvetica", 9)
-        c.drawString(30, notes_y - 12, str(invoice_data['terms_conditions'])[:80])
-        notes_y -= 30
-
-    # Custom Fields
-    if invoice_data.get('custom_fields'):
-        try:
-            custom_fields = json.loads(invoice_data['custom_fields'])
-            if custom_fields:
-                c.setFont("Helvetica-Bold", 10)
-                c.drawString(30, notes_y, "Additional Information:")
-                c.setFont("Helvetica", 9)
-                notes_y -= 12
-                for key, value in custom_fields.items():
-                    c.drawString(30, notes_y, f"{key}: {value}")
-                    notes_y -= 12
-        except:
-            pass
-        
-    # Footer
-    c.setFont("Helvetica", 8)
-    c.drawCentredString(width/2, 30, "Generated by BR31-Technologies_LedgerPro")
-    
-    c.save()
 
 def generate_bill_pdf(bill_data, filename="bill.pdf"):
     """Generates a PDF for Purchase Bill."""
     c = canvas.Canvas(filename, pagesize=A4)
+    draw_bill(c, bill_data)
+    c.save()
+
+def draw_bill(c, bill_data):
+    """
+    Draws a purchase bill starting on the current page of canvas c.
+
+    Long bills continue onto further pages (c.showPage() is called between
+    them); the caller still ends the last page.
+    """
+    items = bill_data.get('items', [])
+    rows = [[
+        item.get('name') or item.get('item_name', 'Unknown'),
+        str(item.get('quantity', 0)),
+        f"{item.get('rate', 0):.2f}",
+        f"{item.get('gst_percent', 0)}%",
+        f"{item.get('amount', 0):.2f}"
+    ] for item in items]
+
+    total_lines = [
+        f"Subtotal: {bill_data.get('subtotal', 0):.2f}",
+        f"Tax: {bill_data.get('tax_amount', 0):.2f}",
+    ]
+    if bill_data.get('discount_amount'):
+        total_lines.append(f"Discount: -{bill_data.get('discount_amount', 0):.2f}")
+    if bill_data.get('tds_amount'):
+        total_lines.append(f"TDS: -{bill_data.get('tds_amount', 0):.2f}")
+    if bill_data.get('tcs_amount'):
+        total_lines.append(f"TCS: +{bill_data.get('tcs_amount', 0):.2f}")
+    if bill_data.get('adjustment'):
+        total_lines.append(f"Adjustment: {bill_data.get('adjustment', 0):.2f}")
+
+    # Bill notes are internal and not printed; only custom fields go on the page
+    totals = DocumentTotals(
+        total_lines, f"Grand Total: {bill_data.get('grand_total', 0):.2f}", _custom_field_lines(bill_data)
+    )
+
+    draw_item_document(
+        c, bill_data, "PURCHASE BILL", bill_data.get('bill_number', ''),
+        ["Item", "Qty", "Rate", "GST %", "Amount"], [250, 60, 80, 60, 90],
+        rows, [item.get('amount', 0) or 0 for item in items],
+        _draw_bill_details, totals, "Generated by LedgerPro"
+    )
+
+def _draw_bill_details(c, bill_data, y):
     width, height = A4
     
-    y = draw_header(c, bill_data, "PURCHASE BILL")
-    
     # Status Badge
     draw_status_badge(c, bill_data.get('status', ''), width - 30, y + 30)
     
@@ -325,99 +507,15 @@ def generate_bill_pdf(bill_data, filename="bill.pdf"):
         
     if bill_data.get('vendor_gstin'):
         c.drawString(30, ay, f"GSTIN: {bill_data['vendor_gstin']}")
-    
-    # Table
-    table_y = y - 100
-    data = [["Item", "Qty", "Rate", "GST %", "Amount"]]
-    
-    for item in bill_data.get('items', []):
-        name = item.get('name') or item.get('item_name', 'Unknown')
-        data.append([
-            name,
-            str(item.get('quantity', 0)),
-            f"{item.get('rate', 0):.2f}",
-            f"{item.get('gst_percent', 0)}%",
-            f"{item.get('amount', 0):.2f}"
-        ])
-        
-    col_widths = [250, 60, 80, 60, 90]
-    table = Table(data, colWidths=col_widths)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.Color(0.9, 0.9, 0.9)),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-    ]))
-    
-    table.wrapOn(c, width, height)
-    table_height = len(data) * 20
-    table.drawOn(c, 30, table_y - table_height)
-    
-    # Totals
-    total_y = table_y - table_height - 20
-    c.setFont("Helvetica-Bold", 10)
-    c.drawRightString(width - 30, total_y, f"Subtotal: {bill_data.get('subtotal', 0):.2f}")
-    total_y -= 15
-    c.drawRightString(width - 30, total_y, f"Tax: {bill_data.get('tax_amount', 0):.2f}")
-    total_y -= 15
-    
-    if bill_data.get('discount_amount'):
-        c.drawRightString(width - 30, total_y, f"Discount: -{bill_data.get('discount_amount', 0):.2f}")
-        total_y -= 15
-    
-    if bill_data.get('tds_amount'):
-        c.drawRightString(width - 30, total_y, f"TDS: -{bill_data.get('tds_amount', 0):.2f}")
-        total_y -= 15
-        
-    if bill_data.get('tcs_amount'):
-        c.drawRightString(width - 30, total_y, f"TCS: +{bill_data.get('tcs_amount', 0):.2f}")
-        total_y -= 15
-        
-    if bill_data.get('adjustment'):
-        c.drawRightString(width - 30, total_y, f"Adjustment: {bill_data.get('adjustment', 0):.2f}")
-        total_y -= 15
-        
-    c.setFont("Helvetica-Bold", 12)
-    c.drawRightString(width - 30, total_y - 5, f"Grand Total: {bill_data.get('grand_total', 0):.2f}")
-    
-    # Notes - Removed as per user request (Internal use only)
-    # if bill_data.get('notes'):
-    #    notes_y = table_y - table_height - 20
-    #    c.setFont("Helvetica-Bold", 10)
-    #    c.drawString(30, notes_y, "Notes:")
-    #    c.setFont("Helvetica", 9)
-    #    c.drawString(30, notes_y - 12, str(bill_data['notes'])[:80])
-    #    notes_y -= 30
-    # else:
-    notes_y = table_y - table_height - 20
-
-    # Custom Fields
-    if bill_data.get('custom_fields'):
-        try:
-            custom_fields = json.loads(bill_data['custom_fields'])
-            if custom_fields:
-                c.setFont("Helvetica-Bold", 10)
-                c.drawString(30, notes_y, "Additional Information:")
-                c.setFont("Helvetica", 9)
-                notes_y -= 12
-                for key, value in custom_fields.items():
-                    c.drawString(30, notes_y, f"{key}: {value}")
-                    notes_y -= 12
-        except:
-            pass
-
-    # Footer
-    c.setFont("Helvetica", 8)
-    c.drawCentredString(width/2, 30, "Generated by LedgerPro")
-    
-    c.save()
 
 def generate_payment_receipt_pdf(payment_data, filename="receipt.pdf"):
     """Generates a PDF Receipt for Payment Received."""
     c = canvas.Canvas(filename, pagesize=A4)
+    draw_payment_receipt(c, payment_data)
+    c.save()
+
+def draw_payment_receipt(c, payment_data):
+    """Draws a payment receipt onto the current page of canvas c."""
     width, height = A4
     
     y = draw_header(c, payment_data, "PAYMENT RECEIPT")
@@ -508,9 +606,77 @@ def generate_payment_receipt_pdf(payment_data, filename="receipt.pdf"):
     # Footer
     c.setFont("Helvetica", 8)
     c.drawCentredString(width/2, 30, "Generated by LedgerPro")
-    
+
+def generate_statement_pdf(statement_data, filename="statement.pdf"):
+    """Generates a statement of account PDF for a customer or vendor."""
+    c = canvas.Canvas(filename, pagesize=A4)
+    draw_statement(c, statement_data)
     c.save()
 
+def draw_statement(c, statement_data):
+    """
+    Draws a statement of account starting on the current page of canvas c.
+
+    The opening balance is the first row and the last column is the running
+    balance, so pages carry the balance forward like invoice subtotals.
+    """
+    paid_label = "Received" if statement_data.get('party_type') == 'customer' else "Paid"
+    rows = [[statement_data.get('start_date', ''), "", "", "Opening Balance", "", "",
+             f"{statement_data.get('opening_balance', 0):.2f}"]]
+    amounts = [statement_data.get('opening_balance', 0) or 0]
+    for line in statement_data.get('lines', []):
+        rows.append([
+            line.get('date', ''),
+            line.get('type', ''),
+            line.get('number', ''),
+            line.get('details') or '',
+            f"{line['billed']:.2f}" if line.get('billed') else "",
+            f"{line['settled']:.2f}" if line.get('settled') else "",
+            f"{line.get('balance', 0):.2f}",
+        ])
+        amounts.append((line.get('billed') or 0) - (line.get('settled') or 0))
+
+    totals = DocumentTotals(
+        [
+            f"Opening Balance: {statement_data.get('opening_balance', 0):.2f}",
+            f"Billed: {statement_data.get('total_billed', 0):.2f}",
+            f"{paid_label}: {statement_data.get('total_settled', 0):.2f}",
+        ],
+        f"Closing Balance: {statement_data.get('closing_balance', 0):.2f}",
+        []
+    )
+
+    draw_item_document(
+        c, statement_data, "STATEMENT OF ACCOUNT", statement_data.get('party_name', ''),
+        ["Date", "Type", "Number", "Details", "Billed", paid_label, "Balance"], [65, 55, 80, 125, 70, 70, 70],
+        rows, amounts, _draw_statement_details, totals, "Generated by LedgerPro"
+    )
+
+def _draw_statement_details(c, statement_data, y):
+    width, height = A4
+
+    c.setFont("Helvetica-Bold", 10)
+    c.drawString(30, y, "Statement For:" if statement_data.get('party_type') == 'customer' else "Vendor:")
+    c.setFont("Helvetica", 10)
+    c.drawString(30, y - 15, statement_data.get('party_name', ''))
+    line_y = y - 30
+    for line in (statement_data.get('party_address') or '').split('\n')[:3]:
+        if line:
+            c.drawString(30, line_y, line)
+            line_y -= 12
+    if statement_data.get('party_gstin'):
+        c.drawString(30, line_y, f"GSTIN: {statement_data['party_gstin']}")
+
+    right_x = width - 200
+    c.setFont("Helvetica-Bold", 10)
+    c.drawString(right_x, y, "Statement Period")
+    c.setFont("Helvetica", 10)
+    c.drawString(right_x, y - 15, f"From: {statement_data.get('start_date', '')}")
+    c.drawString(right_x, y - 30, f"To: {statement_data.get('end_date', '')}")
+    balance = statement_data.get('closing_balance', 0)
+    c.setFont("Helvetica-Bold", 10)
+    c.drawString(right_x, y - 50, f"Balance Due: {balance:.2f}")
+
 def generate_price_list_pdf(items, filename="price_list.pdf"):
     """
     Generates a PDF price list (rates).
@@ -518,7 +684,7 @@ def generate_price_list_pdf(items, filename="price_list.pdf"):
     """
     doc = SimpleDocTemplate(filename, pagesize=A4)
     elements = []
-    styles = getSampleStyleSheet()
+    styles = get_stylesheet()
     
     # Title
     elements.append(Paragraph("Price List / Rates", styles['Title']))
@@ -548,6 +714,26 @@ def generate_price_list_pdf(items, filename="price_list.pdf"):
     elements.append(table)
     doc.build(elements)
 
+# Manual column width adjustments for known reports
+# A4 Width ~ 595. Margins 30+30=60. Available ~535.
+REPORT_COL_WIDTHS = {
+    "STOCK VALUATION": [215, 80, 70, 80, 90],
+    "SALES REPORT": [70, 195, 80, 100, 90],
+    "PURCHASE REPORT": [70, 195, 80, 100, 90],
+    "OUTSTANDING INVOICES": [70, 195, 80, 90, 100],
+    "PRICE LIST": [250, 135, 150],
+    "AR AGING REPORT": [70, 165, 80, 70, 60, 90],
+    "AP AGING REPORT": [70, 165, 80, 70, 60, 90],
+}
+
+def get_report_col_widths(title, col_count):
+    """Returns column widths for a report, falling back to equal widths."""
+    widths = REPORT_COL_WIDTHS.get(title.upper())
+    if widths and len(widths) == col_count:
+        return list(widths)
+    available_width = A4[0] - 60 # 30 left, 30 right margin
+    return [available_width / col_count] * col_count
+
 def generate_generic_report_pdf(report_data, headers, rows, filename="report.pdf", title="REPORT"):
     """
     Generates a generic PDF report with company header and a table.
@@ -623,30 +809,7 @@ def generate_generic_report_pdf(report_data, headers, rows, filename="report.pdf
             f"₹{stock_total_value:.2f}"
         ])
     
-    available_width = width - 60 # 30 left, 30 right margin
-    col_count = len(headers)
-    
-    # Manual column width adjustments
-    # A4 Width ~ 595. Margins 30+30=60. Available ~535.
-    custom_col_widths = {
-        "STOCK VALUATION": [215, 80, 70, 80, 90],
-        "SALES REPORT": [70, 195, 80, 100, 90],
-        "PURCHASE REPORT": [70, 195, 80, 100, 90],
-        "OUTSTANDING INVOICES": [70, 195, 80, 90, 100],
-        "PRICE LIST": [250, 135, 150],
-        "AR AGING REPORT": [70, 165, 80, 70, 60, 90],
-        "AP AGING REPORT": [70, 165, 80, 70, 60, 90],
-    }
-    
-    col_widths = None
-    if title.upper() in custom_col_widths:
-        widths = custom_col_widths[title.upper()]
-        if len(widths) == col_count:
-            col_widths = widths
-            
-    if not col_widths:
-        col_width = available_width / col_count
-        col_widths = [col_width] * col_count
+    col_widths = get_report_col_widths(title, len(headers))
     
     table = Table(data, colWidths=col_widths, repeatRows=1)
     body_font = get_unicode_font()
@@ -0,0 +1,131 @@
+import os
+import glob
+import json
+import shutil
+import hashlib
+from database.db import current_db
+from pdf.generator import TEMPLATE_VERSION
+
+# Rendered documents live next to the database so each install (and each
+# company) has its own cache, unless CACHE_DIR is set
+CACHE_DIR = None
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+
+
+def _file_signature(path):
+    # The logo is referenced by path, so a replaced file must still change the key
+    if path and os.path.exists(path):
+        stat = os.stat(path)
+        return [stat.st_size, stat.st_mtime_ns]
+    return None
+
+
+def document_cache_key(doc_type, data):
+    """
+    Hashes everything that ends up on the page.
+
+    The document data carries the row version, which every update of the
+    invoice or bill moves on (edits, payments, status changes; see
+    database/concurrency.py), plus the merged company settings. So a render
+    goes stale by itself, whichever process made the change, and the write
+    paths never have to touch the cache.
+    """
+    payload = {
+        'doc_type': doc_type,
+        'template_version': TEMPLATE_VERSION,
+        'version': data.get('version'),
+        'logo': _file_signature(data.get('logo_path')),
+        'data': data,
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def cache_dir():
+    return CACHE_DIR or os.path.join(os.path.dirname(current_db()), "pdf_cache")
+
+
+def cache_path(doc_type, doc_id, key):
+    return os.path.join(cache_dir(), f"{doc_type}_{doc_id}_{key[:32]}.pdf")
+
+
+def render_cached_pdf(doc_type, doc_id, data, render_fn, filename):
+    """
+    Writes the PDF for a document to filename, reusing the cached copy when
+    nothing on the page has changed since it was last rendered.
+
+    Args:
+        doc_type (str): 'invoice', 'bill' or 'receipt'.
+        doc_id (int): Database id, used to invalidate every cached version of the document.
+        data (dict): Data passed to render_fn.
+        render_fn (callable): Generator such as generate_invoice_pdf(data, filename).
+        filename (str): Output path.
+
+    Returns:
+        bool: True if the PDF was served from the cache.
+    """
+    cached = cache_path(doc_type, doc_id, document_cache_key(doc_type, data))
+    if os.path.exists(cached):
+        try:
+            # Touch so eviction sees this entry as recently used
+            os.utime(cached)
+            shutil.copyfile(cached, filename)
+            return True
+        except OSError as e:
+            print(f"Warning: Could not read cached PDF {cached}: {e}")
+
+    render_fn(data, filename)
+
+    try:
+        os.makedirs(cache_dir(), exist_ok=True)
+        # Older renders of this document can never be hit again
+        invalidate_document(doc_type, doc_id)
+        temp_path = cached + ".tmp"
+        shutil.copyfile(filename, temp_path)
+        os.replace(temp_path, cached)
+        evict_render_cache()
+    except OSError as e:
+        print(f"Warning: Could not update PDF cache: {e}")
+    return False
+
+
+def invalidate_document(doc_type, doc_id):
+    """Removes all cached renders of one document."""
+    for path in glob.glob(os.path.join(cache_dir(), f"{doc_type}_{doc_id}_*.pdf")):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def clear_render_cache():
+    """Removes every cached PDF, e.g. after the company profile or database changes."""
+    for path in glob.glob(os.path.join(cache_dir(), "*.pdf")):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def evict_render_cache(max_bytes=MAX_CACHE_BYTES):
+    """Deletes least recently used PDFs until the cache fits in max_bytes."""
+    entries = []
+    total = 0
+    for path in glob.glob(os.path.join(cache_dir(), "*.pdf")):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime_ns, stat.st_size, path))
+        total += stat.st_size
+
+    entries.sort()
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+    return total
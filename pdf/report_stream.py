@@ -0,0 +1,174 @@
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+from reportlab.lib import colors
+from reportlab.platypus import Table, TableStyle
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from pdf.generator import draw_header, get_report_col_widths
+from pdf.resources import get_unicode_font
+
+# Fixed geometry so every page holds the same number of rows and no
+# Table ever has to measure more than one page worth of cells.
+FONT_SIZE = 8
+HEADER_ROW_HEIGHT = 22
+ROW_HEIGHT = 14
+CELL_PADDING = 6
+BOTTOM_MARGIN = 50
+
+_TABLE_STYLES = {}
+
+
+class ReportCancelled(Exception):
+    """Raised when a streaming report is cancelled before it is saved."""
+    pass
+
+
+def get_report_table_style(body_font, with_total_row=False):
+    """Returns a cached TableStyle for report pages (built once per font)."""
+    key = (body_font, with_total_row)
+    if key not in _TABLE_STYLES:
+        commands = [
+            ('BACKGROUND', (0, 0), (-1, 0), colors.Color(0.9, 0.9, 0.9)),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTNAME', (0, 1), (-1, -1), body_font),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('FONTSIZE', (0, 0), (-1, -1), FONT_SIZE),
+            ('TOPPADDING', (0, 0), (-1, -1), 1),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 1),
+        ]
+        if with_total_row:
+            commands.append(('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'))
+            commands.append(('BACKGROUND', (0, -1), (-1, -1), colors.Color(0.95, 0.95, 0.95)))
+        _TABLE_STYLES[key] = TableStyle(commands)
+    return _TABLE_STYLES[key]
+
+
+def fit_text(text, font_name, max_width):
+    """Truncates text with an ellipsis so it fits in a single table cell."""
+    if stringWidth(text, font_name, FONT_SIZE) <= max_width:
+        return text
+    ellipsis = "..."
+    # No glyph is narrower than a quarter em, so anything past that can be dropped up front
+    text = text[:int(max_width / (FONT_SIZE * 0.25)) + 1]
+    while text and stringWidth(text + ellipsis, font_name, FONT_SIZE) > max_width:
+        text = text[:-1]
+    return text + ellipsis
+
+
+def _parse_amount(value):
+    value = (value or "").replace("₹", "").replace(",", "").strip()
+    return float(value) if value else 0.0
+
+
+def generate_streaming_report_pdf(report_data, headers, rows, filename="report.pdf", title="REPORT",
+                                  progress_callback=None, is_cancelled=None, total_rows=None):
+    """
+    Generates a report PDF from any row iterable, one page at a time.
+
+    Rows are pulled from the iterator in fixed-size chunks, each chunk is drawn as
+    its own Table with precomputed column widths and a shared TableStyle, so the
+    layout work per page is constant regardless of how many rows the report has.
+
+    Args:
+        report_data (dict): Company details and 'generated_date'/'date_range'.
+        headers (list): Column headings.
+        rows (iterable): Sequences of cell values (lists, tuples or sqlite3.Row).
+        progress_callback (callable): Called as progress_callback(rows_done, total_rows) per page.
+        is_cancelled (callable): Returns True to abort; checked before each page.
+        total_rows (int): Optional row count, only passed through to progress_callback.
+
+    Returns:
+        int: Number of data rows written.
+    """
+    width, height = A4
+    c = canvas.Canvas(filename, pagesize=A4, pageCompression=1)
+    body_font = get_unicode_font()
+    col_widths = get_report_col_widths(title, len(headers))
+    max_text_widths = [w - 2 * CELL_PADDING for w in col_widths]
+    header_row = [fit_text(str(h), 'Helvetica-Bold', w) for h, w in zip(headers, max_text_widths)]
+
+    # Stock valuation totals are accumulated while streaming and printed as the last row
+    track_stock_totals = title.upper() == "STOCK VALUATION" and len(headers) >= 5
+    stock_total_qty = 0.0
+    stock_total_value = 0.0
+
+    def draw_page_frame(page_number):
+        c.saveState()
+        y = draw_header(c, report_data, title)
+        c.setFont(body_font, 10)
+        c.drawString(30, y, f"Generated on: {report_data.get('generated_date', '')}")
+        if report_data.get('date_range'):
+            c.drawRightString(width - 30, y, f"Period: {report_data.get('date_range', '')}")
+        c.setFont(body_font, 8)
+        c.drawRightString(width - 30, 30, f"Page {page_number}")
+        c.restoreState()
+        return y - 14
+
+    def draw_chunk(chunk, table_top, with_total_row=False):
+        data = [header_row] + chunk
+        row_heights = [HEADER_ROW_HEIGHT] + [ROW_HEIGHT] * len(chunk)
+        table = Table(data, colWidths=col_widths, rowHeights=row_heights)
+        table.setStyle(get_report_table_style(body_font, with_total_row))
+        table.wrapOn(c, width, height)
+        table.drawOn(c, 30, table_top - sum(row_heights))
+
+    rows_iter = iter(rows)
+    pending = None
+    rows_done = 0
+    page_number = 1
+    finished = False
+
+    while not finished:
+        if is_cancelled and is_cancelled():
+            raise ReportCancelled("Report generation was cancelled.")
+
+        table_top = draw_page_frame(page_number)
+        rows_per_page = max(1, int((table_top - BOTTOM_MARGIN - HEADER_ROW_HEIGHT) // ROW_HEIGHT))
+
+        chunk = []
+        while len(chunk) < rows_per_page:
+            row = pending if pending is not None else next(rows_iter, None)
+            pending = None
+            if row is None:
+                break
+            cells = ["" if v is None else str(v) for v in row]
+            if track_stock_totals and len(cells) >= 5:
+                try:
+                    stock_total_qty += _parse_amount(cells[2])
+                    stock_total_value += _parse_amount(cells[4])
+                except ValueError:
+                    pass
+            chunk.append([fit_text(v, body_font, w) for v, w in zip(cells, max_text_widths)])
+
+        # Look ahead one row so the last page is never followed by an empty one
+        pending = next(rows_iter, None)
+        finished = pending is None
+
+        rows_done += len(chunk)
+        with_total_row = False
+        if finished and track_stock_totals:
+            total_row = ["TOTAL", "", f"{stock_total_qty:.2f}", "", f"₹{stock_total_value:.2f}"]
+            total_row += [""] * (len(headers) - len(total_row))
+            if len(chunk) >= rows_per_page:
+                # No room left on this page for the total row
+                draw_chunk(chunk, table_top)
+                c.showPage()
+                page_number += 1
+                table_top = draw_page_frame(page_number)
+                chunk = []
+            chunk.append(total_row)
+            with_total_row = True
+
+        draw_chunk(chunk, table_top, with_total_row)
+
+        if progress_callback:
+            progress_callback(rows_done, total_rows or 0)
+
+        if not finished:
+            c.showPage()
+            page_number += 1
+
+    c.save()
+    return rows_done
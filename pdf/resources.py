@@ -0,0 +1,138 @@
+import os
+import sys
+import threading
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.lib.utils import ImageReader
+from reportlab.lib.styles import getSampleStyleSheet
+
+# Process-wide PDF resources. Fonts are parsed and registered once (ReportLab
+# embeds only the glyphs each document uses), the decoded company logo and the
+# sample stylesheet are kept in memory and shared by every PDF generated.
+
+def _base_dirs():
+    dirs = []
+    if getattr(sys, "frozen", False):
+        dirs.append(getattr(sys, "_MEIPASS", os.path.dirname(sys.executable)))
+    dirs.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return dirs
+
+def _font_candidates():
+    candidates = []
+    # A font shipped with the app wins on every platform
+    for base in _base_dirs():
+        candidates.append(("DejaVuSans", os.path.join(base, "assets", "fonts", "DejaVuSans.ttf")))
+
+    windows_fonts = os.path.join(os.environ.get("WINDIR", r"C:\Windows"), "Fonts")
+    candidates += [
+        ("ArialUnicode", os.path.join(windows_fonts, "arial.ttf")),
+        ("DejaVuSans", os.path.join(windows_fonts, "DejaVuSans.ttf")),
+        # Debian/Ubuntu, Fedora and Arch layouts
+        ("DejaVuSans", "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"),
+        ("DejaVuSans", "/usr/share/fonts/dejavu-sans-fonts/DejaVuSans.ttf"),
+        ("DejaVuSans", "/usr/share/fonts/dejavu/DejaVuSans.ttf"),
+        ("DejaVuSans", "/usr/share/fonts/TTF/DejaVuSans.ttf"),
+        ("NotoSans", "/usr/share/fonts/truetype/noto/NotoSans-Regular.ttf"),
+        ("NotoSans", "/usr/share/fonts/noto/NotoSans-Regular.ttf"),
+        ("LiberationSans", "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf"),
+        ("LiberationSans", "/usr/share/fonts/liberation-sans/LiberationSans-Regular.ttf"),
+        # macOS
+        ("ArialUnicode", "/Library/Fonts/Arial Unicode.ttf"),
+        ("ArialUnicode", "/System/Library/Fonts/Supplemental/Arial Unicode.ttf"),
+    ]
+    return candidates
+
+_lock = threading.RLock()
+_unicode_font_name = None
+_stylesheet = None
+# logo path -> ((size, mtime), ImageReader)
+_logo_readers = {}
+
+
+def get_unicode_font():
+    """Returns the name of a registered font with ₹ support, or Helvetica."""
+    global _unicode_font_name
+    if _unicode_font_name:
+        return _unicode_font_name
+    with _lock:
+        if _unicode_font_name:
+            return _unicode_font_name
+        for name, path in _font_candidates():
+            try:
+                if os.path.exists(path):
+                    pdfmetrics.registerFont(TTFont(name, path))
+                    _unicode_font_name = name
+                    return _unicode_font_name
+            except Exception as e:
+                print(f"Error registering font {name}: {e}")
+        _unicode_font_name = "Helvetica"
+        return _unicode_font_name
+
+
+def get_stylesheet():
+    """Returns the shared sample stylesheet. Treat it as read-only."""
+    global _stylesheet
+    with _lock:
+        if _stylesheet is None:
+            _stylesheet = getSampleStyleSheet()
+        return _stylesheet
+
+
+def get_logo_reader(logo_path):
+    """
+    Returns a decoded ImageReader for the logo, or None if there is no usable logo.
+
+    The reader is reused until the file at logo_path changes on disk.
+    """
+    if not logo_path:
+        return None
+    try:
+        stat = os.stat(logo_path)
+    except OSError:
+        return None
+    signature = (stat.st_size, stat.st_mtime_ns)
+
+    with _lock:
+        cached = _logo_readers.get(logo_path)
+        if cached and cached[0] == signature:
+            return cached[1]
+        try:
+            reader = ImageReader(logo_path)
+            # Decode now so every PDF after this one reuses the pixel data
+            reader.getRGBData()
+        except Exception as e:
+            print(f"Error loading logo: {e}")
+            return None
+        _logo_readers[logo_path] = (signature, reader)
+        return reader
+
+
+def invalidate_logo(logo_path=None):
+    """Drops the cached logo (all logos if no path is given)."""
+    with _lock:
+        if logo_path is None:
+            _logo_readers.clear()
+        else:
+            _logo_readers.pop(logo_path, None)
+
+
+def warm_up_pdf_resources(logo_path=None):
+    """Loads fonts, styles and the company logo so the first PDF is not slowed down."""
+    get_unicode_font()
+    get_stylesheet()
+    if logo_path is None:
+        from database.db import execute_read_query
+        try:
+            rows = execute_read_query("SELECT value FROM settings WHERE key='company_logo'")
+            logo_path = rows[0]['value'] if rows else None
+        except Exception as e:
+            print(f"Warning: Could not read company logo setting: {e}")
+    get_logo_reader(logo_path)
+
+
+def start_pdf_warm_up(logo_path=None):
+    """Runs warm_up_pdf_resources() on a daemon thread and returns the thread."""
+    thread = threading.Thread(target=warm_up_pdf_resources, args=(logo_path,),
+                              name="pdf-warm-up", daemon=True)
+    thread.start()
+    return thread
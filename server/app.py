@@ -0,0 +1,301 @@
+import argparse
+import asyncio
+import contextlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import database.db as db
+from auth import auth_logic
+from database import audit
+from database.concurrency import EditConflict
+from database.maintenance import start_maintenance_scheduler
+from database.snapshots import start_snapshot_scheduler
+from modules import backend
+# Imported for their @remotable registrations; nothing here uses them by name
+import modules.invoice  # noqa: F401
+import modules.payment  # noqa: F401
+import modules.stock_fifo  # noqa: F401
+import modules.reports_logic  # noqa: F401
+import modules.statements  # noqa: F401
+import modules.period_close  # noqa: F401
+import modules.archive  # noqa: F401
+from server import protocol
+
+# Hosts the database for several desktop clients and runs the modules layer
+# for them over HTTP/JSON:
+#
+#   GET  /health               {"status": "ok", "schema_version": N}
+#   GET  /functions            {"invoice.create_invoice": "write", ...}
+#   POST /login                {"email": ..., "password": ...} -> {"session": ..., "user": {...}}
+#   POST /logout
+#   POST /call/<module.func>   {"args": [...], "kwargs": {...}} -> result
+#
+# The server checks passwords itself. A sign-in gets a session id, which the
+# client sends with every call; writes are audited as the session's user.
+# The SQL clients send (the db.* helpers and history queries) runs with
+# db.PROTECTED_COLUMNS hidden, so password hashes never leave the server.
+#
+# Reads run in parallel on a thread pool. Writes go through the database
+# write queue (database.db.WriteQueue): they run one at a time on its
+# writer thread, and the writes of terminals billing at the same moment
+# share one group commit.
+# An EditConflict comes back as 409, other errors as 500 with the message.
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY = 16 * 1024 * 1024
+
+# Registered functions that run SQL text sent by the client
+CLIENT_SQL = ('db.', 'archive.execute_history_query')
+
+_REASONS = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+            405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large",
+            500: "Internal Server Error"}
+
+
+def _json(status, value):
+    return status, json.dumps(value).encode('utf-8')
+
+
+class LedgerServer:
+    """
+    HTTP/JSON server for the modules layer. start() serves from a background
+    thread and returns the bound port (port=0 picks a free one); serve()
+    blocks, for the command line. With schedulers=True the automatic
+    snapshots and idle maintenance run here, since clients leave the hosted
+    file alone.
+    """
+
+    def __init__(self, db_path=None, host="127.0.0.1", port=protocol.DEFAULT_PORT, token=None, read_workers=4,
+                 schedulers=False):
+        self.db_path = db_path or db.DB_NAME
+        self.schedulers = schedulers
+        self.host = host
+        self.port = port
+        self.token = token
+        self.read_workers = read_workers
+        self._readers = None
+        self._write_queue = None
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._connections = set()
+        # session id -> user id, for the users signed in through this server
+        self._sessions = {}
+
+    def _open(self):
+        db.DB_NAME = self.db_path
+        db.init_db()
+        self._readers = ThreadPoolExecutor(self.read_workers, thread_name_prefix="ledger-reader")
+        self._write_queue = db.start_write_queue()
+        if self.schedulers:
+            start_snapshot_scheduler()
+            start_maintenance_scheduler()
+
+    async def _serve(self):
+        self._loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        async with self._server:
+            try:
+                await self._server.serve_forever()
+            except asyncio.CancelledError:
+                pass
+
+    def _run_loop(self):
+        # Writes are queued from the loop thread against its database, so pin
+        # it to the hosted file whatever else this process has open
+        with db.using_database(self.db_path):
+            asyncio.run(self._serve())
+
+    def serve(self):
+        """Opens the database and serves until interrupted."""
+        self._open()
+        try:
+            self._run_loop()
+        finally:
+            self._shutdown_workers()
+
+    def start(self):
+        """Serves from a background thread; returns the port once listening."""
+        self._open()
+        self._ready.clear()
+        self._thread = threading.Thread(target=self._run_loop, name="ledger-server", daemon=True)
+        self._thread.start()
+        if not self._ready.wait(10):
+            raise Exception(f"The server could not listen on {self.host}:{self.port}")
+        return self.port
+
+    def stop(self):
+        if self._loop and self._server:
+            self._loop.call_soon_threadsafe(self._close)
+        if self._thread:
+            self._thread.join(10)
+            self._thread = None
+        self._shutdown_workers()
+
+    def _close(self):
+        self._server.close()
+        # Idle keep-alive connections would otherwise hold the server open
+        for writer in list(self._connections):
+            writer.close()
+
+    def _shutdown_workers(self):
+        if self._readers:
+            self._readers.shutdown(wait=True)
+        if self._write_queue:
+            db.stop_write_queue()
+        self._readers = self._write_queue = None
+
+    async def _handle(self, reader, writer):
+        self._connections.add(writer)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode('latin-1').partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length') or 0)
+                if length > MAX_BODY:
+                    await self._respond(writer, *_json(413, {'error': "Request too large."}), keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                status, payload = await self._dispatch(method, target, headers, body)
+                keep_alive = version == "HTTP/1.1" and headers.get('connection', '').lower() != "close"
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+    async def _respond(self, writer, status, payload, keep_alive):
+        head = (f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + payload)
+        await writer.drain()
+
+    async def _dispatch(self, method, target, headers, body):
+        if self.token and not hmac.compare_digest(headers.get(protocol.TOKEN_HEADER, "").encode(), self.token.encode()):
+            return _json(401, {'error': "Invalid or missing access token."})
+        path = target.split("?", 1)[0]
+
+        if path == "/health" and method == "GET":
+            return _json(200, {'status': "ok", 'schema_version': db.SCHEMA_VERSION,
+                               'writes': self._write_queue.stats()})
+        if path == "/functions" and method == "GET":
+            return _json(200, {name: "write" if write else "read"
+                               for name, (_, write) in sorted(backend.REGISTRY.items())})
+        if path == "/login" and method == "POST":
+            return await self._login(body)
+        if path == "/logout" and method == "POST":
+            self._sessions.pop(headers.get(protocol.SESSION_HEADER), None)
+            return _json(200, {})
+        if not path.startswith(protocol.API_PREFIX):
+            return _json(404, {'error': f"Unknown path {path}"})
+        if method != "POST":
+            return _json(405, {'error': "Use POST to call a function."})
+
+        name = path[len(protocol.API_PREFIX):]
+        if name not in backend.REGISTRY:
+            return _json(404, {'error': f"Unknown function {name}"})
+        try:
+            request = protocol.loads(body) if body else {}
+            args, kwargs = request.get('args', []), request.get('kwargs', {})
+        except (ValueError, AttributeError):
+            return _json(400, {'error': "The request body is not valid JSON."})
+
+        session = headers.get(protocol.SESSION_HEADER)
+        user_id = self._sessions.get(session) if session else None
+        if session and user_id is None:
+            return _json(401, {'error': "The session has ended. Sign in again."})
+        try:
+            if backend.REGISTRY[name][1]:
+                future = self._write_queue.submit(self._write, name, args, kwargs, user_id)
+                return 200, await asyncio.wrap_future(future)
+            return 200, await self._loop.run_in_executor(self._readers, self._read, name, args, kwargs)
+        except EditConflict as e:
+            return 409, protocol.dumps({'error': str(e), 'type': "EditConflict", 'table': e.table,
+                                        'record_ids': e.record_ids, 'current': e.current})
+        except Exception as e:
+            logger.error("%s failed", name, exc_info=e)
+            return 500, protocol.dumps({'error': str(e), 'type': type(e).__name__})
+
+    async def _login(self, body):
+        try:
+            request = json.loads(body)
+            email, password = request['email'], request['password']
+        except (ValueError, TypeError, KeyError):
+            return _json(400, {'error': "Send an email and a password to sign in."})
+        # bcrypt is slow on purpose, so it runs on a reader thread
+        user = await self._loop.run_in_executor(self._readers, self._check_login, email, password)
+        if user is None:
+            return _json(200, {'session': None, 'user': None})
+        session = secrets.token_urlsafe(32)
+        self._sessions[session] = user['id']
+        return 200, protocol.dumps({'session': session, 'user': user})
+
+    def _check_login(self, email, password):
+        with db.using_database(self.db_path), backend.serving():
+            user = auth_logic.login_user(email, password)
+        if user is not None:
+            user.pop('password_hash', None)
+        return user
+
+    def _guard(self, name):
+        return db.protected_columns() if name.startswith(CLIENT_SQL) else contextlib.nullcontext()
+
+    def _read(self, name, args, kwargs):
+        with db.using_database(self.db_path), self._guard(name):
+            return protocol.dumps(backend.run_local(name, args, kwargs))
+
+    def _write(self, name, args, kwargs, user_id):
+        # Runs on the writer thread, so the audit user can't change mid-write.
+        # An error rolls back just this call's writes.
+        audit.set_user(user_id)
+        with self._guard(name):
+            return protocol.dumps(backend.run_local(name, args, kwargs))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a LedgerPro database to desktop clients on the local network.")
+    parser.add_argument("--db", default=db.DB_NAME, help="database file to host")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (0.0.0.0 for all interfaces)")
+    parser.add_argument("--port", type=int, default=protocol.DEFAULT_PORT)
+    parser.add_argument("--token", default=os.environ.get("LEDGERPRO_TOKEN"),
+                        help="access token clients must send (default: $LEDGERPRO_TOKEN)")
+    parser.add_argument("--read-workers", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    server = LedgerServer(os.path.abspath(args.db), args.host, args.port, args.token, args.read_workers,
+                          schedulers=True)
+    print(f"Serving {server.db_path} on http://{args.host}:{args.port}")
+    try:
+        server.serve()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
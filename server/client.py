@@ -0,0 +1,115 @@
+import http.client
+import json
+import threading
+import urllib.parse
+
+from database.concurrency import EditConflict
+from modules.backend import REGISTRY
+from server import protocol
+
+
+class ServerError(Exception):
+    """Raised when a call fails on the server or the server can't be reached."""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class RemoteBackend:
+    """
+    Sends @remotable calls to a LedgerPro server (see modules.backend). Each
+    thread keeps its own keep-alive connection. Errors raised on the server
+    are raised here again: EditConflict as itself, the rest as ServerError
+    with the server's message. After login() every call carries the session
+    the server issued, which is how it knows the user writes are audited as.
+    """
+
+    def __init__(self, url, token=None, timeout=30):
+        parts = urllib.parse.urlsplit(url if "//" in url else f"http://{url}")
+        self.url = url
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or protocol.DEFAULT_PORT
+        self.token = token
+        self.timeout = timeout
+        self.session = None
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        """Closes the calling thread's connection."""
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        if conn is not None:
+            conn.close()
+
+    def _request(self, method, path, body=None, retry=True):
+        headers = {'Content-Type': "application/json"}
+        if self.token:
+            headers[protocol.TOKEN_HEADER] = self.token
+        if self.session:
+            headers[protocol.SESSION_HEADER] = self.session
+        # A kept-alive connection the server has dropped fails on first use.
+        # Reads are sent again once; a write might already have been applied.
+        for attempt in range(2 if retry else 1):
+            conn = self._connection()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                return response.status, response.read()
+            except (OSError, http.client.HTTPException) as e:
+                self.close()
+                error = e
+        raise ServerError(f"Could not reach the LedgerPro server at {self.host}:{self.port}: {error}")
+
+    def call(self, name, args=(), kwargs=None):
+        # Unknown names are treated as writes so they are never sent twice
+        write = REGISTRY.get(name, (None, True))[1]
+        body = protocol.dumps({'args': list(args), 'kwargs': kwargs or {}})
+        status, payload = self._request("POST", protocol.API_PREFIX + name, body, retry=not write)
+        result = protocol.loads(payload) if payload else None
+        if status == 200:
+            return result
+        if status == 409 and result.get('type') == "EditConflict":
+            raise EditConflict(result['table'], result['record_ids'], result['current'])
+        message = result.get('error') if isinstance(result, dict) else None
+        raise ServerError(message or f"The server answered {status}", status)
+
+    def login(self, email, password):
+        """
+        Signs in on the server, which checks the password itself. Returns the
+        user (without the password hash), or None for a wrong email or password.
+        """
+        body = json.dumps({'email': email, 'password': password})
+        status, payload = self._request("POST", "/login", body, retry=False)
+        result = json.loads(payload) if payload else {}
+        if status != 200:
+            raise ServerError(result.get('error') or f"The server answered {status}", status)
+        self.session = result['session']
+        return result['user']
+
+    def logout(self):
+        """Ends the session; calls after it carry no user."""
+        if self.session is None:
+            return
+        try:
+            self._request("POST", "/logout", retry=False)
+        except ServerError:
+            # Nothing more to do from here; the server forgets every
+            # session when it restarts
+            pass
+        finally:
+            self.session = None
+
+    def ping(self):
+        """Returns the server's /health answer; raises ServerError when it is unreachable."""
+        status, payload = self._request("GET", "/health")
+        if status != 200:
+            raise ServerError(json.loads(payload).get('error') or f"The server answered {status}", status)
+        return json.loads(payload)
@@ -0,0 +1,102 @@
+import json
+import sqlite3
+import datetime
+import types
+
+# JSON as exchanged between server/app.py and server/client.py. Results of
+# the modules layer are mostly sqlite3.Row lists, which travel as one column
+# list plus value lists and come back as RemoteRow, readable by name and by
+# position like the rows they replace. Dicts with non-string keys (document
+# ids) keep their keys.
+
+DEFAULT_PORT = 8765
+API_PREFIX = "/call/"
+TOKEN_HEADER = "x-ledgerpro-token"
+SESSION_HEADER = "x-ledgerpro-session"
+
+
+class RemoteRow:
+    """A result row read by column name or position, like sqlite3.Row."""
+
+    __slots__ = ('_columns', '_values')
+
+    def __init__(self, columns, values):
+        self._columns = columns
+        self._values = values
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, slice)):
+            return self._values[key]
+        return self._values[self._columns[key]]
+
+    def keys(self):
+        return list(self._columns)
+
+    def get(self, key, default=None):
+        index = self._columns.get(key)
+        return default if index is None else self._values[index]
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __eq__(self, other):
+        return tuple(self) == tuple(other)
+
+    def __repr__(self):
+        return f"RemoteRow({dict(zip(self._columns, self._values))!r})"
+
+
+def _encode(value):
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    if isinstance(value, (sqlite3.Row, RemoteRow)):
+        return {'__row__': [list(value.keys()), [_encode(v) for v in value]]}
+    if isinstance(value, dict):
+        if all(isinstance(key, str) for key in value):
+            return {key: _encode(v) for key, v in value.items()}
+        return {'__map__': [[_encode(key), _encode(v)] for key, v in value.items()]}
+    if isinstance(value, (list, tuple, types.GeneratorType)):
+        items = list(value)
+        if items and all(isinstance(item, (sqlite3.Row, RemoteRow)) for item in items):
+            columns = list(items[0].keys())
+            if all(list(item.keys()) == columns for item in items):
+                return {'__rows__': [columns, [[_encode(v) for v in item] for item in items]]}
+        return [_encode(item) for item in items]
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return None
+    raise TypeError(f"{type(value).__name__} cannot be sent to or from the server")
+
+
+def _decode(value):
+    if isinstance(value, list):
+        return [_decode(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if len(value) == 1:
+        if '__rows__' in value:
+            names, rows = value['__rows__']
+            columns = {name: index for index, name in enumerate(names)}
+            return [RemoteRow(columns, [_decode(v) for v in row]) for row in rows]
+        if '__row__' in value:
+            names, row = value['__row__']
+            return RemoteRow({name: index for index, name in enumerate(names)}, [_decode(v) for v in row])
+        if '__map__' in value:
+            return {_hashable(_decode(key)): _decode(v) for key, v in value['__map__']}
+    return {key: _decode(v) for key, v in value.items()}
+
+
+def _hashable(key):
+    return tuple(key) if isinstance(key, list) else key
+
+
+def dumps(value):
+    return json.dumps(_encode(value), separators=(',', ':')).encode('utf-8')
+
+
+def loads(data):
+    return _decode(json.loads(data))
@@ -0,0 +1,109 @@
+import os
+import datetime
+import pytest
+import modules.archive as archive
+from database.db import execute_write_query, execute_read_query
+from modules.payment import save_payment, save_bill_payment
+from modules.invoice import generate_invoice_number
+from modules.reports_logic import get_sales_report, get_gst_report, get_monthly_sales_data, get_cash_flow_data
+
+FY = 2010
+
+def setup_year():
+    cust_id = execute_write_query("INSERT INTO customers (name) VALUES ('Archive Customer')")
+    vendor_id = execute_write_query("INSERT INTO vendors (name) VALUES ('Archive Vendor')")
+    item_id = execute_write_query("INSERT INTO items (name, selling_price) VALUES ('Archive Item', 10)")
+
+    invoice_ids = []
+    for number, date in (("INV-9000001", "2010-05-10"), ("INV-9000002", "2010-08-01"), ("INV-9000003", "2011-02-20")):
+        inv_id = execute_write_query(
+            "INSERT INTO invoices (invoice_number, customer_id, date, subtotal, tax_amount, grand_total, status) VALUES (?, ?, ?, ?, ?, ?, 'Sent')",
+            (number, cust_id, date, 100.0, 18.0, 118.0)
+        )
+        execute_write_query("INSERT INTO invoice_items (invoice_id, item_id, quantity, rate, amount) VALUES (?, ?, 10, 10, 100)",
+                            (inv_id, item_id))
+        invoice_ids.append(inv_id)
+
+    # First invoice paid in the year, the last one only after the year ended
+    save_payment({'customer_id': cust_id, 'date': '2010-06-01', 'method': 'Cash',
+                  'allocations': [{'invoice_id': invoice_ids[0], 'amount': 118.0}]})
+    save_payment({'customer_id': cust_id, 'date': '2011-05-15', 'method': 'Cash',
+                  'allocations': [{'invoice_id': invoice_ids[2], 'amount': 118.0}]})
+    # Unallocated credit stays live
+    execute_write_query("INSERT INTO payments (customer_id, amount, date, method) VALUES (?, 50, '2010-09-01', 'Cash')", (cust_id,))
+
+    bill_id = execute_write_query(
+        "INSERT INTO bills (bill_number, vendor_id, date, subtotal, tax_amount, grand_total, status) VALUES ('ARC-BILL-1', ?, '2010-07-01', 50, 9, 59, 'Sent')",
+        (vendor_id,)
+    )
+    save_bill_payment({'vendor_id': vendor_id, 'date': '2010-07-15', 'method': 'Cash',
+                       'allocations': [{'bill_id': bill_id, 'amount': 59.0}]})
+
+    execute_write_query("INSERT INTO stock_batches (item_id, quantity_remaining, purchase_rate, purchase_date) VALUES (?, 0, 5, '2010-07-01')", (item_id,))
+    execute_write_query("INSERT INTO stock_batches (item_id, quantity_remaining, purchase_rate, purchase_date) VALUES (?, 3, 5, '2010-07-01')", (item_id,))
+    return cust_id, invoice_ids
+
+def test_fiscal_year_archive(work_db):
+    print("Testing fiscal-year archival...")
+    original_dir = archive.ARCHIVE_DIR
+    archive.ARCHIVE_DIR = os.path.dirname(work_db)
+
+    try:
+        cust_id, invoice_ids = setup_year()
+        start, end = archive.fiscal_year_range(FY)
+
+        before = {
+            'sales': [dict(r) for r in get_sales_report(start, end)],
+            'gst': get_gst_report(start, end),
+            'monthly': get_monthly_sales_data(2010),
+            'cash_this': get_cash_flow_data(FY),
+            'cash_next': get_cash_flow_data(FY + 1),
+        }
+
+        result = archive.archive_fiscal_year(FY)
+        print(f"Archived {result['invoices']} invoices, {result['bills']} bills, {result['payments']} payments, "
+              f"{result['stock_batches']} batches in {result['seconds'] * 1000:.1f} ms")
+        assert (result['invoices'], result['bills'], result['payments'], result['stock_batches']) == (2, 1, 3, 1)
+        assert os.path.exists(archive.archive_path(FY))
+
+        # The unpaid invoice, the credit and the batch with stock stay live
+        live = execute_read_query("SELECT invoice_number FROM invoices WHERE customer_id = ?", (cust_id,))
+        assert [r['invoice_number'] for r in live] == ["INV-9000002"]
+        assert execute_read_query("SELECT COUNT(*) FROM payments WHERE customer_id = ? AND invoice_id IS NULL", (cust_id,))[0][0] == 1
+        assert execute_read_query("SELECT COUNT(*) FROM stock_batches WHERE purchase_date = '2010-07-01'")[0][0] == 1
+
+        # Reports read through the archive and match what they showed before
+        after_sales = [dict(r) for r in get_sales_report(start, end)]
+        assert sorted(r['invoice_number'] for r in after_sales) == sorted(r['invoice_number'] for r in before['sales'])
+        assert get_gst_report(start, end) == before['gst']
+        assert get_monthly_sales_data(2010) == before['monthly']
+        assert get_cash_flow_data(FY) == before['cash_this']
+        assert get_cash_flow_data(FY + 1) == before['cash_next']
+
+        # Recent ranges do not attach anything
+        conn = archive.open_history_connection("2026-01-01", "2026-01-31")
+        assert [row[1] for row in conn.execute("PRAGMA database_list")] == ['main', 'temp']
+        conn.close()
+
+        # Numbering continues after the archived numbers
+        assert generate_invoice_number() == "INV-9000004"
+
+        # Closing the year again moves what has been settled since
+        save_payment({'customer_id': cust_id, 'date': '2012-01-10', 'method': 'Cash',
+                      'allocations': [{'invoice_id': invoice_ids[1], 'amount': 118.0}]})
+        archive.archive_fiscal_year(FY)
+        years = archive.get_archived_years()
+        assert years[0]['fiscal_year'] == FY and years[0]['invoices'] == 3
+        assert execute_read_query("SELECT COUNT(*) FROM invoices WHERE customer_id = ?", (cust_id,))[0][0] == 0
+        assert len(get_sales_report(start, end)) == len(before['sales'])
+
+        try:
+            archive.archive_fiscal_year(archive.fiscal_year_of(datetime.date.today()))
+            assert False, "Expected the current year to be refused"
+        except Exception as e:
+            assert "has not ended" in str(e)
+    finally:
+        archive.ARCHIVE_DIR = original_dir
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main(["-s", __file__]))
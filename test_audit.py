@@ -0,0 +1,82 @@
+import json
+import sqlite3
+import datetime
+import pytest
+import database.db as db
+from auth.session import Session
+from database import audit
+from database.db import execute_write_query, execute_read_query, execute_transaction
+
+def test_audit_log(work_db):
+    print("Testing the audit log...")
+    try:
+        user_id = execute_write_query(
+            "INSERT INTO users (name, email, password_hash) VALUES ('Audit User', 'audit@example.com', 'x')"
+        )
+        Session().set_user({'id': user_id, 'name': 'Audit User'})
+        cust_id = execute_write_query("INSERT INTO customers (name) VALUES ('Audit Customer')")
+        start = execute_read_query("SELECT COALESCE(MAX(id), 0) FROM audit_log")[0][0]
+
+        # Every row of one transaction shares its transaction number
+        execute_transaction([
+            ("INSERT INTO invoices (invoice_number, customer_id, date, grand_total, status) VALUES (?, ?, '2024-01-01', 100, 'Draft')",
+             (f"AUDIT-{n}", cust_id))
+            for n in range(3)
+        ])
+        rows = execute_read_query("SELECT * FROM audit_log WHERE id > ? ORDER BY id", (start,))
+        assert [r['action'] for r in rows] == ['I', 'I', 'I']
+        assert len({r['txn'] for r in rows}) == 1 and all(r['user_id'] == user_id for r in rows)
+        invoice_id = rows[0]['entity_id']
+
+        # Updates store only the columns that changed; no-op updates aren't logged
+        execute_write_query("UPDATE invoices SET status = 'Sent', grand_total = 100 WHERE id = ?", (invoice_id,))
+        execute_write_query("UPDATE invoices SET status = 'Sent' WHERE id = ?", (invoice_id,))
+        update = execute_read_query("SELECT * FROM audit_log WHERE entity = 'invoices' AND action = 'U' AND id > ?", (start,))
+        assert len(update) == 1 and json.loads(update[0]['changes']) == {'status': ['Draft', 'Sent']}
+        assert update[0]['txn'] > rows[0]['txn']
+        assert audit.describe_changes('U', update[0]['changes']) == "status: Draft → Sent"
+
+        # Stock level changes are left to the stock ledger
+        item_id = execute_write_query("INSERT INTO items (name, sku) VALUES ('Audit Item', 'AUDIT-SKU')")
+        execute_write_query("UPDATE items SET stock_on_hand = 5 WHERE id = ?", (item_id,))
+        execute_write_query("UPDATE items SET selling_price = 12.5 WHERE id = ?", (item_id,))
+        item_rows = execute_read_query("SELECT action, changes FROM audit_log WHERE entity = 'items' AND entity_id = ?", (item_id,))
+        assert [r['action'] for r in item_rows] == ['I', 'U']
+        assert json.loads(item_rows[1]['changes']) == {'selling_price': [0, 12.5]}
+
+        # Signed out changes belong to nobody, and suspended transactions aren't logged
+        Session().clear()
+        execute_write_query("DELETE FROM invoices WHERE id = ?", (invoice_id,))
+        conn = db.get_connection()
+        conn.execute(*audit.context_query(suspended=True))
+        conn.execute("DELETE FROM invoices WHERE invoice_number = 'AUDIT-1'")
+        conn.execute(*audit.record_query('archive', 2023, 'A', {'invoices': 1}))
+        conn.execute("UPDATE audit_context SET suspended = 0 WHERE id = 1")
+        conn.commit()
+        conn.close()
+
+        # The viewer filters by entity, record and date and keeps deleted records' names
+        today = datetime.date.today().isoformat()
+        log = audit.get_audit_log(entity='invoices', entity_id=invoice_id, start_date=today, end_date=today)
+        assert [r['action'] for r in log] == ['D', 'U', 'I']
+        assert log[0]['user'] == "System" and log[1]['user'] == "Audit User"
+        assert all(r['label'] == "AUDIT-0" for r in log)
+        assert audit.get_audit_log(entity='invoices', start_date="2000-01-01", end_date="2000-01-31") == []
+        archived = audit.get_audit_log(entity='archive', entity_id=2023)
+        assert archived[0]['action'] == 'A' and json.loads(archived[0]['changes']) == {'invoices': 1}
+        assert not execute_read_query(
+            "SELECT 1 FROM audit_log WHERE entity = 'invoices' AND action = 'D' AND changes LIKE '%AUDIT-1%'"
+        )
+
+        # Reinstalling leaves up-to-date triggers alone
+        conn = sqlite3.connect(work_db)
+        assert audit.install_audit_triggers(conn) == 0
+        audit.drop_audit_triggers(conn)
+        assert audit.install_audit_triggers(conn) == 3 * len(audit.AUDITED_TABLES)
+        conn.close()
+        print(f"Recorded {len(execute_read_query('SELECT id FROM audit_log WHERE id > ?', (start,)))} audit rows")
+    finally:
+        Session().clear()
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main(["-s", __file__]))
@@ -0,0 +1,71 @@
+import pytest
+from database.db import execute_write_query, execute_read_query
+from modules.stock_fifo import (
+    add_stock, reduce_stock, set_valuation_method, get_stock_at, get_stock_valuation_summary,
+    get_total_stock_value, WEIGHTED_AVERAGE
+)
+from modules.reports_logic import get_stock_valuation
+
+def item_row(item_id):
+    return execute_read_query("SELECT stock_on_hand, average_cost FROM items WHERE id = ?", (item_id,))[0]
+
+def live_batches(item_id):
+    return execute_read_query("SELECT COUNT(*) FROM stock_batches WHERE item_id = ? AND quantity_remaining > 0", (item_id,))[0][0]
+
+def test_weighted_average(work_db):
+    print("Testing weighted-average costing...")
+    before_total = get_total_stock_value()
+
+    # Purchases move the average without creating batches
+    avg_id = execute_write_query(
+        "INSERT INTO items (name, purchase_price, stock_on_hand, inventory_valuation_method) VALUES ('Average Item', 5, 0, ?)",
+        (WEIGHTED_AVERAGE,)
+    )
+    add_stock(avg_id, 10, 5, '2020-01-10')
+    add_stock(avg_id, 10, 7, '2020-01-20')
+    row = item_row(avg_id)
+    assert (row['stock_on_hand'], row['average_cost']) == (20, 6)
+    assert live_batches(avg_id) == 0
+
+    # Issues go out at the average, which does not change
+    assert reduce_stock(avg_id, 5, '2020-01-25') == 30
+    add_stock(avg_id, 5, 10, '2020-02-01')
+    row = item_row(avg_id)
+    assert row['stock_on_hand'] == 20 and abs(row['average_cost'] - 7) < 1e-9
+
+    summary = {s['item_id']: s for s in get_stock_valuation_summary()}
+    assert summary[avg_id]['method'] == WEIGHTED_AVERAGE and summary[avg_id]['total_value'] == 140
+    report = {r['name']: r for r in get_stock_valuation()}
+    assert report['Average Item']['total_value'] == 140
+    assert abs(get_total_stock_value() - before_total - 140) < 1e-6
+    # The ledger agrees with the running average
+    assert get_stock_at('2020-02-01', avg_id)[avg_id] == {'quantity': 20, 'value': 140}
+
+    # A FIFO item converts with the cost of its remaining batches
+    fifo_id = execute_write_query("INSERT INTO items (name, purchase_price, stock_on_hand) VALUES ('Convert Item', 4, 0)")
+    add_stock(fifo_id, 10, 4, '2020-01-05')
+    add_stock(fifo_id, 10, 8, '2020-01-06')
+    assert reduce_stock(fifo_id, 5, '2020-01-07') == 20
+    set_valuation_method(fifo_id, WEIGHTED_AVERAGE, '2020-01-08')
+    row = item_row(fifo_id)
+    assert row['stock_on_hand'] == 15 and abs(row['average_cost'] - 100 / 15) < 1e-9
+    assert live_batches(fifo_id) == 0
+    assert abs(reduce_stock(fifo_id, 3, '2020-01-09') - 20) < 1e-9
+    assert abs(get_stock_at('2020-01-09', fifo_id)[fifo_id]['value'] - 80) < 1e-6
+
+    # And back to FIFO as a single batch at the average cost
+    set_valuation_method(fifo_id, 'FIFO', '2020-01-10')
+    batch = execute_read_query("SELECT quantity_remaining, purchase_rate FROM stock_batches WHERE item_id = ? AND quantity_remaining > 0",
+                               (fifo_id,))
+    assert len(batch) == 1 and batch[0]['quantity_remaining'] == 12
+    assert abs(reduce_stock(fifo_id, 12, '2020-01-11') - 80) < 1e-6
+
+    # Stock on hand that was in no batch is revalued in the ledger
+    loose_id = execute_write_query("INSERT INTO items (name, purchase_price, stock_on_hand) VALUES ('Loose Item', 3, 4)")
+    set_valuation_method(loose_id, WEIGHTED_AVERAGE, '2020-01-12')
+    movements = execute_read_query("SELECT quantity, value, kind FROM stock_movements WHERE item_id = ?", (loose_id,))
+    assert [(m['quantity'], m['value'], m['kind']) for m in movements] == [(0, 12, 'revaluation')]
+    print("Weighted-average costing OK")
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main(["-s", __file__]))
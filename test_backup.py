@@ -0,0 +1,58 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+from database.db import execute_read_query
+from database.backup import backup_database, decompress_backup, check_database_integrity, BackupCancelled
+
+def table_counts(conn):
+    tables = [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")]
+    return {t: conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in tables}
+
+def test_hot_backup():
+    print("Testing online backup...")
+    work_dir = tempfile.mkdtemp()
+    try:
+        backup_path = os.path.join(work_dir, "ledgerpro_backup.db.gz")
+        progress = []
+        result = backup_database(backup_path, pages_per_step=8,
+                                 progress_callback=lambda done, total: progress.append((done, total)))
+        print(f"Backed up {result['pages']} pages ({result['db_bytes']} -> {result['backup_bytes']} bytes) in {result['seconds']:.2f}s")
+        assert result['compression'] == "gzip"
+        assert progress and progress[-1][0] == progress[-1][1] == result['pages']
+        assert [p[0] for p in progress] == sorted(p[0] for p in progress)
+        assert not os.path.exists(backup_path + ".part")
+        assert os.listdir(work_dir) == ["ledgerpro_backup.db.gz"]
+
+        restored = os.path.join(work_dir, "restored.db")
+        decompress_backup(backup_path, restored)
+        assert check_database_integrity(restored) == []
+        conn = sqlite3.connect(restored)
+        try:
+            # Self-contained copy, not a WAL database
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+            backup_counts = table_counts(conn)
+        finally:
+            conn.close()
+        live_users = execute_read_query("SELECT COUNT(*) FROM users")[0][0]
+        assert backup_counts['users'] == live_users
+    finally:
+        shutil.rmtree(work_dir)
+
+def test_backup_cancel():
+    print("Testing backup cancellation...")
+    work_dir = tempfile.mkdtemp()
+    try:
+        backup_path = os.path.join(work_dir, "cancelled.db.gz")
+        try:
+            backup_database(backup_path, pages_per_step=1, is_cancelled=lambda: True)
+            assert False, "Expected BackupCancelled"
+        except BackupCancelled:
+            pass
+        assert os.listdir(work_dir) == []
+    finally:
+        shutil.rmtree(work_dir)
+
+if __name__ == "__main__":
+    test_hot_backup()
+    test_backup_cancel()
@@ -0,0 +1,97 @@
+import os
+import shutil
+import datetime
+from database.db import execute_write_query
+from modules.payment import save_payment
+from pdf.batch_export import load_documents, export_documents_pdf, export_bulk_pdfs
+from pdf.report_stream import ReportCancelled
+
+EXPORT_DATE = '2019-03-15'
+OUTPUT_FOLDER = "test_batch_export_pdf"
+MERGED_FILE = "test_batch_export_merged.pdf"
+
+def setup_documents():
+    stamp = datetime.datetime.now().strftime('%H%M%S%f')
+    # A fresh customer per run keeps the counts below independent of earlier runs
+    cust_id = execute_write_query("INSERT INTO customers (name) VALUES (?)", (f"Batch Export Customer {stamp}",))
+    item_id = execute_write_query("INSERT INTO items (name, selling_price) VALUES ('Batch Export Item', 10)")
+
+    invoice_ids = []
+    for i in range(6):
+        inv_num = f"INV-BATCH-{stamp}-{i}"
+        inv_id = execute_write_query(
+            "INSERT INTO invoices (invoice_number, customer_id, date, subtotal, grand_total, status) VALUES (?, ?, ?, ?, ?, ?)",
+            (inv_num, cust_id, EXPORT_DATE, 100.0, 100.0, 'Sent')
+        )
+        execute_write_query(
+            "INSERT INTO invoice_items (invoice_id, item_id, quantity, rate, amount) VALUES (?, ?, ?, ?, ?)",
+            (inv_id, item_id, 10, 10.0, 100.0)
+        )
+        invoice_ids.append(inv_id)
+
+    save_payment({
+        'customer_id': cust_id,
+        'date': EXPORT_DATE,
+        'method': 'Cash',
+        'allocations': [{'invoice_id': invoice_ids[0], 'amount': 100.0}]
+    })
+
+    vendor_id = execute_write_query("INSERT INTO vendors (name) VALUES (?)", (f"Batch Export Vendor {stamp}",))
+    execute_write_query(
+        "INSERT INTO bills (bill_number, vendor_id, date, grand_total, status) VALUES (?, ?, ?, ?, ?)",
+        (f"BILL-BATCH-{stamp}", vendor_id, EXPORT_DATE, 50.0, 'Sent')
+    )
+    return cust_id, vendor_id
+
+def test_batch_export():
+    print("Testing bulk PDF export...")
+    cust_id, vendor_id = setup_documents()
+
+    documents = load_documents(("invoice", "receipt"), EXPORT_DATE, EXPORT_DATE, customer_id=cust_id)
+    invoices = [d for t, d in documents if t == "invoice"]
+    receipts = [d for t, d in documents if t == "receipt"]
+    print(f"Loaded {len(invoices)} invoices and {len(receipts)} receipts")
+    assert len(invoices) == 6
+    assert all(len(d['items']) == 1 and d['items'][0]['name'] == 'Batch Export Item' for d in invoices)
+    assert len(receipts) == 1
+    assert receipts[0]['amount_received'] == 100.0
+    assert len(receipts[0]['allocations']) == 1
+
+    # A chosen party only brings its own side's documents, not everyone else's
+    by_customer = load_documents(start_date=EXPORT_DATE, end_date=EXPORT_DATE, customer_id=cust_id)
+    assert sorted(set(t for t, _ in by_customer)) == ["invoice", "receipt"] and len(by_customer) == 7
+    by_vendor = load_documents(start_date=EXPORT_DATE, end_date=EXPORT_DATE, vendor_id=vendor_id)
+    assert [(t, d['vendor_id']) for t, d in by_vendor] == [("bill", vendor_id)]
+
+    # Folder output across worker processes
+    progress = []
+    result = export_documents_pdf(documents, OUTPUT_FOLDER, max_workers=2,
+                                  progress_callback=lambda done, total: progress.append((done, total)))
+    print(f"Folder export: {result['count']} documents, {result['docs_per_sec']:.1f} docs/sec")
+    assert result['count'] == 7
+    assert progress[-1] == (7, 7)
+    assert all(os.path.exists(f) for f in result['files'])
+    assert len(os.listdir(OUTPUT_FOLDER)) == 7
+    shutil.rmtree(OUTPUT_FOLDER)
+
+    # Single merged PDF, one page per document
+    result = export_bulk_pdfs(MERGED_FILE, ("invoice", "receipt"), EXPORT_DATE, EXPORT_DATE,
+                              customer_id=cust_id, merged=True)
+    print(f"Merged export: {result['count']} documents, {result['docs_per_sec']:.1f} docs/sec")
+    with open(MERGED_FILE, 'rb') as f:
+        assert f.read().count(b'/Type /Page\n') == 7
+    os.remove(MERGED_FILE)
+
+def test_batch_export_cancel():
+    print("Testing bulk PDF export cancellation...")
+    documents = load_documents(("invoice",), EXPORT_DATE, EXPORT_DATE)
+    try:
+        export_documents_pdf(documents, MERGED_FILE, merged=True, is_cancelled=lambda: True)
+        assert False, "Expected ReportCancelled"
+    except ReportCancelled:
+        pass
+    assert not os.path.exists(MERGED_FILE)
+
+if __name__ == "__main__":
+    test_batch_export()
+    test_batch_export_cancel()
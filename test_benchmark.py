@@ -0,0 +1,55 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import benchmark
+from database import audit
+
+def books_digest(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return [
+            conn.execute("SELECT COUNT(*), SUM(grand_total), SUM(status = 'Paid') FROM invoices").fetchone(),
+            conn.execute("SELECT COUNT(*), SUM(amount) FROM invoice_items").fetchone(),
+            conn.execute("SELECT COUNT(*), SUM(amount), MAX(date) FROM payments").fetchone(),
+            conn.execute("SELECT COUNT(*), SUM(stock_on_hand) FROM items").fetchone(),
+        ]
+    finally:
+        conn.close()
+
+def test_benchmark_harness():
+    print("Testing the benchmark harness...")
+    work_dir = tempfile.mkdtemp()
+    try:
+        first, second = os.path.join(work_dir, "a.db"), os.path.join(work_dir, "b.db")
+        counts = benchmark.generate_books(first, items=200, invoice_lines=1000, payments=300, seed=7, progress=lambda msg: None)
+        assert (counts['items'], counts['invoices'], counts['invoice_items']) == (200, 200, 1000)
+        assert 0 < counts['payments'] <= 300
+
+        # The same seed gives the same books
+        benchmark.generate_books(second, items=200, invoice_lines=1000, payments=300, seed=7, progress=lambda msg: None)
+        assert books_digest(first) == books_digest(second)
+
+        results = benchmark.run_benchmarks(first, repeat=2, csv_rows=0, only=["get_unpaid_invoices", "get_gst_report"],
+                                           progress=lambda msg: None)
+        assert sorted(results) == ["get_unpaid_invoices", "reports.get_gst_report"]
+        assert all(r['runs'] == 2 and r['min_ms'] <= r['median_ms'] for r in results.values())
+
+        overhead = benchmark.measure_audit_overhead(first, repeat=2, rounds=2, progress=lambda msg: None)
+        assert sorted(overhead) == sorted(benchmark.AUDITED_WRITES)
+        assert all(r['plain_ms'] > 0 and r['audited_ms'] > 0 for r in overhead.values())
+        assert all(r['plain_spread_ms'][0] == r['plain_ms'] <= r['plain_spread_ms'][1] for r in overhead.values())
+        assert all(r['audited_spread_ms'][0] == r['audited_ms'] <= r['audited_spread_ms'][1] for r in overhead.values())
+        # The context bump is back on for everything after the plain runs
+        assert audit.is_enabled()
+
+        baseline = {'config': {'books': {'items': 200}}, 'results': {'a': {'median_ms': 10.0}, 'b': {'median_ms': 10.0}}}
+        current = {'config': {'books': {'items': 200}}, 'results': {'a': {'median_ms': 15.0}, 'b': {'median_ms': 11.0},
+                                                                   'c': {'median_ms': 1.0}}}
+        regressions = benchmark.compare_results(baseline, current, threshold=0.2)
+        assert [r['name'] for r in regressions] == ['a'] and regressions[0]['change'] == 0.5
+    finally:
+        shutil.rmtree(work_dir)
+
+if __name__ == "__main__":
+    test_benchmark_harness()
@@ -0,0 +1,79 @@
+import os
+import pytest
+import database.db as db
+from database import companies
+from database.companies import (
+    open_active_company, add_company, switch_company, list_companies, get_active_company,
+    get_settings, get_item_catalog, run_for_companies
+)
+from database.db import execute_read_query, execute_write_query
+from modules.reports_logic import get_consolidated_summary
+
+def count_items():
+    return execute_read_query("SELECT COUNT(*) FROM items")[0][0]
+
+def test_companies(work_db):
+    print("Testing multiple companies...")
+    original_dir = companies.DATA_DIR
+    companies.DATA_DIR = os.path.dirname(work_db)
+
+    try:
+        # Without a registry the existing database is the only company
+        first = open_active_company()
+        assert first['id'] == companies.DEFAULT_ID and db.DB_NAME == first['path'] == work_db
+        first_items = count_items()
+        users = execute_read_query("SELECT COUNT(*) FROM users")[0][0]
+
+        second = add_company("Second Traders", "29ABCDE1234F1Z5")
+        assert [c['id'] for c in list_companies()] == [companies.DEFAULT_ID, second['id']]
+        try:
+            add_company("second traders")
+            assert False, "Expected duplicate name error"
+        except Exception as e:
+            assert "already exists" in str(e)
+
+        # Switching points every helper at the other file
+        switch_company(second['id'])
+        assert get_active_company()['id'] == second['id']
+        assert count_items() == 0
+        assert execute_read_query("SELECT COUNT(*) FROM users")[0][0] == users
+        settings = get_settings()
+        assert settings['company_name'] == "Second Traders" and settings['company_gstin'] == "29ABCDE1234F1Z5"
+
+        # Cached until the company's database is written to
+        assert get_item_catalog() is get_item_catalog()
+        item_id = execute_write_query(
+            "INSERT INTO items (name, sku, selling_price, purchase_price, stock_on_hand) VALUES ('Second Item', 'SEC-1', 200, 120, 5)"
+        )
+        catalog = get_item_catalog()
+        assert [item['id'] for item in catalog] == [item_id]
+        execute_write_query("INSERT INTO stock_batches (item_id, quantity_remaining, purchase_rate, purchase_date) VALUES (?, 5, 120, '2024-01-01')", (item_id,))
+        execute_write_query("UPDATE settings SET value = 'Renamed Traders' WHERE key = 'company_name'")
+        assert get_settings()['company_name'] == "Renamed Traders"
+        catalog = get_item_catalog()
+
+        # Each company keeps its own cache
+        switch_company(companies.DEFAULT_ID)
+        assert count_items() == first_items
+        assert all(item['name'] != 'Second Item' for item in get_item_catalog())
+        switch_company(second['id'])
+        assert get_item_catalog() is catalog
+
+        # Consolidated reports read every company, whichever is in use
+        counts = run_for_companies(count_items)
+        assert counts == {companies.DEFAULT_ID: first_items, second['id']: 1}
+        summary = get_consolidated_summary('2000-01-01', '2099-12-31')
+        assert [row['company_id'] for row in summary['companies']] == [companies.DEFAULT_ID, second['id']]
+        assert summary['companies'][1]['stock_value'] == 600
+        assert summary['total']['sales'] == sum(row['sales'] for row in summary['companies'])
+        assert db.DB_NAME == second['path']
+
+        # The choice is remembered for the next start
+        db.DB_NAME = work_db
+        assert open_active_company()['id'] == second['id']
+    finally:
+        companies.DATA_DIR = original_dir
+        companies._caches.clear()
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main(["-s", __file__]))
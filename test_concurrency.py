@@ -0,0 +1,69 @@
+import pytest
+from database.concurrency import EditConflict, merge_changes
+from database.db import execute_write_query, execute_read_query, execute_versioned_transaction
+from modules.invoice import create_invoice, update_invoice
+
+def version_of(table, record_id):
+    return execute_read_query(f"SELECT version FROM {table} WHERE id = ?", (record_id,))[0][0]
+
+def test_optimistic_concurrency(work_db):
+    print("Testing optimistic concurrency...")
+    cust_id = execute_write_query("INSERT INTO customers (name) VALUES ('Version Customer')")
+    item_id = execute_write_query(
+        "INSERT INTO items (name, sku, stock_on_hand, purchase_price) VALUES ('Version Item', 'VERSION-SKU', 0, 50)"
+    )
+    execute_write_query(
+        "INSERT INTO stock_batches (item_id, quantity_remaining, purchase_rate, purchase_date) VALUES (?, 100, 50, '2024-01-01')",
+        (item_id,)
+    )
+    execute_write_query("UPDATE items SET stock_on_hand = 100 WHERE id = ?", (item_id,))
+    # Stock changes alone don't count as an edit of the item
+    assert version_of('items', item_id) == 1
+
+    line = {'item_id': item_id, 'quantity': 5, 'rate': 100.0, 'gst_percent': 0.0}
+    invoice_id = create_invoice({'customer_id': cust_id, 'date': '2024-02-01', 'status': 'Sent', 'items': [line]})
+    loaded = version_of('invoices', invoice_id)
+
+    # Clerk A saves first
+    data = {'customer_id': cust_id, 'date': '2024-02-01', 'status': 'Sent', 'version': loaded,
+            'items': [dict(line, quantity=7)]}
+    update_invoice(invoice_id, data)
+    assert version_of('invoices', invoice_id) == loaded + 1
+    stock_after_a = execute_read_query("SELECT stock_on_hand FROM items WHERE id = ?", (item_id,))[0][0]
+    assert stock_after_a == 93
+
+    # Clerk B still holds the old version: nothing is written, stock included
+    try:
+        update_invoice(invoice_id, dict(data, version=loaded, items=[dict(line, quantity=20)]))
+        assert False, "Expected EditConflict"
+    except EditConflict as e:
+        assert not e.deleted and e.current[invoice_id]['version'] == loaded + 1
+    assert execute_read_query("SELECT quantity FROM invoice_items WHERE invoice_id = ?", (invoice_id,))[0][0] == 7
+    assert execute_read_query("SELECT stock_on_hand FROM items WHERE id = ?", (item_id,))[0][0] == stock_after_a
+
+    # Writers that don't check versions still move them on
+    execute_write_query("UPDATE invoices SET status = 'Paid' WHERE id = ?", (invoice_id,))
+    assert version_of('invoices', invoice_id) == loaded + 2
+
+    # A row that is only checked, not updated, still moves to the next version
+    assert execute_versioned_transaction('invoices', {invoice_id: loaded + 2}, []) == {invoice_id: loaded + 3}
+    assert version_of('invoices', invoice_id) == loaded + 3
+
+    execute_write_query("DELETE FROM invoice_items WHERE invoice_id = ?", (invoice_id,))
+    execute_write_query("DELETE FROM invoices WHERE id = ?", (invoice_id,))
+    try:
+        execute_versioned_transaction('invoices', {invoice_id: loaded + 3}, [])
+        assert False, "Expected EditConflict"
+    except EditConflict as e:
+        assert e.deleted and "deleted" in str(e)
+
+    # Merging keeps the editor's changes on top of the saved record
+    base = {'notes': 'a', 'terms': 'x', 'status': 'Sent'}
+    mine = {'notes': 'mine', 'terms': 'x', 'status': 'Sent'}
+    theirs = {'notes': 'theirs', 'terms': 'y', 'status': 'Sent', 'version': 5}
+    merged, clashes = merge_changes(base, mine, theirs)
+    assert merged == {'notes': 'mine', 'terms': 'y', 'status': 'Sent', 'version': 5}
+    assert clashes == ['notes']
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main(["-s", __file__]))
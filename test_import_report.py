@@ -1,7 +1,7 @@
 import csv
 import sqlite3
 import os
-from database.db import execute_write_query, execute_read_query, execute_transaction
+from database.db import execute_write_query, execute_read_query, execute_transaction, run_migrations
 from datetime import datetime
 
 # Mock QDate for the script
@@ -18,6 +18,9 @@ csv_content = """Item ID,Item Name,SKU,HSN/SAC,Description,Rate,Account,Account
 ,Test Item 2,SKU002,5678,Desc 2,200.0,,,,,,,Output GST,12.0,,,,,,,,,pcs,pcs,150.0,,,,,,,5.0,Vendor B,0.0,0.0,10.0,,,,
 """
 
+# The app migrates the database on startup; the valuation report needs the latest schema
+run_migrations()
+
 filename = "test_import.csv"
 with open(filename, "w", newline="") as f:
     f.write(csv_content)
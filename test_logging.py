@@ -0,0 +1,71 @@
+import os
+import sys
+import shutil
+import logging
+import tempfile
+import debug_logger
+from debug_logger import setup_logging, shutdown_logging, get_log_path
+from modules import stock_fifo
+
+def read_logs(work_dir):
+    text = ""
+    for name in sorted(os.listdir(work_dir)):
+        with open(os.path.join(work_dir, name), encoding="utf-8") as f:
+            text += f.read()
+    return text
+
+def test_queued_rotating_log():
+    print("Testing queued rotating log...")
+    work_dir = tempfile.mkdtemp()
+    original_stdout = sys.stdout
+    try:
+        # The previous session is kept when a new one starts
+        with open(get_log_path(work_dir), "w", encoding="utf-8") as f:
+            f.write("previous session\n")
+        path = setup_logging(force=True, log_dir=work_dir, max_bytes=4096, backup_count=3)
+        assert path == get_log_path(work_dir) and sys.stdout is not original_stdout
+        assert setup_logging(force=True, log_dir=work_dir) == path
+
+        # print() lands under the printing module's logger, split into lines
+        exec('print("stock line one\\nstock line two")', {"__name__": "modules.stock_fifo"})
+        stock_fifo.logger.warning("Not enough stock for item %s", 42)
+        print("partial", end="")
+        print(" line")
+        shutdown_logging()
+        assert sys.stdout is original_stdout
+
+        with open(path, encoding="utf-8") as f:
+            current = f.read()
+        with open(path + ".1", encoding="utf-8") as f:
+            assert f.read() == "previous session\n"
+        assert "INFO modules.stock_fifo (MainThread): stock line one" in current
+        assert "INFO modules.stock_fifo (MainThread): stock line two" in current
+        assert "WARNING modules.stock_fifo (MainThread): Not enough stock for item 42" in current
+        assert "stdout (MainThread): partial line" in current or "test_logging (MainThread): partial line" in current
+
+        # A storm rotates by size, keeps backup_count files and drops what the queue can't hold
+        setup_logging(force=True, log_dir=work_dir, max_bytes=4096, backup_count=3, queue_size=50)
+        storm = logging.getLogger("storm")
+        debug_logger._listener.stop()
+        for n in range(500):
+            storm.info("storm record %d %s", n, "x" * 40)
+        assert debug_logger._queue_handler.queue.qsize() == 50 and debug_logger._queue_handler.dropped == 450
+        debug_logger._listener.start()
+        debug_logger._listener.stop()
+        storm.info("after the storm")
+        debug_logger._listener.start()
+        shutdown_logging()
+
+        files = sorted(os.listdir(work_dir))
+        assert files == ["debug_log.txt", "debug_log.txt.1", "debug_log.txt.2", "debug_log.txt.3"], files
+        assert all(os.path.getsize(os.path.join(work_dir, name)) <= 4096 for name in files)
+        text = read_logs(work_dir)
+        assert "storm record 49 " in text and "storm record 50 " not in text
+        assert "Dropped 450 log records" in text and "after the storm" in text
+        print(f"Rotated into {len(files)} files")
+    finally:
+        shutdown_logging()
+        shutil.rmtree(work_dir)
+
+if __name__ == "__main__":
+    test_queued_rotating_log()
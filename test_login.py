@@ -0,0 +1,48 @@
+import bcrypt
+import pytest
+from auth import auth_logic
+from auth.auth_logic import (
+    calibrate_work_factor, get_hash_rounds, needs_rehash, login_user, signup_user, MIN_ROUNDS, MAX_ROUNDS
+)
+from database.db import execute_read_query, execute_write_query
+
+def test_login_rehash(work_db):
+    print("Testing calibrated login hashing...")
+    original_factor = auth_logic._work_factor
+
+    try:
+        # Cost stays within bounds whatever the hardware
+        assert calibrate_work_factor(target_ms=0) == MIN_ROUNDS
+        assert calibrate_work_factor(target_ms=10 ** 9) == MAX_ROUNDS
+        factor = calibrate_work_factor(target_ms=1)
+        assert factor == MIN_ROUNDS and auth_logic.get_work_factor() == factor
+
+        assert get_hash_rounds("$2b$12$abcdefghijklmnopqrstuv") == 12
+        assert get_hash_rounds("not a hash") is None
+        assert needs_rehash(f"$2b${factor - 1:02d}$x") and needs_rehash(f"$2b${factor + 2:02d}$x")
+        assert not needs_rehash(f"$2b${factor:02d}$x") and not needs_rehash(f"$2b${factor + 1:02d}$x")
+
+        # A cheap legacy hash is replaced on a successful login only
+        legacy = bcrypt.hashpw(b"secret", bcrypt.gensalt(4)).decode('utf-8')
+        user_id = execute_write_query("INSERT INTO users (name, email, password_hash) VALUES ('Legacy', 'legacy@test', ?)", (legacy,))
+        assert login_user("legacy@test", "wrong") is None
+        assert execute_read_query("SELECT password_hash FROM users WHERE id = ?", (user_id,))[0][0] == legacy
+
+        user = login_user("legacy@test", "secret")
+        stored = execute_read_query("SELECT password_hash FROM users WHERE id = ?", (user_id,))[0][0]
+        assert user['id'] == user_id and user['password_hash'] == stored
+        assert get_hash_rounds(stored) == factor
+
+        # Still valid after the rehash, and left alone this time
+        assert login_user("legacy@test", "secret")['password_hash'] == stored
+        assert login_user("missing@test", "secret") is None
+
+        assert signup_user("New", "new@test", "pw")
+        new_hash = execute_read_query("SELECT password_hash FROM users WHERE email = 'new@test'")[0][0]
+        assert get_hash_rounds(new_hash) == factor
+        print(f"Calibrated cost {factor}, legacy hash upgraded from 4")
+    finally:
+        auth_logic._work_factor = original_factor
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main(["-s", __file__]))
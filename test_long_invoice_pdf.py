@@ -0,0 +1,114 @@
+import re
+import time
+from io import BytesIO
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+from pdf.generator import draw_invoice, draw_bill
+
+def invoice_data(line_count):
+    return {
+        'invoice_number': 'INV-LONG-0001',
+        'date': '2026-01-01',
+        'status': 'Sent',
+        'customer_name': 'Long Invoice Customer',
+        'company_name': 'Long Invoice Co',
+        'company_address': '1 Test Street\nTest City',
+        'subtotal': line_count * 10.0,
+        'grand_total': line_count * 10.0,
+        'customer_notes': 'Thank you for your business',
+        'items': [{'name': f"Line {i:05d}", 'quantity': 1, 'rate': 10.0, 'discount_percent': 0,
+                   'gst_percent': 0, 'amount': 10.0} for i in range(line_count)]
+    }
+
+def render(draw_fn, data):
+    # Uncompressed so the drawn text can be checked in the raw PDF
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4, pageCompression=0)
+    draw_fn(c, data)
+    c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+def test_long_invoice_pdf():
+    print("Testing multi-page invoice PDF...")
+    start = time.perf_counter()
+    pdf = render(draw_invoice, invoice_data(1000))
+    elapsed = time.perf_counter() - start
+    page_count = pdf.count(b'/Type /Page\n')
+    print(f"1000 lines: {page_count} pages in {elapsed:.2f}s")
+
+    # Every line is printed exactly once, across several pages
+    lines = re.findall(rb'\(Line (\d{5})\) Tj', pdf)
+    assert sorted(int(n) for n in lines) == list(range(1000))
+    assert page_count > 20
+    # The totals block may need a page of its own after the last items page
+    carried_count = pdf.count(b'(Carried forward) Tj')
+    assert carried_count == pdf.count(b'(Brought forward) Tj')
+    assert carried_count in (page_count - 1, page_count - 2)
+    assert f"(Page {page_count} of {page_count}) Tj".encode() in pdf
+    assert b'(Grand Total: 10000.00) Tj' in pdf
+
+    # Running subtotal carried to the last page equals the sum of all lines before it
+    carried = [float(v) for v in re.findall(rb'\(Carried forward\) Tj.*?\(([\d.]+)\) Tj', pdf, re.S)]
+    assert carried == sorted(carried) and carried[-1] < 10000.0
+
+def test_wrapped_item_names():
+    print("Testing invoice PDF with long item names...")
+    data = invoice_data(200)
+    for i, item in enumerate(data['items']):
+        item['name'] = f"Line {i:05d} " + "heavy duty copper wiring " * (i % 5) + ("\nBatch B-7" if i % 7 == 0 else "")
+    pdf = render(draw_invoice, data)
+    page_count = pdf.count(b'/Type /Page\n')
+
+    # Long names wrap inside their row instead of running into the next one,
+    # so the same lines need more pages than one-line names
+    assert page_count > pdf_pages(render(draw_invoice, invoice_data(200)))
+    lines = re.findall(rb'\(Line (\d{5})', pdf)
+    assert sorted(int(n) for n in lines) == list(range(200))
+    assert pdf.count(b'(Batch B-7)') == len(range(0, 200, 7))
+    assert f"(Page {page_count} of {page_count}) Tj".encode() in pdf
+    assert b'(Grand Total: 2000.00) Tj' in pdf
+
+def test_page_footers_agree():
+    print("Testing page footers around the totals page break...")
+    moved = 0
+    for line_count in range(20, 80):
+        pdf = render(draw_invoice, invoice_data(line_count))
+        page_count = pdf_pages(pdf)
+        footers = [(int(n), int(of)) for n, of in re.findall(rb'\(Page (\d+) of (\d+)\) Tj', pdf)]
+        # Every page, including one the totals moved to, names the final count
+        if page_count > 1:
+            assert footers == [(n, page_count) for n in range(1, page_count + 1)]
+        moved += page_count > 1 and pdf.count(b'(Carried forward) Tj') == page_count - 2
+    # Some of these lengths push the totals onto a page of their own
+    assert moved
+
+def pdf_pages(pdf):
+    return pdf.count(b'/Type /Page\n')
+
+def test_short_invoice_single_page():
+    print("Testing single-page invoice PDF...")
+    pdf = render(draw_invoice, invoice_data(3))
+    assert pdf.count(b'/Type /Page\n') == 1
+    assert b'forward' not in pdf
+    assert b'(Page 1 of 1)' not in pdf
+
+def test_long_bill_linear_time():
+    print("Testing multi-page bill render time...")
+    timings = {}
+    for line_count in (1000, 4000):
+        data = invoice_data(line_count)
+        data['bill_number'] = 'BILL-LONG-0001'
+        start = time.perf_counter()
+        render(draw_bill, data)
+        timings[line_count] = time.perf_counter() - start
+    print(f"1000 lines: {timings[1000]:.2f}s, 4000 lines: {timings[4000]:.2f}s")
+    # 4x the lines should cost roughly 4x the time, not 16x
+    assert timings[4000] < timings[1000] * 8
+
+if __name__ == "__main__":
+    test_long_invoice_pdf()
+    test_wrapped_item_names()
+    test_page_footers_agree()
+    test_short_invoice_single_page()
+    test_long_bill_linear_time()
@@ -0,0 +1,57 @@
+import datetime
+import pytest
+from database.db import execute_write_query, execute_transaction
+from database.maintenance import (
+    get_database_stats, get_last_runs, run_maintenance, tasks_due, WAL_CHECKPOINT_BYTES
+)
+
+def test_maintenance_run(work_db):
+    print("Testing database maintenance...")
+    stats = get_database_stats()
+    assert stats['auto_vacuum'] == 'incremental'
+
+    # Leave free pages behind the way the bulk clears in Settings do
+    execute_write_query("CREATE TABLE IF NOT EXISTS maintenance_scratch (id INTEGER PRIMARY KEY, payload TEXT)")
+    execute_transaction([
+        ("INSERT INTO maintenance_scratch (payload) VALUES (?)", ("x" * 2000,)) for _ in range(500)
+    ])
+    execute_write_query("DROP TABLE maintenance_scratch")
+    before = get_database_stats()
+    print(f"Before: {before['free_pages']} free pages, WAL {before['wal_bytes']} bytes")
+    assert before['free_pages'] >= 200
+    assert 'vacuum' in tasks_due(stats=before)
+
+    results = run_maintenance()
+    for result in results:
+        print(f"{result['task']}: {result['seconds'] * 1000:.1f} ms - {result['details']}")
+    assert [r['task'] for r in results] == ['optimize', 'vacuum', 'checkpoint']
+
+    after = get_database_stats()
+    print(f"After: {after['free_pages']} free pages, WAL {after['wal_bytes']} bytes")
+    assert after['free_pages'] < before['free_pages']
+    assert after['db_bytes'] < before['db_bytes'] + before['wal_bytes']
+
+    last_runs = get_last_runs()
+    assert set(last_runs) >= {'optimize', 'vacuum', 'checkpoint'}
+    assert all(run['seconds'] >= 0 for run in last_runs.values())
+
+def test_tasks_due():
+    print("Testing maintenance scheduling...")
+    now = datetime.datetime(2026, 6, 1, 12, 0)
+    recent = {task: {'started_at': (now - datetime.timedelta(minutes=5)).isoformat()}
+              for task in ('optimize', 'vacuum', 'checkpoint')}
+    quiet = {'free_pages': 0, 'page_count': 1000, 'wal_bytes': 0, 'auto_vacuum': 'incremental'}
+
+    assert tasks_due(now, quiet, recent) == []
+    assert tasks_due(now, quiet, {}) == ['optimize']
+    assert tasks_due(now, dict(quiet, free_pages=300), recent) == ['vacuum']
+    # A few free pages in a big file are not worth a vacuum
+    assert tasks_due(now, dict(quiet, free_pages=10), recent) == []
+    assert tasks_due(now, dict(quiet, free_pages=300, auto_vacuum='none'), recent) == []
+    assert tasks_due(now, dict(quiet, wal_bytes=WAL_CHECKPOINT_BYTES), recent) == ['checkpoint']
+    # A small WAL is checkpointed once the interval has passed
+    stale = dict(recent, checkpoint={'started_at': (now - datetime.timedelta(hours=2)).isoformat()})
+    assert tasks_due(now, dict(quiet, wal_bytes=4096), stale) == ['checkpoint']
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main(["-s", __file__]))
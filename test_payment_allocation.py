@@ -0,0 +1,80 @@
+import pytest
+from database import query_stats
+from database.db import execute_write_query, execute_read_query, execute_transaction
+from modules.payment import save_payment, save_bill_payment, apply_credits, get_customer_credits, get_unpaid_invoices
+
+def test_batched_allocation(work_db):
+    print("Testing batched payment allocation...")
+    try:
+        cust_id = execute_write_query("INSERT INTO customers (name) VALUES ('Allocation Customer')")
+        execute_transaction([
+            ("INSERT INTO invoices (invoice_number, customer_id, date, grand_total, status) VALUES (?, ?, '2024-02-01', 100, 'Sent')",
+             (f"ALLOC-{n:03d}", cust_id))
+            for n in range(500)
+        ])
+        invoice_ids = [row['id'] for row in execute_read_query(
+            "SELECT id FROM invoices WHERE customer_id = ? ORDER BY id", (cust_id,))]
+
+        # Three advances of 150, 30 and 70 on account
+        for n, amount in enumerate([150.0, 30.0, 70.0]):
+            save_payment({'customer_id': cust_id, 'amount_received': amount, 'date': f'2024-01-0{n + 1}',
+                          'method': 'Cash', 'bank_charges': 5.0 if n == 0 else 0.0, 'allocations': []})
+        assert get_customer_credits(cust_id) == 250.0
+
+        # 250 of credits and 49,710 of new money settle 499 invoices and part of the last one
+        allocations = [{'invoice_id': inv_id, 'amount': 100.0} for inv_id in invoice_ids[:-1]]
+        allocations.append({'invoice_id': invoice_ids[-1], 'amount': 60.0})
+        query_stats.clear()
+        query_stats.set_enabled(True, 10000)
+        result = save_payment({'customer_id': cust_id, 'amount_received': 49800.0, 'date': '2024-02-10',
+                               'method': 'Bank Transfer', 'bank_charges': 12.5, 'use_credits': True,
+                               'allocations': allocations})
+        calls = sum(s['calls'] for s in query_stats.get_call_site_stats())
+        print(f"Allocated across {len(allocations)} invoices in {calls} statements")
+        assert calls <= 10
+
+        assert (result['from_credits'], result['from_cash'], result['excess']) == (250.0, 49710.0, 90.0)
+        assert len(result['paid']) == 499 and invoice_ids[-1] not in result['paid']
+        assert get_customer_credits(cust_id) == 90.0
+
+        # Credits were applied oldest first: 150 over invoices 1-2, 30 to invoice 2, 70 over invoices 2-3
+        rows = execute_read_query("SELECT invoice_id, amount, bank_charges FROM payments WHERE customer_id = ? "
+                                  "AND date < '2024-02-01'", (cust_id,))
+        assert sorted((r['invoice_id'], r['amount']) for r in rows) == [
+            (invoice_ids[0], 100.0), (invoice_ids[1], 20.0), (invoice_ids[1], 30.0), (invoice_ids[1], 50.0),
+            (invoice_ids[2], 50.0)]
+        assert sum(r['bank_charges'] for r in rows) == 5.0
+
+        # Bank charges go on the first row of new money only
+        charges = execute_read_query("SELECT invoice_id, bank_charges FROM payments WHERE date = '2024-02-10' AND bank_charges > 0")
+        assert [(r['invoice_id'], r['bank_charges']) for r in charges] == [(invoice_ids[2], 12.5)]
+
+        unpaid = get_unpaid_invoices(cust_id)
+        assert [(u['id'], u['balance_due']) for u in unpaid] == [(invoice_ids[-1], 40.0)]
+
+        # The receipt's excess can then settle the last invoice on its own
+        try:
+            apply_credits('customer', cust_id, [{'invoice_id': invoice_ids[-1], 'amount': 400.0}])
+            assert False, "Applying more than the open credits should fail"
+        except Exception as e:
+            assert "exceed" in str(e)
+        result = apply_credits('customer', cust_id, [{'invoice_id': invoice_ids[-1], 'amount': 40.0}], date='2024-02-11')
+        assert result['paid'] == [invoice_ids[-1]] and result['from_cash'] == 0.0
+        assert get_customer_credits(cust_id) == 50.0 and get_unpaid_invoices(cust_id) == []
+
+        # Vendor payments share the engine
+        vendor_id = execute_write_query("INSERT INTO vendors (name) VALUES ('Allocation Vendor')")
+        bill_id = execute_write_query(
+            "INSERT INTO bills (bill_number, vendor_id, date, grand_total, status) VALUES ('ALLOC-B1', ?, '2024-02-01', 300, 'Open')",
+            (vendor_id,))
+        result = save_bill_payment({'vendor_id': vendor_id, 'amount_paid': 300.0, 'date': '2024-02-12',
+                                    'method': 'Cash', 'allocations': [{'bill_id': bill_id, 'amount': 300.0}]})
+        assert result['paid'] == [bill_id]
+        assert execute_read_query("SELECT status FROM bills WHERE id = ?", (bill_id,))[0]['status'] == 'Paid'
+        print("Batched allocation OK")
+    finally:
+        query_stats.set_enabled(False, query_stats.DEFAULT_SLOW_MS)
+        query_stats.clear()
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main(["-s", __file__]))
@@ -0,0 +1,59 @@
+import os
+import shutil
+import tempfile
+from pdf import resources
+from pdf.generator import generate_invoice_pdf
+
+def test_unicode_font_registered():
+    print("Testing unicode font lookup...")
+    font_name = resources.get_unicode_font()
+    available = [path for name, path in resources._font_candidates() if os.path.exists(path)]
+    print(f"Font: {font_name}, candidates on this machine: {available}")
+    if available:
+        assert font_name != "Helvetica"
+    # Registered once and reused
+    assert resources.get_unicode_font() == font_name
+
+def test_logo_reader_cache():
+    print("Testing logo reader cache...")
+    work_dir = tempfile.mkdtemp()
+    logo_path = os.path.join(work_dir, "logo.png")
+    shutil.copy(os.path.join("assets", "br31logo.png"), logo_path)
+    try:
+        first = resources.get_logo_reader(logo_path)
+        assert first is not None
+        assert resources.get_logo_reader(logo_path) is first
+
+        # A replaced file is decoded again
+        stat = os.stat(logo_path)
+        os.utime(logo_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        second = resources.get_logo_reader(logo_path)
+        assert second is not first
+
+        resources.invalidate_logo()
+        assert resources.get_logo_reader(logo_path) is not second
+        assert resources.get_logo_reader(os.path.join(work_dir, "missing.png")) is None
+
+        # The cached reader can be drawn into more than one document
+        invoice = {'invoice_number': 'INV-LOGO', 'logo_path': logo_path, 'company_name': 'Logo Co', 'items': []}
+        for i in range(2):
+            filename = os.path.join(work_dir, f"invoice_{i}.pdf")
+            generate_invoice_pdf(invoice, filename)
+            assert os.path.getsize(filename) > 0
+    finally:
+        resources.invalidate_logo()
+        shutil.rmtree(work_dir)
+
+def test_background_warm_up():
+    print("Testing background warm-up...")
+    thread = resources.start_pdf_warm_up(os.path.join("assets", "br31logo.png"))
+    thread.join(timeout=30)
+    assert not thread.is_alive()
+    assert os.path.join("assets", "br31logo.png") in resources._logo_readers
+    assert resources.get_stylesheet() is resources.get_stylesheet()
+    resources.invalidate_logo()
+
+if __name__ == "__main__":
+    test_unicode_font_registered()
+    test_logo_reader_cache()
+    test_background_warm_up()
@@ -0,0 +1,99 @@
+import os
+import datetime
+import pytest
+import modules.archive as archive
+from database.db import execute_write_query, execute_read_query
+from modules.payment import save_payment, save_bill_payment
+from modules.invoice import delete_invoice
+from modules.stock_fifo import add_stock
+from modules.reports_logic import get_cash_flow_data
+from modules.period_close import (
+    close_period, reopen_period, get_party_balances, get_period_stock, get_locked_until,
+    get_closable_periods, check_period_open
+)
+
+def expect_locked(fn, *args):
+    try:
+        fn(*args)
+        assert False, "Expected the closed period to be refused"
+    except Exception as e:
+        assert "closed up to" in str(e), str(e)
+
+def test_period_close(work_db):
+    print("Testing period close...")
+    original_dir = archive.ARCHIVE_DIR
+    archive.ARCHIVE_DIR = os.path.dirname(work_db)
+
+    try:
+        cust_id = execute_write_query("INSERT INTO customers (name) VALUES ('Close Customer')")
+        vendor_id = execute_write_query("INSERT INTO vendors (name) VALUES ('Close Vendor')")
+        item_id = execute_write_query("INSERT INTO items (name, purchase_price) VALUES ('Close Item', 25)")
+        add_stock(item_id, 4, 25, '2015-05-01')
+        add_stock(item_id, 6, 25, '2015-07-01')
+        inv_id = execute_write_query(
+            "INSERT INTO invoices (invoice_number, customer_id, date, subtotal, tax_amount, grand_total, status) "
+            "VALUES ('INV-8000001', ?, '2015-05-10', 100, 18, 118, 'Sent')", (cust_id,)
+        )
+        save_payment({'customer_id': cust_id, 'date': '2015-06-01', 'method': 'Cash',
+                      'allocations': [{'invoice_id': inv_id, 'amount': 100.0}]})
+        bill_id = execute_write_query(
+            "INSERT INTO bills (bill_number, vendor_id, date, subtotal, tax_amount, grand_total, status) "
+            "VALUES ('CLOSE-BILL-1', ?, '2015-05-20', 50, 9, 59, 'Sent')", (vendor_id,)
+        )
+        save_bill_payment({'vendor_id': vendor_id, 'date': '2015-05-25', 'method': 'Cash',
+                           'allocations': [{'bill_id': bill_id, 'amount': 59.0}]})
+
+        before = {fy: get_cash_flow_data(fy) for fy in (2015, 2016)}
+        assert '2015-06' in get_closable_periods()
+        close = close_period('2015-06')
+        print(f"Closed {close['period']}: cash {close['cash_in'] - close['cash_out']:.2f}")
+        assert close['kind'] == 'month' and get_locked_until() == '2015-06-30'
+        assert '2015-06' not in get_closable_periods()
+        assert {fy: get_cash_flow_data(fy) for fy in (2015, 2016)} == before
+
+        customer = get_party_balances('customer')[cust_id]
+        assert (customer['billed'], customer['settled'], customer['balance']) == (118.0, 100.0, 18.0)
+        assert get_party_balances('vendor')[vendor_id]['balance'] == 0.0
+        assert get_party_balances('customer', '2015-06-01')[cust_id]['balance'] == 118.0
+        stock = {row['item_id']: row for row in get_period_stock('2015-06')}
+        # Stock as of the month end, not including the July purchase
+        assert (stock[item_id]['quantity'], stock[item_id]['value']) == (4, 100)
+
+        # Backdated changes are refused, later ones go through
+        expect_locked(save_payment, {'customer_id': cust_id, 'date': '2015-06-30', 'method': 'Cash',
+                                     'allocations': [{'invoice_id': inv_id, 'amount': 18.0}]})
+        expect_locked(delete_invoice, inv_id)
+        expect_locked(check_period_open, None, '2015-01-01')
+        save_payment({'customer_id': cust_id, 'date': '2015-07-01', 'method': 'Cash',
+                      'allocations': [{'invoice_id': inv_id, 'amount': 18.0}]})
+        assert get_party_balances('customer')[cust_id]['balance'] == 0.0
+
+        # Reports start from the close: an edit behind its back is not picked up
+        opening = get_cash_flow_data(2016)['opening_balance']
+        execute_write_query("UPDATE payments SET amount = 1000 WHERE customer_id = ? AND date = '2015-06-01'", (cust_id,))
+        assert get_cash_flow_data(2016)['opening_balance'] == opening
+        reopen_period('2015-06')
+        assert get_locked_until() is None
+        assert get_cash_flow_data(2016)['opening_balance'] == opening + 900
+        execute_write_query("UPDATE payments SET amount = 100 WHERE customer_id = ? AND date = '2015-06-01'", (cust_id,))
+
+        # March closes are year ends, and archiving keeps the balances
+        assert close_period('2016-03')['kind'] == 'year'
+        assert get_period_stock('2016-03')[0]['quantity'] == 10
+        after_close = get_party_balances('customer')[cust_id]
+        archive.archive_fiscal_year(2015)
+        assert execute_read_query("SELECT COUNT(*) FROM invoices WHERE customer_id = ?", (cust_id,))[0][0] == 0
+        assert get_party_balances('customer')[cust_id] == after_close
+        reopen_period()
+        assert get_party_balances('customer')[cust_id] == after_close
+
+        try:
+            close_period(datetime.date.today().isoformat()[:7])
+            assert False, "Expected the current month to be refused"
+        except Exception as e:
+            assert "has not ended" in str(e)
+    finally:
+        archive.ARCHIVE_DIR = original_dir
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main(["-s", __file__]))
@@ -0,0 +1,58 @@
+import os
+import json
+import pytest
+from database import query_stats
+from database.db import execute_write_query, execute_read_query, execute_transaction, iter_read_query
+
+def test_query_instrumentation(work_db):
+    print("Testing query instrumentation...")
+    work_dir = os.path.dirname(work_db)
+    try:
+        cust_id = execute_write_query("INSERT INTO customers (name) VALUES ('Stats Customer')")
+        execute_transaction([
+            ("INSERT INTO invoices (invoice_number, customer_id, date, grand_total, status) VALUES (?, ?, '2024-01-01', 100, 'Sent')",
+             (f"STATS-{n}", cust_id))
+            for n in range(12)
+        ])
+
+        # Nothing is recorded while disabled
+        query_stats.clear()
+        execute_read_query("SELECT COUNT(*) FROM invoices")
+        assert query_stats.get_call_site_stats() == []
+
+        query_stats.set_enabled(True, 10000)
+        assert query_stats.normalize_sql("SELECT *  FROM items\n WHERE id IN (?, ?, ?) AND name = 'x' LIMIT 5") == \
+            "SELECT * FROM items WHERE id IN (...) AND name = ? LIMIT ?"
+
+        execute_read_query("SELECT id FROM invoices WHERE customer_id = ?", (cust_id,))
+        assert sum(1 for _ in iter_read_query("SELECT id FROM invoices WHERE customer_id = ?", (cust_id,), batch_size=5)) == 12
+        site = query_stats.get_call_site_stats()
+        assert len(site) == 2 and all(s['call_site'].startswith("test_query_stats.py:") for s in site)
+        assert [s['rows'] for s in site] == [12, 12]
+
+        # One balance query per invoice within one action is flagged
+        query_stats.begin_action("Payments: QComboBox 'Stats Customer'")
+        for row in execute_read_query("SELECT id FROM invoices WHERE customer_id = ?", (cust_id,)):
+            execute_read_query("SELECT SUM(amount) FROM payments WHERE invoice_id = ?", (row['id'],))
+        found = query_stats.end_action()
+        assert len(found) == 1 and found[0]['count'] == 12
+        assert found[0]['call_site'].startswith("test_query_stats.py:") and "payments WHERE invoice_id = ?" in found[0]['sql']
+        assert query_stats.end_action() == []
+
+        # Slow statements are logged
+        query_stats.set_enabled(True, 1)
+        execute_read_query("WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < 300000) SELECT SUM(x) FROM n")
+        snapshot = query_stats.get_snapshot()
+        assert any("RECURSIVE" in q['sql'] for q in snapshot['slow_queries'])
+
+        path = query_stats.dump_json(os.path.join(work_dir, "stats.json"))
+        with open(path, encoding='utf-8') as f:
+            dumped = json.load(f)
+        assert dumped['n_plus_one'][0]['count'] == 12 and len(dumped['recent']) == len(snapshot['recent'])
+        print(f"Recorded {len(dumped['recent'])} statements from {len(dumped['call_sites'])} call sites")
+    finally:
+        query_stats.set_enabled(False, query_stats.DEFAULT_SLOW_MS)
+        query_stats.clear()
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main(["-s", __file__]))
@@ -0,0 +1,98 @@
+import os
+import csv
+import time
+import pytest
+from database.db import execute_write_query, execute_read_query, execute_transaction
+from modules.payment import save_payment, save_bill_payment, get_customer_credits
+from modules.reconciliation import (import_statement, auto_match, get_statement_lines, confirm_lines,
+                                    ignore_lines, record_lines, get_statements, parse_amount)
+
+def write_csv(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["Txn Date", "Narration", "Chq/Ref No", "Withdrawal Amt", "Deposit Amt", "Balance"])
+        writer.writerows(rows)
+
+def test_bank_reconciliation(work_db):
+    print("Testing bank statement reconciliation...")
+    work_dir = os.path.dirname(work_db)
+    assert parse_amount("1,234.50") == 1234.5 and parse_amount("(250)") == -250.0
+    assert parse_amount("120.00 DR") == -120.0 and parse_amount("") is None
+
+    cust_id = execute_write_query("INSERT INTO customers (name) VALUES ('Recon Customer')")
+    vendor_id = execute_write_query("INSERT INTO vendors (name) VALUES ('Recon Vendor')")
+    inv = {}
+    for number, total in (("RECON-1", 1000.0), ("RECON-2", 2500.0), ("RECON-3", 777.0), ("RECON-4", 640.0)):
+        inv[number] = execute_write_query(
+            "INSERT INTO invoices (invoice_number, customer_id, date, grand_total, status) VALUES (?, ?, '2030-03-01', ?, 'Sent')",
+            (number, cust_id, total))
+    bill_id = execute_write_query(
+        "INSERT INTO bills (bill_number, vendor_id, date, grand_total, status) VALUES ('RB-9', ?, '2030-03-01', 900, 'Open')",
+        (vendor_id,))
+
+    save_payment({'customer_id': cust_id, 'amount_received': 1000.0, 'date': '2030-03-05', 'method': 'Bank Transfer',
+                  'payment_number': 'RCP-7001', 'allocations': [{'invoice_id': inv['RECON-1'], 'amount': 1000.0}]})
+    save_payment({'customer_id': cust_id, 'amount_received': 2500.0, 'date': '2030-03-06', 'method': 'Bank Transfer',
+                  'payment_number': 'RCP-7002', 'bank_charges': 15.0,
+                  'allocations': [{'invoice_id': inv['RECON-2'], 'amount': 2500.0}]})
+    save_bill_payment({'vendor_id': vendor_id, 'amount_paid': 900.0, 'date': '2030-03-07', 'method': 'Bank Transfer',
+                       'payment_number': 'VP-7003', 'allocations': [{'bill_id': bill_id, 'amount': 900.0}]})
+
+    path = os.path.join(work_dir, "statement.csv")
+    write_csv(path, [
+        ("05/03/2030", "NEFT CR RCP-7001 RECON CUSTOMER", "UTR001", "", "1,000.00", "1000.00"),
+        ("07/03/2030", "NEFT CR RECON CUSTOMER", "UTR002", "", "2,485.00", "3485.00"),
+        ("08/03/2030", "IMPS DR RECON VENDOR", "UTR003", "900.00", "", "2585.00"),
+        ("09/03/2030", "UPI/RECON-3/PAYMENT", "UTR004", "", "777.00", "3362.00"),
+        ("10/03/2030", "CASH DEPOSIT", "", "", "300.00", "3662.00"),
+        ("11/03/2030", "SMS CHARGES", "", "17.70", "", "3644.30"),
+        ("", "", "", "", "", ""),
+    ])
+    statement_id = import_statement(path, account="Current A/c")
+    lines = get_statement_lines(statement_id)
+    assert [l['amount'] for l in lines] == [1000.0, 2485.0, -900.0, 777.0, 300.0, -17.7]
+    assert lines[0]['date'] == '2030-03-05'
+
+    counts = auto_match(statement_id)
+    assert counts == {'Matched': 1, 'Suggested': 3, 'Unmatched': 2}, counts
+    by_desc = {l['description']: l for l in get_statement_lines(statement_id)}
+    first = by_desc["NEFT CR RCP-7001 RECON CUSTOMER"]
+    assert (first['status'], first['payment_number'], first['match_rule']) == ('Matched', 'RCP-7001', 'reference')
+    # Received net of the 15.00 bank charge
+    assert by_desc["NEFT CR RECON CUSTOMER"]['payment_number'] == 'RCP-7002'
+    assert by_desc["IMPS DR RECON VENDOR"]['payment_number'] == 'VP-7003'
+    upi = by_desc["UPI/RECON-3/PAYMENT"]
+    assert (upi['match_type'], upi['match_id'], upi['match_label']) == ('invoice', inv['RECON-3'], 'RECON-3')
+
+    # Matching again finds nothing new for the lines already matched
+    assert auto_match(statement_id) == {'Matched': 0, 'Suggested': 0, 'Unmatched': 2}
+
+    confirm_lines([by_desc["NEFT CR RECON CUSTOMER"]['id'], by_desc["IMPS DR RECON VENDOR"]['id']])
+    ignore_lines([by_desc["SMS CHARGES"]['id']])
+    result = record_lines([upi['id'], by_desc["CASH DEPOSIT"]['id'], by_desc["SMS CHARGES"]['id']],
+                          party_type='customer', party_id=cust_id)
+    assert result == {'recorded': 2, 'skipped': 1}
+    assert execute_read_query("SELECT status FROM invoices WHERE id = ?", (inv['RECON-3'],))[0]['status'] == 'Paid'
+    assert get_customer_credits(cust_id) == 300.0
+
+    summary = get_statements()[0]
+    assert (summary['reconciled'], summary['ignored'], summary['unmatched'], summary['suggested']) == (5, 1, 0, 0)
+
+    # A large statement matches in near-linear time
+    execute_transaction([
+        ("INSERT INTO payments (customer_id, amount, date, method, payment_number) VALUES (?, ?, '2030-04-01', 'Bank Transfer', ?)",
+         (cust_id, 100 + n, f"BULK-{n}"))
+        for n in range(5000)
+    ])
+    big = os.path.join(work_dir, "big.csv")
+    write_csv(big, [("01/04/2030", f"NEFT CR {n}", f"U{n}", "", f"{100 + n:.2f}", "") for n in range(5000)]
+              + [("02/04/2030", f"UNKNOWN {n}", "", "", f"{0.5 + n:.2f}", "") for n in range(5000)])
+    started = time.perf_counter()
+    big_id = import_statement(big)
+    counts = auto_match(big_id)
+    elapsed = time.perf_counter() - started
+    print(f"Imported and matched 10000 lines in {elapsed:.2f}s: {counts}")
+    assert counts['Matched'] + counts['Suggested'] >= 5000
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main(["-s", __file__]))
@@ -0,0 +1,103 @@
+import os
+import time
+import shutil
+import tempfile
+import pdf.render_cache as render_cache
+from pdf.generator import generate_invoice_pdf
+
+INVOICE_DATA = {
+    'id': 1,
+    'invoice_number': 'INV-CACHE-0001',
+    'date': '2026-01-01',
+    'status': 'Sent',
+    'customer_name': 'Cache Test Customer',
+    'company_name': 'Cache Test Co',
+    'subtotal': 100.0,
+    'grand_total': 100.0,
+    'items': [{'name': 'Widget', 'quantity': 10, 'rate': 10.0, 'discount_percent': 0, 'gst_percent': 0, 'amount': 100.0}]
+}
+
+def counting_renderer(calls):
+    def render(data, filename):
+        calls.append(data['invoice_number'])
+        generate_invoice_pdf(data, filename)
+    return render
+
+def test_render_cache():
+    print("Testing PDF render cache...")
+    work_dir = tempfile.mkdtemp()
+    original_cache_dir = render_cache.CACHE_DIR
+    render_cache.CACHE_DIR = os.path.join(work_dir, "pdf_cache")
+    output = os.path.join(work_dir, "invoice.pdf")
+    calls = []
+    render = counting_renderer(calls)
+
+    try:
+        # First open renders, second is served from the cache
+        start = time.perf_counter()
+        assert render_cache.render_cached_pdf('invoice', 1, dict(INVOICE_DATA), render, output) is False
+        miss_time = time.perf_counter() - start
+        start = time.perf_counter()
+        assert render_cache.render_cached_pdf('invoice', 1, dict(INVOICE_DATA), render, output) is True
+        hit_time = time.perf_counter() - start
+        print(f"Miss: {miss_time * 1000:.1f} ms, hit: {hit_time * 1000:.1f} ms")
+        assert len(calls) == 1
+        assert os.path.getsize(output) > 0
+
+        # A status change (e.g. after a payment) produces a new key and replaces the old entry
+        paid = dict(INVOICE_DATA, status='Paid')
+        assert render_cache.render_cached_pdf('invoice', 1, paid, render, output) is False
+        assert len(calls) == 2
+        assert len(os.listdir(render_cache.CACHE_DIR)) == 1
+
+        # Any other update of the row moves its version on, so no write path has to invalidate
+        edited = dict(paid, version=2)
+        assert render_cache.document_cache_key('invoice', edited) != render_cache.document_cache_key('invoice', dict(paid, version=1))
+
+        # Company profile changes are part of the key as well
+        renamed = dict(paid, company_name='Renamed Co')
+        assert render_cache.document_cache_key('invoice', renamed) != render_cache.document_cache_key('invoice', paid)
+
+        # Explicit invalidation
+        render_cache.invalidate_document('invoice', 1)
+        assert os.listdir(render_cache.CACHE_DIR) == []
+        assert render_cache.render_cached_pdf('invoice', 1, paid, render, output) is False
+        assert len(calls) == 3
+    finally:
+        render_cache.CACHE_DIR = original_cache_dir
+        shutil.rmtree(work_dir)
+
+def test_render_cache_eviction():
+    print("Testing PDF render cache eviction...")
+    work_dir = tempfile.mkdtemp()
+    original_cache_dir = render_cache.CACHE_DIR
+    render_cache.CACHE_DIR = os.path.join(work_dir, "pdf_cache")
+    output = os.path.join(work_dir, "invoice.pdf")
+    calls = []
+    render = counting_renderer(calls)
+
+    try:
+        for doc_id in range(1, 6):
+            data = dict(INVOICE_DATA, id=doc_id, invoice_number=f"INV-CACHE-{doc_id:04d}")
+            render_cache.render_cached_pdf('invoice', doc_id, data, render, output)
+            # Distinct mtimes even on filesystems with coarse timestamps
+            cached = render_cache.cache_path('invoice', doc_id, render_cache.document_cache_key('invoice', data))
+            os.utime(cached, ns=(doc_id * 10**9, doc_id * 10**9))
+
+        entry_size = os.path.getsize(output)
+        remaining = render_cache.evict_render_cache(max_bytes=entry_size * 2)
+        names = sorted(os.listdir(render_cache.CACHE_DIR))
+        print(f"Remaining entries: {names}")
+        assert remaining <= entry_size * 2
+        # The least recently used documents go first
+        assert [n.split('_')[1] for n in names] == ['4', '5']
+
+        render_cache.clear_render_cache()
+        assert os.listdir(render_cache.CACHE_DIR) == []
+    finally:
+        render_cache.CACHE_DIR = original_cache_dir
+        shutil.rmtree(work_dir)
+
+if __name__ == "__main__":
+    test_render_cache()
+    test_render_cache_eviction()
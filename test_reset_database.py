@@ -0,0 +1,60 @@
+import sqlite3
+import threading
+import pytest
+import database.db as db
+from database.db import execute_read_query, execute_write_query, start_write_queue, stop_write_queue, reset_database
+
+def count_on_disk(path, name):
+    # A connection of its own, so it sees only what is in the file at path
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM customers WHERE name = ?", (name,)).fetchone()[0]
+    finally:
+        conn.close()
+
+def test_reset_then_write(work_db):
+    print("Testing database reset...")
+    start_write_queue()
+    execute_write_query("INSERT INTO customers (name) VALUES ('Before Reset')")
+
+    # A worker thread keeps its own connection open across the reset
+    worker_ready, reset_done, worker_done = threading.Event(), threading.Event(), threading.Event()
+    worker_results = []
+    def worker():
+        worker_results.append(execute_read_query("SELECT COUNT(*) FROM customers")[0][0])
+        worker_ready.set()
+        reset_done.wait(10)
+        worker_results.append(execute_read_query("SELECT COUNT(*) FROM customers WHERE name = 'Before Reset'")[0][0])
+        execute_write_query("INSERT INTO customers (name) VALUES ('Worker After Reset')")
+        db.close_thread_connection()
+        worker_done.set()
+    thread = threading.Thread(target=worker)
+    thread.start()
+    worker_ready.wait(10)
+    assert worker_results[0] >= 1
+
+    reset_database()
+    reset_done.set()
+    assert worker_done.wait(10)
+    thread.join()
+
+    # The old book is gone for every thread, and the queue is back
+    assert worker_results[1] == 0
+    assert db.get_write_queue() is not None
+    assert execute_read_query("SELECT COUNT(*) FROM customers WHERE name = 'Before Reset'")[0][0] == 0
+
+    # Writes after the reset land in the new file
+    execute_write_query("INSERT INTO customers (name) VALUES ('After Reset')")
+    assert count_on_disk(work_db, 'After Reset') == 1
+    assert count_on_disk(work_db, 'Worker After Reset') == 1
+
+    # And without the queue too
+    stop_write_queue()
+    reset_database()
+    assert db.get_write_queue() is None
+    execute_write_query("INSERT INTO customers (name) VALUES ('Direct After Reset')")
+    assert count_on_disk(work_db, 'Direct After Reset') == 1
+    assert count_on_disk(work_db, 'After Reset') == 0
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main(["-s", __file__]))
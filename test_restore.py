@@ -0,0 +1,121 @@
+import os
+import shutil
+import sqlite3
+import datetime
+import tempfile
+from database.db import DB_NAME, SCHEMA_VERSION, execute_write_query, execute_read_query, get_connection
+from database.backup import backup_database, decompress_backup
+from database.audit import drop_audit_triggers
+from database.restore import restore_database, RestoreError
+
+def customer_exists(name):
+    return bool(execute_read_query("SELECT id FROM customers WHERE name = ?", (name,)))
+
+def test_restore_round_trip():
+    print("Testing validated restore...")
+    work_dir = tempfile.mkdtemp()
+    backup_path = os.path.join(work_dir, "before.db.gz")
+    name = f"Restore Customer {datetime.datetime.now().strftime('%H%M%S%f')}"
+
+    try:
+        backup_database(backup_path)
+        execute_write_query("INSERT INTO customers (name) VALUES (?)", (name,))
+        assert customer_exists(name)
+
+        # A connection opened before the restore sees the restored book afterwards
+        reader = get_connection()
+        steps = []
+        result = restore_database(backup_path, progress_callback=lambda done, total: steps.append(done))
+        print(f"Restored in {result['seconds']:.2f}s, steps {steps}")
+        assert steps[-1] == 3
+        assert not customer_exists(name)
+        assert reader.execute("SELECT COUNT(*) FROM customers WHERE name = ?", (name,)).fetchone()[0] == 0
+        reader.close()
+
+        # The database as it was right before the restore is kept
+        safety = sqlite3.connect(result['safety_copy'])
+        assert safety.execute("SELECT COUNT(*) FROM customers WHERE name = ?", (name,)).fetchone()[0] == 1
+        safety.close()
+        os.remove(result['safety_copy'])
+
+        assert not os.path.exists(DB_NAME + ".restore")
+        assert execute_read_query("PRAGMA integrity_check")[0][0] == "ok"
+    finally:
+        shutil.rmtree(work_dir)
+
+def test_restore_migrates_old_backup():
+    print("Testing restore of an old backup...")
+    work_dir = tempfile.mkdtemp()
+    backup_path = os.path.join(work_dir, "current.db")
+    old_path = os.path.join(work_dir, "old.db")
+
+    try:
+        backup_database(backup_path)
+        decompress_backup(backup_path, old_path)
+        # Make it look like it predates the v3 migration (and the v12 audit triggers)
+        conn = sqlite3.connect(old_path)
+        drop_audit_triggers(conn)
+        conn.execute("ALTER TABLE invoices DROP COLUMN adjustment")
+        conn.execute("PRAGMA user_version = 0")
+        conn.commit()
+        conn.close()
+
+        result = restore_database(old_path, keep_safety_copy=False)
+        assert result['migrated'] and result['schema_version'] == 0
+        columns = [row['name'] for row in execute_read_query("PRAGMA table_info(invoices)")]
+        assert 'adjustment' in columns
+        assert execute_read_query("PRAGMA user_version")[0][0] == SCHEMA_VERSION
+    finally:
+        shutil.rmtree(work_dir)
+
+def test_restore_rejects_bad_files():
+    print("Testing restore validation...")
+    work_dir = tempfile.mkdtemp()
+    marker = f"Restore Marker {datetime.datetime.now().strftime('%H%M%S%f')}"
+    execute_write_query("INSERT INTO customers (name) VALUES (?)", (marker,))
+
+    def expect_rejected(path, text):
+        try:
+            restore_database(path, keep_safety_copy=False)
+            assert False, "Expected RestoreError"
+        except RestoreError as e:
+            print(f"Rejected: {e}")
+            assert text in str(e)
+        # The live database is untouched
+        assert customer_exists(marker)
+
+    try:
+        not_sqlite = os.path.join(work_dir, "notes.db")
+        with open(not_sqlite, 'w') as f:
+            f.write("not a database")
+        expect_rejected(not_sqlite, "not a SQLite database")
+
+        other_app = os.path.join(work_dir, "other.db")
+        conn = sqlite3.connect(other_app)
+        conn.execute("CREATE TABLE notes (id INTEGER PRIMARY KEY)")
+        conn.close()
+        expect_rejected(other_app, "not a LedgerPro database")
+
+        newer = os.path.join(work_dir, "newer.db")
+        backup_database(newer)
+        conn = sqlite3.connect(newer)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION + 1}")
+        conn.close()
+        expect_rejected(newer, "newer version")
+
+        truncated = os.path.join(work_dir, "truncated.db")
+        with open(newer, 'rb') as src, open(truncated, 'wb') as dst:
+            dst.write(src.read(4096 * 3))
+        try:
+            restore_database(truncated, keep_safety_copy=False)
+            assert False, "Expected RestoreError"
+        except RestoreError as e:
+            print(f"Rejected: {e}")
+        assert customer_exists(marker)
+    finally:
+        shutil.rmtree(work_dir)
+
+if __name__ == "__main__":
+    test_restore_round_trip()
+    test_restore_migrates_old_backup()
+    test_restore_rejects_bad_files()
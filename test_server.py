@@ -0,0 +1,181 @@
+import os
+import shutil
+import sqlite3
+import datetime
+import threading
+import http.client
+import pytest
+import database.db as db
+from database.concurrency import EditConflict
+from auth.auth_logic import change_password, hash_password, login_user
+from database.db import execute_read_query, execute_write_query, execute_transaction, execute_versioned_transaction
+from modules.archive import execute_history_query
+from modules.backend import use_remote, use_local
+from modules.invoice import create_invoice, update_invoice
+from modules.payment import get_unpaid_invoices
+from modules.period_close import close_period, reopen_period
+from modules.reports_logic import get_sales_report
+from modules.statements import get_party_statement
+from modules.stock_fifo import set_valuation_method
+from server.app import LedgerServer
+from server.client import RemoteBackend, ServerError
+
+def test_server_mode(work_db):
+    print("Testing server mode...")
+    server = LedgerServer(work_db, port=0, token="secret")
+    port = server.start()
+    remote = RemoteBackend(f"http://127.0.0.1:{port}", token="secret")
+    try:
+        assert remote.ping()['schema_version'] == db.SCHEMA_VERSION
+
+        cust_id = execute_write_query("INSERT INTO customers (name) VALUES ('Remote Customer')")
+        item_id = execute_write_query(
+            "INSERT INTO items (name, sku, stock_on_hand, purchase_price) VALUES ('Remote Item', 'REMOTE-SKU', 0, 50)"
+        )
+        execute_write_query(
+            "INSERT INTO stock_batches (item_id, quantity_remaining, purchase_rate, purchase_date) VALUES (?, 100, 50, '2024-01-01')",
+            (item_id,)
+        )
+        execute_write_query("UPDATE items SET stock_on_hand = 100 WHERE id = ?", (item_id,))
+        user_id = execute_write_query("INSERT INTO users (name, email, password_hash) VALUES ('Remote User', 'remote@test', ?)",
+                                      (hash_password("pw"),))
+
+        # A hidden column reads as NULL only inside the block, cached statements included
+        hash_query = "SELECT * FROM users WHERE id = ?"
+        with db.protected_columns():
+            assert execute_read_query(hash_query, (user_id,))[0]['password_hash'] is None
+        assert execute_read_query(hash_query, (user_id,))[0]['password_hash'].startswith("$2")
+
+        # The terminal's own file; nothing may be read from or written to it from here on
+        terminal_db = os.path.join(os.path.dirname(work_db), "terminal.db")
+        shutil.copyfile(work_db, terminal_db)
+        db.DB_NAME = terminal_db
+
+        use_remote(remote)
+        line = {'item_id': item_id, 'quantity': 2, 'rate': 100.0, 'gst_percent': 0.0}
+        data = {'customer_id': cust_id, 'date': '2024-02-01', 'status': 'Sent', 'items': [line]}
+
+        # Writes from several terminals at once all land, one at a time
+        invoice_ids = []
+        def bill_customer():
+            invoice_ids.append(create_invoice(data))
+            remote.close()
+        threads = [threading.Thread(target=bill_customer) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(set(invoice_ids)) == 8
+        assert execute_read_query("SELECT stock_on_hand FROM items WHERE id = ?", (item_id,))[0][0] == 84
+
+        unpaid = get_unpaid_invoices(cust_id)
+        assert sorted(row['id'] for row in unpaid) == sorted(invoice_ids)
+        # Rows come back readable by name and position
+        sales = [row for row in get_sales_report('2024-02-01', '2024-02-01') if row['customer_name'] == 'Remote Customer']
+        assert len(sales) == 8
+        assert sales[0][0] == sales[0]['invoice_number'] and 'grand_total' in sales[0].keys()
+
+        # Conflicts and errors raised on the server are raised here
+        invoice_id = invoice_ids[0]
+        version = execute_read_query("SELECT version FROM invoices WHERE id = ?", (invoice_id,))[0][0]
+        update_invoice(invoice_id, dict(data, version=version))
+        try:
+            update_invoice(invoice_id, dict(data, version=version))
+            assert False, "Expected EditConflict"
+        except EditConflict as e:
+            assert e.current[invoice_id]['version'] == version + 1
+        try:
+            set_valuation_method(999999, 'average')
+            assert False, "Expected ServerError"
+        except ServerError as e:
+            assert e.status == 500 and "not found" in str(e)
+
+        try:
+            RemoteBackend(f"127.0.0.1:{port}", token="wrong").ping()
+            assert False, "Expected ServerError"
+        except ServerError as e:
+            assert e.status == 401
+        try:
+            remote.call("invoice.no_such_function")
+            assert False, "Expected ServerError"
+        except ServerError as e:
+            assert e.status == 404
+
+        # SQL run by pages themselves reaches the server's book too
+        page_cust = execute_write_query("INSERT INTO customers (name) VALUES ('Page Customer')")
+        assert execute_read_query("SELECT name FROM customers WHERE id = ?", (page_cust,))[0]['name'] == 'Page Customer'
+        execute_transaction([("UPDATE customers SET address = 'Server Road' WHERE id = ?", (page_cust,))])
+        item_version = execute_read_query("SELECT version FROM items WHERE id = ?", (item_id,))[0][0]
+        execute_versioned_transaction('items', {item_id: item_version},
+                                      [("UPDATE items SET purchase_price = 55 WHERE id = ?", (item_id,))])
+        try:
+            execute_versioned_transaction('items', {item_id: item_version}, [])
+            assert False, "Expected EditConflict"
+        except EditConflict:
+            pass
+        assert execute_history_query("SELECT COUNT(*) FROM history_invoices WHERE customer_id = ?", (cust_id,))[0][0] == 8
+        assert get_party_statement('customer', cust_id, '2024-01-01', '2024-12-31')['total_billed'] == 1600.0
+        for path, expected in ((work_db, 1), (terminal_db, 0)):
+            conn = sqlite3.connect(path)
+            rows = conn.execute("SELECT COUNT(*) FROM customers WHERE name = 'Page Customer' AND address = 'Server Road'").fetchone()[0]
+            rows += conn.execute("SELECT COUNT(*) FROM items WHERE id = ? AND purchase_price = 55", (item_id,)).fetchone()[0]
+            invoices = conn.execute("SELECT COUNT(*) FROM invoices WHERE customer_id = ?", (cust_id,)).fetchone()[0]
+            conn.close()
+            assert (rows, invoices) == (2 * expected, 8 * expected)
+
+        # Passwords are checked on the server, which then knows who is writing
+        assert login_user("remote@test", "wrong") is None and remote.session is None
+        user = login_user("remote@test", "pw")
+        assert user['id'] == user_id and 'password_hash' not in user and remote.session
+        update_invoice(invoice_ids[1], dict(data, date='2024-02-02', version=execute_read_query(
+            "SELECT version FROM invoices WHERE id = ?", (invoice_ids[1],))[0][0]))
+        audited = execute_read_query("SELECT user_id FROM audit_log WHERE entity = 'invoices' AND entity_id = ? ORDER BY id",
+                                     (invoice_ids[1],))
+        assert audited[0][0] is None and audited[-1][0] == user_id
+
+        # The hash can't be read or set through the SQL a terminal sends
+        assert execute_read_query("SELECT password_hash FROM users WHERE id = ?", (user_id,))[0][0] is None
+        assert execute_read_query(hash_query, (user_id,))[0]['password_hash'] is None
+        assert execute_history_query("SELECT password_hash FROM users WHERE id = ?", (user_id,))[0][0] is None
+        try:
+            execute_write_query("UPDATE users SET password_hash = 'x' WHERE id = ?", (user_id,))
+            assert False, "Expected ServerError"
+        except ServerError as e:
+            assert "not authorized" in str(e)
+        assert not change_password(user_id, "wrong", "new pw")
+        assert change_password(user_id, "pw", "new pw")
+        assert login_user("remote@test", "new pw")['id'] == user_id
+
+        # A session the server didn't issue is turned away, and so is one that ended
+        for session in ("made-up", remote.session):
+            remote.logout()
+            remote.session = session
+            try:
+                get_unpaid_invoices(cust_id)
+                assert False, "Expected ServerError"
+            except ServerError as e:
+                assert e.status == 401
+        remote.session = None
+
+        # Closing and reopening the books happens on the server's book as well
+        reopen_period()
+        assert close_period('2024-02', today=datetime.date(2024, 3, 15))['end_date'] == '2024-02-29'
+        for path, expected in ((work_db, 1), (terminal_db, 0)):
+            conn = sqlite3.connect(path)
+            closes = conn.execute("SELECT COUNT(*) FROM period_closes WHERE period = '2024-02'").fetchone()[0]
+            conn.close()
+            assert closes == expected
+        reopen_period('2024-02')
+        assert execute_read_query("SELECT COUNT(*) FROM period_closes WHERE period >= '2024-02'")[0][0] == 0
+
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+        conn.request("POST", "/call/payment.get_unpaid_invoices", body=b"{not json", headers={'x-ledgerpro-token': "secret"})
+        assert conn.getresponse().status == 400
+        conn.close()
+    finally:
+        use_local()
+        remote.close()
+        server.stop()
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main(["-s", __file__]))
@@ -0,0 +1,101 @@
+import os
+import shutil
+import sqlite3
+import datetime
+import tempfile
+import database.snapshots as snapshots
+from database.db import execute_write_query, execute_read_query
+
+def test_snapshot_dedup_and_restore():
+    print("Testing deduplicated snapshots...")
+    work_dir = tempfile.mkdtemp()
+    original_dir = snapshots.SNAPSHOT_DIR
+    snapshots.SNAPSHOT_DIR = os.path.join(work_dir, "snapshots")
+
+    try:
+        first = snapshots.take_snapshot()
+        print(f"First snapshot: {first['new_pages']} of {first['page_count']} pages in {first['seconds']:.2f}s")
+        assert first['id'] is not None
+        assert first['new_pages'] <= first['page_count']
+
+        # Nothing changed: no new snapshot unless forced
+        assert snapshots.take_snapshot()['id'] is None
+
+        name = f"Snapshot Customer {datetime.datetime.now().strftime('%H%M%S%f')}"
+        cust_id = execute_write_query("INSERT INTO customers (name) VALUES (?)", (name,))
+        second = snapshots.take_snapshot()
+        print(f"Second snapshot: {second['new_pages']} of {second['page_count']} pages new")
+        assert second['id'] is not None
+        # A single insert only touches a handful of pages
+        assert second['new_pages'] < max(10, second['page_count'] // 4)
+        assert len(snapshots.list_snapshots()) == 2
+
+        # Point-in-time restore: the first snapshot predates the customer
+        restored = os.path.join(work_dir, "restored.db")
+        snapshots.restore_snapshot(first['id'], restored)
+        conn = sqlite3.connect(restored)
+        assert conn.execute("SELECT COUNT(*) FROM customers WHERE id = ?", (cust_id,)).fetchone()[0] == 0
+        conn.close()
+
+        snapshots.restore_snapshot(second['id'], restored)
+        conn = sqlite3.connect(restored)
+        assert conn.execute("SELECT name FROM customers WHERE id = ?", (cust_id,)).fetchone()[0] == name
+        live_count = execute_read_query("SELECT COUNT(*) AS c FROM customers")[0]['c']
+        assert conn.execute("SELECT COUNT(*) FROM customers").fetchone()[0] == live_count
+        conn.close()
+    finally:
+        snapshots.SNAPSHOT_DIR = original_dir
+        shutil.rmtree(work_dir)
+
+def test_snapshot_retention():
+    print("Testing snapshot retention...")
+    now = datetime.datetime(2026, 6, 30, 12, 0)
+    history = []
+    # One snapshot every 30 minutes for 400 days
+    for i in range(400 * 48):
+        created = now - datetime.timedelta(minutes=30 * i)
+        history.append({'id': i + 1, 'created_at': created.isoformat(timespec='seconds')})
+
+    keep = snapshots.select_snapshots_to_keep(history, now=now, hourly=24, daily=30, monthly=12)
+    print(f"Keeping {len(keep)} of {len(history)} snapshots")
+    assert 1 in keep
+    # At most one per bucket: 24 hourly + 30 daily + 12 monthly
+    assert len(keep) <= 24 + 30 + 12
+    kept_times = [datetime.datetime.fromisoformat(s['created_at']) for s in history if s['id'] in keep]
+    assert min(kept_times) >= now - datetime.timedelta(days=31 * 12)
+    # Every one of the last 24 hours is covered
+    assert len({t.replace(minute=0) for t in kept_times if now - t < datetime.timedelta(hours=24)}) == 24
+
+def test_snapshot_prune():
+    print("Testing snapshot pruning...")
+    work_dir = tempfile.mkdtemp()
+    original_dir = snapshots.SNAPSHOT_DIR
+    snapshots.SNAPSHOT_DIR = os.path.join(work_dir, "snapshots")
+
+    try:
+        ids = [snapshots.take_snapshot(force=True)['id'] for _ in range(3)]
+        store = sqlite3.connect(snapshots.store_path())
+        # Age the first two so they share an old hourly bucket with nothing else
+        store.execute("UPDATE snapshots SET created_at = '2000-01-01T00:00:00' WHERE id IN (?, ?)", (ids[0], ids[1]))
+        store.commit()
+        store.close()
+
+        deleted = snapshots.prune_snapshots()
+        remaining = [s['id'] for s in snapshots.list_snapshots()]
+        print(f"Pruned {deleted} snapshots, remaining {remaining}")
+        assert remaining == [ids[2]]
+        snapshots.restore_snapshot(ids[2], os.path.join(work_dir, "restored.db"))
+
+        # The freed pages go back to the file system without a full VACUUM
+        store = sqlite3.connect(snapshots.store_path())
+        assert store.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+        assert store.execute("PRAGMA freelist_count").fetchone()[0] == 0
+        store.close()
+    finally:
+        snapshots.SNAPSHOT_DIR = original_dir
+        shutil.rmtree(work_dir)
+
+if __name__ == "__main__":
+    test_snapshot_dedup_and_restore()
+    test_snapshot_retention()
+    test_snapshot_prune()
@@ -0,0 +1,74 @@
+import os
+import pytest
+from database.db import execute_write_query, execute_read_query
+from modules.payment import save_payment, save_bill_payment, get_document_balances
+from modules.period_close import get_party_balances
+from modules.statements import get_party_statement, get_party_statements
+from pdf.batch_export import export_party_statements
+
+def test_party_statements(work_db):
+    print("Testing statements of account...")
+    work_dir = os.path.dirname(work_db)
+    indexes = {row['name'] for row in execute_read_query("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {'idx_invoices_customer_date', 'idx_payments_customer_date', 'idx_payments_vendor_date'} <= indexes
+
+    cust_id = execute_write_query("INSERT INTO customers (name, address) VALUES ('Statement Customer', '1 Main Road')")
+    other_id = execute_write_query("INSERT INTO customers (name) VALUES ('Statement Other')")
+    vendor_id = execute_write_query("INSERT INTO vendors (name) VALUES ('Statement Vendor')")
+
+    def invoice(number, party, date, total, status='Sent'):
+        return execute_write_query(
+            "INSERT INTO invoices (invoice_number, customer_id, date, grand_total, status) VALUES (?, ?, ?, ?, ?)",
+            (number, party, date, total, status))
+
+    old = invoice("ST-1", cust_id, '2032-12-20', 1000.0)
+    jan_a = invoice("ST-2", cust_id, '2033-01-05', 500.0)
+    jan_b = invoice("ST-3", cust_id, '2033-01-10', 300.0)
+    invoice("ST-4", cust_id, '2033-01-12', 999.0, status='Draft')
+    invoice("ST-5", other_id, '2033-01-07', 50.0)
+    save_payment({'customer_id': cust_id, 'amount_received': 400.0, 'date': '2032-12-28', 'method': 'Cash',
+                  'allocations': [{'invoice_id': old, 'amount': 400.0}]})
+    # One receipt over two invoices plus an advance is a single statement entry
+    save_payment({'customer_id': cust_id, 'amount_received': 1200.0, 'date': '2033-01-15', 'method': 'UPI',
+                  'reference': 'UTR-77', 'allocations': [{'invoice_id': old, 'amount': 600.0},
+                                                         {'invoice_id': jan_a, 'amount': 500.0}]})
+
+    statement = get_party_statement('customer', cust_id, '2033-01-01', '2033-01-31')
+    assert statement['opening_balance'] == 600.0
+    assert [(l['type'], l['number'], l['billed'], l['settled'], l['balance']) for l in statement['lines']] == [
+        ('Invoice', 'ST-2', 500.0, 0, 1100.0),
+        ('Invoice', 'ST-3', 300.0, 0, 1400.0),
+        ('Payment', statement['lines'][2]['number'], 0, 1200.0, 200.0),
+    ]
+    assert statement['lines'][2]['details'] == 'UPI UTR-77'
+    # The receipt settled ST-1 and ST-2; the second January invoice is still owed in full
+    balances = get_document_balances('customer', [jan_a, jan_b])
+    assert balances[jan_a]['amount_paid'] == 500.0
+    assert (balances[jan_b]['grand_total'], balances[jan_b]['amount_paid']) == (300.0, 0)
+    assert (statement['total_billed'], statement['total_settled'], statement['closing_balance']) == (800.0, 1200.0, 200.0)
+    assert statement['closing_balance'] == get_party_balances('customer', '2033-02-01')[cust_id]['balance']
+
+    # All customers from the same query; each balance runs per party
+    statements = {s['party_id']: s for s in get_party_statements('customer', '2033-01-01', '2033-01-31')}
+    assert statements[cust_id]['lines'] == statement['lines']
+    assert statements[other_id]['closing_balance'] == 50.0
+
+    bill_id = execute_write_query(
+        "INSERT INTO bills (bill_number, vendor_id, date, grand_total, status) VALUES ('SB-1', ?, '2033-01-03', 700, 'Open')",
+        (vendor_id,))
+    save_bill_payment({'vendor_id': vendor_id, 'amount_paid': 250.0, 'date': '2033-01-20', 'method': 'Cash',
+                       'allocations': [{'bill_id': bill_id, 'amount': 250.0}]})
+    vendor = get_party_statement('vendor', vendor_id, '2033-01-01', '2033-01-31')
+    assert [l['balance'] for l in vendor['lines']] == [700.0, 450.0] and vendor['opening_balance'] == 0.0
+
+    folder = os.path.join(work_dir, "statements")
+    result = export_party_statements(folder, 'customer', '2033-01-01', '2033-01-31', max_workers=2)
+    assert result['count'] == len(statements) and all(os.path.getsize(f) > 0 for f in result['files'])
+    assert os.path.basename(result['files'][0]).startswith("statement_")
+    merged = os.path.join(work_dir, "vendor.pdf")
+    export_party_statements(merged, 'vendor', '2033-01-01', '2033-01-31', party_id=vendor_id, merged=True)
+    assert os.path.getsize(merged) > 0
+    print(f"Rendered {result['count']} customer statements in {result['seconds']:.2f}s")
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main(["-s", __file__]))
@@ -0,0 +1,64 @@
+import sqlite3
+import datetime
+import pytest
+from database.db import execute_write_query, execute_read_query, run_migrations
+from modules.stock_fifo import (
+    add_stock, reduce_stock_fifo, get_stock_at, get_stock_movements, write_stock_checkpoints
+)
+
+def test_stock_ledger(live_copy):
+    print("Testing the stock movement ledger...")
+    had_ledger = bool(execute_read_query("SELECT name FROM sqlite_master WHERE name = 'stock_movements'"))
+    run_migrations(live_copy)
+    if not had_ledger:
+        # Existing stock opens the ledger
+        stocked = execute_read_query("SELECT COUNT(*) FROM items WHERE COALESCE(stock_on_hand, 0) != 0")[0][0]
+        assert execute_read_query("SELECT COUNT(*) FROM stock_movements WHERE kind = 'opening'")[0][0] == stocked
+
+    item_id = execute_write_query("INSERT INTO items (name, purchase_price) VALUES ('Ledger Item', 5)")
+    add_stock(item_id, 10, 5, '2020-01-10')
+    add_stock(item_id, 10, 7, '2020-02-05')
+    cogs = reduce_stock_fifo(item_id, 15, '2020-02-20', 'sale', 'invoice', 42)
+    assert cogs == 85
+
+    def at(date):
+        totals = get_stock_at(date, item_id).get(item_id)
+        return (totals['quantity'], totals['value']) if totals else None
+
+    assert at('2020-01-05') is None
+    assert at('2020-01-31') == (10, 50)
+    assert at('2020-02-29') == (5, 35)
+    assert get_stock_at('2020-02-29')[item_id] == {'quantity': 5, 'value': 35}
+    sale = get_stock_movements(item_id)[-1]
+    assert (sale['kind'], sale['reference_type'], sale['reference_id']) == ('sale', 'invoice', 42)
+
+    # Checkpoints give the same answers
+    written = write_stock_checkpoints(datetime.date(2020, 3, 15))
+    print(f"Checkpoints written: {written}")
+    assert written == ['2020-01-31', '2020-02-29']
+    assert write_stock_checkpoints(datetime.date(2020, 3, 15)) == []
+    assert at('2020-01-31') == (10, 50) and at('2020-02-29') == (5, 35) and at('2020-03-10') == (5, 35)
+
+    # A backdated movement drops the checkpoints it invalidates
+    add_stock(item_id, 2, 4, '2020-01-20')
+    assert execute_read_query("SELECT COUNT(*) FROM stock_checkpoints WHERE date >= '2020-01-20'")[0][0] == 0
+    assert at('2020-01-31') == (12, 58) and at('2020-02-29') == (7, 43)
+    assert write_stock_checkpoints(datetime.date(2020, 3, 15)) == ['2020-01-31', '2020-02-29']
+    assert at('2020-02-29') == (7, 43)
+
+    # Per-item lookups are a range scan on (item_id, date)
+    plan = " ".join(row[3] for row in execute_read_query(
+        "EXPLAIN QUERY PLAN SELECT SUM(quantity) FROM stock_movements WHERE item_id = ? AND date <= ?", (item_id, '2020-02-29')))
+    assert 'idx_stock_movements_item_date' in plan
+
+    # The ledger is append-only
+    for statement in ("UPDATE stock_movements SET quantity = 0 WHERE item_id = ?",
+                      "DELETE FROM stock_movements WHERE item_id = ?"):
+        try:
+            execute_write_query(statement, (item_id,))
+            assert False, "Expected the ledger to refuse changes"
+        except sqlite3.DatabaseError as e:
+            assert "append-only" in str(e)
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main(["-s", __file__]))
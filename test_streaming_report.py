@@ -0,0 +1,69 @@
+import os
+import time
+import tracemalloc
+from pdf.report_stream import generate_streaming_report_pdf, ReportCancelled
+
+REPORT_DATA = {
+    'company_name': 'Streaming Test Co',
+    'company_address': '1 Test Street',
+    'generated_date': '2026-01-01',
+    'date_range': '2025-04-01 to 2026-03-31'
+}
+HEADERS = ["Inv #", "Customer", "Date", "Total", "Status"]
+
+def sales_rows(count):
+    for i in range(count):
+        yield [f"INV-{i:06d}", f"Customer {i % 97} with a fairly long trading name Pvt Ltd", "2025-06-01", f"₹{i * 1.5:.2f}", "Paid"]
+
+def test_streaming_report():
+    print("Testing streaming report PDF...")
+    filename = "test_streaming_report.pdf"
+    pages_seen = []
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    written = generate_streaming_report_pdf(
+        REPORT_DATA, HEADERS, sales_rows(3000), filename, "SALES REPORT",
+        progress_callback=lambda done, total: pages_seen.append(done)
+    )
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"Rows written: {written} in {elapsed:.2f}s, pages: {len(pages_seen)}, peak memory: {peak / 1024 / 1024:.1f} MB")
+    assert written == 3000
+    assert pages_seen[-1] == 3000
+    assert os.path.exists(filename)
+    os.remove(filename)
+
+def test_stock_valuation_totals():
+    print("Testing stock valuation total row...")
+    filename = "test_stock_stream.pdf"
+    rows = [["Item A", "SKU-A", "10", "₹5.00", "₹50.00"], ["Item B", "", "2.5", "₹4.00", "₹10.00"]]
+    written = generate_streaming_report_pdf(REPORT_DATA, ["Item Name", "SKU", "Stock Qty", "Purchase Price", "Total Value"],
+                                            rows, filename, "STOCK VALUATION")
+    assert written == 2
+    assert os.path.exists(filename)
+    os.remove(filename)
+
+def test_streaming_report_cancel():
+    print("Testing streaming report cancellation...")
+    filename = "test_streaming_cancel.pdf"
+    progress = []
+    try:
+        generate_streaming_report_pdf(
+            REPORT_DATA, HEADERS, sales_rows(5000), filename, "SALES REPORT",
+            progress_callback=lambda done, total: progress.append(done),
+            is_cancelled=lambda: len(progress) >= 2
+        )
+        cancelled = False
+    except ReportCancelled:
+        cancelled = True
+    print(f"Cancelled after {len(progress)} pages: {cancelled}")
+    assert cancelled
+    assert not os.path.exists(filename)
+
+if __name__ == "__main__":
+    test_streaming_report()
+    test_stock_valuation_totals()
+    test_streaming_report_cancel()
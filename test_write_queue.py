@@ -0,0 +1,96 @@
+import threading
+import pytest
+import database.db as db
+from database import query_stats
+from database.db import execute_read_query, execute_write_query, start_write_queue, stop_write_queue
+from modules.invoice import create_invoice
+
+def count_address(address):
+    return execute_read_query("SELECT COUNT(*) FROM customers WHERE address = ?", (address,))[0][0]
+
+def test_write_queue(work_db):
+    print("Testing write queue...")
+    writer = start_write_queue()
+
+    # Writes queued while the writer is busy share the next commit
+    release = threading.Event()
+    blocker = writer.submit(release.wait, 10)
+    futures = [writer.submit(execute_write_query, "INSERT INTO customers (name, address) VALUES (?, 'queued')", (f"Queued {n}",))
+               for n in range(5)]
+
+    # An operation that fails is rolled back on its own
+    def half_written():
+        execute_write_query("INSERT INTO customers (name, address) VALUES ('Half', 'queued')")
+        raise ValueError("Invalid customer")
+    failing = writer.submit(half_written)
+    release.set()
+
+    ids = [future.result(10) for future in futures]
+    assert blocker.result(10) is True
+    try:
+        failing.result(10)
+        assert False, "Expected ValueError"
+    except ValueError:
+        pass
+    assert len(set(ids)) == 5 and count_address('queued') == 5
+    stats = writer.stats()
+    assert stats['max_batch'] >= 4 and stats['failed'] == 1
+    assert stats['commit_ms'] >= 0 and stats['wait_ms'] > 0
+
+    # Helpers called from other threads go through the queue and are visible once they return
+    cust_id = execute_write_query("INSERT INTO customers (name, address) VALUES ('Grouped', 'threads')")
+    item_id = execute_write_query(
+        "INSERT INTO items (name, sku, stock_on_hand, purchase_price) VALUES ('Queue Item', 'QUEUE-SKU', 0, 50)"
+    )
+    execute_write_query(
+        "INSERT INTO stock_batches (item_id, quantity_remaining, purchase_rate, purchase_date) VALUES (?, 100, 50, '2024-01-01')",
+        (item_id,)
+    )
+    execute_write_query("UPDATE items SET stock_on_hand = 100 WHERE id = ?", (item_id,))
+    line = {'item_id': item_id, 'quantity': 3, 'rate': 100.0, 'gst_percent': 0.0}
+    invoice_ids = []
+    def bill():
+        invoice_ids.append(create_invoice({'customer_id': cust_id, 'date': '2024-02-01', 'status': 'Sent', 'items': [line]}))
+        db.close_thread_connection()
+    threads = [threading.Thread(target=bill) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(invoice_ids)) == 6
+    assert execute_read_query("SELECT stock_on_hand FROM items WHERE id = ?", (item_id,))[0][0] == 82
+    assert writer.stats()['operations'] >= 6 + 6 + 4
+
+    stop_write_queue()
+    assert db.get_write_queue() is None
+    execute_write_query("INSERT INTO customers (name, address) VALUES ('Direct', 'queued')")
+    assert count_address('queued') == 6
+
+def test_n_plus_one_through_queue(work_db):
+    print("Testing N+1 detection with the write queue running...")
+    def write_with_lookups():
+        for n in range(20):
+            execute_read_query("SELECT id FROM customers WHERE name = ?", (f"Lookup {n}",))
+        return execute_write_query("INSERT INTO customers (name) VALUES ('N+1 Customer')")
+
+    try:
+        query_stats.set_enabled(True, 10000)
+        writer = start_write_queue()
+
+        # Statements run on the writer thread count towards the caller's action
+        query_stats.begin_action("Customers: Save")
+        writer.run(write_with_lookups)
+        found = query_stats.end_action()
+        assert len(found) == 1 and found[0]['count'] == 20
+        assert found[0]['call_site'].startswith("test_write_queue.py:")
+
+        # And stay out of the next action, or of none at all
+        writer.run(write_with_lookups)
+        query_stats.begin_action("Customers: Refresh")
+        assert query_stats.end_action() == []
+    finally:
+        query_stats.set_enabled(False, query_stats.DEFAULT_SLOW_MS)
+        query_stats.clear()
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main(["-s", __file__]))
@@ -0,0 +1,107 @@
+from PySide6.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QComboBox, QTableWidget,
+    QTableWidgetItem, QHeaderView, QDateEdit, QLineEdit, QAbstractItemView
+)
+from PySide6.QtCore import QDate
+from database.audit import ACTIONS, describe_changes, get_audit_log
+
+# Rows shown at once; narrow the filters to see older changes
+DISPLAY_LIMIT = 2000
+
+ENTITIES = [
+    ("All", None),
+    ("Invoices", 'invoices'),
+    ("Bills", 'bills'),
+    ("Payments", 'payments'),
+    ("Items", 'items'),
+    ("Archive", 'archive'),
+]
+
+
+class AuditLogPage(QWidget):
+    """Read-only view of the audit log, filtered by entity, record and date."""
+
+    def __init__(self):
+        super().__init__()
+        layout = QVBoxLayout()
+
+        filter_layout = QHBoxLayout()
+        filter_layout.addWidget(QLabel("Entity:"))
+        self.entity_combo = QComboBox()
+        for label, entity in ENTITIES:
+            self.entity_combo.addItem(label, entity)
+        filter_layout.addWidget(self.entity_combo)
+
+        filter_layout.addWidget(QLabel("Record ID:"))
+        self.record_input = QLineEdit()
+        self.record_input.setPlaceholderText("Any")
+        self.record_input.setFixedWidth(80)
+        filter_layout.addWidget(self.record_input)
+
+        filter_layout.addWidget(QLabel("From:"))
+        self.start_date = QDateEdit(QDate.currentDate().addDays(-30))
+        self.start_date.setCalendarPopup(True)
+        filter_layout.addWidget(self.start_date)
+        filter_layout.addWidget(QLabel("To:"))
+        self.end_date = QDateEdit(QDate.currentDate())
+        self.end_date.setCalendarPopup(True)
+        filter_layout.addWidget(self.end_date)
+
+        refresh_btn = QPushButton("Refresh")
+        refresh_btn.clicked.connect(self.load_log)
+        filter_layout.addWidget(refresh_btn)
+        filter_layout.addStretch()
+        self.summary_label = QLabel("")
+        filter_layout.addWidget(self.summary_label)
+        layout.addLayout(filter_layout)
+
+        self.table = QTableWidget()
+        self.table.setColumnCount(7)
+        self.table.setHorizontalHeaderLabels(["Time", "User", "Entity", "ID", "Record", "Action", "Changes"])
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        header = self.table.horizontalHeader()
+        for column in range(6):
+            header.setSectionResizeMode(column, QHeaderView.ResizeMode.ResizeToContents)
+        header.setSectionResizeMode(6, QHeaderView.ResizeMode.Stretch)
+        layout.addWidget(self.table)
+
+        self.setLayout(layout)
+
+        self.entity_combo.currentIndexChanged.connect(self.load_log)
+        self.record_input.returnPressed.connect(self.load_log)
+        self.start_date.dateChanged.connect(self.load_log)
+        self.end_date.dateChanged.connect(self.load_log)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.load_log()
+
+    def load_log(self):
+        record = self.record_input.text().strip()
+        entity_id = int(record) if record.isdigit() else None
+        rows = get_audit_log(
+            entity=self.entity_combo.currentData(),
+            entity_id=entity_id,
+            start_date=self.start_date.date().toString("yyyy-MM-dd"),
+            end_date=self.end_date.date().toString("yyyy-MM-dd"),
+            limit=DISPLAY_LIMIT,
+        )
+
+        self.table.setUpdatesEnabled(False)
+        self.table.setRowCount(len(rows))
+        for i, row in enumerate(rows):
+            changes = describe_changes(row['action'], row['changes'])
+            values = [
+                row['ts'], row['user'], row['entity'].title(), str(row['entity_id']),
+                str(row['label']), ACTIONS.get(row['action'], row['action']), changes,
+            ]
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if column == 6:
+                    item.setToolTip(changes)
+                self.table.setItem(i, column, item)
+        self.table.setUpdatesEnabled(True)
+
+        more = " (newest shown; narrow the filters for more)" if len(rows) >= DISPLAY_LIMIT else ""
+        self.summary_label.setText(f"{len(rows)} changes{more}")
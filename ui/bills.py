@@ -9,11 +9,38 @@ from PySide6.QtGui import QDesktopServices
 import os
 import json
 from database.db import execute_read_query, execute_write_query
+from database.companies import get_item_catalog
 from modules.invoice import create_bill, update_bill, delete_bill
+from database.concurrency import EditConflict
 from modules.payment import get_unpaid_bills, save_bill_payment, generate_payment_number, get_vendor_credits
+from modules.period_close import check_period_open
 from pdf.generator import generate_bill_pdf
+from pdf.render_cache import render_cached_pdf
+from ui.conflicts import editable_values, resolve_conflict
 import datetime
 
+# Line fields an edit conflict compares
+LINE_FIELDS = ('item_id', 'quantity', 'rate', 'gst_percent')
+
+def load_bill_for_edit(bill_id):
+    """Returns the bill with its 'items', as CreateBillDialog edits it, or None if it is gone."""
+    bill_rows = execute_read_query("SELECT * FROM bills WHERE id = ?", (bill_id,))
+    if not bill_rows:
+        return None
+
+    bill = dict(bill_rows[0])
+
+    # Fetch items
+    items_query = """
+        SELECT bi.*, i.name as item_name, i.purchase_price as list_price, i.gst_rate as list_gst
+        FROM bill_items bi
+        JOIN items i ON bi.item_id = i.id
+        WHERE bi.bill_id = ?
+    """
+    items = execute_read_query(items_query, (bill_id,))
+    bill['items'] = [dict(item) for item in items]
+    return bill
+
 class BillsPage(QWidget):
     def __init__(self):
         super().__init__()
@@ -115,7 +142,7 @@ class BillsPage(QWidget):
 
     def mark_as_due(self, bill_id):
         # Check if grand_total is valid (> 0)
-        bill_check = execute_read_query("SELECT grand_total FROM bills WHERE id = ?", (bill_id,))
+        bill_check = execute_read_query("SELECT grand_total, date FROM bills WHERE id = ?", (bill_id,))
         if not bill_check:
             return
             
@@ -131,6 +158,7 @@ class BillsPage(QWidget):
         )
         if confirm == QMessageBox.StandardButton.Yes:
             try:
+                check_period_open(bill_check[0]['date'])
                 execute_write_query("UPDATE bills SET status = 'Sent' WHERE id = ?", (bill_id,))
                 self.refresh_data()
                 QMessageBox.information(self, "Success", "Bill marked as Due (Sent).")
@@ -138,27 +166,13 @@ class BillsPage(QWidget):
                 QMessageBox.critical(self, "Error", f"Failed to update bill status: {str(e)}")
 
     def edit_bill(self, bill_id):
-        # Fetch full details
-        bill_query = "SELECT * FROM bills WHERE id = ?"
-        bill_rows = execute_read_query(bill_query, (bill_id,))
-        if not bill_rows:
-            return
-            
-        bill = dict(bill_rows[0])
-        
-        # Fetch items
-        items_query = """
-            SELECT bi.*, i.name as item_name, i.purchase_price as list_price, i.gst_rate as list_gst
-            FROM bill_items bi
-            JOIN items i ON bi.item_id = i.id
-            WHERE bi.bill_id = ?
-        """
-        items = execute_read_query(items_query, (bill_id,))
-        bill['items'] = [dict(item) for item in items]
-        
-        dialog = CreateBillDialog(self, bill_data=bill)
-        if dialog.exec():
-            self.refresh_data()
+        bill = load_bill_for_edit(bill_id)
+        while bill:
+            dialog = CreateBillDialog(self, bill_data=bill)
+            if dialog.exec():
+                self.refresh_data()
+            # Reopened with the reloaded or merged bill after an edit conflict
+            bill = dialog.reopen_with
 
     def view_bill(self, bill_id):
         # Fetch full details
@@ -566,7 +580,7 @@ class ViewBillDialog(QDialog):
                 os.makedirs(folder)
                 
             filename = os.path.join(folder, f"{self.bill_data['bill_number']}.pdf")
-            generate_bill_pdf(self.bill_data, filename)
+            render_cached_pdf('bill', self.bill_data['id'], self.bill_data, generate_bill_pdf, filename)
             
             QDesktopServices.openUrl(QUrl.fromLocalFile(filename))
         except Exception as e:
@@ -576,6 +590,7 @@ class CreateBillDialog(QDialog):
     def __init__(self, parent=None, bill_data=None):
         super().__init__(parent)
         self.bill_data = bill_data
+        self.reopen_with = None
         self.setWindowTitle("Edit Purchase (Bill)" if bill_data else "Record New Purchase (Bill)")
         self.setFixedSize(900, 700)
         
@@ -732,9 +747,7 @@ class CreateBillDialog(QDialog):
         main_layout.addLayout(btn_layout)
         self.setLayout(main_layout)
         
-        self.available_items = execute_read_query(
-            "SELECT id, name, sku, purchase_price, gst_rate, is_purchasable FROM items"
-        )
+        self.available_items = get_item_catalog()
         self.calculated_subtotal = 0.0
 
         if self.bill_data:
@@ -1024,11 +1037,28 @@ class CreateBillDialog(QDialog):
             if self.bill_data:
                 # Update
                 bill_data['status'] = self.bill_data.get('status', 'Draft')
+                bill_data['version'] = self.bill_data.get('version')
                 update_bill(self.bill_data['id'], bill_data)
                 QMessageBox.information(self, "Success", "Bill updated successfully")
             else:
                 create_bill(bill_data)
                 QMessageBox.information(self, "Success", "Bill saved successfully")
             self.accept()
+        except EditConflict as e:
+            self.resolve_edit_conflict(e, bill_data)
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to save bill: {str(e)}")
+
+    def resolve_edit_conflict(self, conflict, bill_data):
+        current = load_bill_for_edit(self.bill_data['id'])
+        action, values = resolve_conflict(
+            self, conflict,
+            editable_values(self.bill_data, bill_data, LINE_FIELDS),
+            bill_data,
+            editable_values(current or {}, bill_data, LINE_FIELDS),
+        )
+        if action:
+            self.reopen_with = dict(current, **values)
+            self.reject()
+        elif conflict.deleted:
+            self.reject()
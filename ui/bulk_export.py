@@ -0,0 +1,184 @@
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QFormLayout, QPushButton,
+    QComboBox, QDateEdit, QCheckBox, QRadioButton, QFileDialog, QMessageBox,
+    QProgressDialog
+)
+from PySide6.QtCore import Qt, QDate, QUrl
+from PySide6.QtGui import QDesktopServices
+from database.db import execute_read_query
+from pdf.batch_export import export_bulk_pdfs
+from ui.workers import BackgroundTask
+import os
+
+
+class BulkExportDialog(QDialog):
+    """Exports invoice, bill and receipt PDFs for a period in one go."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Bulk Export PDFs")
+        self.setFixedSize(420, 360)
+
+        self.export_task = None
+        self.export_progress = None
+        self.export_output = None
+
+        layout = QVBoxLayout()
+        form = QFormLayout()
+
+        today = QDate.currentDate()
+        self.start_date = QDateEdit(QDate(today.year(), today.month(), 1))
+        self.start_date.setCalendarPopup(True)
+        self.end_date = QDateEdit(today)
+        self.end_date.setCalendarPopup(True)
+        form.addRow("From:", self.start_date)
+        form.addRow("To:", self.end_date)
+
+        self.customer_combo = QComboBox()
+        self.customer_combo.addItem("All Customers", None)
+        for row in execute_read_query("SELECT id, name FROM customers ORDER BY name"):
+            self.customer_combo.addItem(row['name'], row['id'])
+        form.addRow("Customer:", self.customer_combo)
+
+        self.vendor_combo = QComboBox()
+        self.vendor_combo.addItem("All Vendors", None)
+        for row in execute_read_query("SELECT id, name FROM vendors ORDER BY name"):
+            self.vendor_combo.addItem(row['name'], row['id'])
+        form.addRow("Vendor:", self.vendor_combo)
+
+        types_layout = QHBoxLayout()
+        self.invoice_check = QCheckBox("Invoices")
+        self.invoice_check.setChecked(True)
+        self.bill_check = QCheckBox("Bills")
+        self.bill_check.setChecked(True)
+        self.receipt_check = QCheckBox("Receipts")
+        self.receipt_check.setChecked(True)
+        types_layout.addWidget(self.invoice_check)
+        types_layout.addWidget(self.bill_check)
+        types_layout.addWidget(self.receipt_check)
+        form.addRow("Documents:", types_layout)
+
+        output_layout = QHBoxLayout()
+        self.folder_radio = QRadioButton("One file each")
+        self.folder_radio.setChecked(True)
+        self.merged_radio = QRadioButton("Single merged PDF")
+        output_layout.addWidget(self.folder_radio)
+        output_layout.addWidget(self.merged_radio)
+        form.addRow("Output:", output_layout)
+
+        layout.addLayout(form)
+        layout.addStretch()
+
+        btn_layout = QHBoxLayout()
+        export_btn = QPushButton("Export")
+        export_btn.setStyleSheet("background-color: #2563EB; color: white; padding: 8px 16px; border-radius: 6px;")
+        export_btn.clicked.connect(self.start_export)
+        close_btn = QPushButton("Close")
+        close_btn.clicked.connect(self.reject)
+        btn_layout.addStretch()
+        btn_layout.addWidget(export_btn)
+        btn_layout.addWidget(close_btn)
+        layout.addLayout(btn_layout)
+
+        self.setLayout(layout)
+
+    def selected_doc_types(self):
+        doc_types = []
+        if self.invoice_check.isChecked():
+            doc_types.append("invoice")
+        if self.bill_check.isChecked():
+            doc_types.append("bill")
+        if self.receipt_check.isChecked():
+            doc_types.append("receipt")
+        return doc_types
+
+    def start_export(self):
+        if self.export_task and self.export_task.is_running():
+            QMessageBox.information(self, "Please Wait", "An export is already running.")
+            return
+
+        doc_types = self.selected_doc_types()
+        if not doc_types:
+            QMessageBox.warning(self, "Validation Error", "Select at least one document type.")
+            return
+
+        start = self.start_date.date().toString("yyyy-MM-dd")
+        end = self.end_date.date().toString("yyyy-MM-dd")
+        merged = self.merged_radio.isChecked()
+
+        default_folder = os.path.join(os.getcwd(), "exports_pdf")
+        if merged:
+            output, _ = QFileDialog.getSaveFileName(
+                self, "Save Merged PDF", os.path.join(default_folder, f"documents_{start}_{end}.pdf"),
+                "PDF Files (*.pdf)"
+            )
+        else:
+            output = QFileDialog.getExistingDirectory(self, "Select Output Folder", os.getcwd())
+        if not output:
+            return
+
+        self.export_output = output
+        self.export_task = BackgroundTask(
+            export_bulk_pdfs, output, doc_types, start, end,
+            customer_id=self.customer_combo.currentData(),
+            vendor_id=self.vendor_combo.currentData(),
+            merged=merged
+        )
+        self.export_task.progress.connect(self.on_export_progress)
+        self.export_task.finished.connect(self.on_export_finished)
+        self.export_task.failed.connect(self.on_export_failed)
+
+        self.export_progress = QProgressDialog("Loading documents...", "Cancel", 0, 0, self)
+        self.export_progress.setWindowTitle("Bulk Export")
+        self.export_progress.setWindowModality(Qt.WindowModality.WindowModal)
+        self.export_progress.setMinimumDuration(0)
+        self.export_progress.setAutoClose(False)
+        self.export_progress.setAutoReset(False)
+        self.export_progress.canceled.connect(self.cancel_export)
+        self.export_progress.show()
+
+        self.export_task.start()
+
+    def cancel_export(self):
+        if self.export_task:
+            self.export_task.cancel()
+
+    def on_export_progress(self, done, total):
+        if not self.export_progress:
+            return
+        self.export_progress.setMaximum(total)
+        self.export_progress.setValue(done)
+        self.export_progress.setLabelText(f"Rendering PDFs... {done} of {total}")
+
+    def close_export_progress(self):
+        if self.export_progress:
+            self.export_progress.canceled.disconnect(self.cancel_export)
+            self.export_progress.close()
+            self.export_progress = None
+
+    def on_export_finished(self, result):
+        self.close_export_progress()
+        self.export_task.wait()
+        if not result['count']:
+            QMessageBox.information(self, "Bulk Export", "No documents found for the selected filters.")
+            return
+        QMessageBox.information(
+            self, "Bulk Export",
+            f"Exported {result['count']} documents in {result['seconds']:.1f}s "
+            f"({result['docs_per_sec']:.1f} docs/sec)."
+        )
+        QDesktopServices.openUrl(QUrl.fromLocalFile(self.export_output))
+
+    def on_export_failed(self, message):
+        self.close_export_progress()
+        self.export_task.wait()
+        if self.export_task.is_cancelled():
+            return
+        QMessageBox.critical(self, "Error", f"Bulk export failed: {message}")
+
+    def reject(self):
+        # Don't leave a worker thread running behind a closed dialog
+        if self.export_task and self.export_task.is_running():
+            self.export_task.cancel()
+            self.export_task.wait()
+        super().reject()
@@ -0,0 +1,77 @@
+from PySide6.QtWidgets import QMessageBox
+from database.concurrency import merge_changes
+
+RELOAD = 'reload'
+MERGE = 'merge'
+
+
+def _label(key):
+    return key.replace('_', ' ').title()
+
+
+def editable_values(record, like, line_fields=()):
+    """
+    The values of record (a database row as a dict) for the keys of like (a
+    dialog's values), so the two compare equal when nothing changed. None is
+    read as the dialog's empty value, and 'items' lines keep only line_fields.
+    """
+    values = {}
+    for key, value in like.items():
+        if key == 'version':
+            continue
+        current = record.get(key)
+        if key == 'items':
+            current = [{field: line.get(field) or 0 for field in line_fields} for line in current or []]
+        elif current is None and value is not None:
+            current = type(value)()
+        values[key] = current
+    return values
+
+
+def resolve_conflict(parent, conflict, base, mine, theirs):
+    """
+    Tells the user that the record they are editing was saved elsewhere and
+    asks whether to reload it or merge their changes into it.
+
+    Args:
+        conflict (EditConflict): The conflict raised on save.
+        base (dict): The record as the dialog loaded it.
+        mine (dict): The dialog's current values, with the same keys.
+        theirs (dict): The record as it is now, with the same keys.
+
+    Returns:
+        tuple: (RELOAD, theirs), (MERGE, merged) or (None, None) when the user
+        stays in the dialog or the record was deleted. merged keeps the
+        user's changes on top of theirs and carries their version.
+    """
+    if conflict.deleted:
+        QMessageBox.warning(parent, "Record Deleted", f"{conflict} Your changes cannot be saved.")
+        return None, None
+
+    mine = {key: value for key, value in mine.items() if key != 'version'}
+    merged, clashes = merge_changes(base, mine, theirs)
+    changed = [key for key in theirs if key != 'version' and key in base and base[key] != theirs[key]]
+    text = str(conflict)
+    if changed:
+        text += "\n\nChanged there: " + ", ".join(_label(key) for key in changed)
+    if clashes:
+        text += "\nAlso changed by you: " + ", ".join(_label(key) for key in clashes)
+    text += ("\n\nReload discards your changes and shows the saved version. Merge keeps your "
+             "changes on top of it so you can review them and save again.")
+
+    box = QMessageBox(parent)
+    box.setIcon(QMessageBox.Icon.Warning)
+    box.setWindowTitle("Edit Conflict")
+    box.setText(text)
+    reload_btn = box.addButton("Reload", QMessageBox.ButtonRole.DestructiveRole)
+    merge_btn = box.addButton("Merge", QMessageBox.ButtonRole.AcceptRole)
+    box.addButton(QMessageBox.StandardButton.Cancel)
+    box.setDefaultButton(merge_btn)
+    box.exec()
+
+    clicked = box.clickedButton()
+    if clicked == reload_btn:
+        return RELOAD, theirs
+    if clicked == merge_btn:
+        return MERGE, merged
+    return None, None
@@ -6,6 +6,8 @@ from modules.reports_logic import (
     get_sales_report, get_gst_report, get_monthly_sales_data, get_monthly_purchase_data, get_cash_flow_data
 )
 from database.db import execute_read_query
+from modules.archive import execute_history_query
+from modules.stock_fifo import get_total_stock_value
 from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 import datetime
@@ -505,7 +507,8 @@ class DashboardPage(QWidget):
         
         # Purchases Update
         try:
-             purchase_res = execute_read_query("SELECT SUM(grand_total) FROM bills WHERE date BETWEEN ? AND ?", (start_date, end_date))[0][0]
+             purchase_res = execute_history_query("SELECT SUM(grand_total) FROM history_bills WHERE date BETWEEN ? AND ?",
+                                                  (start_date, end_date), start_date, end_date)[0][0]
              total_purchases = purchase_res if purchase_res is not None else 0.0
              self.update_card_value(self.purchase_card, f"₹{total_purchases:,.2f}")
         except Exception as e:
@@ -517,7 +520,7 @@ class DashboardPage(QWidget):
             item_count = execute_read_query("SELECT COUNT(*) FROM items")[0][0] or 0
             self.update_card_value(self.items_card, str(item_count))
             
-            stock_val_res = execute_read_query("SELECT SUM(quantity_remaining * purchase_rate) FROM stock_batches")[0][0]
+            stock_val_res = get_total_stock_value()
             stock_val = stock_val_res if stock_val_res is not None else 0.0
             self.update_card_value(self.stock_value_card, f"₹{stock_val:,.2f}")
             
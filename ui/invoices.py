@@ -7,13 +7,40 @@ from PySide6.QtWidgets import (
 from PySide6.QtCore import Qt, QDate, QUrl
 from PySide6.QtGui import QDesktopServices
 from database.db import execute_read_query, execute_write_query
+from database.companies import get_settings, get_item_catalog
 from modules.invoice import create_invoice, update_invoice, delete_invoice
+from database.concurrency import EditConflict
 from pdf.generator import generate_invoice_pdf
+from pdf.render_cache import render_cached_pdf
 from ui.payments import RecordPaymentDialog
+from ui.bulk_export import BulkExportDialog
+from ui.conflicts import editable_values, resolve_conflict
 import datetime
 import os
 import json
 
+# Line fields an edit conflict compares
+LINE_FIELDS = ('item_id', 'quantity', 'rate', 'discount_percent', 'gst_percent')
+
+def load_invoice_for_edit(invoice_id):
+    """Returns the invoice with its 'items', as CreateInvoiceDialog edits it, or None if it is gone."""
+    inv_rows = execute_read_query("SELECT * FROM invoices WHERE id = ?", (invoice_id,))
+    if not inv_rows:
+        return None
+
+    invoice = dict(inv_rows[0])
+
+    # Fetch items
+    items_query = """
+        SELECT ii.*, i.name as item_name, i.selling_price as list_price, i.gst_rate as list_gst
+        FROM invoice_items ii
+        JOIN items i ON ii.item_id = i.id
+        WHERE ii.invoice_id = ?
+    """
+    items = execute_read_query(items_query, (invoice_id,))
+    invoice['items'] = [dict(item) for item in items]
+    return invoice
+
 class InvoicesPage(QWidget):
     def __init__(self):
         super().__init__()
@@ -32,8 +59,13 @@ class InvoicesPage(QWidget):
         pay_btn.setStyleSheet("background-color: #10B981; color: white; padding: 8px 16px; border-radius: 6px;")
         pay_btn.clicked.connect(self.open_payment_dialog)
         
+        export_btn = QPushButton("Bulk Export PDFs")
+        export_btn.setStyleSheet("background-color: #6B7280; color: white; padding: 8px 16px; border-radius: 6px;")
+        export_btn.clicked.connect(self.open_bulk_export_dialog)
+        
         header_layout.addWidget(title)
         header_layout.addStretch()
+        header_layout.addWidget(export_btn)
         header_layout.addWidget(pay_btn)
         header_layout.addWidget(create_btn)
         
@@ -103,27 +135,13 @@ class InvoicesPage(QWidget):
                 QMessageBox.critical(self, "Error", f"Failed to delete invoice: {str(e)}")
 
     def edit_invoice(self, invoice_id):
-        # Fetch full details
-        inv_query = "SELECT * FROM invoices WHERE id = ?"
-        inv_rows = execute_read_query(inv_query, (invoice_id,))
-        if not inv_rows:
-            return
-            
-        invoice = dict(inv_rows[0])
-        
-        # Fetch items
-        items_query = """
-            SELECT ii.*, i.name as item_name, i.selling_price as list_price, i.gst_rate as list_gst
-            FROM invoice_items ii
-            JOIN items i ON ii.item_id = i.id
-            WHERE ii.invoice_id = ?
-        """
-        items = execute_read_query(items_query, (invoice_id,))
-        invoice['items'] = [dict(item) for item in items]
-        
-        dialog = CreateInvoiceDialog(self, invoice_data=invoice)
-        if dialog.exec():
-            self.refresh_data()
+        invoice = load_invoice_for_edit(invoice_id)
+        while invoice:
+            dialog = CreateInvoiceDialog(self, invoice_data=invoice)
+            if dialog.exec():
+                self.refresh_data()
+            # Reopened with the reloaded or merged invoice after an edit conflict
+            invoice = dialog.reopen_with
 
     def view_invoice(self, invoice_id):
         # Fetch full details
@@ -174,6 +192,10 @@ class InvoicesPage(QWidget):
         if dialog.exec():
             self.refresh_data()
 
+    def open_bulk_export_dialog(self):
+        dialog = BulkExportDialog(self)
+        dialog.exec()
+
 class ViewInvoiceDialog(QDialog):
     def __init__(self, invoice_data, parent=None):
         super().__init__(parent)
@@ -182,8 +204,7 @@ class ViewInvoiceDialog(QDialog):
         self.invoice_data = invoice_data
         
         # Fetch company settings for PDF and Display
-        settings = execute_read_query("SELECT key, value FROM settings")
-        self.settings_dict = {row['key']: row['value'] for row in settings}
+        self.settings_dict = get_settings()
         self.invoice_data.update(self.settings_dict)
         self.invoice_data['logo_path'] = self.settings_dict.get('company_logo', '')
         
@@ -261,7 +282,7 @@ class ViewInvoiceDialog(QDialog):
                 os.makedirs(folder)
                 
             filename = os.path.join(folder, f"{self.invoice_data['invoice_number']}.pdf")
-            generate_invoice_pdf(self.invoice_data, filename)
+            render_cached_pdf('invoice', self.invoice_data['id'], self.invoice_data, generate_invoice_pdf, filename)
             
             # Open PDF
             QDesktopServices.openUrl(QUrl.fromLocalFile(filename))
@@ -273,6 +294,7 @@ class CreateInvoiceDialog(QDialog):
     def __init__(self, parent=None, invoice_data=None):
         super().__init__(parent)
         self.invoice_data = invoice_data
+        self.reopen_with = None
         self.setWindowTitle("Edit Invoice" if invoice_data else "Create New Invoice")
         self.resize(900, 700)
         # Enable Maximize Button
@@ -441,9 +463,7 @@ class CreateInvoiceDialog(QDialog):
         self.calculated_subtotal = 0.0 # Store for final calc
         
         # Load available items (including flags to control sellability)
-        self.available_items = execute_read_query(
-            "SELECT id, name, sku, selling_price, gst_rate, is_sellable FROM items"
-        )
+        self.available_items = get_item_catalog()
 
         # Populate if editing
         if self.invoice_data:
@@ -756,6 +776,7 @@ class CreateInvoiceDialog(QDialog):
             if self.invoice_data:
                 # Update
                 invoice_data['status'] = self.invoice_data.get('status', 'Due') # Preserve status or default
+                invoice_data['version'] = self.invoice_data.get('version')
                 update_invoice(self.invoice_data['id'], invoice_data)
                 QMessageBox.information(self, "Success", "Invoice updated successfully")
             else:
@@ -763,5 +784,21 @@ class CreateInvoiceDialog(QDialog):
                 create_invoice(invoice_data)
                 QMessageBox.information(self, "Success", "Invoice created successfully")
             self.accept()
+        except EditConflict as e:
+            self.resolve_edit_conflict(e, invoice_data)
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to save invoice: {str(e)}")
+
+    def resolve_edit_conflict(self, conflict, invoice_data):
+        current = load_invoice_for_edit(self.invoice_data['id'])
+        action, values = resolve_conflict(
+            self, conflict,
+            editable_values(self.invoice_data, invoice_data, LINE_FIELDS),
+            invoice_data,
+            editable_values(current or {}, invoice_data, LINE_FIELDS),
+        )
+        if action:
+            self.reopen_with = dict(current, **values)
+            self.reject()
+        elif conflict.deleted:
+            self.reject()
@@ -1,6 +1,7 @@
 from PySide6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
-    QStackedWidget, QLabel, QFrame, QDialog, QTextEdit, QStyle, QScrollArea, QTabWidget
+    QStackedWidget, QLabel, QFrame, QDialog, QTextEdit, QStyle, QScrollArea, QTabWidget,
+    QComboBox, QInputDialog, QMessageBox
 )
 from PySide6.QtCore import Qt, QSize, QUrl
 from PySide6.QtGui import QIcon, QAction, QPixmap, QDesktopServices
@@ -13,9 +14,12 @@ from ui.bills import BillsPage
 from ui.stock import StockPage
 from ui.reports import ReportsPage
 from ui.payments import PaymentsPage
+from ui.reconciliation import ReconciliationPage
 from ui.settings import SettingsPage
 from ui.styles import STYLESHEET
 from auth.session import Session
+from database.companies import list_companies, get_active_company, add_company, switch_company
+from modules.backend import get_backend
 
 
 class AboutWidget(QWidget):
@@ -362,10 +366,11 @@ class MainWindow(QMainWindow):
         self.add_nav_button("Invoices", 4, sidebar_layout)
         self.add_nav_button("Purchases", 5, sidebar_layout)
         self.add_nav_button("Payments", 6, sidebar_layout)
-        self.add_nav_button("Stock", 7, sidebar_layout)
-        self.add_nav_button("Reports", 8, sidebar_layout)
-        self.add_nav_button("Settings", 9, sidebar_layout)
-        self.add_nav_button("About", 10, sidebar_layout)
+        self.add_nav_button("Reconciliation", 7, sidebar_layout)
+        self.add_nav_button("Stock", 8, sidebar_layout)
+        self.add_nav_button("Reports", 9, sidebar_layout)
+        self.add_nav_button("Settings", 10, sidebar_layout)
+        self.add_nav_button("About", 11, sidebar_layout)
         
         sidebar_layout.addStretch()
         
@@ -399,11 +404,27 @@ class MainWindow(QMainWindow):
         self.page_title = QLabel("Dashboard")
         header_layout.addWidget(self.page_title)
         header_layout.addStretch()
+
+        # Company Switcher (a terminal using a server works in the one book the server hosts)
+        if get_backend() is None:
+            header_layout.addWidget(QLabel("Company:"))
+            self.company_combo = QComboBox()
+            self.company_combo.setMinimumWidth(200)
+            self.load_companies()
+            self.company_combo.activated.connect(self.on_company_selected)
+            header_layout.addWidget(self.company_combo)
         
         content_layout.addWidget(header)
         
         # Stacked Pages
         self.stack = QStackedWidget()
+        self.add_pages()
+        
+        content_layout.addWidget(self.stack)
+        
+        main_layout.addWidget(content_container)
+
+    def add_pages(self):
         self.stack.addWidget(DashboardPage())
         self.stack.addWidget(CustomersPage())
         self.stack.addWidget(VendorsPage())
@@ -411,14 +432,50 @@ class MainWindow(QMainWindow):
         self.stack.addWidget(InvoicesPage())
         self.stack.addWidget(BillsPage())
         self.stack.addWidget(PaymentsPage())
+        self.stack.addWidget(ReconciliationPage())
         self.stack.addWidget(StockPage())
         self.stack.addWidget(ReportsPage())
         self.stack.addWidget(SettingsPage())
         self.stack.addWidget(AboutPage())
-        
-        content_layout.addWidget(self.stack)
-        
-        main_layout.addWidget(content_container)
+
+    def load_companies(self):
+        self.company_combo.blockSignals(True)
+        self.company_combo.clear()
+        active_id = get_active_company()['id']
+        for company in list_companies():
+            self.company_combo.addItem(company['name'], company['id'])
+            if company['id'] == active_id:
+                self.company_combo.setCurrentIndex(self.company_combo.count() - 1)
+        self.company_combo.addItem("Add Company...", None)
+        self.company_combo.blockSignals(False)
+
+    def on_company_selected(self, index):
+        company_id = self.company_combo.itemData(index)
+        try:
+            if company_id is None:
+                name, ok = QInputDialog.getText(self, "Add Company", "Company name:")
+                if not ok or not name.strip():
+                    self.load_companies()
+                    return
+                gstin, ok = QInputDialog.getText(self, "Add Company", "GSTIN (optional):")
+                company_id = add_company(name, gstin.strip() if ok else None)['id']
+            elif company_id == get_active_company()['id']:
+                return
+            switch_company(company_id)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to switch company: {e}")
+            self.load_companies()
+            return
+
+        self.load_companies()
+        # Pages hold the previous company's data; build them again for this one
+        current_index = self.stack.currentIndex()
+        while self.stack.count():
+            page = self.stack.widget(0)
+            self.stack.removeWidget(page)
+            page.deleteLater()
+        self.add_pages()
+        self.stack.setCurrentIndex(current_index)
 
     def add_nav_button(self, text, index, layout):
         btn = QPushButton(text)
@@ -432,6 +489,7 @@ class MainWindow(QMainWindow):
             "Invoices": QStyle.StandardPixmap.SP_FileDialogDetailedView,
             "Purchases": QStyle.StandardPixmap.SP_FileDialogListView,
             "Payments": QStyle.StandardPixmap.SP_DialogApplyButton,
+            "Reconciliation": QStyle.StandardPixmap.SP_DialogYesButton,
             "Stock": QStyle.StandardPixmap.SP_DriveHDIcon,
             "Reports": QStyle.StandardPixmap.SP_DialogHelpButton,
             "Settings": QStyle.StandardPixmap.SP_BrowserReload,
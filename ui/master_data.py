@@ -4,7 +4,10 @@ from PySide6.QtWidgets import (
     QFileDialog, QTabWidget, QCheckBox, QComboBox, QScrollArea, QFrame, QDoubleSpinBox
 )
 from PySide6.QtCore import QDate, Qt
-from database.db import execute_read_query, execute_write_query, execute_transaction
+from database.db import execute_read_query, execute_write_query, execute_transaction, execute_versioned_transaction
+from database.concurrency import EditConflict
+from modules.stock_fifo import add_stock, reduce_stock, set_valuation_method
+from ui.conflicts import editable_values, resolve_conflict
 import csv
 import io
 import datetime
@@ -295,7 +298,7 @@ class ItemsPage(BaseCRUDPage):
     def open_view_dialog(self, record_summary):
         self.open_form_dialog(record_summary, view_only=True)
 
-    def open_form_dialog(self, record_summary=None, view_only=False):
+    def open_form_dialog(self, record_summary=None, view_only=False, record=None):
         dialog = QDialog(self)
         mode = "View" if view_only else ("Edit" if record_summary else "Add")
         dialog.setWindowTitle(f"{mode} Item - Detailed View")
@@ -310,12 +313,14 @@ class ItemsPage(BaseCRUDPage):
         # Data Containers
         self.item_inputs = {}
         
-        # Fetch Record if Edit
-        record = None
-        if record_summary:
+        # Fetch Record if Edit (unless reopened with one after an edit conflict)
+        if record is None and record_summary:
             rows = execute_read_query("SELECT * FROM items WHERE id = ?", (record_summary['id'],))
             if rows:
-                record = rows[0]
+                record = dict(rows[0])
+        # The record as loaded, for the version check and conflict merge on save
+        self.item_record = record
+        self.item_reopen = None
         
         # --- Helper to create fields ---
         def add_row(form, label, key, widget, default=None):
@@ -429,7 +434,7 @@ class ItemsPage(BaseCRUDPage):
         add_row(form_stock, "Reorder Point", "reorder_point", sb_reorder)
         
         val_method_cb = QComboBox()
-        val_method_cb.addItems(["FIFO", "LIFO", "Weighted Average"]) # Currently only FIFO logic implemented
+        val_method_cb.addItems(["FIFO", "Weighted Average"])
         add_row(form_stock, "Valuation Method", "inventory_valuation_method", val_method_cb, "FIFO")
         
         # Opening Stock Section (Group Box)
@@ -497,6 +502,9 @@ class ItemsPage(BaseCRUDPage):
             cancel_btn.clicked.connect(dialog.reject)
         
         dialog.exec()
+        # Reopened with the reloaded or merged item after an edit conflict
+        if self.item_reopen:
+            self.open_form_dialog(record_summary, view_only, record=self.item_reopen)
 
     def save_item_custom(self, dialog, record_id):
         try:
@@ -547,7 +555,8 @@ class ItemsPage(BaseCRUDPage):
             
             if not record_id:
                 # New Record
-                data['stock_on_hand'] = data['opening_stock']
+                # Opening stock goes in through add_stock below, with the item's valuation method
+                data['stock_on_hand'] = 0
                 
                 cols = ", ".join(data.keys())
                 placeholders = ", ".join(["?" for _ in data])
@@ -555,73 +564,63 @@ class ItemsPage(BaseCRUDPage):
                 
                 item_id = execute_write_query(f"INSERT INTO items ({cols}) VALUES ({placeholders})", values)
                 
-                # Create Batch for Opening Stock
+                # Add Opening Stock
                 if data['opening_stock'] > 0:
                     # Calculate rate
                     rate = data['purchase_price']
                     if data['opening_stock_value'] > 0:
                         rate = data['opening_stock_value'] / data['opening_stock']
                     
-                    execute_write_query("""
-                        INSERT INTO stock_batches (item_id, quantity_remaining, purchase_rate, purchase_date, vendor_id)
-                        VALUES (?, ?, ?, ?, ?)
-                    """, (item_id, data['opening_stock'], rate, QDate.currentDate().toString("yyyy-MM-dd"), data['vendor_id']))
+                    add_stock(item_id, data['opening_stock'], rate, QDate.currentDate().toString("yyyy-MM-dd"),
+                              data['vendor_id'], 'opening', 'item', item_id)
                     
             else:
                 # Update Record
                 # Fetch old data to calculate difference
-                old_record = execute_read_query("SELECT opening_stock, stock_on_hand FROM items WHERE id = ?", (record_id,))
+                old_record = execute_read_query(
+                    "SELECT opening_stock, stock_on_hand, inventory_valuation_method FROM items WHERE id = ?", (record_id,)
+                )
                 old_opening = 0.0
+                old_method = 'FIFO'
                 if old_record:
                     old_opening = float(old_record[0]['opening_stock'] or 0.0)
+                    old_method = old_record[0]['inventory_valuation_method'] or 'FIFO'
 
+                # The method is switched separately so the stock is carried over
+                edits = dict(data)
+                method = data.pop('inventory_valuation_method')
                 set_clause = ", ".join([f"{col} = ?" for col in data])
                 values = tuple(data.values()) + (record_id,)
-                execute_write_query(f"UPDATE items SET {set_clause} WHERE id = ?", values)
+                update = (f"UPDATE items SET {set_clause} WHERE id = ?", values)
+                version = self.item_record.get('version') if self.item_record else None
+                try:
+                    if version is not None:
+                        execute_versioned_transaction('items', {record_id: version}, [update])
+                    else:
+                        execute_write_query(*update)
+                except EditConflict as e:
+                    self.resolve_item_conflict(dialog, e, record_id, edits)
+                    return
+                if method != old_method:
+                    set_valuation_method(record_id, method)
                 
                 # Handle Stock Correction if Opening Stock Changed
                 new_opening = float(data['opening_stock'] or 0.0)
                 diff = new_opening - old_opening
                 
                 if abs(diff) > 0.001: # Float comparison
-                    # Update stock_on_hand
-                    execute_write_query("UPDATE items SET stock_on_hand = stock_on_hand + ? WHERE id = ?", (diff, record_id))
-                    
                     if diff > 0:
-                        # Add Stock Batch
+                        # Add Stock
                         rate = data['purchase_price']
                         if data['opening_stock_value'] > 0 and new_opening > 0:
                              rate = data['opening_stock_value'] / new_opening
                              
-                        execute_write_query("""
-                            INSERT INTO stock_batches (item_id, quantity_remaining, purchase_rate, purchase_date, vendor_id)
-                            VALUES (?, ?, ?, ?, ?)
-                        """, (record_id, diff, rate, QDate.currentDate().toString("yyyy-MM-dd"), data['vendor_id']))
+                        add_stock(record_id, diff, rate, QDate.currentDate().toString("yyyy-MM-dd"),
+                                  data['vendor_id'], 'opening', 'item', record_id)
                     else:
-                        # Reduce Stock Batch (FIFO logic but for correction)
-                        qty_to_remove = abs(diff)
-                        batches = execute_read_query("""
-                            SELECT id, quantity_remaining 
-                            FROM stock_batches 
-                            WHERE item_id = ? AND quantity_remaining > 0 
-                            ORDER BY purchase_date ASC, id ASC
-                        """, (record_id,))
-                        
-                        for batch in batches:
-                            if qty_to_remove <= 0:
-                                break
-                                
-                            b_id = batch['id']
-                            b_qty = batch['quantity_remaining']
-                            
-                            if b_qty <= qty_to_remove:
-                                # Remove entire batch
-                                execute_write_query("UPDATE stock_batches SET quantity_remaining = 0 WHERE id = ?", (b_id,))
-                                qty_to_remove -= b_qty
-                            else:
-                                # Reduce batch
-                                execute_write_query("UPDATE stock_batches SET quantity_remaining = ? WHERE id = ?", (b_qty - qty_to_remove, b_id))
-                                qty_to_remove = 0
+                        # Reduce Stock (FIFO or average cost, as for a sale)
+                        reduce_stock(record_id, abs(diff), QDate.currentDate().toString("yyyy-MM-dd"),
+                                     'opening', 'item', record_id)
             
             dialog.accept()
             self.refresh_data()
@@ -629,6 +628,19 @@ class ItemsPage(BaseCRUDPage):
         except Exception as e:
             QMessageBox.critical(dialog, "Error", f"Failed to save item: {str(e)}")
 
+    def resolve_item_conflict(self, dialog, conflict, record_id, edits):
+        rows = execute_read_query("SELECT * FROM items WHERE id = ?", (record_id,))
+        current = dict(rows[0]) if rows else {}
+        action, values = resolve_conflict(
+            dialog, conflict, editable_values(self.item_record, edits), edits, editable_values(current, edits)
+        )
+        if action:
+            self.item_reopen = dict(current, **values)
+            dialog.reject()
+        elif conflict.deleted:
+            dialog.reject()
+            self.refresh_data()
+
     def import_csv(self):
         filename, _ = QFileDialog.getOpenFileName(self, "Import Items CSV", "", "CSV Files (*.csv)")
         if not filename:
@@ -781,13 +793,14 @@ class ItemsPage(BaseCRUDPage):
                             errors.append(f"Duplicate: {name} ({sku})")
                             continue
                             
-                        # Insert Item
+                        # Insert Item; the opening stock goes in through add_stock below,
+                        # with the item's valuation method, as in save_item_custom
                         item_id = execute_write_query("""
                             INSERT INTO items (name, sku, hsn_sac, description, unit, 
                                              selling_price, purchase_price, gst_rate, 
                                              reorder_point, stock_on_hand, opening_stock_value)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        """, (name, sku, hsn, desc, unit, selling_price, purchase_price, gst_rate, reorder_point, initial_stock, opening_value))
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 0, ?)
+                        """, (name, sku, hsn, desc, unit, selling_price, purchase_price, gst_rate, reorder_point, opening_value))
                         
                         # Create Opening Stock Batch if applicable
                         if initial_stock > 0:
@@ -796,10 +809,8 @@ class ItemsPage(BaseCRUDPage):
                             if opening_value > 0 and opening_stock > 0:
                                 batch_rate = opening_value / opening_stock
                                 
-                            execute_write_query("""
-                                INSERT INTO stock_batches (item_id, quantity_remaining, purchase_rate, purchase_date, vendor_id)
-                                VALUES (?, ?, ?, ?, ?)
-                            """, (item_id, initial_stock, batch_rate, QDate.currentDate().toString("yyyy-MM-dd"), vendor_id))
+                            add_stock(item_id, initial_stock, batch_rate, QDate.currentDate().toString("yyyy-MM-dd"),
+                                      vendor_id, 'opening', 'item', item_id)
                             
                         success_count += 1
                         
@@ -8,8 +8,11 @@ from PySide6.QtWidgets import (
 from PySide6.QtCore import Qt, QDate
 import os
 import json
-from database.db import execute_read_query, execute_write_query, execute_transaction
+from database.db import execute_read_query, execute_write_query, execute_transaction, execute_versioned_transaction
+from database.concurrency import EditConflict
 from modules.payment import get_unpaid_invoices, save_payment, generate_payment_number, get_customer_credits
+from modules.period_close import check_period_open
+from ui.conflicts import resolve_conflict
 import datetime
 
 class PaymentsPage(QWidget):
@@ -142,6 +145,10 @@ class PaymentsPage(QWidget):
                 inv_rows = execute_read_query("SELECT DISTINCT invoice_id FROM payments WHERE payment_number = ? AND invoice_id IS NOT NULL", (payment_number,))
                 bill_rows = execute_read_query("SELECT DISTINCT bill_id FROM payments WHERE payment_number = ? AND bill_id IS NOT NULL", (payment_number,))
                 
+                # Payments dated in a closed period stay
+                dates = execute_read_query("SELECT DISTINCT date FROM payments WHERE payment_number = ?", (payment_number,))
+                check_period_open(*[row['date'] for row in dates])
+                
                 # Delete
                 execute_write_query("DELETE FROM payments WHERE payment_number = ?", (payment_number,))
                 
@@ -200,14 +207,31 @@ class PaymentsPage(QWidget):
         dialog.exec()
 
     def edit_payment(self, payment_id):
-        dialog = EditPaymentDialog(payment_id, self)
-        if dialog.exec():
-            self.refresh_data()
+        edits = None
+        while True:
+            dialog = EditPaymentDialog(payment_id, self, edits)
+            if dialog.exec():
+                self.refresh_data()
+            # Reopened with the reloaded or merged values after an edit conflict
+            if dialog.reopen_with is None:
+                break
+            edits = dialog.reopen_with
+
+def _payment_values(rows):
+    """The values EditPaymentDialog edits, from all rows of one payment number."""
+    return {
+        'amount': sum(row['amount'] for row in rows),
+        'date': rows[0]['date'],
+        'method': rows[0]['method'],
+        'reference': rows[0]['reference'] or "",
+        'notes': rows[0]['notes'] or "",
+    }
 
 class EditPaymentDialog(QDialog):
-    def __init__(self, payment_id, parent=None):
+    def __init__(self, payment_id, parent=None, edits=None):
         super().__init__(parent)
         self.payment_id = payment_id
+        self.reopen_with = None
         self.setWindowTitle("Edit Payment")
         self.setMinimumSize(500, 400)
         # Enable Maximize Button
@@ -274,6 +298,15 @@ class EditPaymentDialog(QDialog):
         # But here we are editing. Let's show the note from the first row.
         self.notes.setPlainText(self.data['notes'] or "")
         layout.addRow("Notes/Remarks:", self.notes)
+
+        # Loaded values, then the user's own after an edit conflict
+        self.loaded = _payment_values(self.rows)
+        if edits:
+            self.amount.setValue(edits['amount'])
+            self.date_edit.setDate(QDate.fromString(edits['date'], "yyyy-MM-dd"))
+            self.method_combo.setCurrentText(edits['method'])
+            self.reference.setText(edits['reference'])
+            self.notes.setPlainText(edits['notes'])
         
         # Buttons
         btn_layout = QHBoxLayout()
@@ -306,15 +339,27 @@ class EditPaymentDialog(QDialog):
                 SET date = ?, method = ?, reference = ?, notes = ?
                 WHERE payment_number = ?
             """
-            execute_write_query(query_common, (new_date, new_method, new_ref, new_notes, self.payment_number_val))
+            queries = [(query_common, (new_date, new_method, new_ref, new_notes, self.payment_number_val))]
             
             # Update Amount ONLY if not split
             if not self.is_split and abs(new_amount - self.original_amount) > 0.01:
                 query_amt = "UPDATE payments SET amount = ? WHERE id = ?"
-                execute_write_query(query_amt, (new_amount, self.data['id']))
+                queries.append((query_amt, (new_amount, self.data['id'])))
+            
+            # Saved only if no row of the payment changed since it was loaded
+            execute_versioned_transaction('payments', {row['id']: row['version'] for row in self.rows}, queries)
             
             QMessageBox.information(self, "Success", "Payment updated successfully")
             self.accept()
+        except EditConflict as e:
+            mine = {'amount': new_amount, 'date': new_date, 'method': new_method, 'reference': new_ref, 'notes': new_notes}
+            rows = execute_read_query("SELECT * FROM payments WHERE payment_number = ?", (self.payment_number_val,))
+            action, values = resolve_conflict(self, e, self.loaded, mine, _payment_values(rows) if rows else {})
+            if action:
+                self.reopen_with = values
+                self.reject()
+            elif e.deleted:
+                self.reject()
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to update payment: {str(e)}")
 
@@ -0,0 +1,40 @@
+from PySide6.QtCore import QObject, QEvent, QTimer
+from database import query_stats
+
+# Events that start a UI action for the N+1 detector
+ACTION_EVENTS = (QEvent.Type.MouseButtonRelease, QEvent.Type.KeyPress)
+
+
+def describe_widget(widget):
+    """Short label for the widget that started an action, e.g. "QPushButton 'Save'"."""
+    text = ""
+    if hasattr(widget, "text"):
+        try:
+            text = widget.text()
+        except TypeError:
+            text = ""
+    label = text or widget.objectName()
+    window = widget.window().windowTitle() if hasattr(widget, "window") and widget.window() else ""
+    name = f"{type(widget).__name__} '{label}'" if label else type(widget).__name__
+    return f"{window}: {name}" if window else name
+
+
+class ActionTracker(QObject):
+    """
+    Application event filter that treats everything a click or key press
+    triggers, until control returns to the event loop, as one UI action, so
+    query_stats can flag statements repeated within it.
+    """
+
+    def eventFilter(self, obj, event):
+        if query_stats.enabled and event.type() in ACTION_EVENTS and not query_stats.in_action():
+            query_stats.begin_action(describe_widget(obj))
+            # Runs once the handlers of this event have returned
+            QTimer.singleShot(0, query_stats.end_action)
+        return False
+
+
+def install_action_tracker(app):
+    tracker = ActionTracker(app)
+    app.installEventFilter(tracker)
+    return tracker
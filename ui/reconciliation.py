@@ -0,0 +1,302 @@
+from PySide6.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QComboBox, QTableWidget,
+    QTableWidgetItem, QHeaderView, QMessageBox, QFileDialog, QProgressDialog, QInputDialog,
+    QAbstractItemView
+)
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QColor
+from database.db import execute_read_query
+from modules.reconciliation import (
+    STATUSES, import_statement, auto_match, get_statements, get_statement_lines,
+    confirm_lines, unmatch_lines, ignore_lines, record_lines, delete_statement
+)
+from ui.workers import BackgroundTask
+
+# Lines shown at once; filter by status to review the rest
+DISPLAY_LIMIT = 2000
+
+STATUS_COLORS = {
+    'Matched': '#16A34A',
+    'Recorded': '#16A34A',
+    'Suggested': '#D97706',
+    'Unmatched': '#DC2626',
+    'Ignored': '#64748B',
+}
+
+
+def import_and_match(path, progress_callback=None, is_cancelled=None):
+    statement_id = import_statement(path, progress_callback=progress_callback, is_cancelled=is_cancelled)
+    counts = auto_match(statement_id, progress_callback=progress_callback, is_cancelled=is_cancelled)
+    return {'statement_id': statement_id, 'counts': counts}
+
+
+def match_statement(statement_id, progress_callback=None, is_cancelled=None):
+    counts = auto_match(statement_id, progress_callback=progress_callback, is_cancelled=is_cancelled)
+    return {'statement_id': statement_id, 'counts': counts}
+
+
+class ReconciliationPage(QWidget):
+    """Imports bank statements, auto-matches them against payments and reviews the results."""
+
+    def __init__(self):
+        super().__init__()
+        self.task = None
+        self.progress = None
+        self.lines = []
+
+        layout = QVBoxLayout()
+
+        header_layout = QHBoxLayout()
+        title = QLabel("Bank Reconciliation")
+        title.setStyleSheet("font-size: 24px; font-weight: bold;")
+        header_layout.addWidget(title)
+        header_layout.addStretch()
+
+        import_btn = QPushButton("Import Statement")
+        import_btn.setStyleSheet("background-color: #2563EB; color: white; padding: 8px 16px; border-radius: 6px;")
+        import_btn.clicked.connect(self.import_statement)
+        header_layout.addWidget(import_btn)
+
+        match_btn = QPushButton("Auto-Match")
+        match_btn.clicked.connect(self.run_auto_match)
+        header_layout.addWidget(match_btn)
+
+        delete_btn = QPushButton("Delete Statement")
+        delete_btn.clicked.connect(self.delete_statement)
+        header_layout.addWidget(delete_btn)
+        layout.addLayout(header_layout)
+
+        filter_layout = QHBoxLayout()
+        filter_layout.addWidget(QLabel("Statement:"))
+        self.statement_combo = QComboBox()
+        self.statement_combo.setMinimumWidth(320)
+        self.statement_combo.currentIndexChanged.connect(self.load_lines)
+        filter_layout.addWidget(self.statement_combo)
+        filter_layout.addWidget(QLabel("Status:"))
+        self.status_combo = QComboBox()
+        self.status_combo.addItem("All", None)
+        for status in STATUSES:
+            self.status_combo.addItem(status, status)
+        self.status_combo.currentIndexChanged.connect(self.load_lines)
+        filter_layout.addWidget(self.status_combo)
+        filter_layout.addStretch()
+        self.summary_label = QLabel("")
+        filter_layout.addWidget(self.summary_label)
+        layout.addLayout(filter_layout)
+
+        self.table = QTableWidget()
+        self.table.setColumnCount(8)
+        self.table.setHorizontalHeaderLabels(["Date", "Description", "Reference", "Amount", "Status", "Matched To", "Rule", "Score"])
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        layout.addWidget(self.table)
+
+        action_layout = QHBoxLayout()
+        confirm_btn = QPushButton("Confirm Match")
+        confirm_btn.clicked.connect(self.confirm_selected)
+        action_layout.addWidget(confirm_btn)
+        unmatch_btn = QPushButton("Unmatch")
+        unmatch_btn.clicked.connect(self.unmatch_selected)
+        action_layout.addWidget(unmatch_btn)
+        ignore_btn = QPushButton("Ignore")
+        ignore_btn.clicked.connect(self.ignore_selected)
+        action_layout.addWidget(ignore_btn)
+        action_layout.addStretch()
+        record_btn = QPushButton("Record as Payments")
+        record_btn.setStyleSheet("background-color: #10B981; color: white; padding: 8px 16px; border-radius: 6px;")
+        record_btn.clicked.connect(self.record_selected)
+        action_layout.addWidget(record_btn)
+        layout.addLayout(action_layout)
+
+        self.setLayout(layout)
+        self.refresh_data()
+
+    def refresh_data(self):
+        current = self.statement_combo.currentData()
+        self.statement_combo.blockSignals(True)
+        self.statement_combo.clear()
+        for s in get_statements():
+            self.statement_combo.addItem(
+                f"{s['file_name']} ({s['line_count']} lines, {s['unmatched'] or 0} unmatched)", s['id']
+            )
+        if current is not None:
+            index = self.statement_combo.findData(current)
+            if index >= 0:
+                self.statement_combo.setCurrentIndex(index)
+        self.statement_combo.blockSignals(False)
+        self.load_lines()
+
+    def load_lines(self):
+        statement_id = self.statement_combo.currentData()
+        self.lines = get_statement_lines(statement_id, self.status_combo.currentData(), DISPLAY_LIMIT + 1) \
+            if statement_id else []
+        truncated = len(self.lines) > DISPLAY_LIMIT
+        self.lines = self.lines[:DISPLAY_LIMIT]
+
+        self.table.setRowCount(len(self.lines))
+        for row_idx, line in enumerate(self.lines):
+            self.table.setItem(row_idx, 0, QTableWidgetItem(line['date'] or ""))
+            self.table.setItem(row_idx, 1, QTableWidgetItem(line['description'] or ""))
+            self.table.setItem(row_idx, 2, QTableWidgetItem(line['reference'] or ""))
+            amount_item = QTableWidgetItem(f"₹{line['amount']:,.2f}")
+            amount_item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+            self.table.setItem(row_idx, 3, amount_item)
+            status_item = QTableWidgetItem(line['status'])
+            status_item.setForeground(QColor(STATUS_COLORS.get(line['status'], '#0F172A')))
+            self.table.setItem(row_idx, 4, status_item)
+            matched = line['match_label'] or ""
+            if line['match_type'] and matched:
+                matched = f"{line['match_type'].title()} {matched}"
+            self.table.setItem(row_idx, 5, QTableWidgetItem(matched))
+            self.table.setItem(row_idx, 6, QTableWidgetItem(line['match_rule'] or ""))
+            self.table.setItem(row_idx, 7, QTableWidgetItem(f"{line['score']:.1f}" if line['score'] is not None else ""))
+
+        shown = f"Showing first {DISPLAY_LIMIT} lines" if truncated else f"{len(self.lines)} lines"
+        self.summary_label.setText(shown)
+
+    def selected_line_ids(self):
+        rows = sorted({index.row() for index in self.table.selectionModel().selectedRows()})
+        return [self.lines[row]['id'] for row in rows]
+
+    def require_selection(self):
+        ids = self.selected_line_ids()
+        if not ids:
+            QMessageBox.warning(self, "No Selection", "Select one or more statement lines first.")
+        return ids
+
+    def confirm_selected(self):
+        ids = self.require_selection()
+        if ids:
+            confirm_lines(ids)
+            self.refresh_data()
+
+    def unmatch_selected(self):
+        ids = self.require_selection()
+        if ids:
+            unmatch_lines(ids)
+            self.refresh_data()
+
+    def ignore_selected(self):
+        ids = self.require_selection()
+        if ids:
+            ignore_lines(ids)
+            self.refresh_data()
+
+    def record_selected(self):
+        ids = self.require_selection()
+        if not ids:
+            return
+        selected = [line for line in self.lines if line['id'] in set(ids)]
+        unmatched = [line for line in selected if line['status'] == 'Unmatched']
+        party_type = party_id = None
+        if unmatched:
+            money_in = sum(1 for line in unmatched if line['amount'] > 0)
+            party_type = 'customer' if money_in >= len(unmatched) - money_in else 'vendor'
+            table = "customers" if party_type == 'customer' else "vendors"
+            parties = execute_read_query(f"SELECT id, name FROM {table} ORDER BY name")
+            if not parties:
+                QMessageBox.warning(self, "No Parties", f"Add {table} before recording unmatched lines.")
+                return
+            label = "Record unmatched deposits as receipts from:" if party_type == 'customer' \
+                else "Record unmatched withdrawals as payments to:"
+            name, ok = QInputDialog.getItem(self, "Record as Payments", label, [p['name'] for p in parties], 0, False)
+            if not ok:
+                return
+            party_id = next(p['id'] for p in parties if p['name'] == name)
+        try:
+            result = record_lines(ids, party_type, party_id)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to record payments: {str(e)}")
+            self.refresh_data()
+            return
+        self.refresh_data()
+        message = f"Recorded {result['recorded']} payments."
+        if result['skipped']:
+            message += f"\n{result['skipped']} lines were skipped (already reconciled, ignored or in the other direction)."
+        QMessageBox.information(self, "Record as Payments", message)
+
+    def import_statement(self):
+        if self.task and self.task.is_running():
+            QMessageBox.information(self, "Please Wait", "A statement is already being processed.")
+            return
+        path, _ = QFileDialog.getOpenFileName(self, "Import Bank Statement", "", "CSV Files (*.csv)")
+        if path:
+            self.start_task(import_and_match, path)
+
+    def run_auto_match(self):
+        statement_id = self.statement_combo.currentData()
+        if not statement_id:
+            QMessageBox.warning(self, "No Statement", "Import a bank statement first.")
+            return
+        if self.task and self.task.is_running():
+            QMessageBox.information(self, "Please Wait", "A statement is already being processed.")
+            return
+        self.start_task(match_statement, statement_id)
+
+    def delete_statement(self):
+        statement_id = self.statement_combo.currentData()
+        if not statement_id:
+            return
+        confirm = QMessageBox.question(
+            self, "Confirm Delete",
+            "Delete this statement and its matches? Payments recorded from it are kept.",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+        )
+        if confirm == QMessageBox.StandardButton.Yes:
+            delete_statement(statement_id)
+            self.refresh_data()
+
+    def start_task(self, fn, *args):
+        self.task = BackgroundTask(fn, *args)
+        self.task.progress.connect(self.on_progress)
+        self.task.finished.connect(self.on_finished)
+        self.task.failed.connect(self.on_failed)
+
+        self.progress = QProgressDialog("Reading statement...", "Cancel", 0, 0, self)
+        self.progress.setWindowTitle("Bank Reconciliation")
+        self.progress.setWindowModality(Qt.WindowModality.WindowModal)
+        self.progress.setMinimumDuration(0)
+        self.progress.setAutoClose(False)
+        self.progress.setAutoReset(False)
+        self.progress.canceled.connect(self.task.cancel)
+        self.progress.show()
+        self.task.start()
+
+    def on_progress(self, done, total):
+        if not self.progress:
+            return
+        if total:
+            self.progress.setMaximum(total)
+            self.progress.setValue(done)
+            self.progress.setLabelText(f"Matching lines... {done} of {total}")
+        else:
+            self.progress.setLabelText(f"Reading statement... {done} lines")
+
+    def close_progress(self):
+        if self.progress:
+            self.progress.canceled.disconnect(self.task.cancel)
+            self.progress.close()
+            self.progress = None
+
+    def on_finished(self, result):
+        self.close_progress()
+        self.task.wait()
+        self.refresh_data()
+        index = self.statement_combo.findData(result['statement_id'])
+        if index >= 0:
+            self.statement_combo.setCurrentIndex(index)
+        counts = result['counts']
+        QMessageBox.information(
+            self, "Bank Reconciliation",
+            f"Matched: {counts['Matched']}\nSuggested: {counts['Suggested']}\nUnmatched: {counts['Unmatched']}"
+        )
+
+    def on_failed(self, message):
+        self.close_progress()
+        self.task.wait()
+        self.refresh_data()
+        if self.task.is_cancelled():
+            return
+        QMessageBox.critical(self, "Error", f"Reconciliation failed: {message}")
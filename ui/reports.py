@@ -1,17 +1,23 @@
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QTableWidget, 
     QTableWidgetItem, QHeaderView, QLabel, QTabWidget, QDateEdit,
-    QFormLayout, QLineEdit, QMessageBox
+    QFormLayout, QLineEdit, QMessageBox, QProgressDialog, QComboBox, QFileDialog
 )
-from PySide6.QtCore import QDate, QUrl
+from PySide6.QtCore import Qt, QDate, QUrl
 from PySide6.QtGui import QDesktopServices
 from modules.reports_logic import (
     get_sales_report, get_purchase_report, get_gst_report, 
-    get_outstanding_invoices, get_stock_valuation,
-    get_ar_aging_report, get_ap_aging_report
+    get_outstanding_invoices, get_stock_valuation, get_stock_valuation_at,
+    get_ar_aging_report, get_ap_aging_report, get_party_balance_report,
+    iter_sales_report, iter_purchase_report, get_consolidated_summary
 )
 from database.db import execute_read_query
-from pdf.generator import generate_price_list_pdf, generate_generic_report_pdf
+from database.companies import get_settings
+from pdf.generator import generate_price_list_pdf
+from pdf.report_stream import generate_streaming_report_pdf
+from pdf.batch_export import export_party_statements
+from modules.statements import get_party_statement
+from ui.workers import BackgroundTask
 import os
 
 class ReportsPage(QWidget):
@@ -64,6 +70,12 @@ class ReportsPage(QWidget):
         self.price_list_data = []
         self.ar_aging_data = {}
         self.ap_aging_data = {}
+        self.balance_data = []
+        self.statement_data = None
+        self.consolidated_data = {'companies': [], 'total': {}}
+        self.report_task = None
+        self.report_progress = None
+        self.report_filename = None
 
         # Tabs
         self.tabs = QTabWidget()
@@ -76,6 +88,9 @@ class ReportsPage(QWidget):
         self.tabs.addTab(self.create_price_list_tab(), "Price List")
         self.tabs.addTab(self.create_ar_aging_tab(), "AR Aging")
         self.tabs.addTab(self.create_ap_aging_tab(), "AP Aging")
+        self.tabs.addTab(self.create_balance_tab(), "Party Balances")
+        self.tabs.addTab(self.create_statement_tab(), "Statements")
+        self.tabs.addTab(self.create_companies_tab(), "Companies")
         
         layout.addWidget(self.tabs)
         self.setLayout(layout)
@@ -145,6 +160,71 @@ class ReportsPage(QWidget):
         self.ap_aging_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
         return self.ap_aging_table
 
+    def create_balance_tab(self):
+        self.balance_table = QTableWidget()
+        self.balance_table.setColumnCount(5)
+        self.balance_table.setHorizontalHeaderLabels(["Type", "Name", "Billed", "Settled", "Balance"])
+        self.balance_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        return self.balance_table
+
+    def create_statement_tab(self):
+        widget = QWidget()
+        layout = QVBoxLayout()
+        controls = QHBoxLayout()
+        self.statement_type_combo = QComboBox()
+        self.statement_type_combo.addItem("Customer", "customer")
+        self.statement_type_combo.addItem("Vendor", "vendor")
+        self.statement_type_combo.currentIndexChanged.connect(self.load_statement_parties)
+        self.statement_party_combo = QComboBox()
+        self.statement_party_combo.setMinimumWidth(220)
+        self.statement_party_combo.currentIndexChanged.connect(self.load_statement)
+        export_all_btn = QPushButton("Export All Statements")
+        export_all_btn.clicked.connect(self.export_all_statements)
+        self.statement_summary = QLabel("")
+        controls.addWidget(self.statement_type_combo)
+        controls.addWidget(self.statement_party_combo)
+        controls.addWidget(export_all_btn)
+        controls.addStretch()
+        controls.addWidget(self.statement_summary)
+        layout.addLayout(controls)
+
+        self.statement_table = QTableWidget()
+        self.statement_table.setColumnCount(7)
+        self.statement_table.setHorizontalHeaderLabels(["Date", "Type", "Number", "Details", "Billed", "Paid", "Balance"])
+        self.statement_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        layout.addWidget(self.statement_table)
+        widget.setLayout(layout)
+
+        self.load_statement_parties()
+        return widget
+
+    def create_companies_tab(self):
+        self.companies_table = QTableWidget()
+        self.companies_table.setColumnCount(7)
+        self.companies_table.setHorizontalHeaderLabels(["Company", "Sales", "Purchases", "Net GST", "Receivable", "Payable", "Stock Value"])
+        self.companies_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        return self.companies_table
+
+    def load_statement_parties(self):
+        table = "customers" if self.statement_type_combo.currentData() == 'customer' else "vendors"
+        self.statement_party_combo.blockSignals(True)
+        self.statement_party_combo.clear()
+        for row in execute_read_query(f"SELECT id, name FROM {table} ORDER BY name"):
+            self.statement_party_combo.addItem(row['name'], row['id'])
+        self.statement_party_combo.blockSignals(False)
+        self.load_statement()
+
+    def load_statement(self):
+        party_id = self.statement_party_combo.currentData()
+        if party_id is None:
+            self.statement_data = None
+        else:
+            self.statement_data = get_party_statement(
+                self.statement_type_combo.currentData(), party_id,
+                self.start_date.date().toString("yyyy-MM-dd"), self.end_date.date().toString("yyyy-MM-dd")
+            )
+        self.filter_current_tab()
+
     def refresh_all(self):
         start = self.start_date.date().toString("yyyy-MM-dd")
         end = self.end_date.date().toString("yyyy-MM-dd")
@@ -164,8 +244,11 @@ class ReportsPage(QWidget):
         # Outstanding
         self.outstanding_data = get_outstanding_invoices()
         
-        # Stock Valuation
-        self.stock_data_list = get_stock_valuation()
+        # Stock Valuation (as of the end date when it is in the past)
+        if self.end_date.date() < QDate.currentDate():
+            self.stock_data_list = get_stock_valuation_at(end)
+        else:
+            self.stock_data_list = get_stock_valuation()
         
         # Price List
         self.price_list_data = execute_read_query("SELECT name, sku, selling_price FROM items ORDER BY name")
@@ -174,7 +257,14 @@ class ReportsPage(QWidget):
         self.ar_aging_data = get_ar_aging_report()
         self.ap_aging_data = get_ap_aging_report()
         
-        self.filter_current_tab()
+        # Balances as of the end date
+        self.balance_data = get_party_balance_report(end)
+        
+        # All companies side by side, read in parallel
+        self.consolidated_data = get_consolidated_summary(start, end)
+
+        # Statement of the selected party
+        self.load_statement()
 
     def filter_current_tab(self):
         tab_index = self.tabs.currentIndex()
@@ -269,13 +359,56 @@ class ReportsPage(QWidget):
                 self.ap_aging_table.setItem(r, 4, QTableWidgetItem(str(row['days_overdue'])))
                 self.ap_aging_table.setItem(r, 5, QTableWidgetItem(f"₹{row['amount']:.2f}"))
 
+        elif tab_index == 8: # Party Balances
+            filtered = [r for r in self.balance_data if matches(r, ['party_type', 'name'])]
+            self.balance_table.setRowCount(len(filtered))
+            for r, row in enumerate(filtered):
+                self.balance_table.setItem(r, 0, QTableWidgetItem(row['party_type'].title()))
+                self.balance_table.setItem(r, 1, QTableWidgetItem(row['name']))
+                self.balance_table.setItem(r, 2, QTableWidgetItem(f"₹{row['billed']:.2f}"))
+                self.balance_table.setItem(r, 3, QTableWidgetItem(f"₹{row['settled']:.2f}"))
+                self.balance_table.setItem(r, 4, QTableWidgetItem(f"₹{row['balance']:.2f}"))
+
+        elif tab_index == 9: # Statements
+            statement = self.statement_data
+            lines = statement['lines'] if statement else []
+            filtered = [r for r in lines if matches(r, ['type', 'number', 'details'])]
+            self.statement_table.setRowCount(len(filtered) + (1 if statement else 0))
+            if statement:
+                self.statement_table.setItem(0, 0, QTableWidgetItem(statement['start_date']))
+                self.statement_table.setItem(0, 3, QTableWidgetItem("Opening Balance"))
+                self.statement_table.setItem(0, 6, QTableWidgetItem(f"₹{statement['opening_balance']:.2f}"))
+                self.statement_summary.setText(
+                    f"Opening ₹{statement['opening_balance']:.2f} | Closing ₹{statement['closing_balance']:.2f}"
+                )
+            else:
+                self.statement_summary.setText("")
+            for r, row in enumerate(filtered, start=1):
+                self.statement_table.setItem(r, 0, QTableWidgetItem(str(row['date'])))
+                self.statement_table.setItem(r, 1, QTableWidgetItem(row['type']))
+                self.statement_table.setItem(r, 2, QTableWidgetItem(row['number']))
+                self.statement_table.setItem(r, 3, QTableWidgetItem(row['details']))
+                self.statement_table.setItem(r, 4, QTableWidgetItem(f"₹{row['billed']:.2f}" if row['billed'] else ""))
+                self.statement_table.setItem(r, 5, QTableWidgetItem(f"₹{row['settled']:.2f}" if row['settled'] else ""))
+                self.statement_table.setItem(r, 6, QTableWidgetItem(f"₹{row['balance']:.2f}"))
+
+        elif tab_index == 10: # Companies
+            filtered = [r for r in self.consolidated_data['companies'] if matches(r, ['name'])]
+            keys = ['sales', 'purchases', 'net_gst', 'receivable', 'payable', 'stock_value']
+            total = dict({key: sum(row[key] for row in filtered) for key in keys}, name="Total")
+            rows = filtered + ([total] if filtered else [])
+            self.companies_table.setRowCount(len(rows))
+            for r, row in enumerate(rows):
+                self.companies_table.setItem(r, 0, QTableWidgetItem(row['name']))
+                for c, key in enumerate(keys, start=1):
+                    self.companies_table.setItem(r, c, QTableWidgetItem(f"₹{row[key]:.2f}"))
+
     def print_current_report(self):
         tab_index = self.tabs.currentIndex()
         
         # 1. Fetch Company Settings
         try:
-            settings = execute_read_query("SELECT key, value FROM settings")
-            settings_dict = {row['key']: row['value'] for row in settings}
+            settings_dict = get_settings()
         except Exception as e:
             print(f"Error fetching settings: {e}")
             settings_dict = {}
@@ -354,15 +487,144 @@ class ReportsPage(QWidget):
                 filename = os.path.join(folder, "ap_aging_report.pdf")
                 headers = ["Bill #", "Vendor", "Due Date", "Bucket", "Days Overdue", "Amount"]
                 rows = self.get_table_data(self.ap_aging_table)
+
+            elif tab_index == 8: # Party Balances
+                title = "PARTY BALANCES"
+                filename = os.path.join(folder, "party_balances.pdf")
+                headers = ["Type", "Name", "Billed", "Settled", "Balance"]
+                rows = self.get_table_data(self.balance_table)
+
+            elif tab_index == 9: # Statements
+                party_id = self.statement_party_combo.currentData()
+                if party_id is None:
+                    QMessageBox.warning(self, "No Party", "Select a customer or vendor first.")
+                    return
+                name = "".join(ch if ch.isalnum() else "_" for ch in self.statement_party_combo.currentText())
+                self.start_statement_task(os.path.join(folder, f"statement_{name}.pdf"), party_id, merged=True)
+                return
+
+            elif tab_index == 10: # Companies
+                title = "CONSOLIDATED SUMMARY"
+                filename = os.path.join(folder, "consolidated_summary.pdf")
+                headers = ["Company", "Sales", "Purchases", "Net GST", "Receivable", "Payable", "Stock Value"]
+                rows = self.get_table_data(self.companies_table)
             
-            # 3. Generate PDF
-            generate_generic_report_pdf(report_data, headers, rows, filename, title)
-            
-            QDesktopServices.openUrl(QUrl.fromLocalFile(filename))
+            # 3. Generate PDF in the background
+            # Unfiltered registers are streamed straight from the database
+            total_rows = len(rows)
+            if not self.search_bar.text():
+                start = self.start_date.date().toString("yyyy-MM-dd")
+                end = self.end_date.date().toString("yyyy-MM-dd")
+                if tab_index == 0:
+                    rows = self.iter_register_rows(iter_sales_report(start, end), 'invoice_number', 'customer_name')
+                    total_rows = None
+                elif tab_index == 1:
+                    rows = self.iter_register_rows(iter_purchase_report(start, end), 'bill_number', 'vendor_name')
+                    total_rows = None
+
+            self.start_report_task(report_data, headers, rows, filename, title, total_rows)
             
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to generate PDF: {str(e)}")
 
+    def iter_register_rows(self, db_rows, number_key, party_key):
+        """Formats streamed register rows the same way the on-screen table shows them."""
+        for row in db_rows:
+            yield [row[number_key], row[party_key], str(row['date']), f"₹{row['grand_total']:.2f}", row['status']]
+
+    def start_report_task(self, report_data, headers, rows, filename, title, total_rows):
+        if self.report_task and self.report_task.is_running():
+            QMessageBox.information(self, "Please Wait", "A report is already being generated.")
+            return
+
+        self.report_filename = filename
+        self.report_task = BackgroundTask(
+            generate_streaming_report_pdf, report_data, headers, rows, filename, title,
+            total_rows=total_rows
+        )
+        self.report_task.progress.connect(self.on_report_progress)
+        self.report_task.finished.connect(self.on_report_finished)
+        self.report_task.failed.connect(self.on_report_failed)
+
+        self.report_progress = QProgressDialog("Generating PDF...", "Cancel", 0, total_rows or 0, self)
+        self.report_progress.setWindowTitle(title.title())
+        self.report_progress.setWindowModality(Qt.WindowModality.WindowModal)
+        self.report_progress.setMinimumDuration(0)
+        self.report_progress.setAutoClose(False)
+        self.report_progress.setAutoReset(False)
+        self.report_progress.canceled.connect(self.cancel_report_task)
+        self.report_progress.show()
+
+        self.report_task.start()
+
+    def export_all_statements(self):
+        folder = QFileDialog.getExistingDirectory(self, "Select Output Folder", os.getcwd())
+        if folder:
+            self.start_statement_task(folder, None, merged=False)
+
+    def start_statement_task(self, output, party_id, merged):
+        """Renders one statement, or every party's statements into a folder across worker processes."""
+        if self.report_task and self.report_task.is_running():
+            QMessageBox.information(self, "Please Wait", "A report is already being generated.")
+            return
+
+        self.report_filename = output
+        self.report_task = BackgroundTask(
+            export_party_statements, output, self.statement_type_combo.currentData(),
+            self.start_date.date().toString("yyyy-MM-dd"), self.end_date.date().toString("yyyy-MM-dd"),
+            party_id=party_id, merged=merged
+        )
+        self.report_task.progress.connect(self.on_statement_progress)
+        self.report_task.finished.connect(self.on_report_finished)
+        self.report_task.failed.connect(self.on_report_failed)
+
+        self.report_progress = QProgressDialog("Loading statements...", "Cancel", 0, 0, self)
+        self.report_progress.setWindowTitle("Statements")
+        self.report_progress.setWindowModality(Qt.WindowModality.WindowModal)
+        self.report_progress.setMinimumDuration(0)
+        self.report_progress.setAutoClose(False)
+        self.report_progress.setAutoReset(False)
+        self.report_progress.canceled.connect(self.cancel_report_task)
+        self.report_progress.show()
+
+        self.report_task.start()
+
+    def on_statement_progress(self, done, total):
+        if not self.report_progress:
+            return
+        self.report_progress.setMaximum(total)
+        self.report_progress.setValue(done)
+        self.report_progress.setLabelText(f"Rendering statements... {done} of {total}")
+
+    def cancel_report_task(self):
+        if self.report_task:
+            self.report_task.cancel()
+
+    def on_report_progress(self, rows_done, total_rows):
+        if not self.report_progress:
+            return
+        if total_rows:
+            self.report_progress.setValue(min(rows_done, total_rows))
+        self.report_progress.setLabelText(f"Generating PDF... {rows_done} rows written")
+
+    def close_report_progress(self):
+        if self.report_progress:
+            self.report_progress.canceled.disconnect(self.cancel_report_task)
+            self.report_progress.close()
+            self.report_progress = None
+
+    def on_report_finished(self, rows_written):
+        self.close_report_progress()
+        self.report_task.wait()
+        QDesktopServices.openUrl(QUrl.fromLocalFile(self.report_filename))
+
+    def on_report_failed(self, message):
+        self.close_report_progress()
+        self.report_task.wait()
+        if self.report_task.is_cancelled():
+            return
+        QMessageBox.critical(self, "Error", f"Failed to generate PDF: {message}")
+
     def get_table_data(self, table_widget):
         rows = []
         for r in range(table_widget.rowCount()):
@@ -2,12 +2,28 @@ from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, 
     QLineEdit, QFormLayout, QMessageBox, QFileDialog, QTabWidget,
     QTableWidget, QTableWidgetItem, QHeaderView, QComboBox, QDialog,
-    QDialogButtonBox, QGroupBox
+    QDialogButtonBox, QGroupBox, QProgressDialog, QCheckBox, QSpinBox, QScrollArea, QFrame
 )
 from PySide6.QtCore import Qt
 from database.db import execute_read_query, execute_write_query
-from auth.auth_logic import update_password, check_password
+from auth.auth_logic import change_password
 from auth.session import Session
+from pdf.render_cache import clear_render_cache
+from pdf.resources import invalidate_logo
+from database.backup import backup_database, default_backup_extension
+from database.snapshots import (
+    take_snapshot, list_snapshots, prune_snapshots, get_store_size, get_snapshot_settings
+)
+from database.restore import restore_database, restore_from_snapshot
+from database.maintenance import get_database_stats, get_last_runs, run_maintenance
+from database import query_stats
+from modules.backend import get_backend
+from modules.archive import (
+    archive_fiscal_year, get_archived_years, get_closable_fiscal_years, fiscal_year_label
+)
+from modules.period_close import get_period_closes, get_closable_periods, close_period, reopen_period
+from ui.workers import BackgroundTask
+from ui.audit_log import AuditLogPage
 import shutil
 import datetime
 import os
@@ -43,12 +59,31 @@ class SettingsPage(QWidget):
         
         # --- Tab 4: Database ---
         self.database_tab = QWidget()
-        self.init_database_tab()
+        if get_backend() is None:
+            self.init_database_tab()
+        else:
+            # Backups, snapshots, archives and maintenance work on the database
+            # file, which lives with the server; only the server machine runs them
+            self.init_remote_database_tab()
         self.tabs.addTab(self.database_tab, "Database")
+
+        # --- Tab 5: Audit Log ---
+        self.audit_tab = AuditLogPage()
+        self.tabs.addTab(self.audit_tab, "Audit Log")
         
         layout.addWidget(self.tabs)
         self.setLayout(layout)
         
+        self.backup_task = None
+        self.backup_progress = None
+        self.snapshot_task = None
+        self.snapshot_progress = None
+        self.restore_task = None
+        self.restore_progress = None
+        self.maintenance_task = None
+        self.archive_task = None
+        self.archive_progress = None
+        
         self.load_settings()
 
     def init_profile_tab(self):
@@ -160,6 +195,18 @@ class SettingsPage(QWidget):
         layout.addLayout(btn_layout)
         self.custom_fields_tab.setLayout(layout)
 
+    def init_remote_database_tab(self):
+        layout = QVBoxLayout()
+        note = QLabel(
+            f"This terminal uses the LedgerPro server at {get_backend().url}. Backup, restore, snapshots, "
+            "maintenance, fiscal year archives, period close and reset are done in LedgerPro on the server "
+            "machine, against the database the server hosts."
+        )
+        note.setWordWrap(True)
+        layout.addWidget(note)
+        layout.addStretch()
+        self.database_tab.setLayout(layout)
+
     def init_database_tab(self):
         layout = QVBoxLayout()
         
@@ -179,6 +226,211 @@ class SettingsPage(QWidget):
         backup_group.setLayout(backup_layout)
         layout.addWidget(backup_group)
         
+        # Maintenance
+        maintenance_group = QGroupBox("Database Maintenance")
+        maintenance_layout = QVBoxLayout()
+        
+        self.db_stats_label = QLabel()
+        maintenance_layout.addWidget(self.db_stats_label)
+        self.maintenance_runs_label = QLabel()
+        self.maintenance_runs_label.setStyleSheet("color: #64748B;")
+        maintenance_layout.addWidget(self.maintenance_runs_label)
+        
+        maintenance_btn_layout = QHBoxLayout()
+        maintenance_btn = QPushButton("Run Maintenance Now")
+        maintenance_btn.clicked.connect(self.run_maintenance_now)
+        refresh_stats_btn = QPushButton("Refresh")
+        refresh_stats_btn.clicked.connect(self.load_database_stats)
+        maintenance_btn_layout.addWidget(maintenance_btn)
+        maintenance_btn_layout.addWidget(refresh_stats_btn)
+        maintenance_btn_layout.addStretch()
+        maintenance_layout.addLayout(maintenance_btn_layout)
+        
+        maintenance_group.setLayout(maintenance_layout)
+        layout.addWidget(maintenance_group)
+        self.load_database_stats()
+        
+        # Query Diagnostics
+        query_group = QGroupBox("Query Diagnostics")
+        query_layout = QVBoxLayout()
+        
+        query_note = QLabel(
+            "Records every database statement with where it was run from, its row count and how long it took. "
+            f"Flags slow statements, and statements run {query_stats.N_PLUS_ONE_MIN} or more times for one click (N+1)."
+        )
+        query_note.setWordWrap(True)
+        query_note.setStyleSheet("color: #64748B;")
+        query_layout.addWidget(query_note)
+        
+        query_options = QHBoxLayout()
+        self.query_stats_enabled = QCheckBox("Record queries; slow above")
+        self.query_stats_enabled.setChecked(query_stats.enabled)
+        self.slow_query_ms = QSpinBox()
+        self.slow_query_ms.setRange(1, 60000)
+        self.slow_query_ms.setSuffix(" ms")
+        self.slow_query_ms.setValue(query_stats.slow_threshold_ms)
+        save_query_btn = QPushButton("Save")
+        save_query_btn.clicked.connect(self.save_query_stats_settings)
+        query_options.addWidget(self.query_stats_enabled)
+        query_options.addWidget(self.slow_query_ms)
+        query_options.addWidget(save_query_btn)
+        query_options.addStretch()
+        query_layout.addLayout(query_options)
+        
+        self.query_summary = QLabel()
+        query_layout.addWidget(self.query_summary)
+        
+        self.query_sites_table = QTableWidget()
+        self.query_sites_table.setColumnCount(6)
+        self.query_sites_table.setHorizontalHeaderLabels(["Call Site", "Statement", "Calls", "Total ms", "Max ms", "Rows"])
+        self.query_sites_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.query_sites_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.query_sites_table.setMinimumHeight(160)
+        query_layout.addWidget(self.query_sites_table)
+        
+        self.query_findings_table = QTableWidget()
+        self.query_findings_table.setColumnCount(5)
+        self.query_findings_table.setHorizontalHeaderLabels(["Kind", "At", "Where", "Statement", "Detail"])
+        self.query_findings_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.query_findings_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.query_findings_table.setMinimumHeight(140)
+        query_layout.addWidget(self.query_findings_table)
+        
+        query_btn_layout = QHBoxLayout()
+        refresh_query_btn = QPushButton("Refresh")
+        refresh_query_btn.clicked.connect(self.load_query_stats)
+        clear_query_btn = QPushButton("Clear")
+        clear_query_btn.clicked.connect(self.clear_query_stats)
+        export_query_btn = QPushButton("Export JSON")
+        export_query_btn.clicked.connect(self.export_query_stats)
+        query_btn_layout.addWidget(refresh_query_btn)
+        query_btn_layout.addWidget(clear_query_btn)
+        query_btn_layout.addWidget(export_query_btn)
+        query_btn_layout.addStretch()
+        query_layout.addLayout(query_btn_layout)
+        
+        query_group.setLayout(query_layout)
+        layout.addWidget(query_group)
+        self.load_query_stats()
+        
+        # Automatic Snapshots
+        snapshot_group = QGroupBox("Automatic Snapshots")
+        snapshot_layout = QVBoxLayout()
+        
+        enabled, interval = get_snapshot_settings()
+        options_layout = QHBoxLayout()
+        self.snapshot_enabled = QCheckBox("Take snapshots automatically every")
+        self.snapshot_enabled.setChecked(enabled)
+        self.snapshot_interval = QSpinBox()
+        self.snapshot_interval.setRange(5, 24 * 60)
+        self.snapshot_interval.setSuffix(" min")
+        self.snapshot_interval.setValue(interval)
+        save_snapshot_btn = QPushButton("Save")
+        save_snapshot_btn.clicked.connect(self.save_snapshot_settings)
+        options_layout.addWidget(self.snapshot_enabled)
+        options_layout.addWidget(self.snapshot_interval)
+        options_layout.addWidget(save_snapshot_btn)
+        options_layout.addStretch()
+        snapshot_layout.addLayout(options_layout)
+        
+        self.snapshot_table = QTableWidget()
+        self.snapshot_table.setColumnCount(4)
+        self.snapshot_table.setHorizontalHeaderLabels(["ID", "Taken At", "Database Size", "New Data"])
+        self.snapshot_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.snapshot_table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.snapshot_table.setSelectionMode(QTableWidget.SelectionMode.SingleSelection)
+        self.snapshot_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.snapshot_table.setMinimumHeight(160)
+        snapshot_layout.addWidget(self.snapshot_table)
+        
+        self.snapshot_info = QLabel()
+        snapshot_layout.addWidget(self.snapshot_info)
+        
+        snapshot_btn_layout = QHBoxLayout()
+        snapshot_now_btn = QPushButton("Take Snapshot Now")
+        snapshot_now_btn.clicked.connect(self.take_snapshot_now)
+        restore_snapshot_btn = QPushButton("Restore Selected")
+        restore_snapshot_btn.setStyleSheet("background-color: #F59E0B; color: white;")
+        restore_snapshot_btn.clicked.connect(self.restore_selected_snapshot)
+        snapshot_btn_layout.addWidget(snapshot_now_btn)
+        snapshot_btn_layout.addWidget(restore_snapshot_btn)
+        snapshot_layout.addLayout(snapshot_btn_layout)
+        
+        snapshot_group.setLayout(snapshot_layout)
+        layout.addWidget(snapshot_group)
+        self.load_snapshots()
+        
+        # Fiscal Year Archive
+        archive_group = QGroupBox("Fiscal Year Archive")
+        archive_layout = QVBoxLayout()
+        
+        archive_note = QLabel(
+            "Moves paid invoices and bills of a closed fiscal year, with their payments, into a separate "
+            "archive file. Unpaid documents and credits stay. Reports still include archived years."
+        )
+        archive_note.setWordWrap(True)
+        archive_note.setStyleSheet("color: #64748B;")
+        archive_layout.addWidget(archive_note)
+        
+        self.archive_table = QTableWidget()
+        self.archive_table.setColumnCount(6)
+        self.archive_table.setHorizontalHeaderLabels(["Fiscal Year", "File", "Invoices", "Bills", "Payments", "Archived At"])
+        self.archive_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.archive_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.archive_table.setMaximumHeight(140)
+        archive_layout.addWidget(self.archive_table)
+        
+        archive_btn_layout = QHBoxLayout()
+        self.archive_year_combo = QComboBox()
+        archive_btn = QPushButton("Archive Year")
+        archive_btn.clicked.connect(self.archive_selected_year)
+        archive_btn_layout.addWidget(QLabel("Close:"))
+        archive_btn_layout.addWidget(self.archive_year_combo)
+        archive_btn_layout.addWidget(archive_btn)
+        archive_btn_layout.addStretch()
+        archive_layout.addLayout(archive_btn_layout)
+        
+        archive_group.setLayout(archive_layout)
+        layout.addWidget(archive_group)
+        self.load_archives()
+        
+        # Period Close
+        close_group = QGroupBox("Period Close")
+        close_layout = QVBoxLayout()
+        
+        close_note = QLabel(
+            "Closing a month records cash, customer and vendor balances and stock as of its last day, "
+            "and locks every entry dated up to then. Reports start from the latest close."
+        )
+        close_note.setWordWrap(True)
+        close_note.setStyleSheet("color: #64748B;")
+        close_layout.addWidget(close_note)
+        
+        self.close_table = QTableWidget()
+        self.close_table.setColumnCount(5)
+        self.close_table.setHorizontalHeaderLabels(["Period", "Type", "Locked Until", "Cash Balance", "Closed At"])
+        self.close_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.close_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.close_table.setMaximumHeight(140)
+        close_layout.addWidget(self.close_table)
+        
+        close_btn_layout = QHBoxLayout()
+        self.close_period_combo = QComboBox()
+        close_period_btn = QPushButton("Close Period")
+        close_period_btn.clicked.connect(self.close_selected_period)
+        reopen_btn = QPushButton("Reopen Latest")
+        reopen_btn.clicked.connect(self.reopen_latest_period)
+        close_btn_layout.addWidget(QLabel("Close up to:"))
+        close_btn_layout.addWidget(self.close_period_combo)
+        close_btn_layout.addWidget(close_period_btn)
+        close_btn_layout.addWidget(reopen_btn)
+        close_btn_layout.addStretch()
+        close_layout.addLayout(close_btn_layout)
+        
+        close_group.setLayout(close_layout)
+        layout.addWidget(close_group)
+        self.load_period_closes()
+        
         # Danger Zone
         danger_group = QGroupBox("Danger Zone")
         danger_layout = QVBoxLayout()
@@ -207,11 +459,20 @@ class SettingsPage(QWidget):
         layout.addWidget(danger_group)
         
         layout.addStretch()
-        self.database_tab.setLayout(layout)
+        
+        # Scrolls on smaller screens
+        content = QWidget()
+        content.setLayout(layout)
+        scroll = QScrollArea()
+        scroll.setWidgetResizable(True)
+        scroll.setFrameShape(QFrame.Shape.NoFrame)
+        scroll.setWidget(content)
+        tab_layout = QVBoxLayout()
+        tab_layout.setContentsMargins(0, 0, 0, 0)
+        tab_layout.addWidget(scroll)
+        self.database_tab.setLayout(tab_layout)
 
     def import_db(self):
-        from database.db import DB_NAME
-        
         confirm = QMessageBox.question(
             self, "Confirm Restore", 
             "Restoring a database will OVERWRITE the current database. All current data will be lost. Are you sure?",
@@ -220,16 +481,79 @@ class SettingsPage(QWidget):
         if confirm != QMessageBox.StandardButton.Yes:
             return
 
-        file_path, _ = QFileDialog.getOpenFileName(self, "Select Backup File", "", "SQLite Database (*.db);;All Files (*)")
+        file_path, _ = QFileDialog.getOpenFileName(self, "Select Backup File", "", "Backups (*.db *.gz *.zst);;All Files (*)")
         if file_path:
-            try:
-                # Close current connection if possible? 
-                # SQLite usually allows overwriting if no active transaction lock.
-                # But safer to just copy.
-                shutil.copy(file_path, DB_NAME)
-                QMessageBox.information(self, "Success", "Database restored successfully. Please restart the application.")
-            except Exception as e:
-                QMessageBox.critical(self, "Error", f"Failed to restore database: {str(e)}")
+            # Validated and migrated in a work file before the live database is touched
+            self.start_restore(restore_database, file_path)
+
+    def start_restore(self, fn, *args):
+        if self.restore_task and self.restore_task.is_running():
+            QMessageBox.information(self, "Please Wait", "A restore is already running.")
+            return
+        
+        self.restore_task = BackgroundTask(fn, *args)
+        self.restore_task.progress.connect(self.on_restore_progress)
+        self.restore_task.finished.connect(self.on_restore_finished)
+        self.restore_task.failed.connect(self.on_restore_failed)
+        
+        self.restore_progress = QProgressDialog("Checking backup...", "Cancel", 0, 0, self)
+        self.restore_progress.setWindowTitle("Restore")
+        self.restore_progress.setWindowModality(Qt.WindowModality.WindowModal)
+        self.restore_progress.setMinimumDuration(0)
+        self.restore_progress.setAutoClose(False)
+        self.restore_progress.setAutoReset(False)
+        self.restore_progress.canceled.connect(self.cancel_restore)
+        self.restore_progress.show()
+        
+        self.restore_task.start()
+
+    def cancel_restore(self):
+        if self.restore_task:
+            self.restore_task.cancel()
+
+    def on_restore_progress(self, step, total_steps):
+        if not self.restore_progress:
+            return
+        labels = ["Checking backup...", "Saving a safety copy of the current database...", "Restoring database..."]
+        if step < len(labels):
+            self.restore_progress.setLabelText(labels[step])
+        if step >= len(labels) - 1:
+            # The live database is being replaced; it cannot be stopped half way
+            self.restore_progress.setCancelButton(None)
+        self.restore_progress.setMaximum(total_steps)
+        # setValue() processes events on a modal dialog, so it has to come last
+        self.restore_progress.setValue(step)
+
+    def close_restore_progress(self):
+        if self.restore_progress:
+            self.restore_progress.canceled.disconnect(self.cancel_restore)
+            self.restore_progress.close()
+            self.restore_progress = None
+
+    def on_restore_finished(self, result):
+        self.close_restore_progress()
+        self.restore_task.wait()
+        # Every query opens a new connection, so only in-memory copies need refreshing
+        clear_render_cache()
+        invalidate_logo()
+        self.load_settings()
+        self.load_snapshots()
+        self.load_archives()
+        self.load_period_closes()
+        self.load_database_stats()
+        message = "Database restored successfully."
+        if result['migrated']:
+            message += " It was upgraded to the current version."
+        if result['safety_copy']:
+            message += f"\n\nThe previous database was saved to:\n{result['safety_copy']}"
+        QMessageBox.information(self, "Success", message)
+
+    def on_restore_failed(self, message):
+        self.close_restore_progress()
+        self.restore_task.wait()
+        if self.restore_task.is_cancelled():
+            return
+        QMessageBox.critical(self, "Error", f"Failed to restore database: {message}\n\nThe current database was not changed.")
 
     def clear_invoices(self):
         confirm = QMessageBox.question(self, "Confirm", "Delete ALL Invoices? This cannot be undone.\n\nWARNING: Stock quantities will NOT be restored. Use this only if you want to clear sales history but keep current stock levels, or if you plan to reset stock separately.", QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
@@ -240,6 +564,12 @@ class SettingsPage(QWidget):
                 # Also need to clear invoice_id from payments or delete those payments?
                 # Ideally we should delete payments associated with invoices.
                 execute_write_query("DELETE FROM payments WHERE invoice_id IS NOT NULL")
+                # The recorded period balances no longer match the book
+                reopen_period()
+                self.load_period_closes()
+                clear_render_cache()
+                # Hand the freed pages back and refresh planner statistics
+                self.run_maintenance_now()
                 QMessageBox.information(self, "Success", "All invoices and related payments deleted.")
             except Exception as e:
                 QMessageBox.critical(self, "Error", str(e))
@@ -252,6 +582,12 @@ class SettingsPage(QWidget):
                 execute_write_query("DELETE FROM bills")
                 # Delete payments associated with bills
                 execute_write_query("DELETE FROM payments WHERE bill_id IS NOT NULL")
+                # The recorded period balances no longer match the book
+                reopen_period()
+                self.load_period_closes()
+                clear_render_cache()
+                # Hand the freed pages back and refresh planner statistics
+                self.run_maintenance_now()
                 QMessageBox.information(self, "Success", "All bills and related payments deleted.")
             except Exception as e:
                 QMessageBox.critical(self, "Error", str(e))
@@ -265,6 +601,12 @@ class SettingsPage(QWidget):
                 # Yes, if payments are gone, invoices are likely Due/Sent.
                 execute_write_query("UPDATE invoices SET status = 'Sent' WHERE status = 'Paid'")
                 execute_write_query("UPDATE bills SET status = 'Sent' WHERE status = 'Paid'")
+                # The recorded period balances no longer match the book
+                reopen_period()
+                self.load_period_closes()
+                clear_render_cache()
+                # Hand the freed pages back and refresh planner statistics
+                self.run_maintenance_now()
                 QMessageBox.information(self, "Success", "All payments deleted. Invoice/Bill statuses updated.")
             except Exception as e:
                 QMessageBox.critical(self, "Error", str(e))
@@ -275,14 +617,420 @@ class SettingsPage(QWidget):
         if not os.path.exists(DB_NAME):
             QMessageBox.warning(self, "Error", "Database file not found.")
             return
+        if self.backup_task and self.backup_task.is_running():
+            QMessageBox.information(self, "Please Wait", "A backup is already running.")
+            return
             
-        file_path, _ = QFileDialog.getSaveFileName(self, "Save Backup", f"backup_{datetime.date.today()}.db", "SQLite Database (*.db)")
-        if file_path:
-            try:
-                shutil.copy(DB_NAME, file_path)
-                QMessageBox.information(self, "Success", "Backup created successfully.")
-            except Exception as e:
-                QMessageBox.critical(self, "Error", f"Failed to backup database: {str(e)}")
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "Save Backup", f"backup_ledgerpro_{timestamp}{default_backup_extension()}",
+            "Compressed Backup (*.gz *.zst);;SQLite Database (*.db)"
+        )
+        if not file_path:
+            return
+            
+        # Runs on a worker thread; the live database stays usable while pages are copied
+        self.backup_task = BackgroundTask(backup_database, file_path)
+        self.backup_task.progress.connect(self.on_backup_progress)
+        self.backup_task.finished.connect(self.on_backup_finished)
+        self.backup_task.failed.connect(self.on_backup_failed)
+        
+        self.backup_progress = QProgressDialog("Backing up database...", "Cancel", 0, 0, self)
+        self.backup_progress.setWindowTitle("Backup")
+        self.backup_progress.setWindowModality(Qt.WindowModality.WindowModal)
+        self.backup_progress.setMinimumDuration(0)
+        self.backup_progress.setAutoClose(False)
+        self.backup_progress.setAutoReset(False)
+        self.backup_progress.canceled.connect(self.cancel_backup)
+        self.backup_progress.show()
+        
+        self.backup_task.start()
+
+    def cancel_backup(self):
+        if self.backup_task:
+            self.backup_task.cancel()
+
+    def on_backup_progress(self, pages_done, total_pages):
+        if not self.backup_progress:
+            return
+        self.backup_progress.setMaximum(total_pages)
+        self.backup_progress.setValue(pages_done)
+        self.backup_progress.setLabelText(f"Backing up database... {pages_done} of {total_pages} pages")
+
+    def close_backup_progress(self):
+        if self.backup_progress:
+            self.backup_progress.canceled.disconnect(self.cancel_backup)
+            self.backup_progress.close()
+            self.backup_progress = None
+
+    def on_backup_finished(self, result):
+        self.close_backup_progress()
+        self.backup_task.wait()
+        size_mb = result['backup_bytes'] / (1024 * 1024)
+        QMessageBox.information(
+            self, "Success",
+            f"Backup created and verified in {result['seconds']:.1f}s ({size_mb:.1f} MB):\n{result['path']}"
+        )
+
+    def on_backup_failed(self, message):
+        self.close_backup_progress()
+        self.backup_task.wait()
+        if self.backup_task.is_cancelled():
+            return
+        QMessageBox.critical(self, "Error", f"Failed to backup database: {message}")
+
+    def load_database_stats(self):
+        try:
+            stats = get_database_stats()
+            last_runs = get_last_runs()
+        except Exception as e:
+            self.db_stats_label.setText(f"Could not read database statistics: {e}")
+            return
+        mb = 1024 * 1024
+        self.db_stats_label.setText(
+            f"Database: {stats['db_bytes'] / mb:.1f} MB    "
+            f"Free pages: {stats['free_pages']} ({stats['free_bytes'] / mb:.1f} MB)    "
+            f"WAL: {stats['wal_bytes'] / mb:.1f} MB"
+        )
+        names = {'optimize': "Statistics", 'vacuum': "Incremental vacuum", 'checkpoint': "WAL checkpoint"}
+        lines = []
+        for task, name in names.items():
+            run = last_runs.get(task)
+            if run:
+                lines.append(f"{name}: {run['started_at'].replace('T', ' ')} ({run['seconds'] * 1000:.0f} ms) - {run['details']}")
+            else:
+                lines.append(f"{name}: never run")
+        self.maintenance_runs_label.setText("\n".join(lines))
+
+    def run_maintenance_now(self):
+        if self.maintenance_task and self.maintenance_task.is_running():
+            return
+        self.maintenance_task = BackgroundTask(run_maintenance)
+        self.maintenance_task.finished.connect(self.on_maintenance_finished)
+        self.maintenance_task.failed.connect(self.on_maintenance_failed)
+        self.db_stats_label.setText("Running maintenance...")
+        self.maintenance_task.start()
+
+    def on_maintenance_finished(self, results):
+        self.maintenance_task.wait()
+        self.load_database_stats()
+
+    def on_maintenance_failed(self, message):
+        self.maintenance_task.wait()
+        self.load_database_stats()
+        QMessageBox.critical(self, "Error", f"Database maintenance failed: {message}")
+
+    def save_query_stats_settings(self):
+        try:
+            enabled = self.query_stats_enabled.isChecked()
+            for key, value in (
+                ('query_stats_enabled', '1' if enabled else '0'),
+                ('slow_query_ms', str(self.slow_query_ms.value())),
+            ):
+                execute_write_query("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, value))
+            query_stats.set_enabled(enabled, self.slow_query_ms.value())
+            self.load_query_stats()
+            QMessageBox.information(self, "Success", "Query diagnostics settings saved.")
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to save query diagnostics settings: {str(e)}")
+
+    def load_query_stats(self):
+        snapshot = query_stats.get_snapshot()
+        sites = snapshot['call_sites']
+        self.query_summary.setText(
+            f"{'Recording' if snapshot['enabled'] else 'Not recording'}: {sum(s['calls'] for s in sites)} statements "
+            f"from {len(sites)} call sites, {len(snapshot['slow_queries'])} slow, "
+            f"{len(snapshot['n_plus_one'])} N+1 patterns"
+        )
+        
+        sites = sites[:50]
+        self.query_sites_table.setRowCount(len(sites))
+        for r, site in enumerate(sites):
+            self.query_sites_table.setItem(r, 0, QTableWidgetItem(site['call_site']))
+            self.query_sites_table.setItem(r, 1, QTableWidgetItem(site['sql']))
+            self.query_sites_table.setItem(r, 2, QTableWidgetItem(str(site['calls'])))
+            self.query_sites_table.setItem(r, 3, QTableWidgetItem(f"{site['total_ms']:.1f}"))
+            self.query_sites_table.setItem(r, 4, QTableWidgetItem(f"{site['max_ms']:.1f}"))
+            self.query_sites_table.setItem(r, 5, QTableWidgetItem(str(site['rows'])))
+        
+        # Latest first
+        findings = [
+            ("N+1", item['at'], f"{item['action']} / {item['call_site']}", item['sql'], f"{item['count']} times")
+            for item in snapshot['n_plus_one']
+        ] + [
+            ("Slow", item['at'], item['call_site'], item['sql'], f"{item['ms']:.0f} ms, {item['rows']} rows")
+            for item in snapshot['slow_queries']
+        ]
+        findings.sort(key=lambda f: f[1], reverse=True)
+        findings = findings[:100]
+        self.query_findings_table.setRowCount(len(findings))
+        for r, finding in enumerate(findings):
+            for c, value in enumerate(finding):
+                self.query_findings_table.setItem(r, c, QTableWidgetItem(str(value)))
+
+    def clear_query_stats(self):
+        query_stats.clear()
+        self.load_query_stats()
+
+    def export_query_stats(self):
+        filename, _ = QFileDialog.getSaveFileName(
+            self, "Export Query Statistics",
+            f"query_stats_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json", "JSON Files (*.json)"
+        )
+        if not filename:
+            return
+        try:
+            query_stats.dump_json(filename)
+            QMessageBox.information(self, "Success", f"Query statistics exported to:\n{filename}")
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to export query statistics: {str(e)}")
+
+    def load_archives(self):
+        try:
+            archived = get_archived_years()
+            closable = get_closable_fiscal_years()
+        except Exception as e:
+            print(f"Warning: Could not read archived years: {e}")
+            return
+        self.archive_table.setRowCount(len(archived))
+        for row, year in enumerate(archived):
+            self.archive_table.setItem(row, 0, QTableWidgetItem(fiscal_year_label(year['fiscal_year'])))
+            self.archive_table.setItem(row, 1, QTableWidgetItem(year['path']))
+            self.archive_table.setItem(row, 2, QTableWidgetItem(str(year['invoices'])))
+            self.archive_table.setItem(row, 3, QTableWidgetItem(str(year['bills'])))
+            self.archive_table.setItem(row, 4, QTableWidgetItem(str(year['payments'])))
+            self.archive_table.setItem(row, 5, QTableWidgetItem(str(year['archived_at'])))
+        
+        self.archive_year_combo.clear()
+        for fiscal_year in closable:
+            self.archive_year_combo.addItem(fiscal_year_label(fiscal_year), fiscal_year)
+
+    def archive_selected_year(self):
+        fiscal_year = self.archive_year_combo.currentData()
+        if fiscal_year is None:
+            QMessageBox.information(self, "Archive", "There is no closed fiscal year to archive.")
+            return
+        if self.archive_task and self.archive_task.is_running():
+            QMessageBox.information(self, "Please Wait", "Archiving is already running.")
+            return
+        
+        confirm = QMessageBox.question(
+            self, "Confirm Archive",
+            f"Move the paid invoices, bills and payments of {fiscal_year_label(fiscal_year)} into an archive file?\n\n"
+            "They will no longer appear in the invoice, bill and payment lists, but reports will still include them. "
+            "Take a backup first.",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+        )
+        if confirm != QMessageBox.StandardButton.Yes:
+            return
+        
+        self.archive_task = BackgroundTask(archive_fiscal_year, fiscal_year)
+        self.archive_task.progress.connect(self.on_archive_progress)
+        self.archive_task.finished.connect(self.on_archive_finished)
+        self.archive_task.failed.connect(self.on_archive_failed)
+        
+        self.archive_progress = QProgressDialog(f"Archiving {fiscal_year_label(fiscal_year)}...", None, 0, 0, self)
+        self.archive_progress.setWindowTitle("Archive")
+        self.archive_progress.setWindowModality(Qt.WindowModality.WindowModal)
+        self.archive_progress.setMinimumDuration(0)
+        self.archive_progress.setAutoClose(False)
+        self.archive_progress.setAutoReset(False)
+        self.archive_progress.show()
+        
+        self.archive_task.start()
+
+    def on_archive_progress(self, step, total_steps):
+        if not self.archive_progress:
+            return
+        self.archive_progress.setMaximum(total_steps)
+        self.archive_progress.setValue(step)
+
+    def close_archive_progress(self):
+        if self.archive_progress:
+            self.archive_progress.close()
+            self.archive_progress = None
+
+    def on_archive_finished(self, result):
+        self.close_archive_progress()
+        self.archive_task.wait()
+        self.load_archives()
+        self.load_database_stats()
+        QMessageBox.information(
+            self, "Success",
+            f"{fiscal_year_label(result['fiscal_year'])} archived: {result['invoices']} invoices, {result['bills']} bills, "
+            f"{result['payments']} payments and {result['stock_batches']} used-up stock batches moved to\n{result['path']}"
+        )
+
+    def on_archive_failed(self, message):
+        self.close_archive_progress()
+        self.archive_task.wait()
+        QMessageBox.critical(self, "Error", f"Failed to archive the fiscal year: {message}")
+
+    def load_period_closes(self):
+        try:
+            closes = get_period_closes()
+            closable = get_closable_periods()
+        except Exception as e:
+            print(f"Warning: Could not read closed periods: {e}")
+            return
+        self.close_table.setRowCount(len(closes))
+        for row, close in enumerate(closes):
+            self.close_table.setItem(row, 0, QTableWidgetItem(close['period']))
+            self.close_table.setItem(row, 1, QTableWidgetItem("Year End" if close['kind'] == 'year' else "Month"))
+            self.close_table.setItem(row, 2, QTableWidgetItem(close['end_date']))
+            self.close_table.setItem(row, 3, QTableWidgetItem(f"₹{close['cash_in'] - close['cash_out']:,.2f}"))
+            self.close_table.setItem(row, 4, QTableWidgetItem(str(close['closed_at'])))
+        
+        self.close_period_combo.clear()
+        for period in closable:
+            self.close_period_combo.addItem(period, period)
+
+    def close_selected_period(self):
+        period = self.close_period_combo.currentData()
+        if period is None:
+            QMessageBox.information(self, "Period Close", "There is no ended period left to close.")
+            return
+        confirm = QMessageBox.question(
+            self, "Confirm Close",
+            f"Close the books up to the end of {period}?\n\n"
+            "Invoices, bills and payments dated up to then can no longer be created, edited or deleted "
+            "until the period is reopened.",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+        )
+        if confirm != QMessageBox.StandardButton.Yes:
+            return
+        try:
+            close = close_period(period)
+            self.load_period_closes()
+            QMessageBox.information(self, "Success", f"Books closed up to {close['end_date']}.")
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to close the period: {str(e)}")
+
+    def reopen_latest_period(self):
+        closes = get_period_closes()
+        if not closes:
+            QMessageBox.information(self, "Period Close", "No period is closed.")
+            return
+        period = closes[0]['period']
+        confirm = QMessageBox.question(
+            self, "Confirm Reopen",
+            f"Reopen {period}? Entries dated in it can be changed again and its recorded balances are discarded.",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+        )
+        if confirm != QMessageBox.StandardButton.Yes:
+            return
+        try:
+            reopen_period(period)
+            self.load_period_closes()
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to reopen the period: {str(e)}")
+
+    def save_snapshot_settings(self):
+        try:
+            for key, value in (
+                ('auto_snapshot_enabled', '1' if self.snapshot_enabled.isChecked() else '0'),
+                ('auto_snapshot_interval_minutes', str(self.snapshot_interval.value())),
+            ):
+                execute_write_query("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, value))
+            QMessageBox.information(self, "Success", "Snapshot settings saved.")
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to save snapshot settings: {str(e)}")
+
+    def load_snapshots(self):
+        try:
+            snapshots = list_snapshots()
+        except Exception as e:
+            self.snapshot_info.setText(f"Could not read snapshots: {e}")
+            return
+        self.snapshot_table.setRowCount(len(snapshots))
+        for row, snap in enumerate(snapshots):
+            self.snapshot_table.setItem(row, 0, QTableWidgetItem(str(snap['id'])))
+            self.snapshot_table.setItem(row, 1, QTableWidgetItem(snap['created_at'].replace('T', ' ')))
+            self.snapshot_table.setItem(row, 2, QTableWidgetItem(f"{snap['db_bytes'] / (1024 * 1024):.1f} MB"))
+            self.snapshot_table.setItem(row, 3, QTableWidgetItem(f"{snap['new_bytes'] / 1024:.0f} KB ({snap['new_pages']} pages)"))
+        self.snapshot_info.setText(
+            f"{len(snapshots)} snapshots using {get_store_size() / (1024 * 1024):.1f} MB. "
+            "Hourly snapshots are kept for a day, daily for a month and monthly for a year."
+        )
+
+    def take_snapshot_now(self):
+        if self.snapshot_task and self.snapshot_task.is_running():
+            QMessageBox.information(self, "Please Wait", "A snapshot is already running.")
+            return
+        
+        self.snapshot_task = BackgroundTask(take_snapshot)
+        self.snapshot_task.progress.connect(self.on_snapshot_progress)
+        self.snapshot_task.finished.connect(self.on_snapshot_finished)
+        self.snapshot_task.failed.connect(self.on_snapshot_failed)
+        
+        self.snapshot_progress = QProgressDialog("Taking snapshot...", "Cancel", 0, 0, self)
+        self.snapshot_progress.setWindowTitle("Snapshot")
+        self.snapshot_progress.setWindowModality(Qt.WindowModality.WindowModal)
+        self.snapshot_progress.setMinimumDuration(0)
+        self.snapshot_progress.setAutoClose(False)
+        self.snapshot_progress.setAutoReset(False)
+        self.snapshot_progress.canceled.connect(self.cancel_snapshot)
+        self.snapshot_progress.show()
+        
+        self.snapshot_task.start()
+
+    def cancel_snapshot(self):
+        if self.snapshot_task:
+            self.snapshot_task.cancel()
+
+    def on_snapshot_progress(self, done, total):
+        if not self.snapshot_progress:
+            return
+        self.snapshot_progress.setMaximum(total)
+        self.snapshot_progress.setValue(done)
+
+    def close_snapshot_progress(self):
+        if self.snapshot_progress:
+            self.snapshot_progress.canceled.disconnect(self.cancel_snapshot)
+            self.snapshot_progress.close()
+            self.snapshot_progress = None
+
+    def on_snapshot_finished(self, result):
+        self.close_snapshot_progress()
+        self.snapshot_task.wait()
+        try:
+            prune_snapshots()
+        except Exception as e:
+            print(f"Warning: Could not prune snapshots: {e}")
+        self.load_snapshots()
+        if result['id'] is None:
+            QMessageBox.information(self, "Snapshot", "Nothing has changed since the latest snapshot.")
+        else:
+            QMessageBox.information(
+                self, "Success",
+                f"Snapshot taken in {result['seconds']:.1f}s; "
+                f"{result['new_pages']} of {result['page_count']} pages were new ({result['new_bytes'] / 1024:.0f} KB stored)."
+            )
+
+    def on_snapshot_failed(self, message):
+        self.close_snapshot_progress()
+        self.snapshot_task.wait()
+        if self.snapshot_task.is_cancelled():
+            return
+        QMessageBox.critical(self, "Error", f"Failed to take snapshot: {message}")
+
+    def restore_selected_snapshot(self):
+        row = self.snapshot_table.currentRow()
+        if row < 0:
+            QMessageBox.warning(self, "Error", "Please select a snapshot to restore.")
+            return
+        snapshot_id = int(self.snapshot_table.item(row, 0).text())
+        taken_at = self.snapshot_table.item(row, 1).text()
+        
+        confirm = QMessageBox.question(
+            self, "Confirm Restore",
+            f"Restore the database as it was at {taken_at}? Changes made after that will be lost.",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+        )
+        if confirm != QMessageBox.StandardButton.Yes:
+            return
+        
+        self.start_restore(restore_from_snapshot, snapshot_id)
 
     def reset_db(self):
         confirm = QMessageBox.question(
@@ -298,12 +1046,10 @@ class SettingsPage(QWidget):
                 QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
             )
             if confirm2 == QMessageBox.StandardButton.Yes:
-                from database.db import DB_NAME, init_db
+                from database.db import reset_database
                 try:
-                    if os.path.exists(DB_NAME):
-                        os.remove(DB_NAME)
-                    
-                    init_db()
+                    reset_database()
+                    clear_render_cache()
                     QMessageBox.information(self, "Success", "Database has been reset. Please restart the application.")
                 except Exception as e:
                     QMessageBox.critical(self, "Error", f"Failed to reset database: {str(e)}")
@@ -377,6 +1123,10 @@ class SettingsPage(QWidget):
             for query, params in updates:
                 execute_write_query(query, params)
             
+            # Cached invoices and bills still show the old company header
+            clear_render_cache()
+            invalidate_logo()
+            
             # Refresh local data
             self.load_settings()
             QMessageBox.information(self, "Success", "Profile settings saved!")
@@ -401,24 +1151,20 @@ class SettingsPage(QWidget):
             QMessageBox.critical(self, "Error", "User session not found. Please login again.")
             return
 
-        # Verify current password
-        # Need to fetch latest hash from DB to be safe
-        user_db = execute_read_query("SELECT password_hash FROM users WHERE id = ?", (user['id'],))
-        if not user_db:
-             QMessageBox.critical(self, "Error", "User not found in database.")
-             return
-             
-        if not check_password(current, user_db[0]['password_hash']):
+        # Checked against the stored hash where the database is, on the server in client mode
+        try:
+            changed = change_password(user['id'], current, new_pass)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to update password: {e}")
+            return
+        if not changed:
             QMessageBox.critical(self, "Error", "Current password is incorrect")
             return
-            
-        if update_password(user['id'], new_pass):
-            QMessageBox.information(self, "Success", "Password updated successfully!")
-            self.current_password.clear()
-            self.new_password.clear()
-            self.confirm_password.clear()
-        else:
-            QMessageBox.critical(self, "Error", "Failed to update password")
+
+        QMessageBox.information(self, "Success", "Password updated successfully!")
+        self.current_password.clear()
+        self.new_password.clear()
+        self.confirm_password.clear()
 
     def load_custom_fields(self):
         module = self.module_combo.currentText().lower() # invoices, bills, payments
@@ -484,11 +1230,3 @@ class SettingsPage(QWidget):
             QMessageBox.information(self, "Success", f"Custom fields for {module} saved!")
         except Exception as e:
             QMessageBox.critical(self, "Error", str(e))
-
-    def backup_db(self):
-        try:
-            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-            shutil.copy("database/ledgerpro.db", f"backup_ledgerpro_{timestamp}.db")
-            QMessageBox.information(self, "Success", f"Backup created: backup_ledgerpro_{timestamp}.db")
-        except Exception as e:
-            QMessageBox.critical(self, "Error", str(e))
@@ -3,7 +3,7 @@ from PySide6.QtWidgets import (
     QTableWidgetItem, QHeaderView, QLabel, QMessageBox, QFileDialog, QInputDialog, QLineEdit
 )
 from PySide6.QtCore import QDate
-from modules.stock_fifo import get_stock_valuation_summary, add_stock, reduce_stock_fifo
+from modules.stock_fifo import get_stock_valuation_summary, add_stock, reduce_stock
 from database.db import execute_read_query, execute_write_query
 import csv
 
@@ -14,7 +14,7 @@ class StockPage(QWidget):
         
         # Header
         header = QHBoxLayout()
-        title = QLabel("Stock Valuation (FIFO)")
+        title = QLabel("Stock Valuation")
         title.setStyleSheet("font-size: 24px; font-weight: bold;")
         
         self.search_bar = QLineEdit()
@@ -38,8 +38,8 @@ class StockPage(QWidget):
         layout.addLayout(header)
         
         self.table = QTableWidget()
-        self.table.setColumnCount(4)
-        self.table.setHorizontalHeaderLabels(["Item Name", "Qty Available", "FIFO Value", "Avg Cost"])
+        self.table.setColumnCount(5)
+        self.table.setHorizontalHeaderLabels(["Item Name", "Method", "Qty Available", "Stock Value", "Avg Cost"])
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
         self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
         
@@ -71,9 +71,10 @@ class StockPage(QWidget):
         
         for r, item in enumerate(filtered_data):
             self.table.setItem(r, 0, QTableWidgetItem(item['item_name']))
-            self.table.setItem(r, 1, QTableWidgetItem(str(item['total_quantity'])))
-            self.table.setItem(r, 2, QTableWidgetItem(f"₹{item['total_value']:.2f}"))
-            self.table.setItem(r, 3, QTableWidgetItem(f"₹{item['avg_cost']:.2f}"))
+            self.table.setItem(r, 1, QTableWidgetItem(item['method']))
+            self.table.setItem(r, 2, QTableWidgetItem(str(item['total_quantity'])))
+            self.table.setItem(r, 3, QTableWidgetItem(f"₹{item['total_value']:.2f}"))
+            self.table.setItem(r, 4, QTableWidgetItem(f"₹{item['avg_cost']:.2f}"))
         
         total_qty = 0.0
         total_value = 0.0
@@ -184,11 +185,11 @@ class StockPage(QWidget):
                         if new_qty > current_qty:
                             # Add Stock
                             diff = new_qty - current_qty
-                            add_stock(item_id, diff, purchase_price, QDate.currentDate().toString("yyyy-MM-dd"))
+                            add_stock(item_id, diff, purchase_price, QDate.currentDate().toString("yyyy-MM-dd"), kind='adjustment')
                         elif new_qty < current_qty:
                             # Reduce Stock
                             diff = current_qty - new_qty
-                            reduce_stock_fifo(item_id, diff)
+                            reduce_stock(item_id, diff, kind='adjustment')
                         
                         success_count += 1
                         
@@ -210,6 +211,6 @@ class StockPage(QWidget):
         if filename:
             with open(filename, 'w', newline='', encoding='utf-8') as f:
                 writer = csv.writer(f)
-                writer.writerow(["Item Name", "Quantity", "Total Value", "Avg Cost"])
+                writer.writerow(["Item Name", "Method", "Quantity", "Total Value", "Avg Cost"])
                 for item in self.stock_data:
-                    writer.writerow([item['item_name'], item['total_quantity'], item['total_value'], item['avg_cost']])
+                    writer.writerow([item['item_name'], item['method'], item['total_quantity'], item['total_value'], item['avg_cost']])
@@ -0,0 +1,58 @@
+from PySide6.QtCore import Qt, QObject, QThread, Signal
+
+
+class BackgroundTask(QObject):
+    """
+    Runs a long function on a worker thread.
+
+    The function is called as fn(*args, progress_callback=..., is_cancelled=..., **kwargs)
+    so it can report progress and stop early. Connect the signals to methods of
+    widgets (not lambdas) so the slots run on the GUI thread.
+    """
+    progress = Signal(int, int)
+    finished = Signal(object)
+    failed = Signal(str)
+
+    def __init__(self, fn, *args, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self._cancelled = False
+        self.thread = None
+
+    def cancel(self):
+        # Called directly from the GUI thread; the worker polls is_cancelled()
+        self._cancelled = True
+
+    def is_cancelled(self):
+        return self._cancelled
+
+    def run(self):
+        try:
+            result = self.fn(
+                *self.args,
+                progress_callback=self.progress.emit,
+                is_cancelled=self.is_cancelled,
+                **self.kwargs
+            )
+            self.finished.emit(result)
+        except Exception as e:
+            self.failed.emit(str(e))
+
+    def start(self):
+        """Moves the task onto a new QThread and starts it."""
+        self.thread = QThread()
+        self.moveToThread(self.thread)
+        self.thread.started.connect(self.run)
+        # Quit from the worker side so a GUI slot can safely wait() on the thread
+        self.finished.connect(self.thread.quit, Qt.ConnectionType.DirectConnection)
+        self.failed.connect(self.thread.quit, Qt.ConnectionType.DirectConnection)
+        self.thread.start()
+
+    def is_running(self):
+        return self.thread is not None and self.thread.isRunning()
+
+    def wait(self):
+        if self.thread is not None:
+            self.thread.wait()
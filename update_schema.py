@@ -2,12 +2,13 @@ import sqlite3
 import os
 from database.db import DB_NAME
 
-def migrate():
+def migrate(db_path=None):
+    db_path = db_path or DB_NAME
     # Check if DB exists before connecting
-    if not os.path.exists(DB_NAME):
+    if not os.path.exists(db_path):
         return
 
-    conn = sqlite3.connect(DB_NAME)
+    conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
 
     columns_to_add = [
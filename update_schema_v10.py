@@ -0,0 +1,53 @@
+import sqlite3
+import os
+from database.db import DB_NAME
+
+def migrate(db_path=None):
+    db_path = db_path or DB_NAME
+    if not os.path.exists(db_path):
+        return
+
+    conn = sqlite3.connect(db_path, timeout=30.0)
+    cursor = conn.cursor()
+
+    # One row per imported bank statement file
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS bank_statements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            file_name TEXT,
+            account TEXT,
+            line_count INTEGER DEFAULT 0,
+            imported_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Statement lines and what they were matched to. amount is signed:
+    # positive for money in, negative for money out. A line matched to a
+    # payment keeps its payment_number; one matched to an open invoice or
+    # bill keeps match_type/match_id until it is recorded as a payment.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS bank_statement_lines (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            statement_id INTEGER NOT NULL,
+            line_no INTEGER,
+            date DATE,
+            description TEXT,
+            reference TEXT,
+            amount REAL NOT NULL,
+            status TEXT DEFAULT 'Unmatched',
+            match_type TEXT,
+            match_id INTEGER,
+            payment_number TEXT,
+            match_rule TEXT,
+            score REAL,
+            FOREIGN KEY(statement_id) REFERENCES bank_statements(id)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_bank_lines_statement ON bank_statement_lines(statement_id, status)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_bank_lines_payment ON bank_statement_lines(payment_number)")
+
+    conn.commit()
+    conn.close()
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,29 @@
+import sqlite3
+import os
+from database.db import DB_NAME
+
+# Party and document lookups used by statements of account, payment
+# allocation and balances
+INDEXES = (
+    ("idx_invoices_customer_date", "invoices(customer_id, date)"),
+    ("idx_bills_vendor_date", "bills(vendor_id, date)"),
+    ("idx_payments_customer_date", "payments(customer_id, date)"),
+    ("idx_payments_vendor_date", "payments(vendor_id, date)"),
+    ("idx_payments_invoice", "payments(invoice_id)"),
+    ("idx_payments_bill", "payments(bill_id)"),
+)
+
+def migrate(db_path=None):
+    db_path = db_path or DB_NAME
+    if not os.path.exists(db_path):
+        return
+
+    conn = sqlite3.connect(db_path, timeout=30.0)
+    cursor = conn.cursor()
+    for name, target in INDEXES:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+    conn.commit()
+    conn.close()
+
+if __name__ == "__main__":
+    migrate()
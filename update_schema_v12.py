@@ -0,0 +1,46 @@
+import sqlite3
+import os
+from database.db import DB_NAME
+from database.audit import install_audit_triggers
+
+def migrate(db_path=None):
+    db_path = db_path or DB_NAME
+    if not os.path.exists(db_path):
+        return
+
+    conn = sqlite3.connect(db_path, timeout=30.0)
+    cursor = conn.cursor()
+
+    # Append-only change log written by the audit triggers (database/audit.py)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS audit_log (
+            id INTEGER PRIMARY KEY,
+            txn INTEGER,
+            ts TEXT,
+            user_id INTEGER,
+            entity TEXT,
+            entity_id INTEGER,
+            action TEXT,
+            changes TEXT
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_audit_log_entity_ts ON audit_log(entity, ts)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_audit_log_entity_id ON audit_log(entity, entity_id)")
+
+    # Single row read by the triggers: current transaction number and user
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS audit_context (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            txn INTEGER NOT NULL DEFAULT 0,
+            user_id INTEGER,
+            suspended INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("INSERT OR IGNORE INTO audit_context (id) VALUES (1)")
+    conn.commit()
+
+    install_audit_triggers(conn)
+    conn.close()
+
+if __name__ == "__main__":
+    migrate()
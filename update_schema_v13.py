@@ -0,0 +1,27 @@
+import sqlite3
+import os
+from database.db import DB_NAME
+from database.concurrency import VERSIONED_TABLES, VERSION_TRIGGERS
+
+def migrate(db_path=None):
+    db_path = db_path or DB_NAME
+    if not os.path.exists(db_path):
+        return
+
+    conn = sqlite3.connect(db_path, timeout=30.0)
+    cursor = conn.cursor()
+
+    # Row version checked when an edit is saved (database/concurrency.py)
+    for table in VERSIONED_TABLES:
+        columns = [row[1] for row in cursor.execute(f"PRAGMA table_info({table})")]
+        if 'version' not in columns:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+            print(f"Added version to {table}")
+
+    for sql in VERSION_TRIGGERS.values():
+        cursor.execute(sql)
+    conn.commit()
+    conn.close()
+
+if __name__ == "__main__":
+    migrate()
@@ -14,12 +14,13 @@ def add_column_if_not_exists(cursor, table, column, col_type):
         else:
             print(f"Error adding column {column} to {table}: {e}")
 
-def migrate():
+def migrate(db_path=None):
+    db_path = db_path or DB_FILE
     # Check if DB exists
-    if not os.path.exists(DB_FILE):
+    if not os.path.exists(db_path):
         return
 
-    conn = sqlite3.connect(DB_FILE)
+    conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
 
     # --- Invoices ---
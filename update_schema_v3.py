@@ -14,12 +14,13 @@ def add_column_if_not_exists(cursor, table, column, col_type):
         else:
             print(f"Error adding column {column} to {table}: {e}")
 
-def migrate():
-    if not os.path.exists(DB_FILE):
-        print(f"Database file not found at {DB_FILE}")
+def migrate(db_path=None):
+    db_path = db_path or DB_FILE
+    if not os.path.exists(db_path):
+        print(f"Database file not found at {db_path}")
         return
 
-    conn = sqlite3.connect(DB_FILE, timeout=30.0)
+    conn = sqlite3.connect(db_path, timeout=30.0)
     conn.execute("PRAGMA journal_mode=WAL;")
     cursor = conn.cursor()
 
@@ -2,11 +2,12 @@ import sqlite3
 import os
 from database.db import DB_NAME
 
-def migrate():
-    if not os.path.exists(DB_NAME):
+def migrate(db_path=None):
+    db_path = db_path or DB_NAME
+    if not os.path.exists(db_path):
         return
 
-    conn = sqlite3.connect(DB_NAME)
+    conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
 
     try:
@@ -0,0 +1,39 @@
+import sqlite3
+import os
+from database.db import DB_NAME
+
+def migrate(db_path=None):
+    db_path = db_path or DB_NAME
+    if not os.path.exists(db_path):
+        return
+
+    conn = sqlite3.connect(db_path, timeout=30.0)
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS maintenance_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            task TEXT NOT NULL,
+            started_at TIMESTAMP NOT NULL,
+            seconds REAL NOT NULL,
+            details TEXT
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_maintenance_log_task ON maintenance_log(task, started_at)")
+    conn.commit()
+
+    # Free pages can only be handed back with incremental_vacuum once auto_vacuum
+    # is INCREMENTAL, and switching an existing database needs one full VACUUM
+    auto_vacuum = cursor.execute("PRAGMA auto_vacuum").fetchone()[0]
+    if auto_vacuum != 2:
+        try:
+            cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            cursor.execute("VACUUM")
+            print("Enabled incremental vacuum")
+        except sqlite3.OperationalError as e:
+            print(f"Could not enable incremental vacuum: {e}")
+
+    conn.close()
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,60 @@
+import sqlite3
+import os
+from database.db import DB_NAME
+
+def migrate(db_path=None):
+    db_path = db_path or DB_NAME
+    if not os.path.exists(db_path):
+        return
+
+    conn = sqlite3.connect(db_path, timeout=30.0)
+    cursor = conn.cursor()
+
+    # One row per fiscal year moved into an archive file
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS archived_years (
+            fiscal_year INTEGER PRIMARY KEY,
+            path TEXT NOT NULL,
+            first_date DATE,
+            last_date DATE,
+            invoices INTEGER DEFAULT 0,
+            bills INTEGER DEFAULT 0,
+            payments INTEGER DEFAULT 0,
+            stock_batches INTEGER DEFAULT 0,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Monthly totals of the archived rows, carried forward so opening balances
+    # and charts do not need the archive files
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS archived_totals (
+            fiscal_year INTEGER NOT NULL,
+            month TEXT NOT NULL,
+            sales REAL DEFAULT 0,
+            purchases REAL DEFAULT 0,
+            output_tax REAL DEFAULT 0,
+            input_tax REAL DEFAULT 0,
+            cash_in REAL DEFAULT 0,
+            cash_out REAL DEFAULT 0,
+            PRIMARY KEY (fiscal_year, month)
+        )
+    """)
+
+    # Per customer/vendor totals of the archived documents and their payments
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS archived_party_totals (
+            fiscal_year INTEGER NOT NULL,
+            party_type TEXT NOT NULL,
+            party_id INTEGER NOT NULL,
+            billed REAL DEFAULT 0,
+            settled REAL DEFAULT 0,
+            PRIMARY KEY (fiscal_year, party_type, party_id)
+        )
+    """)
+
+    conn.commit()
+    conn.close()
+
+if __name__ == "__main__":
+    migrate()
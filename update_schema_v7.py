@@ -0,0 +1,52 @@
+import sqlite3
+import os
+from database.db import DB_NAME
+
+def migrate(db_path=None):
+    db_path = db_path or DB_NAME
+    if not os.path.exists(db_path):
+        return
+
+    conn = sqlite3.connect(db_path, timeout=30.0)
+    cursor = conn.cursor()
+
+    # One row per closed month; cash totals are cumulative up to end_date
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS period_closes (
+            period TEXT PRIMARY KEY,
+            kind TEXT NOT NULL DEFAULT 'month',
+            end_date DATE NOT NULL,
+            cash_in REAL DEFAULT 0,
+            cash_out REAL DEFAULT 0,
+            closed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Cumulative billed/settled per customer and vendor at each close
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS period_party_balances (
+            period TEXT NOT NULL,
+            party_type TEXT NOT NULL,
+            party_id INTEGER NOT NULL,
+            billed REAL DEFAULT 0,
+            settled REAL DEFAULT 0,
+            PRIMARY KEY (period, party_type, party_id)
+        )
+    """)
+
+    # Stock quantity and value per item at each close
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS period_stock (
+            period TEXT NOT NULL,
+            item_id INTEGER NOT NULL,
+            quantity REAL DEFAULT 0,
+            value REAL DEFAULT 0,
+            PRIMARY KEY (period, item_id)
+        )
+    """)
+
+    conn.commit()
+    conn.close()
+
+if __name__ == "__main__":
+    migrate()
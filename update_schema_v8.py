@@ -0,0 +1,74 @@
+import sqlite3
+import os
+from database.db import DB_NAME
+
+def migrate(db_path=None):
+    db_path = db_path or DB_NAME
+    if not os.path.exists(db_path):
+        return
+
+    conn = sqlite3.connect(db_path, timeout=30.0)
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='stock_movements'")
+    is_new = cursor.fetchone() is None
+
+    # Every change to stock, never updated or deleted. value is the cost of
+    # the movement (FIFO cost for issues), so SUM(value) is the stock value.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS stock_movements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            item_id INTEGER NOT NULL,
+            date DATE NOT NULL,
+            quantity REAL NOT NULL,
+            value REAL NOT NULL DEFAULT 0,
+            kind TEXT NOT NULL,
+            reference_type TEXT,
+            reference_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (item_id) REFERENCES items(id)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_stock_movements_item_date ON stock_movements(item_id, date)")
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS stock_movements_no_update BEFORE UPDATE ON stock_movements
+        BEGIN SELECT RAISE(ABORT, 'stock_movements is append-only'); END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS stock_movements_no_delete BEFORE DELETE ON stock_movements
+        BEGIN SELECT RAISE(ABORT, 'stock_movements is append-only'); END
+    """)
+
+    # Quantity and value of every item at month ends, so point-in-time
+    # queries only add up the movements after the nearest one
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS stock_checkpoints (
+            date DATE NOT NULL,
+            item_id INTEGER NOT NULL,
+            quantity REAL DEFAULT 0,
+            value REAL DEFAULT 0,
+            PRIMARY KEY (date, item_id)
+        )
+    """)
+
+    if is_new:
+        # Existing books start the ledger with their current stock
+        cursor.execute("""
+            INSERT INTO stock_movements (item_id, date, quantity, value, kind)
+            SELECT i.id, DATE('now', 'localtime'), i.stock_on_hand,
+                   CASE WHEN COALESCE(SUM(sb.quantity_remaining), 0) = 0
+                        THEN i.stock_on_hand * COALESCE(i.purchase_price, 0)
+                        ELSE SUM(sb.quantity_remaining * sb.purchase_rate) END,
+                   'opening'
+            FROM items i
+            LEFT JOIN stock_batches sb ON sb.item_id = i.id AND sb.quantity_remaining > 0
+            WHERE COALESCE(i.stock_on_hand, 0) != 0
+            GROUP BY i.id
+        """)
+        print(f"Stock ledger started with {cursor.rowcount} items")
+
+    conn.commit()
+    conn.close()
+
+if __name__ == "__main__":
+    migrate()
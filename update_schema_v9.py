@@ -0,0 +1,37 @@
+import sqlite3
+import os
+from database.db import DB_NAME
+
+def migrate(db_path=None):
+    db_path = db_path or DB_NAME
+    if not os.path.exists(db_path):
+        return
+
+    conn = sqlite3.connect(db_path, timeout=30.0)
+    cursor = conn.cursor()
+
+    cursor.execute("PRAGMA table_info(items)")
+    if 'average_cost' not in [row[1] for row in cursor.fetchall()]:
+        # Running cost per unit of weighted-average items; they keep no batches
+        cursor.execute("ALTER TABLE items ADD COLUMN average_cost REAL DEFAULT 0")
+
+        # Items already set to Weighted Average were costed with FIFO batches
+        # until now, so start their average from what the batches are worth
+        cursor.execute("""
+            UPDATE items SET average_cost = COALESCE(
+                (SELECT SUM(quantity_remaining * purchase_rate) / SUM(quantity_remaining)
+                 FROM stock_batches WHERE item_id = items.id AND quantity_remaining > 0),
+                purchase_price, 0)
+            WHERE inventory_valuation_method = 'Weighted Average'
+        """)
+        cursor.execute("""
+            UPDATE stock_batches SET quantity_remaining = 0
+            WHERE quantity_remaining > 0 AND item_id IN (
+                SELECT id FROM items WHERE inventory_valuation_method = 'Weighted Average')
+        """)
+
+    conn.commit()
+    conn.close()
+
+if __name__ == "__main__":
+    migrate()